@@ -1,8 +1,8 @@
-from flask import Flask, request, jsonify, session
+from flask import Flask, request, jsonify, session, after_this_request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from werkzeug.utils import secure_filename
-import os, uuid
+import os, uuid, threading
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -12,7 +12,14 @@ load_dotenv()
 from config.settings import config
 from models.database import DatabaseManager
 from models.user_manager import UserManager
-from models.unified_classifier import UnifiedWasteClassifier
+from models.classifier_pool import classifier_pool
+from models.unified_classifier import is_valid_confidence
+from models.phash_index import phash_index
+from models.side_effects import side_effects
+from utils.upload_storage import upload_storage
+from utils.lazy import LazyObject, startup_state, warm, warm_all
+from utils.db_pool import get_db_pool_stats
+from config.ai_config import AIConfig
 
 # Import your route blueprints
 from routes.auth import auth_bp
@@ -38,10 +45,76 @@ def create_app(config_name='development'):
          methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
     jwt = JWTManager(app)
 
-    # DB & Model instances
-    db = DatabaseManager()
-    user_manager = UserManager()
-    classifier = UnifiedWasteClassifier()
+    # DB & Model instances (built on first use; see STARTUP_MODE below)
+    startup_mode = app.config.get('STARTUP_MODE', 'eager')
+    startup_state.begin(startup_mode)
+    db = LazyObject(DatabaseManager, 'database')
+    user_manager = LazyObject(UserManager, 'user_manager')
+
+    def persist_classification(task):
+        """Save a classification, index it and award its points; safe to run again"""
+        row_id = db.save_classification(
+            filename=task['filename'],
+            original_filename=task['original_filename'],
+            waste_type=task['waste_type'],
+            confidence=task['confidence'],
+            all_predictions=task['all_predictions'],
+            image_path=task['image_path'],
+            recommendations=task['recommendations'],
+            environmental_impact=task['environmental_impact'],
+            phash=task['phash'],
+            classification_uid=task['classification_id'],
+            user_id=task['user_id'],
+            session_id=task.get('session_id')  # absent from tasks queued before it was added
+        )
+        if row_id is None:
+            raise RuntimeError("Classification was not saved")
+        if task['phash'] is not None:
+            phash_index.add(row_id, task['phash'])
+
+        if task['user_id']:
+            from routes.rewards import rewards_manager
+            new_total = rewards_manager.add_points(
+                task['user_id'], 10, 'Waste classification', task['classification_id'],
+                idempotency_key=f"classification:{task['classification_id']}"
+            )
+            if new_total is None:
+                raise RuntimeError("Classification points were not awarded")
+
+    # Saving and rewarding run after the response, in order per user
+    side_effects.register('classification', persist_classification)
+
+    def warm_up():
+        # Database and user tables first, then the blueprints' managers and demo data
+        warm(db)
+        warm(user_manager)
+        # Pick up side effects left over from before a restart
+        side_effects.start()
+        warm_all()
+        # Warm the active provider now so the first request doesn't pay for it
+        classifier_pool.get()
+        # Near-duplicate index fills from the classifications table in the background
+        if AIConfig.PHASH_INDEX_ENABLED:
+            phash_index.start_loading()
+        startup_state.mark_ready()
+
+    def warm_up_in_background():
+        try:
+            warm_up()
+        except Exception as e:
+            print(f"[ERROR] Background warm-up failed: {e}")
+
+    # eager: warm everything before serving (slowest start, fastest first request)
+    # background: serve at once and warm on a thread; /api/ready reports 503 until done
+    # lazy: warm nothing; each subsystem is built (and heavy modules imported) on first use
+    if startup_mode == 'background':
+        threading.Thread(target=warm_up_in_background, name="warm-up", daemon=True).start()
+    elif startup_mode == 'lazy':
+        if AIConfig.PHASH_INDEX_ENABLED:
+            phash_index.start_loading()
+        startup_state.mark_ready()
+    else:
+        warm_up()
 
     # JWT error handlers (omitted for brevity)…
     # @jwt.expired_token_loader...
@@ -56,6 +129,7 @@ def create_app(config_name='development'):
     # File upload config
     UPLOAD_FOLDER = app.config['UPLOAD_FOLDER']
     ALLOWED_EXTENSIONS = set(app.config['ALLOWED_EXTENSIONS'])
+    PERSIST_UPLOADS = app.config.get('PERSIST_UPLOADS', True)
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
     def allowed_file(filename):
@@ -78,14 +152,25 @@ def create_app(config_name='development'):
                 'error': f'Invalid file type. Allowed: {", ".join(ALLOWED_EXTENSIONS)}'
             }), 400
 
-        # 2) Save to disk
+        # 2) Read into memory; the original is written to disk after the response
         filename = f"{uuid.uuid4()}_{secure_filename(file.filename)}"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        filepath = os.path.join(UPLOAD_FOLDER, filename) if PERSIST_UPLOADS else None
+        image_bytes = file.read()
 
-        # 3) Classify using unified classifier (supports multiple AI providers)
+        if PERSIST_UPLOADS:
+            @after_this_request
+            def persist_upload(response):
+                response.call_on_close(lambda: upload_storage.save_async(image_bytes, filepath))
+                return response
+
+        # 3) Classify using the pooled classifier (supports multiple AI providers)
+        classifier = classifier_pool.get()
         try:
-            result = classifier.classify(filepath)
+            result = classifier.classify(image_bytes)
+            # Checked before anything is queued: a bad value would make the
+            # side-effect task fail on every retry until it is parked as dead
+            if not is_valid_confidence(result.get('confidence')):
+                raise ValueError(f"Provider returned an invalid confidence: {result.get('confidence')!r}")
         except Exception as exc:
             result = {
                 'waste_type': 'general',
@@ -104,41 +189,70 @@ def create_app(config_name='development'):
         # Build classification object
         classification = {
             'waste_type': result['waste_type'],
-            'confidence': result['confidence'],
+            'confidence': float(result['confidence']),
             'recommendations': recommendations,
             'environmental_impact': f"Proper disposal of {result['waste_type']} helps protect the environment",
             'all_predictions': result.get('all_predictions', {}),
             'provider_used': result.get('provider_used', 'unknown'),
-            'raw_category': result.get('raw_category')
+            'raw_category': result.get('raw_category'),
+            'cached': result.get('cached', False),
+            'payload': result.get('payload')
         }
 
-        # 4) Persist & (optional) reward
+        # 4) Persist & (optional) reward after the response; the id is assigned now
+        classification_id = str(uuid.uuid4())
         session_id = session.get('session_id', str(uuid.uuid4()))
         session['session_id'] = session_id
 
-        classification_id = db.save_classification(
-            filename=filename,
-            original_filename=file.filename,
-            waste_type=classification['waste_type'],
-            confidence=classification['confidence'],
-            all_predictions=classification.get('all_predictions'),
-            image_path=filepath,
-            recommendations=classification['recommendations'],
-            environmental_impact=classification['environmental_impact']
+        # Only index fresh, confident provider results for near-duplicate reuse
+        image_hash = result.get('phash')
+        reusable = (
+            image_hash is not None
+            and not result.get('fallback')
+            and not result.get('cached')
+            and result.get('provider_used') not in ('fallback', 'near-duplicate')
+            and result.get('raw_category') != 'fallback-local'
+            and float(classification['confidence']) >= AIConfig.PHASH_MIN_CONFIDENCE
         )
 
+        user_id = None
         try:
             from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
             verify_jwt_in_request(optional=True)
             user_id = get_jwt_identity()
-            if user_id:
-                from routes.rewards import rewards_manager
-                rewards_manager.add_points(
-                    user_id, 10, 'Waste classification', classification_id
-                )
         except:
             pass
 
+        task = {
+            'classification_id': classification_id,
+            'user_id': user_id,
+            'session_id': session_id,
+            'filename': filename,
+            'original_filename': file.filename,
+            'waste_type': classification['waste_type'],
+            'confidence': float(classification['confidence']),
+            'all_predictions': classification.get('all_predictions'),
+            'image_path': filepath,
+            'recommendations': classification['recommendations'],
+            'environmental_impact': classification['environmental_impact'],
+            'phash': int(image_hash) if reusable else None
+        }
+        try:
+            side_effects.enqueue(
+                'classification',
+                classification_id,
+                ordering_key=f"user:{user_id}" if user_id else f"session:{session_id}",
+                payload=task
+            )
+        except Exception as e:
+            print(f"[ERROR] Could not queue classification {classification_id}, saving inline: {e}")
+            try:
+                persist_classification(task)
+            except Exception as e:
+                # Nothing durable behind the id: don't hand it out
+                print(f"[ERROR] Could not save classification {classification_id}: {e}")
+                classification_id = None
+
         # 5) Return JSON
         return jsonify({
             'success': True,
@@ -152,6 +266,14 @@ def create_app(config_name='development'):
             }
         }), 200
 
+    @app.route('/api/ready', methods=['GET'])
+    def readiness():
+        """Readiness probe: which subsystems are warm and which heavy modules are loaded"""
+        state = startup_state.snapshot()
+        state['classifiers'] = classifier_pool.get_stats()
+        state['database_pools'] = get_db_pool_stats()
+        return jsonify(state), 200 if state['ready'] else 503
+
     # Health, stats, error handlers…
     @app.errorhandler(404)
     def not_found(e):
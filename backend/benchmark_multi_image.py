@@ -0,0 +1,181 @@
+"""
+Benchmark multi-image prompts against single-image calls
+
+Classifies the same images with the current one-image-per-call path and
+with MULTI_IMAGE_PER_CALL images per call, and reports per-image latency,
+calls made, token usage and estimated cost for each.
+
+Usage:
+    python benchmark_multi_image.py --provider gemini photos/*.jpg
+    python benchmark_multi_image.py --provider openai --per-call 4,8,16 photos/
+    python benchmark_multi_image.py --simulate        # no API key: modelled provider latency
+
+--simulate replaces the provider call with a sleep of overhead + per-image
+time and a modelled token count, so it exercises the packing, parsing and
+retry code but its numbers are only as good as the model.
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import argparse
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+from config.ai_config import AIConfig, AIProvider
+
+# USD per 1M tokens (input, output); override with --input-price / --output-price
+PRICES = {
+    AIProvider.GEMINI: (0.10, 0.40),
+    AIProvider.OPENAI: (2.50, 10.00)
+}
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def load_images(paths, count):
+    if not paths:
+        from PIL import Image
+        rng = np.random.default_rng(0)
+        images = []
+        for _ in range(count):
+            pixels = rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)
+            buffer = io.BytesIO()
+            Image.fromarray(pixels).save(buffer, format='JPEG', quality=85)
+            images.append(buffer.getvalue())
+        return images
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            files.append(path)
+    images = []
+    for path in files[:count] if count else files:
+        with open(path, 'rb') as f:
+            images.append(f.read())
+    return images
+
+
+def simulate_provider(classifier, overhead_ms, per_image_ms):
+    """Swap the provider calls for modelled latency and token counts"""
+    prompt_tokens, image_tokens, answer_tokens = 300, 258, 40
+
+    def fake_single(image_bytes, top_k):
+        time.sleep((overhead_ms + per_image_ms) / 1000)
+        result = classifier._llm_result('plastic', 0.9, 'simulated')
+        result['usage'] = {'input_tokens': prompt_tokens + image_tokens, 'output_tokens': answer_tokens}
+        return result
+
+    def fake_multi(images):
+        time.sleep((overhead_ms + per_image_ms * len(images)) / 1000)
+        answer = [{'index': i, 'waste_type': 'plastic', 'confidence': 0.9, 'reasoning': 'simulated'}
+                  for i in range(1, len(images) + 1)]
+        usage = {'input_tokens': prompt_tokens + image_tokens * len(images),
+                 'output_tokens': answer_tokens * len(images)}
+        return json.dumps(answer), usage
+
+    if classifier.provider == AIProvider.GEMINI:
+        classifier._classify_gemini = fake_single
+        classifier._gemini_multi_image = fake_multi
+    else:
+        classifier._classify_openai = fake_single
+        classifier._openai_multi_image = fake_multi
+
+
+def run(classifier, images, per_call):
+    """Classify every image with per_call images per call (1 = current single-image path)"""
+    from models.router import provider_router
+
+    AIConfig.MULTI_IMAGE_ENABLED = per_call > 1
+    AIConfig.MULTI_IMAGE_PER_CALL = per_call
+    calls_before = provider_router.get_stats()['calls'][classifier.provider.value]
+
+    start = time.perf_counter()
+    items = classifier.classify_batch(images)
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    tokens_in = tokens_out = 0.0
+    failed = 0
+    for item in items:
+        if not item['success']:
+            failed += 1
+            continue
+        usage = item['result'].get('usage') or {}
+        tokens_in += usage.get('input_tokens', 0)
+        tokens_out += usage.get('output_tokens', 0)
+    return {
+        'per_call': per_call,
+        'wall_ms': wall_ms,
+        'ms_per_image': wall_ms / len(images),
+        'calls': provider_router.get_stats()['calls'][classifier.provider.value] - calls_before,
+        'input_tokens': tokens_in,
+        'output_tokens': tokens_out,
+        'failed': failed
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare multi-image prompts with single-image calls")
+    parser.add_argument('images', nargs='*', help="Image files or directories (default: synthetic JPEGs)")
+    parser.add_argument('--provider', choices=['gemini', 'openai'], default='gemini')
+    parser.add_argument('--count', type=int, default=32, help="Images to classify")
+    parser.add_argument('--per-call', default='4,8', help="Images per call to compare against 1")
+    parser.add_argument('--concurrency', type=int, default=AIConfig.BATCH_MAX_CONCURRENCY)
+    parser.add_argument('--input-price', type=float, help="USD per 1M input tokens")
+    parser.add_argument('--output-price', type=float, help="USD per 1M output tokens")
+    parser.add_argument('--simulate', action='store_true', help="Model the provider instead of calling it")
+    parser.add_argument('--overhead-ms', type=float, default=600, help="Simulated fixed cost per call")
+    parser.add_argument('--per-image-ms', type=float, default=150, help="Simulated cost per image in a call")
+    args = parser.parse_args(argv)
+
+    provider = AIProvider(args.provider)
+    if not args.simulate and not AIConfig.is_provider_configured(provider):
+        sys.exit(f"[ERROR] {provider.value} has no API key; set it or use --simulate")
+
+    # Measure provider calls only
+    AIConfig.RESULT_CACHE_ENABLED = False
+    AIConfig.PHASH_INDEX_ENABLED = False
+    AIConfig.SINGLE_FLIGHT_ENABLED = False
+    AIConfig.CASCADE_ENABLED = False
+    AIConfig.BATCH_MAX_CONCURRENCY = args.concurrency
+
+    from models.unified_classifier import UnifiedWasteClassifier
+    classifier = UnifiedWasteClassifier(provider=provider)
+    if args.simulate:
+        simulate_provider(classifier, args.overhead_ms, args.per_image_ms)
+
+    images = load_images(args.images, args.count)
+    input_price, output_price = PRICES[provider]
+    input_price = args.input_price if args.input_price is not None else input_price
+    output_price = args.output_price if args.output_price is not None else output_price
+
+    sizes = [1] + [int(k) for k in args.per_call.split(',') if k.strip() and int(k) > 1]
+    results = [run(classifier, images, k) for k in sizes]
+
+    print("=" * 86)
+    mode = 'simulated' if args.simulate else 'live'
+    print(f"MULTI-IMAGE BENCHMARK ({provider.value}, {mode}, {len(images)} images, concurrency {args.concurrency})")
+    print("=" * 86)
+    print(f"{'images/call':>11}{'calls':>8}{'wall ms':>11}{'ms/image':>10}{'in tok/img':>12}"
+          f"{'out tok/img':>13}{'USD/1k img':>12}{'failed':>8}")
+    print("-" * 86)
+    for r in results:
+        cost = (r['input_tokens'] * input_price + r['output_tokens'] * output_price) / 1e6
+        print(f"{r['per_call']:>11}{r['calls']:>8}{r['wall_ms']:>11.0f}{r['ms_per_image']:>10.1f}"
+              f"{r['input_tokens'] / len(images):>12.0f}{r['output_tokens'] / len(images):>13.0f}"
+              f"{cost / len(images) * 1000:>12.3f}{r['failed']:>8}")
+    print("-" * 86)
+    print(f"Prices: ${input_price}/1M input, ${output_price}/1M output tokens")
+    print("=" * 86)
+    classifier.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Benchmark model-input preprocessing: full-resolution decode vs reduced decode
+
+Compares the previous pipeline (cv2.imdecode at full size, cvtColor, resize,
+astype / 255) with utils.image_processing.load_model_input (JPEG DCT-scaled
+decode, EXIF orientation, INTER_AREA resize into a preallocated buffer).
+Each pipeline runs in its own process so peak RSS is measured separately.
+
+Usage:
+    python benchmark_preprocessing.py                  # synthetic 12 MP JPEGs
+    python benchmark_preprocessing.py photo1.jpg ...   # your own images
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TARGET_SIZE = (128, 128)
+
+
+def make_synthetic_jpeg(path, size=(4000, 3000), seed=0):
+    """A photo-sized JPEG: shapes over a gradient plus sensor-like noise (~3-4 MB)"""
+    from PIL import Image, ImageDraw, ImageFilter
+
+    rng = np.random.default_rng(seed)
+    w, h = size
+    img = Image.linear_gradient('L').resize(size).convert('RGB')
+    draw = ImageDraw.Draw(img)
+    for _ in range(40):
+        x, y = int(rng.integers(0, w)), int(rng.integers(0, h))
+        r = int(rng.integers(h // 20, h // 4))
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(int(c) for c in rng.integers(0, 256, 3)))
+    img = img.filter(ImageFilter.GaussianBlur(3))
+    pixels = np.asarray(img, dtype=np.int16) + rng.integers(-12, 13, (h, w, 3), dtype=np.int16)
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(path, format='JPEG', quality=90)
+
+
+def decode_full(image_bytes, out):
+    """Pipeline before reduced decoding"""
+    import cv2
+
+    img = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    img = cv2.resize(img, TARGET_SIZE)
+    out[...] = img.astype(np.float32) / 255.0
+    return out
+
+
+def decode_reduced(image_bytes, out):
+    sys.path.insert(0, BASE_DIR)
+    from utils.image_processing import load_model_input
+    return load_model_input(image_bytes, TARGET_SIZE, out=out)
+
+
+PIPELINES = {'full-decode': decode_full, 'reduced-decode': decode_reduced}
+
+
+def _peak_rss_mb():
+    # VmHWM belongs to this process image; ru_maxrss can carry over from the
+    # parent across fork + exec
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def _worker(name, paths, repeats, queue):
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append(f.read())
+
+    decode = PIPELINES[name]
+    out = np.empty((TARGET_SIZE[1], TARGET_SIZE[0], 3), dtype=np.float32)
+    decode(images[0], out)  # warm-up: imports and codec init
+    rss_before = _peak_rss_mb()
+
+    timings = []
+    checksum = []
+    for _ in range(repeats):
+        for image_bytes in images:
+            start = time.perf_counter()
+            decode(image_bytes, out)
+            timings.append((time.perf_counter() - start) * 1000)
+        checksum.append(out.copy())
+
+    rss_after = _peak_rss_mb()
+    queue.put({
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p95_ms': float(np.percentile(timings, 95)),
+        'peak_rss_mb': rss_after,
+        'rss_growth_mb': rss_after - rss_before if rss_after is not None else None,
+        'last_tensor': checksum[-1]
+    })
+
+
+def run(name, paths, repeats):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_worker, args=(name, paths, repeats, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark model-input preprocessing")
+    parser.add_argument('images', nargs='*', help="Image files (default: synthetic 12 MP JPEGs)")
+    parser.add_argument('--count', type=int, default=8, help="Synthetic images to generate")
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    temp_dir = None
+    paths = args.images
+    if not paths:
+        temp_dir = tempfile.TemporaryDirectory()
+        paths = []
+        for i in range(args.count):
+            path = os.path.join(temp_dir.name, f"synthetic_{i}.jpg")
+            make_synthetic_jpeg(path, seed=i)
+            paths.append(path)
+
+    try:
+        sizes = [os.path.getsize(p) / 1e6 for p in paths]
+        print("=" * 72)
+        print(f"PREPROCESSING BENCHMARK ({len(paths)} images, avg {np.mean(sizes):.1f} MB, "
+              f"{args.repeats} repeats, target {TARGET_SIZE[0]}x{TARGET_SIZE[1]})")
+        print("=" * 72)
+
+        results = {name: run(name, paths, args.repeats) for name in PIPELINES}
+
+        print(f"{'pipeline':<18}{'p50 ms':>10}{'p95 ms':>10}{'peak RSS MB':>14}{'RSS growth MB':>16}")
+        print("-" * 72)
+        for name, result in results.items():
+            rss = f"{result['peak_rss_mb']:.0f}" if result['peak_rss_mb'] is not None else '-'
+            growth = f"{result['rss_growth_mb']:.0f}" if result['rss_growth_mb'] is not None else '-'
+            print(f"{name:<18}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{rss:>14}{growth:>16}")
+
+        full, reduced = results['full-decode'], results['reduced-decode']
+        print("-" * 72)
+        print(f"Speed-up (p50): {full['p50_ms'] / reduced['p50_ms']:.1f}x")
+        if full['peak_rss_mb'] is not None:
+            print(f"Peak RSS saved: {full['peak_rss_mb'] - reduced['peak_rss_mb']:.0f} MB")
+        # Different resampling, so small pixel differences are expected
+        diff = np.abs(full['last_tensor'] - reduced['last_tensor'])
+        print(f"Tensor difference vs full decode: mean {diff.mean():.4f}, max {diff.max():.4f}")
+        print("=" * 72)
+    finally:
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
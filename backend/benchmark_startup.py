@@ -0,0 +1,167 @@
+"""
+Startup-time benchmark for the Flask app factory
+
+Starts the app in a fresh interpreter for each STARTUP_MODE and breaks the
+cold-start cost down into:
+  - import time per package (from python -X importtime, self time summed)
+  - cumulative import time of each app module (routes.*, models.*, ...)
+  - init time of each lazily built subsystem and classifier provider
+  - time until create_app() returns and until /api/ready would report ready
+
+Usage:
+    python benchmark_startup.py
+    python benchmark_startup.py --modes eager,lazy --top 15
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from collections import defaultdict
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PACKAGES = ('app', 'routes', 'models', 'utils', 'config', 'middleware')
+MARKER = '@@STARTUP_BENCH@@'
+
+# Runs in the child interpreter
+CHILD_CODE = f'''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+
+from utils.lazy import startup_state
+from models.classifier_pool import classifier_pool
+deadline = time.perf_counter() + 300
+while not startup_state.ready and time.perf_counter() < deadline:
+    time.sleep(0.005)
+ready = time.perf_counter()
+
+try:
+    import resource
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+except ImportError:
+    peak_rss_mb = None
+
+snapshot = startup_state.snapshot()
+print({MARKER!r} + json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'ready_ms': (ready - start) * 1000,
+    'peak_rss_mb': peak_rss_mb,
+    'subsystems': snapshot['subsystems'],
+    'heavy_modules_loaded': snapshot['heavy_modules_loaded'],
+    'classifiers': classifier_pool.get_stats()
+}}))
+'''
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output
+
+    Returns:
+        list: (module, self_us, cumulative_us, depth) in import order
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_part, cumulative_part, raw_name = line.split('|', 2)
+            self_us = int(self_part.split(':', 1)[1])
+            cumulative_us = int(cumulative_part)
+        except ValueError:
+            continue
+        depth = (len(raw_name) - len(raw_name.lstrip(' ')) - 1) // 2
+        rows.append((raw_name.strip(), self_us, cumulative_us, depth))
+    return rows
+
+
+def run_mode(mode):
+    env = dict(os.environ, STARTUP_MODE=mode, PYTHONDONTWRITEBYTECODE='1')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD_CODE],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, timeout=600
+    )
+    result = None
+    for line in proc.stdout.splitlines():
+        if line.startswith(MARKER):
+            result = json.loads(line[len(MARKER):])
+    if result is None:
+        raise RuntimeError(f"{mode}: app did not start\n{proc.stderr[-2000:]}")
+    result['imports'] = parse_importtime(proc.stderr)
+    return result
+
+
+def summarize_imports(imports):
+    by_package = defaultdict(int)
+    app_modules = {}
+    for name, self_us, cumulative_us, _ in imports:
+        root = name.split('.')[0]
+        by_package[root] += self_us
+        if root in APP_PACKAGES:
+            app_modules[name] = cumulative_us
+    return by_package, app_modules
+
+
+def print_report(results, top):
+    print("=" * 80)
+    print("STARTUP BENCHMARK")
+    print("=" * 80)
+    print(f"{'mode':<12}{'import ms':>11}{'create_app ms':>15}{'ready ms':>11}{'peak RSS MB':>13}  heavy modules loaded")
+    print("-" * 80)
+    for mode, result in results.items():
+        heavy = ', '.join(name for name, loaded in result['heavy_modules_loaded'].items() if loaded) or '-'
+        rss = f"{result['peak_rss_mb']:.0f}" if result['peak_rss_mb'] is not None else '-'
+        print(f"{mode:<12}{result['import_ms']:>11.0f}{result['create_app_ms']:>15.0f}"
+              f"{result['ready_ms']:>11.0f}{rss:>13}  {heavy}")
+
+    for mode, result in results.items():
+        by_package, app_modules = summarize_imports(result['imports'])
+
+        print(f"\n[{mode}] Import self time by package (top {top})")
+        for name, us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+            print(f"  {name:<40}{us / 1000:>10.1f} ms")
+
+        print(f"\n[{mode}] App modules, cumulative import time (top {top})")
+        for name, us in sorted(app_modules.items(), key=lambda item: -item[1])[:top]:
+            print(f"  {name:<40}{us / 1000:>10.1f} ms")
+
+        print(f"\n[{mode}] Subsystem init")
+        for name, entry in sorted(result['subsystems'].items()):
+            status = f"{entry['init_ms']:.1f} ms" if entry['warm'] else 'cold'
+            if entry['error']:
+                status += f" (error: {entry['error']})"
+            print(f"  {name:<40}{status:>10}")
+        for provider, stats in result['classifiers'].items():
+            if stats.get('loaded'):
+                print(f"  {'classifier:' + provider:<40}{stats['load_time_ms']:>7.1f} ms")
+    print("=" * 80)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure app cold-start cost per module")
+    parser.add_argument('--modes', default='eager,background,lazy')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--json', help="Also write the raw results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for mode in [m.strip() for m in args.modes.split(',') if m.strip()]:
+        print(f"[BENCH] Starting app with STARTUP_MODE={mode} ...")
+        results[mode] = run_mode(mode)
+
+    print_report(results, args.top)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"[OK] Raw results saved to: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
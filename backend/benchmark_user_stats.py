@@ -0,0 +1,141 @@
+"""
+Per-user classification stats benchmark
+
+Builds a classifications table at the pre-owner schema (migration 004), times
+the old "filename LIKE '%user_id%'" lookup, applies migration 005 (owner
+columns, ledger backfill, index) and times the indexed replacements:
+  - DatabaseManager.get_user_classification_stats, all time and last 30 days
+  - UserManager.get_user_stats classification count
+
+80% of the rows belong to signed-in users and have a points-ledger entry, as
+the classify endpoint writes them; the rest are anonymous.
+
+Usage:
+    python benchmark_user_stats.py                   # 10M rows in a temp dir
+    python benchmark_user_stats.py --rows 1000000 --users 5000 --db /tmp/bench.db
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.db_pool import get_db_pool
+from models.migrations import MIGRATIONS, run_migrations
+
+WASTE_TYPES = ['plastic', 'organic', 'paper', 'glass', 'metal']
+CHUNK_ROWS = 1000000
+
+STATS_SQL = 'SELECT waste_type, COUNT(*) as count FROM classifications WHERE user_id = ? GROUP BY waste_type'
+STATS_SINCE_SQL = '''
+    SELECT waste_type, COUNT(*) as count FROM classifications
+    WHERE user_id = ? AND created_at >= ? GROUP BY waste_type
+'''
+COUNT_SQL = 'SELECT COUNT(*) FROM classifications WHERE user_id = ?'
+LIKE_SQL = 'SELECT waste_type, COUNT(*) as count FROM classifications WHERE filename LIKE ? GROUP BY waste_type'
+
+
+def populate(pool, rows, users):
+    """Insert rows in chunks with a recursive CTE (no per-row Python overhead)"""
+    for first in range(0, rows, CHUNK_ROWS):
+        last = min(first + CHUNK_ROWS, rows)
+        with pool.connection() as conn:
+            conn.execute(f'''
+                WITH RECURSIVE seq(n) AS (SELECT ? UNION ALL SELECT n + 1 FROM seq WHERE n + 1 < ?)
+                INSERT INTO classifications
+                (filename, original_filename, waste_type, confidence, classification_uid, created_at)
+                SELECT printf('%032x_photo.jpg', n), 'photo.jpg',
+                       CASE n % 5 {' '.join(f"WHEN {i} THEN '{t}'" for i, t in enumerate(WASTE_TYPES))} END,
+                       0.9, 'uid-' || n,
+                       datetime('2026-01-01', '+' || (n % 365) || ' days')
+                FROM seq
+            ''', (first, last))
+            conn.execute('''
+                WITH RECURSIVE seq(n) AS (SELECT ? UNION ALL SELECT n + 1 FROM seq WHERE n + 1 < ?)
+                INSERT INTO point_transactions (id, user_id, points, transaction_type, reason, reference_id)
+                SELECT 'txn-' || n, 'user-' || (n % ?), 10, 'earned', 'Waste classification', 'uid-' || n
+                FROM seq WHERE n % 10 < 8
+            ''', (first, last, users))
+        print(f"[BENCH] {last:,} / {rows:,} rows")
+
+
+def time_query(pool, sql, params_list):
+    timings = []
+    with pool.connection() as conn:
+        for params in params_list:
+            start = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def plan(pool, sql, params):
+    with pool.connection() as conn:
+        return '; '.join(row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params))
+
+
+def row(name, timings, detail):
+    print(f"{name:<34}{np.percentile(timings, 50):>11.3f}{np.percentile(timings, 95):>11.3f}{len(timings):>7}  {detail}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-user stats: filename LIKE scan vs user_id index")
+    parser.add_argument('--rows', type=int, default=10000000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--like-runs', type=int, default=3, help="The scan is slow; a few runs are enough")
+    parser.add_argument('--indexed-runs', type=int, default=1000)
+    parser.add_argument('--db', help="Database file to build (default: a temporary directory)")
+    args = parser.parse_args(argv)
+
+    tmp = None
+    db_path = args.db
+    if db_path is None:
+        tmp = tempfile.TemporaryDirectory()
+        db_path = os.path.join(tmp.name, 'bench.db')
+    pool = get_db_pool(db_path)
+
+    run_migrations(db_path, [m for m in MIGRATIONS if m[0] < 5])
+    start = time.perf_counter()
+    populate(pool, args.rows, args.users)
+    print(f"[BENCH] Built {args.rows:,} rows in {time.perf_counter() - start:.1f} s")
+
+    rng = np.random.default_rng(0)
+    sample = [f"user-{u}" for u in rng.integers(0, args.users, args.indexed_runs)]
+    like_timings = time_query(pool, LIKE_SQL, [(f'%{user}%',) for user in sample[:args.like_runs]])
+
+    start = time.perf_counter()
+    run_migrations(db_path)
+    migration_s = time.perf_counter() - start
+
+    stats_timings = time_query(pool, STATS_SQL, [(user,) for user in sample])
+    since_timings = time_query(pool, STATS_SINCE_SQL, [(user, '2026-12-01') for user in sample])
+    count_timings = time_query(pool, COUNT_SQL, [(user,) for user in sample])
+    with pool.connection() as conn:
+        attributed = conn.execute('SELECT COUNT(*) FROM classifications WHERE user_id IS NOT NULL').fetchone()[0]
+
+    print("=" * 80)
+    print(f"PER-USER STATS BENCHMARK ({args.rows:,} classifications, {args.users:,} users)")
+    print("=" * 80)
+    print(f"{'query':<34}{'p50 ms':>11}{'p95 ms':>11}{'runs':>7}  plan")
+    print("-" * 80)
+    row('filename LIKE (before)', like_timings, plan(pool, LIKE_SQL, ('%user-1%',)))
+    row('user_id stats', stats_timings, plan(pool, STATS_SQL, ('user-1',)))
+    row('user_id stats, last 30 days', since_timings, plan(pool, STATS_SINCE_SQL, ('user-1', '2026-12-01')))
+    row('user_id count', count_timings, plan(pool, COUNT_SQL, ('user-1',)))
+    print("-" * 80)
+    print(f"Migration 005 (columns, backfill, indexes): {migration_s:.1f} s, {attributed:,} rows attributed")
+    print(f"Speedup at p50: {np.percentile(like_timings, 50) / np.percentile(stats_timings, 50):,.0f}x")
+    print("=" * 80)
+
+    pool.close_all()
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,19 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+
+def _payload_policy(name, max_dimension, image_format, quality, max_bytes, min_quality=50):
+    """Payload policy for one provider; each field can be overridden with PAYLOAD_<NAME>_<FIELD>"""
+    prefix = f"PAYLOAD_{name.upper()}_"
+    return {
+        'max_dimension': int(os.environ.get(prefix + 'MAX_DIMENSION', max_dimension)),
+        'format': os.environ.get(prefix + 'FORMAT', image_format).lower(),
+        'quality': int(os.environ.get(prefix + 'QUALITY', quality)),
+        'min_quality': int(os.environ.get(prefix + 'MIN_QUALITY', min_quality)),
+        'max_bytes': int(os.environ.get(prefix + 'MAX_BYTES', max_bytes))
+    }
+
+
 class AIProvider(Enum):
     """Available AI providers for waste classification"""
     LOCAL = "local"  # Your trained model
@@ -18,6 +31,14 @@ class AIProvider(Enum):
     GEMINI = "gemini"  # Google Gemini Vision API
     OPENAI = "openai"  # OpenAI GPT-4 Vision API
 
+def _per_provider(prefix, defaults, cast=float):
+    """Per-provider setting; each value can be overridden with <PREFIX>_<PROVIDER>"""
+    return {
+        provider: cast(os.environ.get(f"{prefix}_{provider.name}", default))
+        for provider, default in defaults.items()
+    }
+
+
 class AIConfig:
     """Configuration for AI classification"""
 
@@ -27,6 +48,10 @@ class AIConfig:
     # Fallback provider if primary fails
     FALLBACK_PROVIDER = AIProvider.LOCAL  # Changed from HUGGINGFACE to LOCAL due to API permissions
 
+    # Classifier pool: a rebuilt or invalidated instance is closed this long after it
+    # stops being handed out, so requests already holding it can finish
+    CLASSIFIER_RETIRE_GRACE_SECONDS = float(os.environ.get('CLASSIFIER_RETIRE_GRACE_SECONDS', 30))
+
     # Local Model Configuration
     LOCAL_MODEL_PATH = os.path.join(
         os.path.dirname(os.path.dirname(__file__)),
@@ -35,6 +60,90 @@ class AIConfig:
     )
     LOCAL_MODEL_INPUT_SIZE = (128, 128)
 
+    # Runtime for the local model: 'keras' (TensorFlow, .h5) or an exported
+    # variant from export_model.py: 'tflite' or 'onnx' (no TensorFlow import)
+    LOCAL_MODEL_BACKEND = os.environ.get('LOCAL_MODEL_BACKEND', 'keras').lower()
+    LOCAL_TFLITE_MODEL_PATH = os.environ.get('LOCAL_TFLITE_MODEL_PATH', os.path.join(
+        os.path.dirname(os.path.dirname(__file__)),
+        'models',
+        'waste_classifier_model.tflite'
+    ))
+    LOCAL_ONNX_MODEL_PATH = os.environ.get('LOCAL_ONNX_MODEL_PATH', os.path.join(
+        os.path.dirname(os.path.dirname(__file__)),
+        'models',
+        'waste_classifier_model.onnx'
+    ))
+    LOCAL_RUNTIME_THREADS = int(os.environ.get('LOCAL_RUNTIME_THREADS', 0)) or None  # None = runtime default
+
+    # Micro-batching for the local model (groups concurrent requests into one predict call)
+    LOCAL_BATCHING_ENABLED = os.environ.get('LOCAL_BATCHING_ENABLED', 'true').lower() == 'true'
+    LOCAL_BATCH_MAX_SIZE = int(os.environ.get('LOCAL_BATCH_MAX_SIZE', 16))  # Flush when this many are queued
+    LOCAL_BATCH_MAX_WAIT_MS = float(os.environ.get('LOCAL_BATCH_MAX_WAIT_MS', 5))  # Max extra latency per request
+    LOCAL_BATCH_TIMEOUT_SECONDS = float(os.environ.get('LOCAL_BATCH_TIMEOUT_SECONDS', 30))  # Caller gives up on its row after this
+
+    # Versioned local models: MODEL_REGISTRY_DIR/<version>/ holds the model file and
+    # its class_indices.json; with no versions there, LOCAL_MODEL_PATH is served as 'default'
+    MODEL_REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR', os.path.join(
+        os.path.dirname(os.path.dirname(__file__)),
+        'models',
+        'registry'
+    ))
+    MODEL_WARMUP_ROUNDS = int(os.environ.get('MODEL_WARMUP_ROUNDS', 2))  # Synthetic passes per batch size before serving
+    MODEL_RETIRE_GRACE_SECONDS = 30  # A replaced version is closed once in-flight requests are done with it
+    LOCAL_MODEL_VERSION = None  # Set by the registry to the version being served
+
+    # Multi-image requests (/api/ai/predict-batch)
+    BATCH_MAX_IMAGES = int(os.environ.get('BATCH_MAX_IMAGES', 100))
+    BATCH_MAX_CONCURRENCY = int(os.environ.get('BATCH_MAX_CONCURRENCY', 4))  # Parallel calls per cloud provider
+
+    # Multi-image prompts: batch requests to Gemini / OpenAI pack several images into one call
+    MULTI_IMAGE_ENABLED = os.environ.get('MULTI_IMAGE_ENABLED', 'true').lower() == 'true'
+    MULTI_IMAGE_PER_CALL = int(os.environ.get('MULTI_IMAGE_PER_CALL', 8))
+    MULTI_IMAGE_MAX_RETRIES = 1  # Re-asks covering only the images missing from / unparseable in the answer
+    MULTI_IMAGE_PROVIDERS = [AIProvider.GEMINI, AIProvider.OPENAI]
+
+    # Asynchronous classification jobs (/api/ai/jobs)
+    JOB_QUEUE_BACKEND = os.environ.get('JOB_QUEUE_BACKEND', 'memory').lower()  # 'memory', 'sqlite' or 'redis'
+    JOB_QUEUE_WORKERS = int(os.environ.get('JOB_QUEUE_WORKERS', 4))
+    JOB_QUEUE_MAX_DEPTH = int(os.environ.get('JOB_QUEUE_MAX_DEPTH', 1000))  # Queued jobs before submissions get 503
+    JOB_QUEUE_SQLITE_PATH = os.environ.get('JOB_QUEUE_SQLITE_PATH', os.path.join(
+        os.path.dirname(os.path.dirname(__file__)),
+        'classification_jobs.db'
+    ))
+    JOB_QUEUE_REDIS_URL = (os.environ.get('JOB_QUEUE_REDIS_URL') or os.environ.get('CELERY_BROKER_URL')
+                           or 'redis://localhost:6379/0')
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+    JOB_RETRY_BACKOFF_SECONDS = float(os.environ.get('JOB_RETRY_BACKOFF_SECONDS', 2))  # Doubles per attempt
+    JOB_TTL_SECONDS = int(os.environ.get('JOB_TTL_SECONDS', 600))  # A job not started by then expires
+    JOB_RESULT_TTL_SECONDS = int(os.environ.get('JOB_RESULT_TTL_SECONDS', 3600))  # Finished jobs kept for polling
+    JOB_LEASE_SECONDS = 120  # Durable backends re-queue a running job whose worker went away
+    JOB_POLL_INTERVAL = 0.5  # Seconds between polls of a shared (sqlite/redis) queue
+    JOB_MAINTENANCE_INTERVAL = 30  # Seconds between expiry / lease sweeps
+    # Hosts a job's callback_url may point at; callbacks are refused while this is empty
+    JOB_CALLBACK_ALLOWED_HOSTS = [h.strip() for h in os.environ.get('JOB_CALLBACK_ALLOWED_HOSTS', '').split(',') if h.strip()]
+
+    # Post-response side effects (saving classifications, awarding points and badges)
+    SIDE_EFFECTS_SQLITE_PATH = os.environ.get('SIDE_EFFECTS_SQLITE_PATH', os.path.join(
+        os.path.dirname(os.path.dirname(__file__)),
+        'side_effects.db'
+    ))
+    SIDE_EFFECTS_WORKERS = int(os.environ.get('SIDE_EFFECTS_WORKERS', 2))
+    SIDE_EFFECTS_MAX_ATTEMPTS = int(os.environ.get('SIDE_EFFECTS_MAX_ATTEMPTS', 8))  # Then the task is parked as 'dead'
+    SIDE_EFFECTS_RETRY_BACKOFF_SECONDS = 1.0  # Doubles per attempt, capped at 5 minutes
+    SIDE_EFFECTS_LEASE_SECONDS = 60  # A running task whose worker went away is run again
+    SIDE_EFFECTS_DONE_TTL_SECONDS = 24 * 3600  # Finished tasks kept so repeated enqueues stay no-ops
+
+    # Shadow-mode evaluation: a sample of requests is also sent, in the background, to a
+    # candidate ('gemini', 'openai', 'huggingface', 'local' or 'local:<registry version>')
+    SHADOW_ENABLED = os.environ.get('SHADOW_ENABLED', 'false').lower() == 'true'
+    SHADOW_CANDIDATE = os.environ.get('SHADOW_CANDIDATE', '')
+    SHADOW_SAMPLE_RATE = float(os.environ.get('SHADOW_SAMPLE_RATE', 0.05))  # Share of fresh classifications
+    SHADOW_MAX_CONCURRENT = int(os.environ.get('SHADOW_MAX_CONCURRENT', 2))  # Sampled requests beyond this are dropped
+    SHADOW_SQLITE_PATH = os.environ.get('SHADOW_SQLITE_PATH', os.path.join(
+        os.path.dirname(os.path.dirname(__file__)),
+        'shadow_results.db'
+    ))
+
     # Hugging Face Configuration
     HUGGINGFACE_API_KEY = os.environ.get('HUGGINGFACE_API_KEY', '')
     # Using image-to-text models since they work better with free-tier API
@@ -55,11 +164,111 @@ class AIConfig:
     # OpenAI Configuration
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
     OPENAI_MODEL = 'gpt-4o'  # or 'gpt-4-vision-preview'
+    OPENAI_API_URL = "https://api.openai.com/v1/chat/completions"
+
+    # HTTP client for cloud providers (pooled keep-alive sessions)
+    HTTP_POOL_SIZE = int(os.environ.get('AI_HTTP_POOL_SIZE', 10))  # Connections kept per provider host
+    HTTP_KEEP_ALIVE = os.environ.get('AI_HTTP_KEEP_ALIVE', 'true').lower() == 'true'
+    HTTP_CONNECT_TIMEOUT = float(os.environ.get('AI_HTTP_CONNECT_TIMEOUT', 5))  # Seconds for TCP + TLS
+    HTTP_READ_TIMEOUT = float(os.environ.get('AI_HTTP_READ_TIMEOUT', 30))  # Seconds waiting on the provider
+    HTTP_MAX_RETRIES = int(os.environ.get('AI_HTTP_MAX_RETRIES', 2))  # Extra attempts on 429/5xx
+    HTTP_BACKOFF_BASE = 0.25  # First backoff ceiling in seconds (doubles each retry, full jitter)
+    HTTP_BACKOFF_MAX = 4.0
+
+    # Payload policy: downscale / re-encode uploads before sending them to a cloud provider
+    PAYLOAD_POLICY_ENABLED = os.environ.get('PAYLOAD_POLICY_ENABLED', 'true').lower() == 'true'
+    PAYLOAD_UPLINK_MBPS = float(os.environ.get('PAYLOAD_UPLINK_MBPS', 20))  # Used to estimate upload time saved
+    PAYLOAD_POLICIES = {
+        # OpenAI scales images to fit 2048px then 768px on the short side; base64 adds a third on top
+        AIProvider.OPENAI: _payload_policy('openai', 1536, 'jpeg', 85, 1024 * 1024),
+        # Gemini tiles large images into 768px crops
+        AIProvider.GEMINI: _payload_policy('gemini', 1536, 'jpeg', 85, 1536 * 1024),
+        # The captioning model sees 224px; anything above 512px is wasted upload
+        AIProvider.HUGGINGFACE: _payload_policy('huggingface', 512, 'jpeg', 90, 256 * 1024)
+    }
 
     # Classification Settings
-    CONFIDENCE_THRESHOLD = 0.3  # Minimum confidence to accept classification
+    CONFIDENCE_THRESHOLD = float(os.environ.get('CONFIDENCE_THRESHOLD', 0.3))  # Minimum confidence to accept classification
     TOP_K_PREDICTIONS = 3  # Number of top predictions to return
 
+    # Cascade mode: local model first, cloud provider only when the local model is unsure
+    CASCADE_ENABLED = os.environ.get('CASCADE_ENABLED', 'false').lower() == 'true'
+    CASCADE_MARGIN = float(os.environ.get('CASCADE_MARGIN', 0.1))  # Escalate when top-1 and top-2 are this close
+    CASCADE_ESCALATION_PROVIDERS = [AIProvider.GEMINI, AIProvider.OPENAI]  # Tried in order
+
+    # Per-request provider routing: 'static' (ACTIVE_PROVIDER then FALLBACK_PROVIDER),
+    # 'weighted', 'least-latency' or 'cheapest-within-slo'
+    ROUTER_STRATEGY = os.environ.get('ROUTER_STRATEGY', 'static').lower()
+    ROUTER_PROVIDERS = [
+        AIProvider(name.strip()) for name in
+        os.environ.get('ROUTER_PROVIDERS', 'local,huggingface,gemini,openai').split(',') if name.strip()
+    ]
+    ROUTER_COST_PER_CALL = _per_provider('ROUTER_COST', {  # USD per classification
+        AIProvider.LOCAL: 0.0,
+        AIProvider.HUGGINGFACE: 0.0,
+        AIProvider.GEMINI: 0.0002,
+        AIProvider.OPENAI: 0.003
+    })
+    ROUTER_QUOTA_PER_MINUTE = _per_provider('ROUTER_QUOTA', {  # 0 = unlimited
+        AIProvider.LOCAL: 0,
+        AIProvider.HUGGINGFACE: 30,
+        AIProvider.GEMINI: 15,
+        AIProvider.OPENAI: 500
+    }, cast=int)
+    ROUTER_WEIGHTS = _per_provider('ROUTER_WEIGHT', {  # Relative share for the weighted strategy
+        AIProvider.LOCAL: 1.0,
+        AIProvider.HUGGINGFACE: 0.5,
+        AIProvider.GEMINI: 3.0,
+        AIProvider.OPENAI: 1.0
+    })
+    ROUTER_SLO_P95_MS = float(os.environ.get('ROUTER_SLO_P95_MS', 3000))
+    ROUTER_SLO_MAX_ERROR_RATE = float(os.environ.get('ROUTER_SLO_MAX_ERROR_RATE', 0.2))
+    ROUTER_UNKNOWN_LATENCY_MS = 1500  # Assumed p95 until a provider has HEDGE_MIN_SAMPLES calls
+
+    # Single-flight: concurrent requests for the same image and provider share one provider call
+    SINGLE_FLIGHT_ENABLED = os.environ.get('SINGLE_FLIGHT_ENABLED', 'true').lower() == 'true'
+    SINGLE_FLIGHT_WAIT_TIMEOUT = float(os.environ.get('SINGLE_FLIGHT_WAIT_TIMEOUT', 60))  # Then call on our own
+    SINGLE_FLIGHT_MAX_WAITS = 2  # Failed leaders a waiter sits through before calling on its own
+
+    # Hedged requests (fire the fallback when the primary is slower than usual)
+    HEDGING_ENABLED = os.environ.get('HEDGING_ENABLED', 'false').lower() == 'true'
+    HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE', 90))  # Of the primary's recent latency
+    HEDGE_DEFAULT_DELAY_MS = 2000  # Used until enough latency samples exist
+    HEDGE_MIN_DELAY_MS = 100
+    HEDGE_MIN_SAMPLES = 20
+    HEDGE_MAX_WORKERS = 16
+    LATENCY_WINDOW_SIZE = 200  # Recent calls kept per provider
+
+    # Circuit breakers (skip a provider while its recent calls keep failing)
+    BREAKER_ENABLED = os.environ.get('BREAKER_ENABLED', 'true').lower() == 'true'
+    BREAKER_WINDOW_SECONDS = 60  # Rolling window the rates are computed over
+    BREAKER_MIN_CALLS = 5  # Calls needed in the window before the circuit can open
+    BREAKER_ERROR_RATE = float(os.environ.get('BREAKER_ERROR_RATE', 0.5))
+    BREAKER_SLOW_CALL_MS = float(os.environ.get('BREAKER_SLOW_CALL_MS', 15000))
+    BREAKER_SLOW_CALL_RATE = 0.8
+    BREAKER_OPEN_SECONDS = float(os.environ.get('BREAKER_OPEN_SECONDS', 30))  # Cool-down before probing
+    BREAKER_HALF_OPEN_PROBES = 1  # Concurrent probe calls while half-open
+    BREAKER_CLOSE_AFTER_SUCCESSES = 2  # Successful probes needed to close again
+
+    # Result Cache (identical uploads skip the provider call)
+    RESULT_CACHE_ENABLED = os.environ.get('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+    RESULT_CACHE_PERSISTENT = os.environ.get('RESULT_CACHE_PERSISTENT', 'true').lower() == 'true'
+    RESULT_CACHE_DB_PATH = os.environ.get('RESULT_CACHE_DB_PATH', os.path.join(
+        os.path.dirname(os.path.dirname(__file__)),
+        'classification_cache.db'
+    ))
+    RESULT_CACHE_MEMORY_SIZE = int(os.environ.get('RESULT_CACHE_MEMORY_SIZE', 1024))  # In-memory LRU entries
+    RESULT_CACHE_MAX_ROWS = int(os.environ.get('RESULT_CACHE_MAX_ROWS', 100000))  # Persistent tier size cap
+    RESULT_CACHE_TTL_SECONDS = int(os.environ.get('RESULT_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+    RESULT_CACHE_TRIM_INTERVAL = 100  # Check the persistent tier size every N writes
+
+    # Near-duplicate reuse (perceptual hash of previously classified images)
+    PHASH_INDEX_ENABLED = os.environ.get('PHASH_INDEX_ENABLED', 'true').lower() == 'true'
+    PHASH_MAX_DISTANCE = int(os.environ.get('PHASH_MAX_DISTANCE', 6))  # Hamming distance out of 64 bits
+    PHASH_INDEX_MAX_ENTRIES = int(os.environ.get('PHASH_INDEX_MAX_ENTRIES', 2000000))  # ~40 bytes per entry
+    PHASH_INDEX_MERGE_BATCH = 1024  # New hashes buffered before re-sorting the index
+    PHASH_MIN_CONFIDENCE = 0.5  # Only index results at least this confident
+
     # Waste Categories (standardized across all providers)
     WASTE_CATEGORIES = [
         'battery', 'biological', 'brown-glass', 'cardboard',
@@ -94,11 +303,39 @@ class AIConfig:
             return cls.OPENAI_API_KEY
         return ""
 
+    @classmethod
+    def get_local_model_path(cls) -> str:
+        """Get the model file the configured local backend loads"""
+        if cls.LOCAL_MODEL_BACKEND == 'tflite':
+            return cls.LOCAL_TFLITE_MODEL_PATH
+        elif cls.LOCAL_MODEL_BACKEND == 'onnx':
+            return cls.LOCAL_ONNX_MODEL_PATH
+        return cls.LOCAL_MODEL_PATH
+
+    @classmethod
+    def get_model_version(cls, provider: AIProvider) -> str:
+        """Get an identifier for the model a provider currently serves"""
+        if provider == AIProvider.LOCAL:
+            if cls.LOCAL_MODEL_VERSION:
+                return cls.LOCAL_MODEL_VERSION
+            try:
+                stat = os.stat(cls.get_local_model_path())
+                return f"{cls.LOCAL_MODEL_BACKEND}-{int(stat.st_mtime)}-{stat.st_size}"
+            except OSError:
+                return "missing"
+        elif provider == AIProvider.HUGGINGFACE:
+            return cls.HUGGINGFACE_MODEL
+        elif provider == AIProvider.GEMINI:
+            return cls.GEMINI_MODEL
+        elif provider == AIProvider.OPENAI:
+            return cls.OPENAI_MODEL
+        return ""
+
     @classmethod
     def is_provider_configured(cls, provider: AIProvider) -> bool:
         """Check if provider is properly configured"""
         if provider == AIProvider.LOCAL:
-            return os.path.exists(cls.LOCAL_MODEL_PATH)
+            return os.path.exists(cls.get_local_model_path())
         else:
             api_key = cls.get_api_key(provider)
             return bool(api_key and api_key.strip())
@@ -122,5 +359,13 @@ class AIConfig:
                 'huggingface': cls.is_provider_configured(AIProvider.HUGGINGFACE),
                 'gemini': cls.is_provider_configured(AIProvider.GEMINI),
                 'openai': cls.is_provider_configured(AIProvider.OPENAI)
-            }
-        }
\ No newline at end of file
+            },
+            'circuit_breakers': cls.get_breaker_states()
+        }
+
+    @classmethod
+    def get_breaker_states(cls):
+        """Get circuit breaker state per provider"""
+        # Imported here: the breaker module reads its thresholds from this class
+        from models.circuit_breaker import circuit_breakers
+        return circuit_breakers.get_states()
\ No newline at end of file
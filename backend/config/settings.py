@@ -6,9 +6,22 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'wastewise_secret_key_2024_dev'
     DEBUG = os.environ.get('FLASK_DEBUG', 'True').lower() == 'true'
 
+    # Startup: 'eager' warms everything before serving, 'background' serves at once
+    # and warms on a thread, 'lazy' defers each subsystem to its first use
+    STARTUP_MODE = os.environ.get('STARTUP_MODE', 'eager').lower()
+
     # Database Configuration
     DATABASE_URL = os.environ.get('DATABASE_URL') or 'sqlite:///wastewise.db'
 
+    # SQLite connection pool (DatabaseManager, UserManager and the marketplace routes)
+    DB_POOL_MAX_CONNECTIONS = int(os.environ.get('DB_POOL_MAX_CONNECTIONS', 16))  # Per database file
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))  # Seconds to wait for a free connection
+    DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))  # SQLite retries a locked database this long
+    DB_SYNCHRONOUS = os.environ.get('DB_SYNCHRONOUS', 'NORMAL').upper()  # NORMAL is crash-safe in WAL mode
+    DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', 16384))  # Page cache per connection
+    DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 128 * 1024 * 1024))  # Bytes of the file read through mmap
+    DB_STATEMENT_CACHE_SIZE = 256  # Prepared statements kept per connection
+
     # JWT Configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt_secret_key_2024'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
@@ -19,6 +32,7 @@ class Config:
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB (for high-resolution images)
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}  # Only image formats supported by AI model
+    PERSIST_UPLOADS = os.environ.get('PERSIST_UPLOADS', 'true').lower() == 'true'  # Keep originals (written after the response)
 
     # Email Configuration
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
@@ -0,0 +1,385 @@
+"""
+Export the trained waste classifier for CPU inference
+
+Converts models/waste_classifier_model.h5 (from train_model.py) to TFLite and/or
+ONNX, optionally with dynamic-range or int8 post-training quantization, then
+benchmarks every variant on the validation split: accuracy drift against the
+Keras model, agreement with its top-1 predictions, latency and peak memory.
+
+Usage:
+    python export_model.py                              # all formats, all quantizations
+    python export_model.py --formats tflite --quantization int8
+    python export_model.py --skip-export                # re-run the benchmark only
+
+Serve a variant by setting LOCAL_MODEL_BACKEND=tflite|onnx and
+LOCAL_TFLITE_MODEL_PATH / LOCAL_ONNX_MODEL_PATH (see config/ai_config.py).
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+import numpy as np
+from PIL import Image
+
+try:
+    import resource  # Peak RSS; not available on Windows
+except ImportError:
+    resource = None
+
+# ============================================================================
+# CONFIGURATION - Same layout and split as train_model.py
+# ============================================================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_DIR = os.path.join(os.path.dirname(BASE_DIR), "database", "garbage_classification")
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+RESULTS_DIR = os.path.join(BASE_DIR, "results")
+MODEL_PATH = os.path.join(MODELS_DIR, "waste_classifier_model.h5")
+CLASS_INDICES_PATH = os.path.join(MODELS_DIR, "class_indices.json")
+REPORT_PATH = os.path.join(RESULTS_DIR, "export_report.json")
+
+IMG_HEIGHT, IMG_WIDTH = 128, 128
+VAL_SPLIT = 0.15
+
+FORMATS = ('tflite', 'onnx')
+QUANTIZATIONS = ('float32', 'dynamic', 'int8')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.ppm', '.tif', '.tiff')
+
+
+def variant_path(fmt, quantization):
+    """models/waste_classifier_model.tflite, ...model.int8.onnx, ..."""
+    suffix = '' if quantization == 'float32' else f'.{quantization}'
+    return os.path.join(MODELS_DIR, f"waste_classifier_model{suffix}.{fmt}")
+
+
+# ============================================================================
+# DATA - validation split exactly as ImageDataGenerator(validation_split=...)
+# ============================================================================
+def list_split(dataset_dir, subset, val_split=VAL_SPLIT):
+    """
+    List (path, label) pairs for a subset, matching Keras flow_from_directory:
+    classes sorted by name, files sorted per class, the first val_split
+    fraction of each class is 'validation' and the rest 'training'
+    """
+    if os.path.exists(CLASS_INDICES_PATH):
+        with open(CLASS_INDICES_PATH) as f:
+            class_indices = json.load(f)
+    else:
+        classes = sorted(d for d in os.listdir(dataset_dir) if os.path.isdir(os.path.join(dataset_dir, d)))
+        class_indices = {name: i for i, name in enumerate(classes)}
+
+    samples = []
+    for name, label in sorted(class_indices.items(), key=lambda item: item[1]):
+        class_dir = os.path.join(dataset_dir, name)
+        files = sorted(
+            os.path.relpath(os.path.join(root, f), class_dir)
+            for root, _, filenames in os.walk(class_dir)
+            for f in filenames if f.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        cut = int(val_split * len(files))
+        chosen = files[:cut] if subset == 'validation' else files[cut:]
+        samples.extend((os.path.join(class_dir, f), label) for f in chosen)
+    return samples
+
+
+def load_images(samples, limit=None, seed=0):
+    """Load images as the training generator did (nearest resize, RGB, /255)"""
+    if limit and len(samples) > limit:
+        rng = np.random.default_rng(seed)
+        samples = [samples[i] for i in sorted(rng.choice(len(samples), size=limit, replace=False))]
+
+    images = np.empty((len(samples), IMG_HEIGHT, IMG_WIDTH, 3), dtype=np.float32)
+    labels = np.empty(len(samples), dtype=np.int64)
+    for i, (path, label) in enumerate(samples):
+        with Image.open(path) as img:
+            img = img.convert('RGB').resize((IMG_WIDTH, IMG_HEIGHT), Image.NEAREST)
+            images[i] = np.asarray(img, dtype=np.float32) / 255.0
+        labels[i] = label
+    return images, labels
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+def export_tflite(model, quantization, calibration, output_path):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization in ('dynamic', 'int8'):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'int8':
+        def representative_dataset():
+            for i in range(len(calibration)):
+                yield [calibration[i:i + 1]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+    with open(output_path, 'wb') as f:
+        f.write(converter.convert())
+
+
+def export_onnx(model, quantization, calibration, output_path):
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None, IMG_HEIGHT, IMG_WIDTH, 3), tf.float32, name='input'),)
+    if quantization == 'float32':
+        tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=output_path)
+        return
+
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantType, quantize_dynamic, quantize_static
+    )
+
+    float_path = f"{output_path}.float.tmp"
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=float_path)
+    try:
+        if quantization == 'dynamic':
+            quantize_dynamic(float_path, output_path, weight_type=QuantType.QInt8)
+        else:
+            class Reader(CalibrationDataReader):
+                def __init__(self):
+                    self._batches = iter(calibration[i:i + 1] for i in range(len(calibration)))
+
+                def get_next(self):
+                    batch = next(self._batches, None)
+                    return None if batch is None else {'input': batch}
+
+            quantize_static(float_path, output_path, Reader(),
+                            activation_type=QuantType.QInt8, weight_type=QuantType.QInt8)
+    finally:
+        os.remove(float_path)
+
+
+EXPORTERS = {'tflite': export_tflite, 'onnx': export_onnx}
+
+
+def export_variants(formats, quantizations, calibration, model_path=MODEL_PATH):
+    """
+    Convert the Keras model to every requested format/quantization
+
+    Returns:
+        list: (format, quantization, path) for each variant written
+    """
+    from tensorflow.keras.models import load_model
+
+    model = load_model(model_path)
+    written = []
+    for fmt in formats:
+        for quantization in quantizations:
+            path = variant_path(fmt, quantization)
+            start = time.perf_counter()
+            try:
+                EXPORTERS[fmt](model, quantization, calibration, path)
+            except ImportError as e:
+                print(f"[SKIP] {fmt}/{quantization}: missing dependency ({e.name})")
+                continue
+            except Exception as e:
+                print(f"[ERROR] {fmt}/{quantization} export failed: {e}")
+                continue
+            print(f"[OK] Exported {fmt}/{quantization} -> {path} "
+                  f"({os.path.getsize(path) / 1e6:.2f} MB, {time.perf_counter() - start:.1f}s)")
+            written.append((fmt, quantization, path))
+    return written
+
+
+# ============================================================================
+# BENCHMARK - each variant runs in a fresh process so memory is not shared
+# ============================================================================
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def _benchmark_worker(fmt, path, images_path, latency_runs, batch_size, queue):
+    try:
+        images = np.load(images_path, mmap_mode='r')
+        rss_before = _peak_rss_mb()
+
+        start = time.perf_counter()
+        if fmt == 'keras':
+            from tensorflow.keras.models import load_model
+            model = load_model(path)
+        else:
+            sys.path.insert(0, BASE_DIR)
+            from models.lite_runtime import load_lite_model
+            model = load_lite_model(fmt, path)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        # Single-image latency, the shape /api/ai/predict sends
+        model.predict(np.ascontiguousarray(images[:1]), verbose=0)  # warm-up
+        single = []
+        for i in range(min(latency_runs, len(images))):
+            sample = np.ascontiguousarray(images[i:i + 1])
+            start = time.perf_counter()
+            model.predict(sample, verbose=0)
+            single.append((time.perf_counter() - start) * 1000)
+
+        # Whole split in batches, timed per image
+        predictions = []
+        start = time.perf_counter()
+        for i in range(0, len(images), batch_size):
+            predictions.append(np.asarray(model.predict(np.ascontiguousarray(images[i:i + batch_size]), verbose=0)))
+        batch_ms_per_image = (time.perf_counter() - start) * 1000 / max(len(images), 1)
+
+        rss_after = _peak_rss_mb()
+        queue.put({
+            'predictions': np.concatenate(predictions).argmax(axis=1).tolist(),
+            'load_ms': round(load_ms, 1),
+            'latency_p50_ms': round(float(np.percentile(single, 50)), 3),
+            'latency_p95_ms': round(float(np.percentile(single, 95)), 3),
+            'batch_ms_per_image': round(batch_ms_per_image, 3),
+            'peak_rss_mb': round(rss_after, 1) if rss_after is not None else None,
+            'model_rss_mb': round(rss_after - rss_before, 1) if rss_after is not None else None
+        })
+    except Exception as e:
+        queue.put({'error': f"{type(e).__name__}: {e}"})
+
+
+def benchmark_variant(fmt, path, images_path, latency_runs=100, batch_size=32):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_benchmark_worker,
+                              args=(fmt, path, images_path, latency_runs, batch_size, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def run_benchmark(variants, images, labels, latency_runs=100, batch_size=32):
+    """
+    Compare every variant with the Keras model on the same images
+
+    Returns:
+        list: One report row per variant; the Keras baseline comes first
+    """
+    with tempfile.NamedTemporaryFile(suffix='.npy', delete=False) as f:
+        images_path = f.name
+    np.save(images_path, images)
+
+    rows = []
+    try:
+        baseline = None
+        for fmt, quantization, path in [('keras', 'float32', MODEL_PATH)] + list(variants):
+            print(f"\n[BENCH] {fmt}/{quantization} ...")
+            result = benchmark_variant(fmt, path, images_path, latency_runs, batch_size)
+            row = {'format': fmt, 'quantization': quantization, 'path': path,
+                   'size_mb': round(os.path.getsize(path) / 1e6, 3)}
+            if 'error' in result:
+                row['error'] = result['error']
+                print(f"[ERROR] {result['error']}")
+                rows.append(row)
+                continue
+
+            predictions = np.asarray(result.pop('predictions'))
+            row['accuracy'] = round(float((predictions == labels).mean()), 4)
+            if baseline is None and fmt == 'keras':
+                baseline = predictions
+                row['accuracy_drift'] = 0.0
+                row['agreement_with_keras'] = 1.0
+            elif baseline is not None:
+                row['accuracy_drift'] = round(row['accuracy'] - rows[0]['accuracy'], 4)
+                row['agreement_with_keras'] = round(float((predictions == baseline).mean()), 4)
+            row.update(result)
+            rows.append(row)
+    finally:
+        os.remove(images_path)
+    return rows
+
+
+def print_report(rows, samples):
+    print("\n" + "=" * 110)
+    print(f"EXPORT REPORT ({samples} validation images)")
+    print("=" * 110)
+    header = f"{'variant':<18}{'size MB':>9}{'acc':>8}{'drift':>8}{'agree':>8}" \
+             f"{'p50 ms':>9}{'p95 ms':>9}{'batch ms/img':>14}{'load ms':>10}{'RSS MB':>9}"
+    print(header)
+    print("-" * 110)
+    for row in rows:
+        name = f"{row['format']}/{row['quantization']}"
+        if 'error' in row:
+            print(f"{name:<18}{row['size_mb']:>9.2f}  {row['error']}")
+            continue
+        drift = row.get('accuracy_drift')
+        agree = row.get('agreement_with_keras')
+        print(f"{name:<18}{row['size_mb']:>9.2f}{row['accuracy']:>8.4f}"
+              f"{(f'{drift:+.4f}' if drift is not None else '-'):>8}"
+              f"{(f'{agree:.4f}' if agree is not None else '-'):>8}"
+              f"{row['latency_p50_ms']:>9.2f}{row['latency_p95_ms']:>9.2f}"
+              f"{row['batch_ms_per_image']:>14.3f}{row['load_ms']:>10.0f}"
+              f"{(row['model_rss_mb'] if row['model_rss_mb'] is not None else '-'):>9}")
+    print("=" * 110)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export and benchmark the waste classifier")
+    parser.add_argument('--formats', default=','.join(FORMATS), help="Comma list of: tflite, onnx")
+    parser.add_argument('--quantization', default=','.join(QUANTIZATIONS),
+                        help="Comma list of: float32, dynamic, int8")
+    parser.add_argument('--dataset', default=DATASET_DIR)
+    parser.add_argument('--max-val-samples', type=int, default=1000,
+                        help="Validation images used for the benchmark (0 = all)")
+    parser.add_argument('--calibration-samples', type=int, default=200,
+                        help="Training images used to calibrate int8 quantization")
+    parser.add_argument('--latency-runs', type=int, default=100)
+    parser.add_argument('--skip-export', action='store_true', help="Benchmark existing files only")
+    args = parser.parse_args(argv)
+
+    formats = [f.strip() for f in args.formats.split(',') if f.strip()]
+    quantizations = [q.strip() for q in args.quantization.split(',') if q.strip()]
+    for value, allowed in [(formats, FORMATS), (quantizations, QUANTIZATIONS)]:
+        unknown = set(value) - set(allowed)
+        if unknown:
+            parser.error(f"unknown value(s): {', '.join(sorted(unknown))}")
+
+    print("=" * 80)
+    print("WASTEWISE MODEL EXPORT")
+    print("=" * 80)
+    print(f"Keras model: {MODEL_PATH}")
+    print(f"Dataset: {args.dataset}")
+    print(f"Variants: {formats} x {quantizations}")
+
+    if not os.path.exists(MODEL_PATH):
+        print("[ERROR] Model not found. Run train_model.py first.")
+        return 1
+
+    print("\n[1/3] Loading validation and calibration images...")
+    val_images, val_labels = load_images(list_split(args.dataset, 'validation'), args.max_val_samples or None)
+    print(f"[OK] {len(val_images)} validation images")
+
+    if args.skip_export:
+        variants = [(fmt, q, variant_path(fmt, q)) for fmt in formats for q in quantizations
+                    if os.path.exists(variant_path(fmt, q))]
+    else:
+        calibration = np.empty((0, IMG_HEIGHT, IMG_WIDTH, 3), dtype=np.float32)
+        if 'int8' in quantizations:
+            calibration, _ = load_images(list_split(args.dataset, 'training'), args.calibration_samples, seed=1)
+            print(f"[OK] {len(calibration)} calibration images")
+
+        print("\n[2/3] Exporting...")
+        variants = export_variants(formats, quantizations, calibration)
+
+    print("\n[3/3] Benchmarking...")
+    rows = run_benchmark(variants, val_images, val_labels, latency_runs=args.latency_runs)
+    print_report(rows, len(val_images))
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(REPORT_PATH, 'w') as f:
+        json.dump({'validation_samples': len(val_images), 'variants': rows}, f, indent=2)
+    print(f"[OK] Report saved to: {REPORT_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Micro-batching Inference Engine
+Groups preprocessed tensors from concurrent requests into a single model call
+Flushes when the batch is full or the oldest request hits its deadline
+"""
+
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class _PendingItem:
+    """A single queued tensor waiting for its prediction row"""
+
+    __slots__ = ('tensor', 'future', 'enqueued_at')
+
+    def __init__(self, tensor):
+        self.tensor = tensor
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    In-process batching scheduler for a vectorized predict function
+    Each caller blocks on its own future and receives its own output row
+    """
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0, name='local'):
+        """
+        Start the batching worker
+
+        Args:
+            predict_fn: Callable taking an (N, ...) array and returning N output rows
+            max_batch_size: Flush as soon as this many tensors are queued
+            max_wait_ms: Flush once the oldest queued tensor has waited this long
+            name: Label used for the worker thread and log messages
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'batches': 0,
+            'items': 0,
+            'max_batch_size_seen': 0,
+            'last_batch_size': 0,
+            'size_flushes': 0,
+            'deadline_flushes': 0,
+            'total_wait_ms': 0.0,
+            'max_wait_ms': 0.0,
+            'total_predict_ms': 0.0,
+            'errors': 0
+        }
+
+        self._worker = threading.Thread(
+            target=self._run, name=f"microbatch-{name}", daemon=True
+        )
+        self._worker.start()
+
+    def submit(self, tensor, timeout=None):
+        """
+        Queue one preprocessed tensor and wait for its prediction
+
+        Args:
+            tensor: Single input without the batch dimension
+            timeout: Seconds to wait for the result (None waits forever)
+
+        Returns:
+            numpy.ndarray: The model output row for this tensor
+
+        Raises:
+            concurrent.futures.TimeoutError: No result within `timeout`
+            Exception: Whatever predict_fn raised for the batch
+        """
+        item = _PendingItem(tensor)
+        with self._close_lock:
+            closed = self._closed
+            if not closed:
+                self._queue.put(item)
+
+        if closed:
+            # Worker is gone (e.g. model was hot-swapped); run unbatched
+            return self.predict_fn(np.expand_dims(tensor, axis=0))[0]
+        return item.future.result(timeout=timeout)
+
+    def close(self):
+        """Stop the worker after flushing anything already queued"""
+        with self._close_lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+
+    def get_stats(self):
+        """Get queue depth, batch size and wait-time metrics"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+
+        batches = stats['batches'] or 1
+        items = stats['items'] or 1
+        return {
+            'queue_depth': self._queue.qsize(),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'batches': stats['batches'],
+            'items': stats['items'],
+            'avg_batch_size': round(stats['items'] / batches, 2),
+            'max_batch_size_seen': stats['max_batch_size_seen'],
+            'last_batch_size': stats['last_batch_size'],
+            'size_flushes': stats['size_flushes'],
+            'deadline_flushes': stats['deadline_flushes'],
+            'avg_wait_ms': round(stats['total_wait_ms'] / items, 3),
+            'max_observed_wait_ms': round(stats['max_wait_ms'], 3),
+            'avg_predict_ms': round(stats['total_predict_ms'] / batches, 3),
+            'errors': stats['errors']
+        }
+
+    def _run(self):
+        """Worker loop: collect a batch, run it, hand out the rows"""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = [first]
+            deadline = first.enqueued_at + self.max_wait
+            stop = False
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        item = self._queue.get(timeout=remaining)
+                    else:
+                        # Past the deadline: take only what is already queued
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch):
+        """Run one vectorized predict call and resolve every caller's future"""
+        flushed_at = time.perf_counter()
+        try:
+            inputs = np.stack([item.tensor for item in batch])
+            outputs = self.predict_fn(inputs)
+            # A short result would leave the unmatched callers waiting forever
+            if len(outputs) != len(batch):
+                raise ValueError(f"predict returned {len(outputs)} rows for a batch of {len(batch)}")
+        except Exception as e:
+            print(f"[ERROR] Micro-batch ({self.name}) predict failed: {e}")
+            with self._stats_lock:
+                self._stats['errors'] += 1
+            for item in batch:
+                item.future.set_exception(e)
+            return
+
+        predict_ms = (time.perf_counter() - flushed_at) * 1000
+        for item, row in zip(batch, outputs):
+            item.future.set_result(row)
+
+        waits = [(flushed_at - item.enqueued_at) * 1000 for item in batch]
+        with self._stats_lock:
+            stats = self._stats
+            stats['batches'] += 1
+            stats['items'] += len(batch)
+            stats['last_batch_size'] = len(batch)
+            stats['max_batch_size_seen'] = max(stats['max_batch_size_seen'], len(batch))
+            if len(batch) >= self.max_batch_size:
+                stats['size_flushes'] += 1
+            else:
+                stats['deadline_flushes'] += 1
+            stats['total_wait_ms'] += sum(waits)
+            stats['max_wait_ms'] = max(stats['max_wait_ms'], max(waits))
+            stats['total_predict_ms'] += predict_ms
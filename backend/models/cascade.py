@@ -0,0 +1,137 @@
+"""
+Confidence-Gated Cascade
+Decides when a local model prediction is too unsure to return and tracks how
+often the cloud tier is needed, how long each tier takes and how often the
+tiers agree
+"""
+
+import os
+import sys
+import threading
+from collections import deque
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from config.ai_config import AIConfig
+
+
+def escalation_reason(result, threshold=None, margin=None):
+    """
+    Check whether a local result should be escalated to the cloud tier
+
+    Args:
+        result: Classification dict from the local model
+        threshold: Minimum top-1 confidence (default CONFIDENCE_THRESHOLD)
+        margin: Minimum gap between the top two classes (default CASCADE_MARGIN)
+
+    Returns:
+        str or None: Why the result needs escalating, None if it can be returned
+    """
+    threshold = AIConfig.CONFIDENCE_THRESHOLD if threshold is None else threshold
+    margin = AIConfig.CASCADE_MARGIN if margin is None else margin
+
+    if not result or result.get('raw_category') == 'fallback-local':
+        return 'local-unavailable'
+
+    confidence = float(result.get('confidence') or 0)
+    if confidence < threshold:
+        return 'low-confidence'
+
+    predictions = result.get('all_predictions') or []
+    if len(predictions) >= 2:
+        gap = float(predictions[0]['confidence']) - float(predictions[1]['confidence'])
+        if gap < margin:
+            return 'small-margin'
+
+    return None
+
+
+class CascadeStats:
+    """Escalation rate, per-tier latency and local/cloud agreement counters"""
+
+    def __init__(self, window_size=None):
+        self.window_size = window_size or AIConfig.LATENCY_WINDOW_SIZE
+        self._lock = threading.Lock()
+        self._latency = {
+            'local': deque(maxlen=self.window_size),
+            'escalation': deque(maxlen=self.window_size),
+            'total': deque(maxlen=self.window_size)
+        }
+        self._stats = {
+            'requests': 0,
+            'escalated': 0,
+            'escalation_failed': 0,
+            'reasons': {},
+            'escalated_to': {},
+            'compared': 0,
+            'agreed': 0
+        }
+
+    def record(self, local_ms, total_ms, reason=None, escalated_to=None,
+               escalation_ms=None, agreed=None, failed=False):
+        """
+        Record one cascade request
+
+        Args:
+            local_ms: Time spent in the local tier
+            total_ms: End-to-end cascade time
+            reason: Escalation reason, None if the local result was returned
+            escalated_to: AIProvider value of the cloud tier used
+            escalation_ms: Time spent in the cloud tier
+            agreed: Whether both tiers picked the same waste type (None if not compared)
+            failed: The cloud tier was tried and failed
+        """
+        with self._lock:
+            stats = self._stats
+            stats['requests'] += 1
+            self._latency['local'].append(local_ms)
+            self._latency['total'].append(total_ms)
+
+            if reason is None:
+                return
+            stats['escalated'] += 1
+            stats['reasons'][reason] = stats['reasons'].get(reason, 0) + 1
+            if failed:
+                stats['escalation_failed'] += 1
+            if escalated_to is not None:
+                stats['escalated_to'][escalated_to] = stats['escalated_to'].get(escalated_to, 0) + 1
+            if escalation_ms is not None:
+                self._latency['escalation'].append(escalation_ms)
+            if agreed is not None:
+                stats['compared'] += 1
+                stats['agreed'] += bool(agreed)
+
+    def get_stats(self):
+        """Get escalation rate, agreement rate and per-tier latency percentiles"""
+        with self._lock:
+            stats = {
+                'requests': self._stats['requests'],
+                'escalated': self._stats['escalated'],
+                'escalation_failed': self._stats['escalation_failed'],
+                'reasons': dict(self._stats['reasons']),
+                'escalated_to': dict(self._stats['escalated_to']),
+                'compared': self._stats['compared'],
+                'agreed': self._stats['agreed']
+            }
+            samples = {tier: list(values) for tier, values in self._latency.items()}
+
+        stats['escalation_rate'] = round(stats['escalated'] / stats['requests'], 4) if stats['requests'] else 0.0
+        stats['agreement_rate'] = round(stats['agreed'] / stats['compared'], 4) if stats['compared'] else None
+        stats['latency'] = {
+            tier: {
+                'samples': len(values),
+                'p50_ms': round(float(np.percentile(values, 50)), 2) if values else None,
+                'p95_ms': round(float(np.percentile(values, 95)), 2) if values else None
+            }
+            for tier, values in samples.items()
+        }
+        stats['threshold'] = AIConfig.CONFIDENCE_THRESHOLD
+        stats['margin'] = AIConfig.CASCADE_MARGIN
+        return stats
+
+
+# Global instance shared by every classifier
+cascade_stats = CascadeStats()
@@ -0,0 +1,198 @@
+"""
+Provider Circuit Breakers
+Stops sending traffic to an AI provider whose recent calls mostly fail or run
+slow, then lets a few probe calls through to detect recovery
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import deque
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from config.ai_config import AIConfig, AIProvider
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is refused because the provider's circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Closed -> open when the rolling error rate or slow-call rate passes its
+    threshold; open -> half-open after a cool-down; half-open -> closed after
+    enough successful probes, or back to open on any probe failure
+    """
+
+    def __init__(self, name, window_seconds=None, min_calls=None, error_rate=None,
+                 slow_call_ms=None, slow_call_rate=None, open_seconds=None,
+                 half_open_probes=None, close_after=None, clock=time.monotonic):
+        self.name = name
+        self.window_seconds = window_seconds or AIConfig.BREAKER_WINDOW_SECONDS
+        self.min_calls = min_calls or AIConfig.BREAKER_MIN_CALLS
+        self.error_rate = error_rate or AIConfig.BREAKER_ERROR_RATE
+        self.slow_call_ms = slow_call_ms or AIConfig.BREAKER_SLOW_CALL_MS
+        self.slow_call_rate = slow_call_rate or AIConfig.BREAKER_SLOW_CALL_RATE
+        self.open_seconds = open_seconds or AIConfig.BREAKER_OPEN_SECONDS
+        self.half_open_probes = half_open_probes or AIConfig.BREAKER_HALF_OPEN_PROBES
+        self.close_after = close_after or AIConfig.BREAKER_CLOSE_AFTER_SUCCESSES
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._calls = deque()  # (timestamp, ok, slow)
+        self._opened_at = None
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._stats = {'opened': 0, 'rejected': 0, 'probes': 0, 'last_error': None}
+
+    @property
+    def state(self):
+        with self._lock:
+            self._advance()
+            return self._state
+
+    def is_available(self):
+        """Whether a call would currently be let through (does not reserve it)"""
+        with self._lock:
+            self._advance()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN:
+                return self._probes_in_flight < self.half_open_probes
+            return False
+
+    def allow_request(self):
+        """
+        Reserve a call slot
+
+        Returns:
+            bool: True if the call may proceed; every allowed call must be
+            followed by record_success() or record_failure()
+        """
+        with self._lock:
+            self._advance()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                self._stats['probes'] += 1
+                return True
+            self._stats['rejected'] += 1
+            return False
+
+    def record_success(self, latency_ms):
+        slow = latency_ms >= self.slow_call_ms
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+                if slow:
+                    self._trip()
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.close_after:
+                    self._state = CLOSED
+                    self._calls.clear()
+                    print(f"[INFO] Circuit for {self.name} closed")
+                return
+            self._add_call(ok=True, slow=slow)
+
+    def record_failure(self, latency_ms, error=None):
+        with self._lock:
+            self._stats['last_error'] = str(error)[:200] if error is not None else None
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+                self._trip()
+                return
+            self._add_call(ok=False, slow=latency_ms >= self.slow_call_ms)
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._calls.clear()
+            self._opened_at = None
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+
+    def snapshot(self):
+        """Get state and rolling-window figures for reporting"""
+        with self._lock:
+            self._advance()
+            self._prune()
+            calls = len(self._calls)
+            failures = sum(1 for _, ok, _ in self._calls if not ok)
+            slow = sum(1 for _, _, is_slow in self._calls if is_slow)
+            retry_in = None
+            if self._state == OPEN:
+                retry_in = max(self.open_seconds - (self._clock() - self._opened_at), 0.0)
+            return {
+                'state': self._state,
+                'window_calls': calls,
+                'error_rate': round(failures / calls, 4) if calls else 0.0,
+                'slow_call_rate': round(slow / calls, 4) if calls else 0.0,
+                'retry_in_seconds': round(retry_in, 1) if retry_in is not None else None,
+                'times_opened': self._stats['opened'],
+                'rejected': self._stats['rejected'],
+                'probes': self._stats['probes'],
+                'last_error': self._stats['last_error']
+            }
+
+    def _add_call(self, ok, slow):
+        self._calls.append((self._clock(), ok, slow))
+        self._prune()
+        if self._state != CLOSED or len(self._calls) < self.min_calls:
+            return
+        calls = len(self._calls)
+        failures = sum(1 for _, call_ok, _ in self._calls if not call_ok)
+        slow_calls = sum(1 for _, _, is_slow in self._calls if is_slow)
+        if failures / calls >= self.error_rate or slow_calls / calls >= self.slow_call_rate:
+            self._trip()
+
+    def _trip(self):
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._probe_successes = 0
+        self._stats['opened'] += 1
+        print(f"[WARNING] Circuit for {self.name} opened for {self.open_seconds:.0f}s")
+
+    def _advance(self):
+        """Move an open circuit to half-open once its cool-down has passed"""
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+
+    def _prune(self):
+        cutoff = self._clock() - self.window_seconds
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
+
+
+class CircuitBreakerRegistry:
+    """One breaker per AIProvider"""
+
+    def __init__(self):
+        self._breakers = {provider: CircuitBreaker(provider.value) for provider in AIProvider}
+
+    def get(self, provider):
+        return self._breakers[provider]
+
+    def is_available(self, provider):
+        if not AIConfig.BREAKER_ENABLED:
+            return True
+        return self._breakers[provider].is_available()
+
+    def get_states(self):
+        """Get a snapshot of every provider's breaker"""
+        return {provider.value: breaker.snapshot() for provider, breaker in self._breakers.items()}
+
+
+# Global instance shared by every classifier
+circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,160 @@
+"""
+Classifier Pool
+Process-wide registry of warm UnifiedWasteClassifier instances
+Keeps one instance per AI provider so the local Keras model is loaded once
+"""
+
+import os
+import sys
+import time
+import threading
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from config.ai_config import AIConfig, AIProvider
+from models.unified_classifier import UnifiedWasteClassifier
+
+
+class ClassifierPool:
+    """
+    Thread-safe registry holding one warmed classifier per provider
+    Instances are built lazily on first use and reused by every request
+    """
+
+    def __init__(self, factory=UnifiedWasteClassifier, retire_grace_seconds=None):
+        """
+        Initialize an empty pool
+
+        Args:
+            factory: Callable taking an AIProvider and returning a classifier
+            retire_grace_seconds: Delay before a replaced instance is closed
+                (default AIConfig.CLASSIFIER_RETIRE_GRACE_SECONDS)
+        """
+        self._factory = factory
+        self._retire_grace_seconds = (
+            retire_grace_seconds if retire_grace_seconds is not None
+            else AIConfig.CLASSIFIER_RETIRE_GRACE_SECONDS
+        )
+        self._instances = {}
+        self._lock = threading.Lock()
+        self._build_locks = {provider: threading.Lock() for provider in AIProvider}
+        self._stats = {
+            provider.value: {
+                'loaded': False,
+                'loads': 0,
+                'load_time_ms': None,
+                'warm_hits': 0,
+                'cold_hits': 0
+            }
+            for provider in AIProvider
+        }
+
+    def get(self, provider=None):
+        """
+        Get the warm classifier for a provider, building it on first use
+
+        Args:
+            provider: AIProvider enum value (if None, uses config default)
+
+        Returns:
+            UnifiedWasteClassifier: Shared instance for the provider
+        """
+        provider = provider or AIConfig.ACTIVE_PROVIDER
+
+        instance = self._instances.get(provider)
+        if instance is not None:
+            self._record_hit(provider, warm=True)
+            return instance
+
+        # Only one thread builds a given provider; the others wait and reuse it
+        with self._build_locks[provider]:
+            instance = self._instances.get(provider)
+            if instance is not None:
+                self._record_hit(provider, warm=True)
+                return instance
+
+            instance = self._build(provider)
+            self._record_hit(provider, warm=False)
+            return instance
+
+    def rebuild(self, provider):
+        """
+        Replace the instance for one provider, leaving the others untouched
+
+        The old instance keeps serving until the new one is ready, and calls
+        already running on it finish before it is closed (see _retire).
+        """
+        with self._build_locks[provider]:
+            return self._build(provider)
+
+    def peek(self, provider):
+        """Get the instance for a provider if it is already built, else None"""
+        return self._instances.get(provider)
+
+    def invalidate(self, provider=None):
+        """Drop the instance for a provider (or all providers if None)"""
+        with self._lock:
+            providers = [provider] if provider else list(self._instances.keys())
+            dropped = []
+            for p in providers:
+                dropped.append(self._instances.pop(p, None))
+                self._stats[p.value]['loaded'] = False
+
+        for instance in dropped:
+            self._retire(instance)
+
+    def get_stats(self):
+        """Get load time and warm/cold hit counters per provider"""
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def _build(self, provider):
+        """Construct a classifier and publish it (caller holds the build lock)"""
+        start = time.perf_counter()
+        instance = self._factory(provider)
+        load_time_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            previous = self._instances.get(provider)
+            self._instances[provider] = instance
+            stats = self._stats[provider.value]
+            stats['loaded'] = True
+            stats['loads'] += 1
+            stats['load_time_ms'] = round(load_time_ms, 2)
+
+        print(f"[INFO] Classifier pool: {provider.value} ready in {load_time_ms:.0f} ms")
+        self._retire(previous)
+        return instance
+
+    def _retire(self, instance):
+        """
+        Close a replaced instance once requests that picked it up are done
+
+        Callers keep the reference get() returned for the whole request and
+        closing cancels the instance's queued work, so the close is delayed
+        by the grace period instead of running at the swap.
+        """
+        if instance is None:
+            return
+        if self._retire_grace_seconds <= 0:
+            self._close(instance)
+            return
+        timer = threading.Timer(self._retire_grace_seconds, self._close, args=(instance,))
+        timer.daemon = True
+        timer.start()
+
+    @staticmethod
+    def _close(instance):
+        """Release an instance that is no longer served by the pool"""
+        if instance is not None and hasattr(instance, 'close'):
+            instance.close()
+
+    def _record_hit(self, provider, warm):
+        with self._lock:
+            key = 'warm_hits' if warm else 'cold_hits'
+            self._stats[provider.value][key] += 1
+
+
+# Global instance shared by app.py and the AI blueprint
+classifier_pool = ClassifierPool()
@@ -1,90 +1,25 @@
 import sqlite3
-import os
 from datetime import datetime
 import json
 
+from utils.db_pool import get_db_pool
+from models.migrations import run_migrations
+
 class DatabaseManager:
+    # Database files migrated by this process (blueprints build a manager per request)
+    _initialized = set()
+
     def __init__(self, db_path='wastewise.db'):
         self.db_path = db_path
-        self.init_database()
+        self.pool = get_db_pool(db_path)
+        if self.pool.db_path not in DatabaseManager._initialized:
+            self.init_database()
 
     def init_database(self):
-        """Initialize the SQLite database with required tables"""
+        """Bring the database schema up to date (tables and indexes live in models/migrations.py)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # Create classifications table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS classifications (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    filename TEXT NOT NULL,
-                    original_filename TEXT,
-                    waste_type TEXT NOT NULL,
-                    confidence REAL NOT NULL,
-                    all_predictions TEXT,
-                    image_path TEXT,
-                    recommendations TEXT,
-                    environmental_impact TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # Create waste_categories table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS waste_categories (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    category_name TEXT UNIQUE NOT NULL,
-                    icon TEXT,
-                    color_code TEXT,
-                    description TEXT,
-                    disposal_instructions TEXT,
-                    environmental_impact TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # Create user_sessions table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS user_sessions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    session_id TEXT UNIQUE NOT NULL,
-                    ip_address TEXT,
-                    user_agent TEXT,
-                    first_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    classification_count INTEGER DEFAULT 0
-                )
-            ''')
-
-            # Insert default waste categories if not exists
-            categories = [
-                ('plastic', '♻️', '#2196f3', 'Synthetic materials that can be recycled',
-                 'Place in recycling bin, clean before disposal, remove labels',
-                 'High recyclability - can be processed into new products'),
-                ('organic', '🌱', '#4caf50', 'Biodegradable waste from living organisms',
-                 'Compost this waste, use for organic fertilizer, dispose in green bin',
-                 'Can be composted to create nutrient-rich soil'),
-                ('paper', '📄', '#ff9800', 'Paper-based materials and cardboard',
-                 'Place in paper recycling, remove plastic coating, ensure clean and dry',
-                 'Easily recyclable - saves trees and reduces landfill waste'),
-                ('glass', '🗞️', '#00bcd4', 'Glass containers and materials',
-                 'Place in glass recycling bin, remove caps and lids, handle with care',
-                 '100% recyclable without quality loss'),
-                ('metal', '🔧', '#607d8b', 'Metallic materials and containers',
-                 'Place in metal recycling, clean any food residue, infinitely recyclable',
-                 'Infinitely recyclable - high environmental value')
-            ]
-
-            for category in categories:
-                cursor.execute('''
-                    INSERT OR IGNORE INTO waste_categories
-                    (category_name, icon, color_code, description, disposal_instructions, environmental_impact)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', category)
-
-            conn.commit()
-            conn.close()
+            run_migrations(self.pool.db_path)
+            DatabaseManager._initialized.add(self.pool.db_path)
             print("Database initialized successfully")
 
         except Exception as e:
@@ -92,26 +27,39 @@ class DatabaseManager:
 
     def save_classification(self, filename, original_filename, waste_type, confidence,
                           all_predictions=None, image_path=None, recommendations=None,
-                          environmental_impact=None):
-        """Save a classification result to the database"""
+                          environmental_impact=None, phash=None, classification_uid=None,
+                          user_id=None, session_id=None):
+        """
+        Save a classification result to the database
+
+        With classification_uid the save can be repeated: a second call
+        returns the existing row's id instead of inserting again.
+        user_id is the signed-in owner (None for anonymous uploads).
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                INSERT INTO classifications
-                (filename, original_filename, waste_type, confidence, all_predictions,
-                 image_path, recommendations, environmental_impact)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (filename, original_filename, waste_type, confidence,
-                  json.dumps(all_predictions) if all_predictions else None,
-                  image_path,
-                  json.dumps(recommendations) if recommendations else None,
-                  environmental_impact))
-
-            conn.commit()
-            classification_id = cursor.lastrowid
-            conn.close()
+            # SQLite integers are signed 64-bit
+            if phash is not None and phash >= (1 << 63):
+                phash -= (1 << 64)
+
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO classifications
+                    (filename, original_filename, waste_type, confidence, all_predictions,
+                     image_path, recommendations, environmental_impact, phash, classification_uid,
+                     user_id, session_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (classification_uid) DO NOTHING
+                ''', (filename, original_filename, waste_type, confidence,
+                      json.dumps(all_predictions) if all_predictions else None,
+                      image_path,
+                      json.dumps(recommendations) if recommendations else None,
+                      environmental_impact, phash, classification_uid, user_id, session_id))
+
+                classification_id = cursor.lastrowid
+                if cursor.rowcount == 0:
+                    cursor.execute('SELECT id FROM classifications WHERE classification_uid = ?', (classification_uid,))
+                    classification_id = cursor.fetchone()[0]
 
             return classification_id
 
@@ -122,21 +70,21 @@ class DatabaseManager:
     def get_statistics(self):
         """Get waste classification statistics for dashboard"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # Get total classifications
-            cursor.execute('SELECT COUNT(*) FROM classifications')
-            total_classifications = cursor.fetchone()[0]
-
-            # Get waste breakdown
-            cursor.execute('''
-                SELECT waste_type, COUNT(*) as count
-                FROM classifications
-                GROUP BY waste_type
-                ORDER BY count DESC
-            ''')
-            waste_breakdown = dict(cursor.fetchall())
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+
+                # Get total classifications
+                cursor.execute('SELECT COUNT(*) FROM classifications')
+                total_classifications = cursor.fetchone()[0]
+
+                # Get waste breakdown
+                cursor.execute('''
+                    SELECT waste_type, COUNT(*) as count
+                    FROM classifications
+                    GROUP BY waste_type
+                    ORDER BY count DESC
+                ''')
+                waste_breakdown = dict(cursor.fetchall())
 
             # Calculate recycling rate (assuming plastic, paper, glass, metal are recyclable)
             recyclable_types = ['plastic', 'paper', 'glass', 'metal']
@@ -150,8 +98,6 @@ class DatabaseManager:
                 'energy_saved': f"{int(recyclable_count * 2.2)} kWh"
             }
 
-            conn.close()
-
             return {
                 'total_classifications': total_classifications,
                 'waste_breakdown': waste_breakdown,
@@ -175,18 +121,17 @@ class DatabaseManager:
     def get_recent_classifications(self, limit=10):
         """Get recent classifications"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute('''
-                SELECT filename, waste_type, confidence, created_at
-                FROM classifications
-                ORDER BY created_at DESC
-                LIMIT ?
-            ''', (limit,))
+                cursor.execute('''
+                    SELECT filename, waste_type, confidence, created_at
+                    FROM classifications
+                    ORDER BY created_at DESC
+                    LIMIT ?
+                ''', (limit,))
 
-            results = cursor.fetchall()
-            conn.close()
+                results = cursor.fetchall()
 
             return [
                 {
@@ -205,30 +150,27 @@ class DatabaseManager:
     def update_session_activity(self, session_id, ip_address=None, user_agent=None):
         """Update or create user session activity"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # Check if session exists
-            cursor.execute('SELECT id FROM user_sessions WHERE session_id = ?', (session_id,))
-            session_exists = cursor.fetchone()
-
-            if session_exists:
-                # Update existing session
-                cursor.execute('''
-                    UPDATE user_sessions
-                    SET last_activity = CURRENT_TIMESTAMP,
-                        classification_count = classification_count + 1
-                    WHERE session_id = ?
-                ''', (session_id,))
-            else:
-                # Create new session
-                cursor.execute('''
-                    INSERT INTO user_sessions (session_id, ip_address, user_agent, classification_count)
-                    VALUES (?, ?, ?, 1)
-                ''', (session_id, ip_address, user_agent))
-
-            conn.commit()
-            conn.close()
+            with self.pool.connection(immediate=True) as conn:
+                cursor = conn.cursor()
+
+                # Check if session exists
+                cursor.execute('SELECT id FROM user_sessions WHERE session_id = ?', (session_id,))
+                session_exists = cursor.fetchone()
+
+                if session_exists:
+                    # Update existing session
+                    cursor.execute('''
+                        UPDATE user_sessions
+                        SET last_activity = CURRENT_TIMESTAMP,
+                            classification_count = classification_count + 1
+                        WHERE session_id = ?
+                    ''', (session_id,))
+                else:
+                    # Create new session
+                    cursor.execute('''
+                        INSERT INTO user_sessions (session_id, ip_address, user_agent, classification_count)
+                        VALUES (?, ?, ?, 1)
+                    ''', (session_id, ip_address, user_agent))
 
         except Exception as e:
             print(f"Error updating session activity: {str(e)}")
@@ -236,17 +178,15 @@ class DatabaseManager:
     def cleanup_old_data(self, days=30):
         """Clean up old classification data"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute('''
-                DELETE FROM classifications
-                WHERE created_at < datetime('now', '-{} days')
-            '''.format(days))
+                cursor.execute('''
+                    DELETE FROM classifications
+                    WHERE created_at < datetime('now', '-{} days')
+                '''.format(days))
 
-            deleted_count = cursor.rowcount
-            conn.commit()
-            conn.close()
+                deleted_count = cursor.rowcount
 
             print(f"Cleaned up {deleted_count} old classification records")
             return deleted_count
@@ -260,12 +200,11 @@ class DatabaseManager:
     def get_user_points(self, user_id):
         """Get user's current points balance"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute('SELECT total_points, points_earned, points_spent FROM user_points WHERE user_id = ?', (user_id,))
-            result = cursor.fetchone()
-            conn.close()
+                cursor.execute('SELECT total_points, points_earned, points_spent FROM user_points WHERE user_id = ?', (user_id,))
+                result = cursor.fetchone()
 
             if result:
                 return {
@@ -279,42 +218,53 @@ class DatabaseManager:
             print(f"Error getting user points: {str(e)}")
             return {'total_points': 0, 'points_earned': 0, 'points_spent': 0}
 
-    def add_points(self, user_id, points, transaction_type, reason, reference_id=None):
-        """Add points to user's account"""
+    def add_points(self, user_id, points, transaction_type, reason, reference_id=None, idempotency_key=None):
+        """
+        Add points to user's account
+
+        An idempotency_key is recorded in the same transaction as the points;
+        repeating the call with the same key leaves the balance unchanged.
+        """
         try:
             import uuid
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # Get or create user points record
-            cursor.execute('SELECT total_points, points_earned FROM user_points WHERE user_id = ?', (user_id,))
-            result = cursor.fetchone()
-
-            if result:
-                new_total = result[0] + points
-                new_earned = result[1] + points
-                cursor.execute('''
-                    UPDATE user_points
-                    SET total_points = ?, points_earned = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE user_id = ?
-                ''', (new_total, new_earned, user_id))
-            else:
-                new_total = points
-                new_earned = points
+            # Read-modify-write of the balance: hold the write lock from the start
+            with self.pool.connection(immediate=True) as conn:
+                cursor = conn.cursor()
+
+                if idempotency_key is not None:
+                    cursor.execute('INSERT OR IGNORE INTO processed_events (event_key) VALUES (?)', (idempotency_key,))
+                    if cursor.rowcount == 0:
+                        cursor.execute('SELECT total_points FROM user_points WHERE user_id = ?', (user_id,))
+                        result = cursor.fetchone()
+                        return result[0] if result else 0
+
+                # Get or create user points record
+                cursor.execute('SELECT total_points, points_earned FROM user_points WHERE user_id = ?', (user_id,))
+                result = cursor.fetchone()
+
+                if result:
+                    new_total = result[0] + points
+                    new_earned = result[1] + points
+                    cursor.execute('''
+                        UPDATE user_points
+                        SET total_points = ?, points_earned = ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE user_id = ?
+                    ''', (new_total, new_earned, user_id))
+                else:
+                    new_total = points
+                    new_earned = points
+                    cursor.execute('''
+                        INSERT INTO user_points (user_id, total_points, points_earned, points_spent)
+                        VALUES (?, ?, ?, 0)
+                    ''', (user_id, new_total, new_earned))
+
+                # Create transaction record
+                transaction_id = str(uuid.uuid4())
                 cursor.execute('''
-                    INSERT INTO user_points (user_id, total_points, points_earned, points_spent)
-                    VALUES (?, ?, ?, 0)
-                ''', (user_id, new_total, new_earned))
-
-            # Create transaction record
-            transaction_id = str(uuid.uuid4())
-            cursor.execute('''
-                INSERT INTO point_transactions (id, user_id, points, transaction_type, reason, reference_id, balance_after)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (transaction_id, user_id, points, transaction_type, reason, reference_id, new_total))
-
-            conn.commit()
-            conn.close()
+                    INSERT INTO point_transactions (id, user_id, points, transaction_type, reason, reference_id, balance_after)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (transaction_id, user_id, points, transaction_type, reason, reference_id, new_total))
+
             return new_total
 
         except Exception as e:
@@ -325,34 +275,32 @@ class DatabaseManager:
         """Deduct points from user's account"""
         try:
             import uuid
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('SELECT total_points, points_spent FROM user_points WHERE user_id = ?', (user_id,))
-            result = cursor.fetchone()
-
-            if not result or result[0] < points:
-                conn.close()
-                return None  # Insufficient points
-
-            new_total = result[0] - points
-            new_spent = result[1] + points
-
-            cursor.execute('''
-                UPDATE user_points
-                SET total_points = ?, points_spent = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            ''', (new_total, new_spent, user_id))
-
-            # Create transaction record
-            transaction_id = str(uuid.uuid4())
-            cursor.execute('''
-                INSERT INTO point_transactions (id, user_id, points, transaction_type, reason, reference_id, balance_after)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (transaction_id, user_id, -points, transaction_type, reason, reference_id, new_total))
-
-            conn.commit()
-            conn.close()
+            # The balance check and the deduction must see the same balance
+            with self.pool.connection(immediate=True) as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('SELECT total_points, points_spent FROM user_points WHERE user_id = ?', (user_id,))
+                result = cursor.fetchone()
+
+                if not result or result[0] < points:
+                    return None  # Insufficient points
+
+                new_total = result[0] - points
+                new_spent = result[1] + points
+
+                cursor.execute('''
+                    UPDATE user_points
+                    SET total_points = ?, points_spent = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE user_id = ?
+                ''', (new_total, new_spent, user_id))
+
+                # Create transaction record
+                transaction_id = str(uuid.uuid4())
+                cursor.execute('''
+                    INSERT INTO point_transactions (id, user_id, points, transaction_type, reason, reference_id, balance_after)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (transaction_id, user_id, -points, transaction_type, reason, reference_id, new_total))
+
             return new_total
 
         except Exception as e:
@@ -362,19 +310,18 @@ class DatabaseManager:
     def get_point_transactions(self, user_id, limit=10):
         """Get user's recent point transactions"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute('''
-                SELECT id, points, transaction_type, reason, reference_id, balance_after, created_at
-                FROM point_transactions
-                WHERE user_id = ?
-                ORDER BY created_at DESC
-                LIMIT ?
-            ''', (user_id, limit))
+                cursor.execute('''
+                    SELECT id, points, transaction_type, reason, reference_id, balance_after, created_at
+                    FROM point_transactions
+                    WHERE user_id = ?
+                    ORDER BY created_at DESC
+                    LIMIT ?
+                ''', (user_id, limit))
 
-            results = cursor.fetchall()
-            conn.close()
+                results = cursor.fetchall()
 
             return [
                 {
@@ -397,17 +344,15 @@ class DatabaseManager:
         """Award a badge to a user"""
         try:
             import uuid
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
 
-            badge_record_id = str(uuid.uuid4())
-            cursor.execute('''
-                INSERT INTO user_badges (id, user_id, badge_id, badge_name, badge_description, icon, points_awarded)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (badge_record_id, user_id, badge_id, badge_name, badge_description, icon, points_awarded))
+                badge_record_id = str(uuid.uuid4())
+                cursor.execute('''
+                    INSERT INTO user_badges (id, user_id, badge_id, badge_name, badge_description, icon, points_awarded)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (badge_record_id, user_id, badge_id, badge_name, badge_description, icon, points_awarded))
 
-            conn.commit()
-            conn.close()
             return badge_record_id
 
         except sqlite3.IntegrityError:
@@ -420,18 +365,17 @@ class DatabaseManager:
     def get_user_badges(self, user_id):
         """Get all badges earned by a user"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute('''
-                SELECT id, badge_id, badge_name, badge_description, icon, points_awarded, earned_at
-                FROM user_badges
-                WHERE user_id = ?
-                ORDER BY earned_at DESC
-            ''', (user_id,))
+                cursor.execute('''
+                    SELECT id, badge_id, badge_name, badge_description, icon, points_awarded, earned_at
+                    FROM user_badges
+                    WHERE user_id = ?
+                    ORDER BY earned_at DESC
+                ''', (user_id,))
 
-            results = cursor.fetchall()
-            conn.close()
+                results = cursor.fetchall()
 
             return [
                 {
@@ -454,18 +398,16 @@ class DatabaseManager:
         """Create a reward redemption record"""
         try:
             import uuid
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            redemption_id = str(uuid.uuid4())
-            cursor.execute('''
-                INSERT INTO reward_redemptions
-                (id, user_id, reward_id, reward_name, quantity, points_spent, estimated_delivery)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (redemption_id, user_id, reward_id, reward_name, quantity, points_spent, estimated_delivery))
-
-            conn.commit()
-            conn.close()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+
+                redemption_id = str(uuid.uuid4())
+                cursor.execute('''
+                    INSERT INTO reward_redemptions
+                    (id, user_id, reward_id, reward_name, quantity, points_spent, estimated_delivery)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (redemption_id, user_id, reward_id, reward_name, quantity, points_spent, estimated_delivery))
+
             return redemption_id
 
         except Exception as e:
@@ -475,18 +417,17 @@ class DatabaseManager:
     def get_user_redemptions(self, user_id):
         """Get all redemptions for a user"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute('''
-                SELECT id, reward_id, reward_name, quantity, points_spent, status, redeemed_at, estimated_delivery, tracking_info
-                FROM reward_redemptions
-                WHERE user_id = ?
-                ORDER BY redeemed_at DESC
-            ''', (user_id,))
+                cursor.execute('''
+                    SELECT id, reward_id, reward_name, quantity, points_spent, status, redeemed_at, estimated_delivery, tracking_info
+                    FROM reward_redemptions
+                    WHERE user_id = ?
+                    ORDER BY redeemed_at DESC
+                ''', (user_id,))
 
-            results = cursor.fetchall()
-            conn.close()
+                results = cursor.fetchall()
 
             return [
                 {
@@ -512,32 +453,30 @@ class DatabaseManager:
     def get_user_classification_stats(self, user_id, start_date=None):
         """Get classification statistics for a specific user"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # Get user's classifications with optional date filter
-            if start_date:
-                cursor.execute('''
-                    SELECT waste_type, COUNT(*) as count
-                    FROM classifications
-                    WHERE filename LIKE ? AND created_at >= ?
-                    GROUP BY waste_type
-                ''', (f'%{user_id}%', start_date))
-            else:
-                cursor.execute('''
-                    SELECT waste_type, COUNT(*) as count
-                    FROM classifications
-                    WHERE filename LIKE ?
-                    GROUP BY waste_type
-                ''', (f'%{user_id}%',))
-
-            waste_breakdown = dict(cursor.fetchall())
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+
+                # Get user's classifications with optional date filter
+                if start_date:
+                    cursor.execute('''
+                        SELECT waste_type, COUNT(*) as count
+                        FROM classifications
+                        WHERE user_id = ? AND created_at >= ?
+                        GROUP BY waste_type
+                    ''', (user_id, start_date))
+                else:
+                    cursor.execute('''
+                        SELECT waste_type, COUNT(*) as count
+                        FROM classifications
+                        WHERE user_id = ?
+                        GROUP BY waste_type
+                    ''', (user_id,))
+
+                waste_breakdown = dict(cursor.fetchall())
 
             # Get total count
             total = sum(waste_breakdown.values())
 
-            conn.close()
-
             return {
                 'total_classifications': total,
                 'waste_breakdown': waste_breakdown
@@ -550,19 +489,18 @@ class DatabaseManager:
     def get_leaderboard_data(self, metric='points', limit=50):
         """Get leaderboard data based on specified metric"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
 
-            if metric == 'points':
-                cursor.execute('''
-                    SELECT user_id, total_points
-                    FROM user_points
-                    ORDER BY total_points DESC
-                    LIMIT ?
-                ''', (limit,))
+                if metric == 'points':
+                    cursor.execute('''
+                        SELECT user_id, total_points
+                        FROM user_points
+                        ORDER BY total_points DESC
+                        LIMIT ?
+                    ''', (limit,))
 
-            results = cursor.fetchall()
-            conn.close()
+                results = cursor.fetchall()
 
             return [
                 {'user_id': row[0], 'score': row[1], 'rank': i+1}
@@ -571,4 +509,4 @@ class DatabaseManager:
 
         except Exception as e:
             print(f"Error getting leaderboard data: {str(e)}")
-            return []
\ No newline at end of file
+            return []
@@ -2,6 +2,8 @@ import random
 from datetime import datetime, timedelta
 import uuid
 
+from utils.lazy import LazyObject
+
 class DemoDataGenerator:
     def __init__(self):
         self.service_providers = self._generate_service_providers()
@@ -267,5 +269,5 @@ class DemoDataGenerator:
         self.bookings.append(new_booking)
         return new_booking
 
-# Global instance for the demo
-demo_data = DemoDataGenerator()
\ No newline at end of file
+# Global instance for the demo (generated on first use, not at import)
+demo_data = LazyObject(DemoDataGenerator, 'demo_data')
\ No newline at end of file
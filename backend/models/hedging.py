@@ -0,0 +1,210 @@
+"""
+Hedged Requests
+Tracks recent provider latency and races the fallback provider against a
+slow primary once the primary passes a latency percentile
+"""
+
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from config.ai_config import AIConfig, AIProvider
+
+
+class LatencyWindow:
+    """Rolling window of recent successful call latencies per provider"""
+
+    def __init__(self, size=None):
+        self.size = size or AIConfig.LATENCY_WINDOW_SIZE
+        self._lock = threading.Lock()
+        self._samples = {provider: deque(maxlen=self.size) for provider in AIProvider}
+
+    def record(self, provider, latency_ms):
+        with self._lock:
+            self._samples[provider].append(latency_ms)
+
+    def percentile(self, provider, pct):
+        """Latency percentile in ms, or None with too few samples"""
+        with self._lock:
+            samples = list(self._samples[provider])
+        if len(samples) < AIConfig.HEDGE_MIN_SAMPLES:
+            return None
+        return float(np.percentile(samples, pct))
+
+    def summary(self, provider):
+        with self._lock:
+            samples = list(self._samples[provider])
+        if not samples:
+            return {'samples': 0, 'p50_ms': None, 'p95_ms': None}
+        return {
+            'samples': len(samples),
+            'p50_ms': round(float(np.percentile(samples, 50)), 2),
+            'p95_ms': round(float(np.percentile(samples, 95)), 2)
+        }
+
+
+class HedgingCoordinator:
+    """Runs a primary call and, if it is slow, a parallel fallback call"""
+
+    def __init__(self, latency_window, max_workers=None):
+        self.latency = latency_window
+        self.max_workers = max_workers or AIConfig.HEDGE_MAX_WORKERS
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="hedge"
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0  # Calls submitted to the pool and not yet finished
+        self._stats = {
+            'requests': 0,
+            'hedged': 0,
+            'skipped_saturated': 0,
+            'wins': {provider.value: 0 for provider in AIProvider},
+            'hedge_wins': 0,
+            'discarded': 0,
+            'all_failed': 0
+        }
+
+    def hedge_delay_ms(self, provider):
+        """How long to wait for the primary before firing the fallback"""
+        delay = self.latency.percentile(provider, AIConfig.HEDGE_PERCENTILE)
+        if delay is None:
+            delay = AIConfig.HEDGE_DEFAULT_DELAY_MS
+        return max(delay, AIConfig.HEDGE_MIN_DELAY_MS)
+
+    def run(self, primary, fallback, call, accept):
+        """
+        Race primary against fallback
+
+        Args:
+            primary: AIProvider tried first
+            fallback: AIProvider fired once the hedge delay passes (or primary fails)
+            call: Callable(provider) -> result dict; may raise
+            accept: Callable(result) -> bool; unacceptable results keep waiting
+
+        Returns:
+            tuple: (result, provider, hedged) from the first acceptable finisher,
+            else the most confident result seen
+
+        Raises:
+            RuntimeError: Both providers failed
+        """
+        with self._lock:
+            self._stats['requests'] += 1
+
+        delay_s = self.hedge_delay_ms(primary) / 1000.0
+        started = threading.Event()
+        pending = {self._submit(call, primary, started): primary}
+        # The hedge delay counts from when the primary starts running, not from
+        # when it was queued behind other calls in the pool
+        started.wait()
+        done, _ = wait(pending, timeout=delay_s)
+
+        hedged = False
+        candidates = []
+        errors = []
+
+        def start_fallback():
+            pending[self._submit(call, fallback)] = fallback
+            with self._lock:
+                self._stats['hedged'] += 1
+
+        if not done:
+            if self._saturated():
+                # A hedge would only queue behind the calls already running
+                with self._lock:
+                    self._stats['skipped_saturated'] += 1
+            else:
+                hedged = True
+                start_fallback()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(f"{provider.value}: {e}")
+                    result = None
+
+                if result is not None and accept(result):
+                    if pending:
+                        # The loser keeps running in the pool; its result is dropped
+                        with self._lock:
+                            self._stats['discarded'] += len(pending)
+                    self._record_win(provider, hedged, primary)
+                    return result, provider, hedged
+
+                if result is not None:
+                    candidates.append((result, provider))
+
+                if provider == primary and not hedged:
+                    # Primary failed or was unsure before the hedge fired
+                    hedged = True
+                    start_fallback()
+
+        if candidates:
+            result, provider = max(candidates, key=lambda c: float(c[0].get('confidence') or 0))
+            self._record_win(provider, hedged, primary)
+            return result, provider, hedged
+
+        with self._lock:
+            self._stats['all_failed'] += 1
+        raise RuntimeError(f"Hedged providers failed: {'; '.join(errors)}")
+
+    def _submit(self, call, provider, started=None):
+        """Run call(provider) in the pool, counting it as in flight until it finishes"""
+        def tracked():
+            if started is not None:
+                started.set()
+            try:
+                return call(provider)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+
+        with self._lock:
+            self._in_flight += 1
+        return self._executor.submit(tracked)
+
+    def _saturated(self):
+        """Whether every pool worker is busy, so a new call would wait in the queue"""
+        with self._lock:
+            return self._in_flight >= self.max_workers
+
+    def get_stats(self):
+        """Get hedge rate and wins per provider"""
+        with self._lock:
+            stats = {
+                'requests': self._stats['requests'],
+                'hedged': self._stats['hedged'],
+                'skipped_saturated': self._stats['skipped_saturated'],
+                'in_flight': self._in_flight,
+                'hedge_wins': self._stats['hedge_wins'],
+                'discarded': self._stats['discarded'],
+                'all_failed': self._stats['all_failed'],
+                'wins': dict(self._stats['wins'])
+            }
+        stats['hedge_rate'] = round(stats['hedged'] / stats['requests'], 4) if stats['requests'] else 0.0
+        stats['hedge_delay_ms'] = {p.value: round(self.hedge_delay_ms(p), 2) for p in AIProvider}
+        stats['latency'] = {p.value: self.latency.summary(p) for p in AIProvider}
+        return stats
+
+    def _record_win(self, provider, hedged, primary):
+        with self._lock:
+            self._stats['wins'][provider.value] += 1
+            if hedged and provider != primary:
+                self._stats['hedge_wins'] += 1
+
+
+# Global instances shared by every classifier
+provider_latency = LatencyWindow()
+hedging = HedgingCoordinator(provider_latency)
@@ -0,0 +1,709 @@
+"""
+Classification Job Queue
+Runs classifications off the request thread: a job is stored, picked up by a
+worker, retried with backoff on failure and its result kept for polling or
+posted to a callback URL
+
+Backends:
+    memory - in-process queue (default; jobs are lost on restart)
+    sqlite - durable table, shared by every process using the same file
+    redis  - Redis lists / sorted sets, shared across hosts
+"""
+
+import os
+import sys
+import json
+import time
+import heapq
+import uuid
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from config.ai_config import AIConfig
+from utils.http_client import get_http_client
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+EXPIRED = 'expired'
+FINISHED_STATUSES = (SUCCEEDED, FAILED, EXPIRED)
+
+
+class QueueFullError(RuntimeError):
+    """Raised by submit() when JOB_QUEUE_MAX_DEPTH jobs are already waiting"""
+
+
+class MemoryJobBackend:
+    """In-process job store; workers are woken directly when a job is added"""
+
+    name = 'memory'
+    durable = False
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._jobs = {}
+        self._images = {}
+        self._ready = deque()
+        self._delayed = []  # heap of (available_at, job_id)
+
+    def put(self, job, image_bytes):
+        with self._cond:
+            self._jobs[job['id']] = dict(job)
+            self._images[job['id']] = image_bytes
+            self._ready.append(job['id'])
+            self._cond.notify()
+
+    def claim(self, timeout):
+        """Take the next due job, marking it running; None if none arrives within timeout"""
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                now = time.time()
+                while self._delayed and self._delayed[0][0] <= now:
+                    self._ready.append(heapq.heappop(self._delayed)[1])
+
+                while self._ready:
+                    job = self._jobs.get(self._ready.popleft())
+                    if job is not None and job['status'] == QUEUED:
+                        _mark_running(job, now)
+                        return dict(job), self._images.get(job['id'])
+
+                if now >= deadline:
+                    return None
+                wait = deadline - now
+                if self._delayed:
+                    wait = min(wait, max(self._delayed[0][0] - now, 0))
+                self._cond.wait(wait)
+
+    def save(self, job):
+        with self._cond:
+            self._jobs[job['id']] = dict(job)
+            if job['status'] in FINISHED_STATUSES:
+                self._images.pop(job['id'], None)
+
+    def requeue(self, job, available_at):
+        with self._cond:
+            job['status'] = QUEUED
+            job['available_at'] = available_at
+            self._jobs[job['id']] = dict(job)
+            heapq.heappush(self._delayed, (available_at, job['id']))
+            self._cond.notify()
+
+    def get(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def recover(self, now):
+        # A running job can only be lost together with this process
+        return 0
+
+    def purge(self, now):
+        """Expire jobs that waited too long and drop finished jobs past their retention"""
+        expired = deleted = 0
+        with self._cond:
+            for job_id, job in list(self._jobs.items()):
+                if job['status'] == QUEUED and job['expires_at'] <= now:
+                    job['status'] = EXPIRED
+                    job['finished_at'] = now
+                    self._images.pop(job_id, None)
+                    expired += 1
+                elif job['status'] in FINISHED_STATUSES and job['finished_at'] + AIConfig.JOB_RESULT_TTL_SECONDS <= now:
+                    del self._jobs[job_id]
+                    deleted += 1
+        return expired, deleted
+
+    def depth(self):
+        now = time.time()
+        with self._cond:
+            counts = {QUEUED: 0, RUNNING: 0}
+            delayed = 0
+            for job in self._jobs.values():
+                if job['status'] in counts:
+                    counts[job['status']] += 1
+                    delayed += job['status'] == QUEUED and job['available_at'] > now
+            return {'queued': counts[QUEUED], 'running': counts[RUNNING], 'delayed': delayed}
+
+
+class SQLiteJobBackend:
+    """Durable job table; claims are serialized with BEGIN IMMEDIATE so several processes can share it"""
+
+    name = 'sqlite'
+    durable = True
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or AIConfig.JOB_QUEUE_SQLITE_PATH
+        self._wakeup = threading.Event()
+        self.init_jobs_table()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def init_jobs_table(self):
+        """Create the jobs table"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS classification_jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    job TEXT NOT NULL,
+                    image BLOB,
+                    available_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    lease_until REAL,
+                    finished_at REAL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_classification_jobs_status ON classification_jobs (status, available_at)')
+        finally:
+            conn.close()
+
+    def put(self, job, image_bytes):
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT INTO classification_jobs (id, status, job, image, available_at, expires_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (job['id'], job['status'], json.dumps(job), sqlite3.Binary(bytes(image_bytes)),
+                 job['available_at'], job['expires_at'])
+            )
+        finally:
+            conn.close()
+        self._wakeup.set()
+
+    def claim(self, timeout):
+        deadline = time.time() + timeout
+        while True:
+            claimed = self._claim_once()
+            if claimed is not None or time.time() >= deadline:
+                return claimed
+            # Other processes cannot wake us, so poll as well
+            self._wakeup.wait(min(AIConfig.JOB_POLL_INTERVAL, max(deadline - time.time(), 0)))
+            self._wakeup.clear()
+
+    def _claim_once(self):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                "SELECT id, job, image FROM classification_jobs WHERE status = 'queued' AND available_at <= ? "
+                "ORDER BY available_at LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            job = json.loads(row[1])
+            _mark_running(job, now)
+            conn.execute(
+                'UPDATE classification_jobs SET status = ?, job = ?, lease_until = ? WHERE id = ?',
+                (RUNNING, json.dumps(job), now + AIConfig.JOB_LEASE_SECONDS, job['id'])
+            )
+            conn.execute('COMMIT')
+            return job, bytes(row[2]) if row[2] is not None else None
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def save(self, job):
+        finished = job['status'] in FINISHED_STATUSES
+        conn = self._connect()
+        try:
+            if finished:
+                conn.execute(
+                    'UPDATE classification_jobs SET status = ?, job = ?, image = NULL, lease_until = NULL, '
+                    'finished_at = ? WHERE id = ?',
+                    (job['status'], json.dumps(job), job['finished_at'], job['id'])
+                )
+            else:
+                conn.execute(
+                    'UPDATE classification_jobs SET status = ?, job = ? WHERE id = ?',
+                    (job['status'], json.dumps(job), job['id'])
+                )
+        finally:
+            conn.close()
+
+    def requeue(self, job, available_at):
+        job['status'] = QUEUED
+        job['available_at'] = available_at
+        conn = self._connect()
+        try:
+            conn.execute(
+                'UPDATE classification_jobs SET status = ?, job = ?, available_at = ?, lease_until = NULL WHERE id = ?',
+                (QUEUED, json.dumps(job), available_at, job['id'])
+            )
+        finally:
+            conn.close()
+
+    def get(self, job_id):
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT job FROM classification_jobs WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else None
+
+    def recover(self, now):
+        """Re-queue running jobs whose worker died (lease ran out)"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE classification_jobs SET status = 'queued', job = json_set(job, '$.status', 'queued'), lease_until = NULL "
+                "WHERE status = 'running' AND lease_until <= ?",
+                (now,)
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def purge(self, now):
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT id, job FROM classification_jobs WHERE status = 'queued' AND expires_at <= ?",
+                (now,)
+            ).fetchall()
+            for job_id, data in rows:
+                job = json.loads(data)
+                job['status'] = EXPIRED
+                job['finished_at'] = now
+                conn.execute(
+                    "UPDATE classification_jobs SET status = ?, job = ?, image = NULL, finished_at = ? "
+                    "WHERE id = ? AND status = 'queued'",
+                    (EXPIRED, json.dumps(job), now, job_id)
+                )
+            cursor = conn.execute(
+                'DELETE FROM classification_jobs WHERE finished_at IS NOT NULL AND finished_at <= ?',
+                (now - AIConfig.JOB_RESULT_TTL_SECONDS,)
+            )
+            return len(rows), cursor.rowcount
+        finally:
+            conn.close()
+
+    def depth(self):
+        now = time.time()
+        conn = self._connect()
+        try:
+            queued, delayed, running = conn.execute(
+                "SELECT "
+                "SUM(status = 'queued' AND available_at <= ?), "
+                "SUM(status = 'queued' AND available_at > ?), "
+                "SUM(status = 'running') "
+                "FROM classification_jobs WHERE status IN ('queued', 'running')",
+                (now, now)
+            ).fetchone()
+        finally:
+            conn.close()
+        return {'queued': (queued or 0) + (delayed or 0), 'running': running or 0, 'delayed': delayed or 0}
+
+
+class RedisJobBackend:
+    """
+    Redis-backed queue (works with any server speaking the Redis protocol)
+
+    Keys: <prefix>job:<id> hash (job JSON + image), <prefix>queue list of ready
+    ids, <prefix>delayed and <prefix>leases sorted sets scored by timestamp.
+    Finished jobs are left to Redis key expiry.
+    """
+
+    name = 'redis'
+    durable = True
+
+    def __init__(self, url=None, prefix='wastewise:jobs:'):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("JOB_QUEUE_BACKEND=redis needs the 'redis' package (pip install redis)")
+        self.url = url or AIConfig.JOB_QUEUE_REDIS_URL
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(self.url)
+
+    def _key(self, name):
+        return f"{self.prefix}{name}"
+
+    def _job_key(self, job_id):
+        return f"{self.prefix}job:{job_id}"
+
+    def put(self, job, image_bytes):
+        pipe = self.client.pipeline()
+        pipe.hset(self._job_key(job['id']), mapping={'job': json.dumps(job), 'image': bytes(image_bytes)})
+        # Backstop: never keep a job longer than it could possibly matter
+        pipe.expireat(self._job_key(job['id']), int(job['expires_at'] + AIConfig.JOB_RESULT_TTL_SECONDS))
+        pipe.lpush(self._key('queue'), job['id'])
+        pipe.execute()
+
+    def claim(self, timeout):
+        deadline = time.time() + timeout
+        while True:
+            self._promote_delayed(time.time())
+            wait = min(AIConfig.JOB_POLL_INTERVAL, max(deadline - time.time(), 0))
+            popped = self.client.brpop(self._key('queue'), timeout=max(int(round(wait)), 1))
+            if popped is not None:
+                job_id = popped[1].decode()
+                data, image = self.client.hmget(self._job_key(job_id), 'job', 'image')
+                if data is not None:
+                    job = json.loads(data)
+                    if job['status'] == QUEUED:
+                        now = time.time()
+                        _mark_running(job, now)
+                        pipe = self.client.pipeline()
+                        pipe.hset(self._job_key(job_id), 'job', json.dumps(job))
+                        pipe.zadd(self._key('leases'), {job_id: now + AIConfig.JOB_LEASE_SECONDS})
+                        pipe.execute()
+                        return job, image
+            if time.time() >= deadline:
+                return None
+
+    def _promote_delayed(self, now):
+        for job_id in self.client.zrangebyscore(self._key('delayed'), '-inf', now):
+            # Only the worker whose ZREM succeeds moves the job
+            if self.client.zrem(self._key('delayed'), job_id):
+                self.client.lpush(self._key('queue'), job_id)
+
+    def save(self, job):
+        pipe = self.client.pipeline()
+        pipe.hset(self._job_key(job['id']), 'job', json.dumps(job))
+        if job['status'] in FINISHED_STATUSES:
+            pipe.hdel(self._job_key(job['id']), 'image')
+            pipe.zrem(self._key('leases'), job['id'])
+            pipe.expire(self._job_key(job['id']), AIConfig.JOB_RESULT_TTL_SECONDS)
+        pipe.execute()
+
+    def requeue(self, job, available_at):
+        job['status'] = QUEUED
+        job['available_at'] = available_at
+        pipe = self.client.pipeline()
+        pipe.hset(self._job_key(job['id']), 'job', json.dumps(job))
+        pipe.zrem(self._key('leases'), job['id'])
+        pipe.zadd(self._key('delayed'), {job['id']: available_at})
+        pipe.execute()
+
+    def get(self, job_id):
+        data = self.client.hget(self._job_key(job_id), 'job')
+        return json.loads(data) if data is not None else None
+
+    def recover(self, now):
+        recovered = 0
+        for job_id in self.client.zrangebyscore(self._key('leases'), '-inf', now):
+            if self.client.zrem(self._key('leases'), job_id):
+                job = self.get(job_id.decode())
+                if job is not None and job['status'] == RUNNING:
+                    self.requeue(job, now)
+                    recovered += 1
+        return recovered
+
+    def purge(self, now):
+        # Jobs still queued past expiry are expired when claimed; finished ones expire in Redis
+        return 0, 0
+
+    def depth(self):
+        pipe = self.client.pipeline()
+        pipe.llen(self._key('queue'))
+        pipe.zcard(self._key('delayed'))
+        pipe.zcard(self._key('leases'))
+        queued, delayed, running = pipe.execute()
+        return {'queued': queued + delayed, 'running': running, 'delayed': delayed}
+
+
+def _mark_running(job, now):
+    job['status'] = RUNNING
+    job['attempts'] += 1
+    job['started_at'] = now
+
+
+def create_backend(name=None):
+    """Build the backend selected by JOB_QUEUE_BACKEND"""
+    name = (name or AIConfig.JOB_QUEUE_BACKEND).lower()
+    if name == 'sqlite':
+        return SQLiteJobBackend()
+    if name == 'redis':
+        return RedisJobBackend()
+    if name == 'memory':
+        return MemoryJobBackend()
+    raise ValueError(f"Unknown JOB_QUEUE_BACKEND: {name}")
+
+
+class JobQueue:
+    """
+    Worker pool in front of a job backend
+
+    The handler is called as handler(image_bytes, job) and returns the
+    JSON-serializable result stored on the job. Exceptions are retried with
+    exponential backoff until the job has used max_attempts.
+    """
+
+    def __init__(self, handler, backend=None, workers=None, max_attempts=None):
+        """
+        Args:
+            handler: Callable doing the work for one job
+            backend: Job store (default from JOB_QUEUE_BACKEND)
+            workers: Worker threads in this process
+            max_attempts: Tries per job before it is marked failed
+        """
+        self.handler = handler
+        self.backend = backend or create_backend()
+        self.workers = workers or AIConfig.JOB_QUEUE_WORKERS
+        self.max_attempts = max_attempts or AIConfig.JOB_MAX_ATTEMPTS
+
+        self._threads = []
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._last_maintenance = 0.0
+        self._wait_ms = deque(maxlen=AIConfig.LATENCY_WINDOW_SIZE)
+        self._run_ms = deque(maxlen=AIConfig.LATENCY_WINDOW_SIZE)
+        self._stats = {
+            'submitted': 0,
+            'rejected': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'retried': 0,
+            'expired': 0,
+            'recovered': 0,
+            'deleted': 0,
+            'callbacks_delivered': 0,
+            'callbacks_failed': 0
+        }
+
+        # Durable queues may hold jobs from before a restart: start working them now
+        if self.backend.durable:
+            self.start()
+
+    def start(self):
+        """Start the worker threads (no-op if already running)"""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        """Stop the workers after their current job"""
+        self._stopping.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def submit(self, image_bytes, provider=None, top_k=None, callback_url=None):
+        """
+        Queue a job
+
+        Args:
+            image_bytes: Encoded image
+            provider: AIProvider value to use (None = active provider)
+            top_k: Number of top predictions
+            callback_url: URL the finished job is POSTed to
+
+        Returns:
+            dict: Public view of the queued job
+
+        Raises:
+            QueueFullError: JOB_QUEUE_MAX_DEPTH jobs are already queued
+        """
+        if self.backend.depth()['queued'] >= AIConfig.JOB_QUEUE_MAX_DEPTH:
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise QueueFullError(f"Job queue is full ({AIConfig.JOB_QUEUE_MAX_DEPTH} jobs waiting)")
+
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': QUEUED,
+            'provider': provider,
+            'top_k': top_k,
+            'callback_url': callback_url,
+            'attempts': 0,
+            'max_attempts': self.max_attempts,
+            'created_at': now,
+            'available_at': now,
+            'expires_at': now + AIConfig.JOB_TTL_SECONDS,
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None,
+            'callback': None
+        }
+        self.start()
+        self.backend.put(job, bytes(image_bytes))
+        with self._lock:
+            self._stats['submitted'] += 1
+        return public_job(job)
+
+    def get(self, job_id):
+        """Public view of a job, None if unknown or already purged"""
+        job = self.backend.get(job_id)
+        return public_job(job) if job is not None else None
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            try:
+                self._maybe_maintain()
+                claimed = self.backend.claim(timeout=1.0)
+            except Exception as e:
+                print(f"[ERROR] Job queue backend error: {e}")
+                self._stopping.wait(AIConfig.JOB_POLL_INTERVAL)
+                continue
+            if claimed is not None:
+                try:
+                    self._run(*claimed)
+                except Exception as e:
+                    # A backend write failed (e.g. database is locked); keep this worker alive
+                    print(f"[ERROR] Job {claimed[0]['id']} could not be stored: {e}")
+                    self._settle(claimed[0], e)
+
+    def _settle(self, job, error):
+        """Put a job whose run hit a backend error back into a consistent state"""
+        try:
+            stored = self.backend.get(job['id'])
+            if stored is None or stored['status'] != RUNNING:
+                # Its final state was saved; only the callback bookkeeping was lost
+                return
+            stored['error'] = str(error)
+            if stored['attempts'] < stored['max_attempts']:
+                self.backend.requeue(stored, time.time() + AIConfig.JOB_RETRY_BACKOFF_SECONDS)
+                with self._lock:
+                    self._stats['retried'] += 1
+            else:
+                stored['status'] = FAILED
+                stored['finished_at'] = time.time()
+                self.backend.save(stored)
+                with self._lock:
+                    self._stats['failed'] += 1
+        except Exception as e:
+            # Durable backends re-queue it once its lease runs out
+            print(f"[ERROR] Job {job['id']} left running: {e}")
+
+    def _run(self, job, image_bytes):
+        now = time.time()
+        if job['expires_at'] <= now:
+            job['status'] = EXPIRED
+            job['finished_at'] = now
+            self.backend.save(job)
+            with self._lock:
+                self._stats['expired'] += 1
+            self._deliver_callback(job)
+            return
+
+        with self._lock:
+            self._wait_ms.append((now - job['available_at']) * 1000)
+
+        start = time.perf_counter()
+        try:
+            if image_bytes is None:
+                raise RuntimeError("Job image is missing")
+            result = self.handler(image_bytes, job)
+        except Exception as e:
+            job['error'] = str(e)
+            if job['attempts'] < job['max_attempts']:
+                delay = AIConfig.JOB_RETRY_BACKOFF_SECONDS * (2 ** (job['attempts'] - 1))
+                print(f"[WARNING] Job {job['id']} attempt {job['attempts']} failed, retrying in {delay:.1f}s: {e}")
+                self.backend.requeue(job, time.time() + delay)
+                with self._lock:
+                    self._stats['retried'] += 1
+                return
+            print(f"[ERROR] Job {job['id']} failed after {job['attempts']} attempts: {e}")
+            job['status'] = FAILED
+        else:
+            job['status'] = SUCCEEDED
+            job['result'] = result
+            job['error'] = None
+
+        job['finished_at'] = time.time()
+        self.backend.save(job)
+        with self._lock:
+            self._stats[job['status']] += 1
+            self._run_ms.append((time.perf_counter() - start) * 1000)
+        self._deliver_callback(job)
+
+    def _deliver_callback(self, job):
+        """POST the finished job to its callback URL (the HTTP client retries 429/5xx)"""
+        if not job.get('callback_url'):
+            return
+        try:
+            response = get_http_client('job-callbacks').post(job['callback_url'], json=public_job(job))
+            delivered = 200 <= response.status_code < 300
+            job['callback'] = {'delivered': delivered, 'status_code': response.status_code, 'at': time.time()}
+        except Exception as e:
+            delivered = False
+            job['callback'] = {'delivered': False, 'error': str(e), 'at': time.time()}
+        self.backend.save(job)
+        with self._lock:
+            self._stats['callbacks_delivered' if delivered else 'callbacks_failed'] += 1
+
+    def _maybe_maintain(self):
+        """Expire stale jobs and recover lost ones, at most every JOB_MAINTENANCE_INTERVAL seconds"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_maintenance < AIConfig.JOB_MAINTENANCE_INTERVAL:
+                return
+            self._last_maintenance = now
+        recovered = self.backend.recover(now)
+        expired, deleted = self.backend.purge(now)
+        with self._lock:
+            self._stats['recovered'] += recovered
+            self._stats['expired'] += expired
+            self._stats['deleted'] += deleted
+
+    def get_stats(self):
+        """Get queue depth, outcome counters and queue-wait / run-time percentiles"""
+        with self._lock:
+            stats = dict(self._stats)
+            samples = {'wait': list(self._wait_ms), 'run': list(self._run_ms)}
+            workers = len(self._threads)
+        try:
+            stats['depth'] = self.backend.depth()
+        except Exception as e:
+            stats['depth'] = {'error': str(e)}
+        stats['backend'] = self.backend.name
+        stats['workers'] = workers
+        stats['max_depth'] = AIConfig.JOB_QUEUE_MAX_DEPTH
+        stats['latency'] = {
+            name: {
+                'samples': len(values),
+                'p50_ms': round(float(np.percentile(values, 50)), 2) if values else None,
+                'p95_ms': round(float(np.percentile(values, 95)), 2) if values else None
+            }
+            for name, values in samples.items()
+        }
+        return stats
+
+
+def public_job(job):
+    """Job fields returned to clients, with timestamps as ISO strings"""
+    def iso(value):
+        return datetime.fromtimestamp(value).isoformat() if value else None
+
+    callback = dict(job['callback']) if job.get('callback') else None
+    if callback and callback.get('at'):
+        callback['at'] = iso(callback['at'])
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        'provider': job['provider'],
+        'attempts': job['attempts'],
+        'max_attempts': job['max_attempts'],
+        'created_at': iso(job['created_at']),
+        'started_at': iso(job['started_at']),
+        'finished_at': iso(job['finished_at']),
+        'expires_at': iso(job['expires_at']),
+        'result': job['result'],
+        'error': job['error'],
+        'callback': callback
+    }
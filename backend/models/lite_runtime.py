@@ -0,0 +1,152 @@
+"""
+Lightweight Model Runtimes
+Runs exported TFLite / ONNX versions of the waste classifier without importing
+TensorFlow. Both wrappers expose the Keras-style predict(batch, verbose=0)
+so the rest of the local pipeline does not care which runtime is loaded
+"""
+
+import threading
+
+import numpy as np
+
+
+def _load_tflite_interpreter():
+    """Prefer the standalone runtimes; full TensorFlow is the last resort"""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    from tensorflow.lite import Interpreter
+    return Interpreter
+
+
+def _quantize(batch, detail):
+    """Map float input onto an int8/uint8 input tensor's scale and zero point"""
+    dtype = detail['dtype']
+    if dtype == np.float32:
+        return batch
+    scale, zero_point = detail['quantization']
+    limits = np.iinfo(dtype)
+    return np.clip(np.round(batch / scale + zero_point), limits.min, limits.max).astype(dtype)
+
+
+def _dequantize(values, detail):
+    if values.dtype == np.float32:
+        return values
+    scale, zero_point = detail['quantization']
+    return (values.astype(np.float32) - zero_point) * scale
+
+
+class TFLiteModel:
+    """
+    TFLite interpreters behind a Keras-style predict()
+
+    Resizing an interpreter reallocates all of its tensors, so instead of
+    resizing on every new batch size, batches are zero-padded up to the next
+    power of two and one interpreter is kept per padded size (a handful at
+    most for the batch sizes the micro-batcher produces).
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        self._Interpreter = _load_tflite_interpreter()
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self._slots = {}  # padded batch size -> _InterpreterSlot
+        self._slots_lock = threading.Lock()
+        # Load the single-image interpreter up front so a bad file fails here, not on the first request
+        self._slot(1)
+
+    def predict(self, batch, verbose=0):
+        batch = np.asarray(batch, dtype=np.float32)
+        count = batch.shape[0]
+        size = _padded_batch_size(count)
+        if size > count:
+            padding = np.zeros((size - count,) + batch.shape[1:], dtype=np.float32)
+            batch = np.concatenate([batch, padding])
+
+        slot = self._slot(size)
+        # An interpreter holds one set of tensors, so calls on the same size are serialized
+        with slot.lock:
+            slot.interpreter.set_tensor(slot.input['index'], _quantize(batch, slot.input))
+            slot.interpreter.invoke()
+            output = slot.interpreter.get_tensor(slot.output['index'])
+        return _dequantize(output, slot.output)[:count]
+
+    def get_stats(self):
+        """Padded batch sizes that have an allocated interpreter"""
+        with self._slots_lock:
+            return {'interpreter_batch_sizes': sorted(self._slots)}
+
+    def _slot(self, size):
+        slot = self._slots.get(size)
+        if slot is not None:
+            return slot
+        with self._slots_lock:
+            slot = self._slots.get(size)
+            if slot is None:
+                slot = _InterpreterSlot(self._Interpreter, self.model_path, self.num_threads, size)
+                self._slots[size] = slot
+        return slot
+
+
+class _InterpreterSlot:
+    """One interpreter allocated for a fixed batch size"""
+
+    def __init__(self, Interpreter, model_path, num_threads, batch_size):
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        shape = list(self.interpreter.get_input_details()[0]['shape'])
+        if shape[0] != batch_size:
+            shape[0] = batch_size
+            self.interpreter.resize_tensor_input(self.interpreter.get_input_details()[0]['index'], shape)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.lock = threading.Lock()
+
+
+def _padded_batch_size(count):
+    """Next power of two at or above count"""
+    return 1 << max(count - 1, 0).bit_length()
+
+
+class ONNXModel:
+    """ONNX Runtime CPU session behind a Keras-style predict()"""
+
+    def __init__(self, model_path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch, verbose=0):
+        # InferenceSession.run is safe to call from several threads
+        return self.session.run(None, {self._input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+
+def load_lite_model(backend, model_path, num_threads=None):
+    """
+    Load an exported model
+
+    Args:
+        backend: 'tflite' or 'onnx'
+        model_path: Path to the exported file
+        num_threads: CPU threads for the runtime (None = runtime default)
+    """
+    if backend == 'tflite':
+        return TFLiteModel(model_path, num_threads=num_threads)
+    if backend == 'onnx':
+        return ONNXModel(model_path, num_threads=num_threads)
+    raise ValueError(f"Unknown local model backend: {backend}")
@@ -0,0 +1,523 @@
+"""
+Schema Migrations
+Every table the routes use is created by the numbered migrations below.
+Applied versions are recorded in schema_migrations, so each migration runs
+exactly once per database file, in order, and in its own transaction.
+
+Adding a migration: append (next_version, name, function) to MIGRATIONS.
+Never edit a migration that has shipped; write a new one instead.
+
+Usage:
+    run_migrations('wastewise.db')            # what the managers call at startup
+    python models/migrations.py [db_path]     # apply and print the schema version
+"""
+
+import os
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.db_pool import get_db_pool
+
+
+def _columns(cursor, table):
+    cursor.execute(f'PRAGMA table_info({table})')
+    return {row[1] for row in cursor.fetchall()}
+
+
+def _001_core_schema(cursor):
+    """Classification, session and user tables, as created before migrations existed"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS classifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            original_filename TEXT,
+            waste_type TEXT NOT NULL,
+            confidence REAL NOT NULL,
+            all_predictions TEXT,
+            image_path TEXT,
+            recommendations TEXT,
+            environmental_impact TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Columns added after release; older files have the table without them
+    classification_columns = _columns(cursor, 'classifications')
+    if 'phash' not in classification_columns:
+        cursor.execute('ALTER TABLE classifications ADD COLUMN phash INTEGER')
+    if 'classification_uid' not in classification_columns:
+        cursor.execute('ALTER TABLE classifications ADD COLUMN classification_uid TEXT')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_classifications_uid
+        ON classifications (classification_uid)
+    ''')
+
+    # Keys of side effects already applied, so a repeated task cannot award points twice
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS processed_events (
+            event_key TEXT PRIMARY KEY,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS waste_categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category_name TEXT UNIQUE NOT NULL,
+            icon TEXT,
+            color_code TEXT,
+            description TEXT,
+            disposal_instructions TEXT,
+            environmental_impact TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT UNIQUE NOT NULL,
+            ip_address TEXT,
+            user_agent TEXT,
+            first_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            classification_count INTEGER DEFAULT 0
+        )
+    ''')
+
+    categories = [
+        ('plastic', '♻️', '#2196f3', 'Synthetic materials that can be recycled',
+         'Place in recycling bin, clean before disposal, remove labels',
+         'High recyclability - can be processed into new products'),
+        ('organic', '🌱', '#4caf50', 'Biodegradable waste from living organisms',
+         'Compost this waste, use for organic fertilizer, dispose in green bin',
+         'Can be composted to create nutrient-rich soil'),
+        ('paper', '📄', '#ff9800', 'Paper-based materials and cardboard',
+         'Place in paper recycling, remove plastic coating, ensure clean and dry',
+         'Easily recyclable - saves trees and reduces landfill waste'),
+        ('glass', '🗞️', '#00bcd4', 'Glass containers and materials',
+         'Place in glass recycling bin, remove caps and lids, handle with care',
+         '100% recyclable without quality loss'),
+        ('metal', '🔧', '#607d8b', 'Metallic materials and containers',
+         'Place in metal recycling, clean any food residue, infinitely recyclable',
+         'Infinitely recyclable - high environmental value')
+    ]
+    cursor.executemany('''
+        INSERT OR IGNORE INTO waste_categories
+        (category_name, icon, color_code, description, disposal_instructions, environmental_impact)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', categories)
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id TEXT PRIMARY KEY,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            full_name TEXT NOT NULL,
+            phone TEXT,
+            role TEXT DEFAULT 'user',
+            is_verified BOOLEAN DEFAULT FALSE,
+            is_active BOOLEAN DEFAULT TRUE,
+            avatar_url TEXT,
+            address TEXT,
+            city TEXT,
+            state TEXT,
+            pincode TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP,
+            login_attempts INTEGER DEFAULT 0,
+            locked_until TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_profiles (
+            user_id TEXT PRIMARY KEY,
+            bio TEXT,
+            preferences TEXT,
+            notification_settings TEXT,
+            language TEXT DEFAULT 'en',
+            timezone TEXT DEFAULT 'Asia/Kolkata',
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS password_reset_tokens (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            token TEXT UNIQUE NOT NULL,
+            expires_at TIMESTAMP NOT NULL,
+            used_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS email_verification_tokens (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            token TEXT UNIQUE NOT NULL,
+            expires_at TIMESTAMP NOT NULL,
+            verified_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # JWT blacklist
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            id TEXT PRIMARY KEY,
+            jti TEXT UNIQUE NOT NULL,
+            user_id TEXT,
+            revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP NOT NULL
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_activity_logs (
+            id TEXT PRIMARY KEY,
+            user_id TEXT,
+            action TEXT NOT NULL,
+            details TEXT,
+            ip_address TEXT,
+            user_agent TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_phone ON users (phone)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_role ON users (role)')
+
+
+def _002_rewards_tables(cursor):
+    """Points balances, the points ledger, badges and redemptions (the catalog lives in routes/rewards.py)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_points (
+            user_id TEXT PRIMARY KEY,
+            total_points INTEGER NOT NULL DEFAULT 0,
+            points_earned INTEGER NOT NULL DEFAULT 0,
+            points_spent INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS point_transactions (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            points INTEGER NOT NULL,
+            transaction_type TEXT NOT NULL,
+            reason TEXT,
+            reference_id TEXT,
+            balance_after INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_badges (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            badge_id TEXT NOT NULL,
+            badge_name TEXT,
+            badge_description TEXT,
+            icon TEXT,
+            points_awarded INTEGER DEFAULT 0,
+            earned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (user_id, badge_id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reward_redemptions (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            reward_id TEXT NOT NULL,
+            reward_name TEXT,
+            quantity INTEGER DEFAULT 1,
+            points_spent INTEGER NOT NULL,
+            status TEXT DEFAULT 'pending',
+            redeemed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            estimated_delivery TEXT,
+            tracking_info TEXT
+        )
+    ''')
+
+
+def _003_marketplace_tables(cursor):
+    """Listings, bookings, payments and reviews used by routes/marketplace.py"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS marketplace_listings (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT,
+            waste_type TEXT NOT NULL,
+            waste_subtype TEXT,
+            quantity_kg REAL NOT NULL,
+            estimated_value REAL,
+            asking_price REAL,
+            location TEXT NOT NULL,
+            latitude REAL,
+            longitude REAL,
+            city TEXT,
+            state TEXT,
+            pincode TEXT,
+            condition TEXT DEFAULT 'good',
+            pickup_available BOOLEAN DEFAULT TRUE,
+            delivery_available BOOLEAN DEFAULT FALSE,
+            status TEXT DEFAULT 'active',
+            views_count INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS marketplace_bookings (
+            id TEXT PRIMARY KEY,
+            listing_id TEXT NOT NULL,
+            buyer_id TEXT NOT NULL,
+            seller_id TEXT NOT NULL,
+            agreed_price REAL,
+            quantity_kg REAL,
+            pickup_address TEXT,
+            pickup_date TEXT,
+            pickup_time_slot TEXT,
+            contact_person TEXT,
+            contact_phone TEXT,
+            special_instructions TEXT,
+            status TEXT DEFAULT 'pending',
+            payment_status TEXT DEFAULT 'pending',
+            payment_id TEXT,
+            transaction_id TEXT,
+            completed_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (listing_id) REFERENCES marketplace_listings (id),
+            FOREIGN KEY (buyer_id) REFERENCES users (id),
+            FOREIGN KEY (seller_id) REFERENCES users (id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS marketplace_transactions (
+            id TEXT PRIMARY KEY,
+            booking_id TEXT NOT NULL,
+            buyer_id TEXT NOT NULL,
+            seller_id TEXT NOT NULL,
+            transaction_type TEXT NOT NULL,
+            amount REAL NOT NULL,
+            platform_fee REAL DEFAULT 0,
+            net_amount REAL,
+            payment_method TEXT,
+            payment_id TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (booking_id) REFERENCES marketplace_bookings (id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS marketplace_reviews (
+            id TEXT PRIMARY KEY,
+            booking_id TEXT NOT NULL,
+            reviewer_id TEXT NOT NULL,
+            reviewed_user_id TEXT NOT NULL,
+            rating INTEGER NOT NULL CHECK (rating BETWEEN 1 AND 5),
+            review_text TEXT,
+            transaction_type TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (booking_id) REFERENCES marketplace_bookings (id)
+        )
+    ''')
+
+
+def _004_hot_path_indexes(cursor):
+    """
+    Indexes shaped by the queries that run on every page view
+
+    Composite indexes put the equality column first and the ORDER BY column
+    last, so "WHERE user_id = ? ORDER BY created_at DESC LIMIT n" reads n
+    index entries instead of sorting the user's rows.
+    """
+    indexes = [
+        # Dashboard: recent classifications, per-type counts, retention cleanup
+        ('idx_classifications_created_at', 'classifications (created_at)'),
+        ('idx_classifications_waste_type', 'classifications (waste_type)'),
+        # Rewards: per-user history newest first, leaderboard
+        ('idx_point_transactions_user_created', 'point_transactions (user_id, created_at)'),
+        ('idx_user_badges_user_earned', 'user_badges (user_id, earned_at)'),
+        ('idx_reward_redemptions_user_redeemed', 'reward_redemptions (user_id, redeemed_at)'),
+        ('idx_user_points_total', 'user_points (total_points)'),
+        # Profile: last ten activities
+        ('idx_user_activity_logs_user_created', 'user_activity_logs (user_id, created_at)'),
+        # Marketplace search (status = 'active' [AND waste_type = ?] ORDER BY created_at DESC)
+        ('idx_listings_status_created', 'marketplace_listings (status, created_at)'),
+        ('idx_listings_status_type_created', 'marketplace_listings (status, waste_type, created_at)'),
+        # My listings and seller stats
+        ('idx_listings_user_status_created', 'marketplace_listings (user_id, status, created_at)'),
+        # Bookings per listing (joins, active-booking check) and per buyer
+        ('idx_bookings_listing_status', 'marketplace_bookings (listing_id, status)'),
+        ('idx_bookings_buyer_created', 'marketplace_bookings (buyer_id, created_at)'),
+        # "buyer_id = ? OR seller_id = ?" is answered from one index per side
+        ('idx_transactions_buyer_created', 'marketplace_transactions (buyer_id, created_at)'),
+        ('idx_transactions_seller_created', 'marketplace_transactions (seller_id, created_at)'),
+        ('idx_reviews_booking_reviewed', 'marketplace_reviews (booking_id, reviewed_user_id)')
+    ]
+    for name, target in indexes:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {target}')
+
+    # Superseded by the (user_id, created_at) index above
+    cursor.execute('DROP INDEX IF EXISTS idx_user_activity_logs_user_id')
+    # Duplicates of the automatic indexes behind UNIQUE (email) and UNIQUE (jti)
+    cursor.execute('DROP INDEX IF EXISTS idx_users_email')
+    cursor.execute('DROP INDEX IF EXISTS idx_revoked_tokens_jti')
+
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def _005_classification_owner(cursor):
+    """
+    user_id and session_id on classifications, replacing filename LIKE '%user_id%'
+
+    Existing rows are attributed from the points ledger: every signed-in
+    classification was awarded points with reference_id = classification_uid,
+    or with the integer row id for rows saved before classification_uid
+    existed. Anonymous and pre-ledger rows keep a NULL user_id; no past
+    session ids were recorded, so session_id starts empty.
+    """
+    classification_columns = _columns(cursor, 'classifications')
+    if 'user_id' not in classification_columns:
+        cursor.execute('ALTER TABLE classifications ADD COLUMN user_id TEXT')
+    if 'session_id' not in classification_columns:
+        cursor.execute('ALTER TABLE classifications ADD COLUMN session_id TEXT')
+
+    # Walk the ledger and update through the unique uid index: O(ledger * log n),
+    # where a correlated subquery per classification would scan the ledger each time
+    reader = cursor.connection.cursor()
+    reader.execute('''
+        SELECT reference_id, user_id FROM point_transactions
+        WHERE reason = 'Waste classification' AND reference_id IS NOT NULL
+    ''')
+    while True:
+        batch = reader.fetchmany(BACKFILL_BATCH_SIZE)
+        if not batch:
+            break
+        cursor.executemany('''
+            UPDATE classifications SET user_id = ?
+            WHERE classification_uid = ? AND user_id IS NULL
+        ''', [(user_id, reference) for reference, user_id in batch])
+        # Legacy ledger rows hold CAST(classifications.id AS TEXT); look those up by primary key
+        legacy = [(user_id, int(reference)) for reference, user_id in batch if str(reference).isdigit()]
+        if legacy:
+            cursor.executemany('''
+                UPDATE classifications SET user_id = ?
+                WHERE id = ? AND user_id IS NULL
+            ''', legacy)
+
+    # Per-user stats: "user_id = ? [AND created_at >= ?] GROUP BY waste_type"
+    # is answered from this index alone, already grouped, without reading rows
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_classifications_user_type_created
+        ON classifications (user_id, waste_type, created_at)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_classifications_session ON classifications (session_id)')
+
+
+MIGRATIONS = [
+    (1, 'core_schema', _001_core_schema),
+    (2, 'rewards_tables', _002_rewards_tables),
+    (3, 'marketplace_tables', _003_marketplace_tables),
+    (4, 'hot_path_indexes', _004_hot_path_indexes),
+    (5, 'classification_owner', _005_classification_owner)
+]
+
+
+def get_schema_version(db_path):
+    """Highest migration version applied to a database file (0 for a new file)"""
+    with get_db_pool(db_path).connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'")
+        if not cursor.fetchone():
+            return 0
+        cursor.execute('SELECT MAX(version) FROM schema_migrations')
+        return cursor.fetchone()[0] or 0
+
+
+def run_migrations(db_path, migrations=None):
+    """
+    Apply the migrations a database file has not seen yet
+
+    Each migration runs under BEGIN IMMEDIATE together with its
+    schema_migrations row, so two processes starting at once cannot both
+    apply it and a failed migration leaves no partial schema behind.
+
+    Args:
+        db_path: SQLite database file
+        migrations: (version, name, function) list, default MIGRATIONS
+
+    Returns:
+        list: Versions applied by this call
+    """
+    pool = get_db_pool(db_path)
+    migrations = MIGRATIONS if migrations is None else migrations
+
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                duration_ms REAL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('SELECT version FROM schema_migrations')
+        done = {row[0] for row in cursor.fetchall()}
+
+    applied = []
+    for version, name, migrate in sorted(migrations, key=lambda m: m[0]):
+        if version in done:
+            continue
+        with pool.connection(immediate=True) as conn:
+            cursor = conn.cursor()
+            # Another process may have applied it while this one waited for the lock
+            cursor.execute('SELECT 1 FROM schema_migrations WHERE version = ?', (version,))
+            if cursor.fetchone():
+                continue
+            start = time.perf_counter()
+            migrate(cursor)
+            duration_ms = (time.perf_counter() - start) * 1000
+            cursor.execute('''
+                INSERT INTO schema_migrations (version, name, duration_ms)
+                VALUES (?, ?, ?)
+            ''', (version, name, round(duration_ms, 3)))
+        applied.append(version)
+        print(f"Applied migration {version:03d}_{name} ({duration_ms:.1f} ms)")
+
+    if applied:
+        # Refresh planner statistics for the new indexes
+        with pool.connection() as conn:
+            conn.execute('PRAGMA optimize')
+    return applied
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.dirname(__file__)), 'wastewise.db')
+    run_migrations(path)
+    print(f"{path}: schema version {get_schema_version(path)}")
@@ -0,0 +1,428 @@
+"""
+Local Model Registry
+Versioned local model artifacts that can be loaded and warmed in the
+background, switched to atomically and rolled back instantly
+
+Layout:
+    MODEL_REGISTRY_DIR/
+        ACTIVE                      name of the version served after a restart
+        2024-06-01/
+            model.h5                (or model.keras / model.tflite / model.onnx)
+            class_indices.json      {"class name": output index, ...}
+            metadata.json           optional: {"backend": ..., "input_size": [w, h]}
+
+With no versions in the directory, LOCAL_MODEL_PATH and the class_indices.json
+next to it are served as version 'default'.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from config.ai_config import AIConfig
+from models.batch_inference import MicroBatcher
+
+DEFAULT_VERSION = 'default'
+ACTIVE_FILE = 'ACTIVE'
+CLASS_INDICES_FILE = 'class_indices.json'
+METADATA_FILE = 'metadata.json'
+MODEL_FILES = (('model.h5', 'keras'), ('model.keras', 'keras'), ('model.tflite', 'tflite'), ('model.onnx', 'onnx'))
+
+LOADING = 'loading'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class ModelVersionError(RuntimeError):
+    """Raised for unknown versions or versions that are not ready to serve"""
+
+
+def load_artifact(backend, model_path):
+    """Load a model file with the runtime for its backend"""
+    if backend == 'keras':
+        from tensorflow.keras.models import load_model
+        return load_model(model_path)
+    from models.lite_runtime import load_lite_model
+    return load_lite_model(backend, model_path, AIConfig.LOCAL_RUNTIME_THREADS)
+
+
+def read_class_names(path):
+    """Class names in output order from a class_indices.json file"""
+    with open(path, 'r') as f:
+        class_indices = json.load(f)
+    names = sorted(class_indices, key=lambda name: class_indices[name])
+    if sorted(class_indices.values()) != list(range(len(names))):
+        raise ValueError(f"{path} does not map classes onto indices 0..{len(names) - 1}")
+    return names
+
+
+class ModelVersion:
+    """One loaded model with its class names, input size and micro-batcher"""
+
+    def __init__(self, version, model, class_names, backend='keras', path=None, input_size=None, batching=None):
+        self.version = version
+        self.model = model
+        self.class_names = list(class_names)
+        self.backend = backend
+        self.path = path
+        self.input_size = tuple(input_size or AIConfig.LOCAL_MODEL_INPUT_SIZE)
+        self.loaded_at = time.time()
+        self.load_ms = None
+        self.warmup = None
+
+        batching = AIConfig.LOCAL_BATCHING_ENABLED if batching is None else batching
+        self.batcher = MicroBatcher(
+            lambda batch: self.model.predict(batch, verbose=0),
+            max_batch_size=AIConfig.LOCAL_BATCH_MAX_SIZE,
+            max_wait_ms=AIConfig.LOCAL_BATCH_MAX_WAIT_MS,
+            name=f"local-{version}"
+        ) if batching else None
+
+    @property
+    def cache_version(self):
+        """Identifier the result cache keys local results with"""
+        return f"{self.backend}-{self.version}"
+
+    def close(self):
+        if self.batcher is not None:
+            self.batcher.close()
+
+    def describe(self):
+        return {
+            'version': self.version,
+            'backend': self.backend,
+            'path': self.path,
+            'classes': len(self.class_names),
+            'input_size': list(self.input_size),
+            'load_ms': self.load_ms,
+            'warmup': self.warmup
+        }
+
+
+class ModelRegistry:
+    """
+    Holds the served local model and the versions staged next to it
+
+    Requests read active() once and use that version throughout, so a switch
+    never mixes two versions in one request. The version replaced by a switch
+    stays loaded as the rollback target.
+    """
+
+    def __init__(self, root=None, loader=load_artifact):
+        """
+        Args:
+            root: Registry directory (default MODEL_REGISTRY_DIR)
+            loader: Callable (backend, model_path) -> model with predict(batch, verbose=0)
+        """
+        self.root = root or AIConfig.MODEL_REGISTRY_DIR
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._bootstrap_lock = threading.Lock()
+        self._bootstrapped = False
+        self._active = None
+        self._previous = None
+        self._loaded = {}  # version -> ModelVersion (staged, active or rollback target)
+        self._states = {}  # version -> load / warm-up status
+        self._stats = {'switches': 0, 'rollbacks': 0, 'loads': 0, 'failed_loads': 0}
+
+    # ---- serving -------------------------------------------------------
+
+    def active(self):
+        """The version serving requests, loading the configured one on first use (None if unavailable)"""
+        active = self._active
+        if active is not None or self._bootstrapped:
+            return active
+        with self._bootstrap_lock:
+            if not self._bootstrapped:
+                self._bootstrap()
+                self._bootstrapped = True
+        return self._active
+
+    def _bootstrap(self):
+        """Serve the version named in ACTIVE (or the newest one), else the legacy model path"""
+        versions = self.versions()
+        version = self._read_active_file()
+        if version not in versions:
+            version = versions[-1] if versions else DEFAULT_VERSION
+        try:
+            self._publish(self._load(version))
+        except Exception as e:
+            print(f"[WARNING] Local model unavailable: {e}")
+
+    def loaded(self, version):
+        """A version that is loaded and warm (served or staged), else None"""
+        with self._lock:
+            if self._states.get(version, {}).get('state') != READY:
+                return None
+            return self._loaded.get(version)
+
+    def serve(self, model_version):
+        """Switch to an already built ModelVersion (e.g. one built in a test)"""
+        with self._lock:
+            self._loaded[model_version.version] = model_version
+            self._states[model_version.version] = {'state': READY, 'error': None}
+        self._bootstrapped = True
+        self._publish(model_version)
+
+    # ---- staging and switching -----------------------------------------
+
+    def stage(self, version, activate=False):
+        """
+        Load and warm a version on a background thread
+
+        Args:
+            version: Directory name under the registry
+            activate: Switch to it as soon as it is warm
+
+        Returns:
+            dict: The version's status
+
+        Raises:
+            ModelVersionError: The version does not exist
+        """
+        if version not in self.versions() and version != DEFAULT_VERSION:
+            raise ModelVersionError(f"Unknown model version '{version}'")
+
+        with self._lock:
+            state = self._states.get(version, {}).get('state')
+            ready = state == READY and version in self._loaded
+            in_progress = state in (LOADING, WARMING)
+            if not ready and not in_progress:
+                self._states[version] = {'state': LOADING, 'error': None}
+
+        if in_progress:
+            return self._status(version)
+        if ready:
+            if activate:
+                self.activate(version)
+            return self._status(version)
+
+        threading.Thread(target=self._stage_worker, args=(version, activate),
+                         name=f"model-stage-{version}", daemon=True).start()
+        return self._status(version)
+
+    def _stage_worker(self, version, activate):
+        try:
+            loaded = self._load(version)
+        except Exception as e:
+            print(f"[ERROR] Model version {version} failed to load: {e}")
+            return
+        with self._lock:
+            self._loaded[version] = loaded
+        if activate:
+            self.activate(version)
+
+    def activate(self, version):
+        """
+        Switch traffic to a staged version; the current one becomes the rollback target
+
+        Raises:
+            ModelVersionError: The version is not loaded and warm
+        """
+        self.active()  # the version served until now becomes the rollback target
+        with self._lock:
+            loaded = self._loaded.get(version)
+            if loaded is None or self._states.get(version, {}).get('state') != READY:
+                raise ModelVersionError(f"Model version '{version}' is not loaded and warm; stage it first")
+        self._publish(loaded)
+        with self._lock:
+            self._stats['switches'] += 1
+        return self.get_stats()
+
+    def rollback(self):
+        """Switch back to the previously served version (already warm)"""
+        with self._lock:
+            previous = self._previous
+        if previous is None:
+            raise ModelVersionError("No previous model version to roll back to")
+        self._publish(previous)
+        with self._lock:
+            self._stats['rollbacks'] += 1
+        return self.get_stats()
+
+    def _publish(self, loaded):
+        """Make `loaded` the served version in one reference swap"""
+        with self._lock:
+            if self._active is loaded:
+                return
+            displaced = self._previous
+            self._previous, self._active = self._active, loaded
+            self._loaded[loaded.version] = loaded
+            AIConfig.LOCAL_MODEL_VERSION = loaded.cache_version
+            # Only the last two served versions stay loaded; staged ones wait for their switch
+            if displaced is not None and displaced is not loaded and displaced is not self._previous:
+                self._loaded.pop(displaced.version, None)
+                self._states.pop(displaced.version, None)
+            else:
+                displaced = None
+        self._write_active_file(loaded.version)
+        print(f"[INFO] Local model version {loaded.version} is now serving")
+        if displaced is not None:
+            # Requests that picked up the old version a moment ago still finish on it
+            timer = threading.Timer(AIConfig.MODEL_RETIRE_GRACE_SECONDS, displaced.close)
+            timer.daemon = True
+            timer.start()
+
+    # ---- loading -------------------------------------------------------
+
+    def _load(self, version):
+        """Load and warm one version, recording its status"""
+        with self._lock:
+            self._states[version] = {'state': LOADING, 'error': None}
+        start = time.perf_counter()
+        try:
+            model_path, backend, class_names, input_size = self._artifact(version)
+            model = self.loader(backend, model_path)
+            loaded = ModelVersion(version, model, class_names, backend=backend, path=model_path,
+                                  input_size=input_size)
+            loaded.load_ms = round((time.perf_counter() - start) * 1000, 2)
+            with self._lock:
+                self._states[version]['state'] = WARMING
+            try:
+                loaded.warmup = self._warm(loaded)
+            except Exception:
+                loaded.close()
+                raise
+        except Exception as e:
+            with self._lock:
+                self._states[version] = {'state': FAILED, 'error': str(e)}
+                self._stats['failed_loads'] += 1
+            raise
+
+        with self._lock:
+            self._states[version] = {'state': READY, 'error': None}
+            self._stats['loads'] += 1
+        print(f"[INFO] Model version {version} loaded ({backend}) in {loaded.load_ms:.0f} ms, "
+              f"warmed in {loaded.warmup['total_ms']:.0f} ms")
+        return loaded
+
+    def _warm(self, loaded):
+        """
+        Run synthetic batches through the model before it serves traffic
+
+        Covers every batch size the micro-batcher can produce (powers of two
+        up to LOCAL_BATCH_MAX_SIZE) so graph tracing / tensor allocation
+        happens here and not on a request. Also checks the output width
+        matches class_indices.json.
+        """
+        width, height = loaded.input_size
+        sizes = sorted({1, AIConfig.LOCAL_BATCH_MAX_SIZE} |
+                       {2 ** i for i in range(1, AIConfig.LOCAL_BATCH_MAX_SIZE.bit_length())
+                        if 2 ** i < AIConfig.LOCAL_BATCH_MAX_SIZE})
+        rng = np.random.default_rng(0)
+        start = time.perf_counter()
+        first_ms = last_ms = None
+        for size in sizes:
+            batch = rng.random((size, height, width, 3), dtype=np.float32)
+            for _ in range(max(AIConfig.MODEL_WARMUP_ROUNDS, 1)):
+                call_start = time.perf_counter()
+                output = np.asarray(loaded.model.predict(batch, verbose=0))
+                call_ms = (time.perf_counter() - call_start) * 1000
+                first_ms = call_ms if first_ms is None else first_ms
+                last_ms = call_ms
+                if output.shape != (size, len(loaded.class_names)):
+                    raise ValueError(
+                        f"Model output shape {output.shape} does not match {len(loaded.class_names)} classes"
+                    )
+        return {
+            'batch_sizes': sizes,
+            'rounds': max(AIConfig.MODEL_WARMUP_ROUNDS, 1),
+            'first_call_ms': round(first_ms, 2),
+            'last_call_ms': round(last_ms, 2),
+            'total_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    def _artifact(self, version):
+        """(model path, backend, class names, input size) for a version"""
+        if version == DEFAULT_VERSION and not os.path.isdir(os.path.join(self.root, version)):
+            model_path = AIConfig.get_local_model_path()
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(f"Local model not found at {model_path}")
+            indices = os.path.join(os.path.dirname(model_path), CLASS_INDICES_FILE)
+            class_names = read_class_names(indices) if os.path.exists(indices) else AIConfig.WASTE_CATEGORIES
+            return model_path, AIConfig.LOCAL_MODEL_BACKEND, class_names, None
+
+        directory = os.path.join(self.root, version)
+        metadata = {}
+        if os.path.exists(os.path.join(directory, METADATA_FILE)):
+            with open(os.path.join(directory, METADATA_FILE), 'r') as f:
+                metadata = json.load(f)
+
+        candidates = [(name, backend) for name, backend in MODEL_FILES
+                      if os.path.exists(os.path.join(directory, name))]
+        if metadata.get('backend'):
+            candidates = [c for c in candidates if c[1] == metadata['backend']]
+        if not candidates:
+            raise FileNotFoundError(f"No model file in {directory}")
+        # Prefer the runtime this deployment is configured for
+        candidates.sort(key=lambda c: c[1] != AIConfig.LOCAL_MODEL_BACKEND)
+        name, backend = candidates[0]
+
+        class_names = read_class_names(os.path.join(directory, CLASS_INDICES_FILE))
+        return os.path.join(directory, name), backend, class_names, metadata.get('input_size')
+
+    # ---- registry directory --------------------------------------------
+
+    def versions(self):
+        """Version directories in the registry, oldest name first"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, name))
+            and os.path.exists(os.path.join(self.root, name, CLASS_INDICES_FILE))
+        )
+
+    def _read_active_file(self):
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE), 'r') as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def _write_active_file(self, version):
+        """Remember the served version across restarts (written then renamed)"""
+        if not os.path.isdir(self.root) or version not in self.versions():
+            return
+        path = os.path.join(self.root, ACTIVE_FILE)
+        try:
+            with open(f"{path}.tmp", 'w') as f:
+                f.write(version)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            print(f"[WARNING] Could not record active model version: {e}")
+
+    # ---- reporting -----------------------------------------------------
+
+    def _status(self, version):
+        with self._lock:
+            state = dict(self._states.get(version, {'state': None, 'error': None}))
+            loaded = self._loaded.get(version)
+        state['version'] = version
+        state['details'] = loaded.describe() if loaded else None
+        return state
+
+    def get_stats(self):
+        """Get the served and rollback versions, staged versions and switch counters"""
+        with self._lock:
+            active, previous = self._active, self._previous
+            states = {name: dict(state) for name, state in self._states.items()}
+            stats = dict(self._stats)
+        stats['active'] = active.describe() if active else None
+        stats['previous'] = previous.version if previous else None
+        stats['states'] = states
+        stats['available'] = self.versions()
+        stats['registry_dir'] = self.root
+        return stats
+
+
+# Global instance shared by every classifier
+model_registry = ModelRegistry()
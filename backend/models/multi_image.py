@@ -0,0 +1,178 @@
+"""
+Multi-Image Prompts
+Prompt, response schema and parser for classifying several images in one
+Gemini / OpenAI call, plus counters for how well the packing works
+"""
+
+import os
+import re
+import sys
+import json
+import threading
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from config.ai_config import AIConfig
+
+
+def build_prompt(count):
+    """Instruction text for a call carrying `count` images labelled Image 1..count"""
+    return f"""You will receive {count} images, each preceded by its label "Image N".
+Classify the waste shown in every image.
+
+Available categories: {', '.join(AIConfig.WASTE_CATEGORIES)}
+
+Respond ONLY with a JSON array (no markdown, no extra text) holding exactly one object per image:
+[{{"index": 1, "waste_type": "category_name", "confidence": 0.95, "reasoning": "brief explanation"}}, ...]
+
+"index" is the image's label number. The waste_type must be one of the available categories listed above."""
+
+
+def item_schema():
+    """JSON schema of one array element"""
+    return {
+        'type': 'object',
+        'properties': {
+            'index': {'type': 'integer'},
+            'waste_type': {'type': 'string', 'enum': list(AIConfig.WASTE_CATEGORIES)},
+            'confidence': {'type': 'number'},
+            'reasoning': {'type': 'string'}
+        },
+        'required': ['index', 'waste_type', 'confidence', 'reasoning'],
+        'additionalProperties': False
+    }
+
+
+def gemini_response_schema():
+    """Array schema in the OpenAPI subset Gemini's response_schema accepts"""
+    return {
+        'type': 'ARRAY',
+        'items': {
+            'type': 'OBJECT',
+            'properties': {
+                'index': {'type': 'INTEGER'},
+                'waste_type': {'type': 'STRING', 'enum': list(AIConfig.WASTE_CATEGORIES)},
+                'confidence': {'type': 'NUMBER'},
+                'reasoning': {'type': 'STRING'}
+            },
+            'required': ['index', 'waste_type', 'confidence', 'reasoning']
+        }
+    }
+
+
+def openai_response_format():
+    """Structured-output response_format (strict mode needs an object at the top level)"""
+    return {
+        'type': 'json_schema',
+        'json_schema': {
+            'name': 'waste_classifications',
+            'strict': True,
+            'schema': {
+                'type': 'object',
+                'properties': {'items': {'type': 'array', 'items': item_schema()}},
+                'required': ['items'],
+                'additionalProperties': False
+            }
+        }
+    }
+
+
+def parse_response(text, count):
+    """
+    Map a multi-image answer back to the images it describes
+
+    Accepts a JSON array, an object wrapping one ("items" / "results"), or -
+    when the JSON is broken - whichever individual objects still parse.
+
+    Args:
+        text: Raw model output
+        count: Number of images sent (labels 1..count)
+
+    Returns:
+        tuple: ({label: item dict}, [labels that are missing or invalid])
+    """
+    text = re.sub(r'```(?:json)?\s*', '', text or '').strip()
+
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get('items', data.get('results', [data]))
+        candidates = data if isinstance(data, list) else []
+    except json.JSONDecodeError:
+        candidates = []
+        for match in re.finditer(r'\{[^{}]*\}', text):
+            try:
+                candidates.append(json.loads(match.group()))
+            except json.JSONDecodeError:
+                continue
+
+    parsed = {}
+    for item in candidates:
+        if not isinstance(item, dict):
+            continue
+        try:
+            label = int(item.get('index'))
+            confidence = float(item.get('confidence'))
+        except (TypeError, ValueError):
+            continue
+        if not 1 <= label <= count or label in parsed:
+            continue
+        if not isinstance(item.get('waste_type'), str) or not 0.0 <= confidence <= 1.0:
+            continue
+        parsed[label] = {
+            'waste_type': item['waste_type'],
+            'confidence': confidence,
+            'reasoning': item.get('reasoning', '')
+        }
+
+    failed = [label for label in range(1, count + 1) if label not in parsed]
+    return parsed, failed
+
+
+class MultiImageStats:
+    """Calls, images per call, per-item retries and token usage of multi-image prompts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, provider, images, call_ms, failed_items, retry=False, error=False, usage=None):
+        name = getattr(provider, 'value', provider)
+        with self._lock:
+            stats = self._stats.setdefault(name, {
+                'calls': 0,
+                'images': 0,
+                'retry_calls': 0,
+                'failed_calls': 0,
+                'unparsed_items': 0,
+                'total_call_ms': 0.0,
+                'input_tokens': 0,
+                'output_tokens': 0
+            })
+            stats['calls'] += 1
+            stats['images'] += images
+            stats['retry_calls'] += bool(retry)
+            stats['failed_calls'] += bool(error)
+            stats['unparsed_items'] += failed_items
+            stats['total_call_ms'] += call_ms
+            if usage:
+                stats['input_tokens'] += usage.get('input_tokens', 0)
+                stats['output_tokens'] += usage.get('output_tokens', 0)
+
+    def get_stats(self):
+        with self._lock:
+            providers = {name: dict(stats) for name, stats in self._stats.items()}
+        for stats in providers.values():
+            stats['images_per_call'] = round(stats['images'] / stats['calls'], 2) if stats['calls'] else 0.0
+            stats['ms_per_image'] = round(stats['total_call_ms'] / stats['images'], 2) if stats['images'] else None
+            stats['total_call_ms'] = round(stats['total_call_ms'], 2)
+        return {
+            'enabled': AIConfig.MULTI_IMAGE_ENABLED,
+            'images_per_call': AIConfig.MULTI_IMAGE_PER_CALL,
+            'providers': providers
+        }
+
+
+# Global instance shared by every classifier
+multi_image_stats = MultiImageStats()
@@ -0,0 +1,246 @@
+"""
+Provider Payload Policy
+Downscales and re-encodes uploads before they are sent to a cloud provider,
+once per request and provider, and tracks how many bytes that saves
+"""
+
+import io
+import os
+import sys
+import time
+import threading
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from config.ai_config import AIConfig
+
+# Formats every cloud provider accepts as-is
+_PASSTHROUGH_FORMATS = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp'}
+_ENCODERS = {'jpeg': ('JPEG', 'image/jpeg'), 'webp': ('WEBP', 'image/webp')}
+_EXIF_ORIENTATION_TAG = 0x0112
+_QUALITY_STEP = 10
+_SCALE_STEP = 0.75
+_MIN_DIMENSION = 256
+
+
+class PreparedPayload:
+    """Image bytes to send to one provider plus what it took to produce them"""
+
+    def __init__(self, data, mime_type, info):
+        self.data = data
+        self.mime_type = mime_type
+        self.info = info
+
+
+def prepare_payload(image_bytes, policy):
+    """
+    Fit an upload to a provider payload policy
+
+    The original is sent untouched when it is already within the pixel and
+    byte limits. Otherwise it is decoded at a reduced JPEG scale, EXIF
+    orientation is applied, it is shrunk to max_dimension and re-encoded,
+    stepping quality down (then size) until it fits max_bytes.
+
+    Args:
+        image_bytes: Encoded upload
+        policy: dict with max_dimension, format ('jpeg' or 'webp'), quality,
+            min_quality and max_bytes
+
+    Returns:
+        PreparedPayload
+    """
+    start = time.perf_counter()
+    original_size = len(image_bytes)
+    max_dimension = policy['max_dimension']
+    max_bytes = policy['max_bytes']
+
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        original_width, original_height = img.size
+        source_format = img.format
+        orientation = img.getexif().get(_EXIF_ORIENTATION_TAG, 1)
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        # Let the provider report the bad upload, as it did before
+        print(f"[WARNING] Payload policy skipped, image not decodable: {e}")
+        return _passthrough(image_bytes, _PASSTHROUGH_FORMATS[_sniff_format(image_bytes)], None, None, start)
+
+    within_limits = max(original_width, original_height) <= max_dimension and original_size <= max_bytes
+    if within_limits and source_format in _PASSTHROUGH_FORMATS and orientation == 1:
+        return _passthrough(image_bytes, _PASSTHROUGH_FORMATS[source_format],
+                            original_width, original_height, start)
+
+    pil_format, mime_type = _ENCODERS.get(policy['format'], _ENCODERS['jpeg'])
+    with img:
+        scale = min(1.0, max_dimension / max(original_width, original_height))
+        draft_size = (round(original_width * scale), round(original_height * scale))
+        # draft() works in stored (pre-rotation) coordinates and only ever scales by 1/2, 1/4, 1/8
+        img.draft('RGB', draft_size)
+        img = ImageOps.exif_transpose(img).convert('RGB')
+
+    limit = max_dimension
+    quality = policy['quality']
+    while True:
+        if max(img.size) > limit:
+            img.thumbnail((limit, limit), Image.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format=pil_format, quality=quality)
+        if buffer.tell() <= max_bytes:
+            break
+        if quality - _QUALITY_STEP >= policy['min_quality']:
+            quality -= _QUALITY_STEP
+        elif max(img.size) * _SCALE_STEP >= _MIN_DIMENSION:
+            limit = int(max(img.size) * _SCALE_STEP)
+        else:
+            break  # Smallest we are willing to go; send it over budget
+
+    data = buffer.getvalue()
+    if len(data) >= original_size and within_limits and source_format in _PASSTHROUGH_FORMATS:
+        # Re-encoding did not help (rotation is left for the provider to handle)
+        return _passthrough(image_bytes, _PASSTHROUGH_FORMATS[source_format],
+                            original_width, original_height, start)
+
+    encode_ms = (time.perf_counter() - start) * 1000
+    return PreparedPayload(data, mime_type, {
+        'reencoded': True,
+        'format': policy['format'],
+        'quality': quality,
+        'original_bytes': original_size,
+        'bytes_sent': len(data),
+        'original_size': [original_width, original_height],
+        'sent_size': list(img.size),
+        'encode_ms': round(encode_ms, 2),
+        'estimated_time_saved_ms': _estimated_time_saved_ms(original_size, len(data), encode_ms)
+    })
+
+
+def _passthrough(image_bytes, mime_type, width, height, start):
+    encode_ms = (time.perf_counter() - start) * 1000
+    size = [width, height] if width is not None else None
+    return PreparedPayload(image_bytes, mime_type, {
+        'reencoded': False,
+        'format': mime_type.split('/')[1],
+        'quality': None,
+        'original_bytes': len(image_bytes),
+        'bytes_sent': len(image_bytes),
+        'original_size': size,
+        'sent_size': size,
+        'encode_ms': round(encode_ms, 2),
+        'estimated_time_saved_ms': _estimated_time_saved_ms(len(image_bytes), len(image_bytes), encode_ms)
+    })
+
+
+def _estimated_time_saved_ms(original_bytes, sent_bytes, encode_ms):
+    """Upload time saved at the configured uplink speed, minus the time spent re-encoding"""
+    bits_per_ms = AIConfig.PAYLOAD_UPLINK_MBPS * 1000
+    return round((original_bytes - sent_bytes) * 8 / bits_per_ms - encode_ms, 2)
+
+
+class RequestImage(bytes):
+    """
+    Upload bytes that remember the payload prepared for each provider, so a
+    fallback, hedge or escalation to the same provider never re-encodes
+    """
+
+    def __new__(cls, data):
+        self = super().__new__(cls, data)
+        self._payloads = {}
+        self._payload_lock = threading.Lock()
+        return self
+
+    def __reduce__(self):
+        # Prepared payloads and the lock stay with this process
+        return (RequestImage, (bytes(self),))
+
+    def payload_for(self, provider):
+        """Get (preparing on first use) the PreparedPayload for a provider"""
+        with self._payload_lock:
+            payload = self._payloads.get(provider)
+            if payload is None:
+                payload = _build_payload(self, provider)
+                self._payloads[provider] = payload
+            return payload
+
+    def payload_info(self, provider):
+        """Metrics of the payload sent to a provider, None if nothing was prepared"""
+        with self._payload_lock:
+            payload = self._payloads.get(provider)
+        return dict(payload.info) if payload is not None else None
+
+
+def provider_payload(image_bytes, provider):
+    """
+    Get the payload to send to a provider
+
+    Uses the per-request cache when image_bytes is a RequestImage.
+    """
+    if isinstance(image_bytes, RequestImage):
+        return image_bytes.payload_for(provider)
+    return _build_payload(image_bytes, provider)
+
+
+def _build_payload(image_bytes, provider):
+    policy = AIConfig.PAYLOAD_POLICIES.get(provider)
+    if not AIConfig.PAYLOAD_POLICY_ENABLED or policy is None:
+        mime_type = _PASSTHROUGH_FORMATS.get(_sniff_format(image_bytes), 'image/jpeg')
+        payload = _passthrough(image_bytes, mime_type, None, None, time.perf_counter())
+    else:
+        payload = prepare_payload(image_bytes, policy)
+    payload_stats.record(provider, payload.info)
+    return payload
+
+
+def _sniff_format(image_bytes):
+    if image_bytes.startswith(b'\x89PNG'):
+        return 'PNG'
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        return 'WEBP'
+    return 'JPEG'
+
+
+class PayloadStats:
+    """Bytes received vs bytes sent and estimated upload time saved, per provider"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._providers = {}
+
+    def record(self, provider, info):
+        name = getattr(provider, 'value', provider)
+        with self._lock:
+            stats = self._providers.setdefault(name, {
+                'payloads': 0,
+                'reencoded': 0,
+                'original_bytes': 0,
+                'bytes_sent': 0,
+                'encode_ms': 0.0,
+                'estimated_time_saved_ms': 0.0
+            })
+            stats['payloads'] += 1
+            stats['reencoded'] += bool(info['reencoded'])
+            stats['original_bytes'] += info['original_bytes']
+            stats['bytes_sent'] += info['bytes_sent']
+            stats['encode_ms'] += info['encode_ms']
+            stats['estimated_time_saved_ms'] += info['estimated_time_saved_ms']
+
+    def get_stats(self):
+        """Get per-provider totals and the fraction of bytes saved"""
+        with self._lock:
+            providers = {name: dict(stats) for name, stats in self._providers.items()}
+        for stats in providers.values():
+            stats['encode_ms'] = round(stats['encode_ms'], 2)
+            stats['estimated_time_saved_ms'] = round(stats['estimated_time_saved_ms'], 2)
+            stats['bytes_saved_ratio'] = (
+                round(1 - stats['bytes_sent'] / stats['original_bytes'], 4) if stats['original_bytes'] else 0.0
+            )
+        return {
+            'enabled': AIConfig.PAYLOAD_POLICY_ENABLED,
+            'uplink_mbps': AIConfig.PAYLOAD_UPLINK_MBPS,
+            'providers': providers
+        }
+
+
+# Global instance shared by every classifier
+payload_stats = PayloadStats()
@@ -0,0 +1,340 @@
+"""
+Near-duplicate Image Index
+Perceptual (difference) hashes of previously classified images with
+multi-index hamming lookup, so re-encoded or lightly cropped re-uploads
+can reuse a stored classification instead of calling a provider
+"""
+
+import io
+import os
+import sys
+import json
+import sqlite3
+import threading
+from itertools import combinations
+
+import numpy as np
+from PIL import Image
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from config.ai_config import AIConfig
+
+CHUNKS = 4  # 64-bit hash split into four 16-bit sub-keys
+CHUNK_BITS = 16
+
+
+def dhash(image_bytes, hash_size=8):
+    """
+    Compute a 64-bit difference hash of an image
+
+    Args:
+        image_bytes: Raw encoded image bytes
+
+    Returns:
+        int: Unsigned 64-bit perceptual hash
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+    # Let the JPEG decoder skip most of the pixels; we only need 9x8
+    img.draft('L', (hash_size * 4, hash_size * 4))
+    img = img.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+
+    pixels = np.asarray(img, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+# Set bits in every byte value (np.bitwise_count needs NumPy 2.0+)
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(values):
+    """Number of set bits for each uint64 in an array"""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    per_byte = _BYTE_POPCOUNT[values.view(np.uint8)].reshape(values.shape + (8,))
+    return per_byte.sum(axis=-1, dtype=np.int64)
+
+
+def _chunk(values, i):
+    return ((values >> np.uint64(i * CHUNK_BITS)) & np.uint64(0xFFFF)).astype(np.uint16)
+
+
+def _probe_masks(radius):
+    """All 16-bit masks with at most `radius` bits set"""
+    masks = [0]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(CHUNK_BITS), r):
+            masks.append(sum(1 << b for b in bits))
+    return np.array(masks, dtype=np.uint16)
+
+
+class PerceptualHashIndex:
+    """
+    Multi-index hashing over 64-bit dHashes
+
+    Each hash is split into four 16-bit chunks kept in sorted arrays. By the
+    pigeonhole principle any hash within distance d of the query matches it
+    in some chunk to within d // 4 bits, so only those candidates are
+    verified. New entries go to a small buffer that is scanned directly and
+    merged into the sorted arrays in bulk.
+    """
+
+    def __init__(self, db_path='wastewise.db', max_entries=None, max_distance=None):
+        """
+        Args:
+            db_path: SQLite database holding the classifications table
+            max_entries: Memory bound; the oldest entries are dropped beyond it
+            max_distance: Max hamming distance treated as a near duplicate
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries or AIConfig.PHASH_INDEX_MAX_ENTRIES
+        self.max_distance = max_distance if max_distance is not None else AIConfig.PHASH_MAX_DISTANCE
+
+        self._lock = threading.Lock()
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._chunk_values = [np.empty(0, dtype=np.uint16) for _ in range(CHUNKS)]
+        self._chunk_order = [np.empty(0, dtype=np.int32) for _ in range(CHUNKS)]
+        self._pending_hashes = []
+        self._pending_ids = []
+        self._merge_lock = threading.Lock()
+        self._merging = False
+
+        self._loader = None
+        self._stats = {
+            'lookups': 0,
+            'hits': 0,
+            'candidates_checked': 0,
+            'loaded_rows': 0,
+            'loading': False
+        }
+
+    # ---------- building ----------
+
+    def start_loading(self, page_size=10000):
+        """Load existing hashes from the classifications table in the background"""
+        if self._loader is not None:
+            return
+        self._loader = threading.Thread(
+            target=self._load_from_db, args=(page_size,), name="phash-index-loader", daemon=True
+        )
+        self._loader.start()
+
+    def _load_from_db(self, page_size):
+        with self._lock:
+            self._stats['loading'] = True
+        last_id = 0
+        buffered_ids, buffered_hashes = [], []
+        try:
+            while True:
+                conn = sqlite3.connect(self.db_path, timeout=5)
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT id, phash FROM classifications
+                    WHERE id > ? AND phash IS NOT NULL
+                    ORDER BY id
+                    LIMIT ?
+                ''', (last_id, page_size))
+                rows = cursor.fetchall()
+                conn.close()
+
+                if not rows:
+                    break
+
+                buffered_ids.extend(r[0] for r in rows)
+                buffered_hashes.extend(r[1] for r in rows)
+                last_id = rows[-1][0]
+
+                # Publish geometrically growing batches: searchable early,
+                # but each row is only re-sorted O(log n) times overall
+                if len(buffered_ids) >= max(page_size, len(self._ids)):
+                    self._publish_loaded(buffered_ids, buffered_hashes)
+                    buffered_ids, buffered_hashes = [], []
+
+            if buffered_ids:
+                self._publish_loaded(buffered_ids, buffered_hashes)
+
+            print(f"[INFO] Near-duplicate index loaded {self._stats['loaded_rows']} hashes")
+        except Exception as e:
+            print(f"[WARNING] Near-duplicate index load failed: {e}")
+        finally:
+            with self._lock:
+                self._stats['loading'] = False
+
+    def _publish_loaded(self, ids, hashes):
+        self._merge(
+            np.array(hashes, dtype=np.int64).view(np.uint64),
+            np.array(ids, dtype=np.int64)
+        )
+        with self._lock:
+            self._stats['loaded_rows'] += len(ids)
+
+    def add(self, classification_id, image_hash):
+        """Register a newly stored classification"""
+        with self._lock:
+            self._pending_ids.append(int(classification_id))
+            self._pending_hashes.append(int(image_hash))
+            should_merge = (
+                len(self._pending_ids) >= AIConfig.PHASH_INDEX_MERGE_BATCH
+                and not self._merging
+            )
+            if should_merge:
+                self._merging = True
+
+        if should_merge:
+            # Re-sorting is O(n log n); keep it off the request thread
+            threading.Thread(target=self._merge_pending, daemon=True).start()
+
+    def _merge_pending(self):
+        try:
+            with self._lock:
+                count = len(self._pending_ids)
+                ids = np.array(self._pending_ids[:count], dtype=np.int64)
+                hashes = np.array(self._pending_hashes[:count], dtype=np.uint64)
+            # Entries stay searchable in the buffer until the merge is published
+            self._merge(hashes, ids, pending_consumed=count)
+        finally:
+            with self._lock:
+                self._merging = False
+
+    def _merge(self, hashes, ids, pending_consumed=0):
+        """Fold a batch into the sorted chunk arrays, enforcing max_entries"""
+        with self._merge_lock:
+            with self._lock:
+                current_hashes, current_ids = self._hashes, self._ids
+
+            all_hashes = np.concatenate([current_hashes, hashes])
+            all_ids = np.concatenate([current_ids, ids])
+
+            if len(all_ids) > self.max_entries:
+                keep = np.argsort(all_ids, kind='stable')[-self.max_entries:]
+                keep.sort()
+                all_hashes = all_hashes[keep]
+                all_ids = all_ids[keep]
+
+            chunk_values = []
+            chunk_order = []
+            for i in range(CHUNKS):
+                values = _chunk(all_hashes, i)
+                order = np.argsort(values, kind='stable').astype(np.int32)
+                chunk_values.append(values[order])
+                chunk_order.append(order)
+
+            with self._lock:
+                self._hashes = all_hashes
+                self._ids = all_ids
+                self._chunk_values = chunk_values
+                self._chunk_order = chunk_order
+                if pending_consumed:
+                    del self._pending_ids[:pending_consumed]
+                    del self._pending_hashes[:pending_consumed]
+
+    # ---------- querying ----------
+
+    def find(self, image_hash, max_distance=None):
+        """
+        Find the closest indexed hash within max_distance
+
+        Returns:
+            tuple: (classification_id, distance) or (None, None)
+        """
+        max_distance = self.max_distance if max_distance is None else max_distance
+        query = np.uint64(image_hash)
+
+        with self._lock:
+            self._stats['lookups'] += 1
+            hashes, ids = self._hashes, self._ids
+            chunk_values, chunk_order = self._chunk_values, self._chunk_order
+            pending_hashes = np.array(self._pending_hashes, dtype=np.uint64)
+            pending_ids = np.array(self._pending_ids, dtype=np.int64)
+
+        best_id, best_distance = None, None
+
+        if len(hashes):
+            masks = _probe_masks(max_distance // CHUNKS)
+            candidates = []
+            for i in range(CHUNKS):
+                probes = np.unique(_chunk(np.array([query]), i)[0] ^ masks)
+                left = np.searchsorted(chunk_values[i], probes, side='left')
+                right = np.searchsorted(chunk_values[i], probes, side='right')
+                for lo, hi in zip(left, right):
+                    if hi > lo:
+                        candidates.append(chunk_order[i][lo:hi])
+
+            if candidates:
+                positions = np.unique(np.concatenate(candidates))
+                distances = _popcount(hashes[positions] ^ query)
+                with self._lock:
+                    self._stats['candidates_checked'] += len(positions)
+                nearest = int(np.argmin(distances))
+                if distances[nearest] <= max_distance:
+                    best_id = int(ids[positions[nearest]])
+                    best_distance = int(distances[nearest])
+
+        if len(pending_hashes):
+            distances = _popcount(pending_hashes ^ query)
+            nearest = int(np.argmin(distances))
+            if distances[nearest] <= max_distance and (best_distance is None or distances[nearest] < best_distance):
+                best_id = int(pending_ids[nearest])
+                best_distance = int(distances[nearest])
+
+        if best_id is not None:
+            with self._lock:
+                self._stats['hits'] += 1
+        return best_id, best_distance
+
+    def lookup(self, image_hash):
+        """
+        Find a stored classification for a near-duplicate image
+
+        Returns:
+            dict: Classification result in the provider format, or None
+        """
+        classification_id, distance = self.find(image_hash)
+        if classification_id is None:
+            return None
+
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT waste_type, confidence, all_predictions
+                FROM classifications WHERE id = ?
+            ''', (classification_id,))
+            row = cursor.fetchone()
+            conn.close()
+        except Exception as e:
+            print(f"[WARNING] Near-duplicate lookup failed: {e}")
+            return None
+
+        if row is None:
+            return None
+
+        return {
+            'waste_type': row[0],
+            'raw_category': row[0],
+            'confidence': row[1],
+            'all_predictions': json.loads(row[2]) if row[2] else [],
+            'near_duplicate': True,
+            'matched_classification_id': classification_id,
+            'hamming_distance': distance
+        }
+
+    def get_stats(self):
+        """Get index size and lookup counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._ids) + len(self._pending_ids)
+        stats['max_entries'] = self.max_entries
+        stats['max_distance'] = self.max_distance
+        stats['memory_bytes'] = int(
+            self._hashes.nbytes + self._ids.nbytes
+            + sum(v.nbytes for v in self._chunk_values)
+            + sum(o.nbytes for o in self._chunk_order)
+        )
+        return stats
+
+
+# Global instance over the main application database
+phash_index = PerceptualHashIndex()
@@ -0,0 +1,268 @@
+"""
+Classification Result Cache
+Content-addressed cache keyed by image hash + provider + model version
+Two tiers: in-memory LRU in front of a persistent SQLite table
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from config.ai_config import AIConfig
+from utils.db_pool import get_db_pool
+from utils.lazy import LazyObject
+
+
+class ClassificationCache:
+    """
+    Two-tier cache of classification results
+    Memory tier is LRU; SQLite tier expires by TTL and is trimmed oldest-first
+    """
+
+    def __init__(self, db_path=None, memory_size=None, ttl_seconds=None, max_rows=None):
+        """
+        Initialize cache tiers
+
+        Args:
+            db_path: SQLite file for the persistent tier (None disables it)
+            memory_size: Max entries kept in the in-memory LRU
+            ttl_seconds: Age after which an entry is treated as missing
+            max_rows: Max rows kept in the SQLite tier
+        """
+        self.db_path = db_path
+        self.memory_size = memory_size if memory_size is not None else AIConfig.RESULT_CACHE_MEMORY_SIZE
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else AIConfig.RESULT_CACHE_TTL_SECONDS
+        self.max_rows = max_rows if max_rows is not None else AIConfig.RESULT_CACHE_MAX_ROWS
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_trim = 0
+        self._pool = None
+        self._stats = {
+            'memory_hits': 0,
+            'sqlite_hits': 0,
+            'misses': 0,
+            'puts': 0,
+            'memory_evictions': 0,
+            'sqlite_evictions': 0,
+            'expired': 0,
+            'errors': 0
+        }
+
+        if self.db_path:
+            self.init_cache_table()
+
+    def init_cache_table(self):
+        """Create the persistent cache table and drop stale rows"""
+        try:
+            self._pool = get_db_pool(self.db_path)
+            with self._pool.connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS classification_cache (
+                        cache_key TEXT PRIMARY KEY,
+                        result TEXT NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                ''')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_classification_cache_created_at ON classification_cache (created_at)')
+
+            self._trim_sqlite()
+
+        except Exception as e:
+            print(f"[WARNING] Result cache table unavailable: {e}")
+            self.db_path = None
+
+    @staticmethod
+    def make_key(image_bytes, provider, top_k=None, model_version=None):
+        """
+        Build a cache key from image content, provider and model version
+
+        Args:
+            image_bytes: Raw uploaded image bytes
+            provider: AIProvider enum value
+            top_k: Number of predictions requested (changes the result shape)
+            model_version: Model actually serving the provider (default: the
+                configured one from AIConfig.get_model_version)
+        """
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        version = model_version or AIConfig.get_model_version(provider)
+        return f"{digest}:{provider.value}:{version}:{top_k}"
+
+    def get(self, key):
+        """
+        Look up a cached result
+
+        Returns:
+            tuple: (result dict, tier name) or (None, None) on a miss
+        """
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                payload, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return json.loads(payload), 'memory'
+                del self._memory[key]
+                self._stats['expired'] += 1
+
+        row = self._sqlite_get(key)
+        if row is not None:
+            payload, created_at = row
+            if now - created_at <= self.ttl_seconds:
+                self._memory_put(key, payload, created_at)
+                with self._lock:
+                    self._stats['sqlite_hits'] += 1
+                return json.loads(payload), 'sqlite'
+            self._sqlite_delete(key)
+            with self._lock:
+                self._stats['expired'] += 1
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None, None
+
+    def put(self, key, result):
+        """Store a result in both tiers"""
+        try:
+            payload = json.dumps(result, default=str)
+        except (TypeError, ValueError) as e:
+            print(f"[WARNING] Result not cacheable: {e}")
+            return
+
+        created_at = time.time()
+        self._memory_put(key, payload, created_at)
+        self._sqlite_put(key, payload, created_at)
+
+        with self._lock:
+            self._stats['puts'] += 1
+
+    def clear(self):
+        """Remove every cached entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+
+        if self.db_path:
+            try:
+                with self._pool.connection() as conn:
+                    conn.execute('DELETE FROM classification_cache')
+            except Exception as e:
+                print(f"[WARNING] Could not clear result cache: {e}")
+
+    def get_stats(self):
+        """Get hit/miss/eviction counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+
+        hits = stats['memory_hits'] + stats['sqlite_hits']
+        lookups = hits + stats['misses']
+        stats['hit_rate'] = round(hits / lookups, 4) if lookups else 0.0
+        stats['persistent'] = bool(self.db_path)
+        return stats
+
+    def _memory_put(self, key, payload, created_at):
+        with self._lock:
+            self._memory[key] = (payload, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+                self._stats['memory_evictions'] += 1
+
+    def _sqlite_get(self, key):
+        if not self.db_path:
+            return None
+        try:
+            with self._pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT result, created_at FROM classification_cache WHERE cache_key = ?', (key,))
+                return cursor.fetchone()
+        except Exception as e:
+            self._record_error(e)
+            return None
+
+    def _sqlite_put(self, key, payload, created_at):
+        if not self.db_path:
+            return
+        try:
+            with self._pool.connection() as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO classification_cache (cache_key, result, created_at)
+                    VALUES (?, ?, ?)
+                ''', (key, payload, created_at))
+        except Exception as e:
+            self._record_error(e)
+            return
+
+        # Trimming needs a COUNT, so only do it every so often
+        with self._lock:
+            self._puts_since_trim += 1
+            should_trim = self._puts_since_trim >= AIConfig.RESULT_CACHE_TRIM_INTERVAL
+            if should_trim:
+                self._puts_since_trim = 0
+        if should_trim:
+            self._trim_sqlite()
+
+    def _sqlite_delete(self, key):
+        try:
+            with self._pool.connection() as conn:
+                conn.execute('DELETE FROM classification_cache WHERE cache_key = ?', (key,))
+        except Exception as e:
+            self._record_error(e)
+
+    def _trim_sqlite(self):
+        """Drop expired rows, then the oldest rows beyond max_rows"""
+        if not self.db_path:
+            return
+        try:
+            with self._pool.connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('DELETE FROM classification_cache WHERE created_at < ?',
+                               (time.time() - self.ttl_seconds,))
+                expired = cursor.rowcount
+
+                cursor.execute('SELECT COUNT(*) FROM classification_cache')
+                overflow = cursor.fetchone()[0] - self.max_rows
+                evicted = 0
+                if overflow > 0:
+                    cursor.execute('''
+                        DELETE FROM classification_cache WHERE cache_key IN (
+                            SELECT cache_key FROM classification_cache
+                            ORDER BY created_at ASC
+                            LIMIT ?
+                        )
+                    ''', (overflow,))
+                    evicted = cursor.rowcount
+
+            with self._lock:
+                self._stats['expired'] += max(expired, 0)
+                self._stats['sqlite_evictions'] += max(evicted, 0)
+
+        except Exception as e:
+            self._record_error(e)
+
+    def _record_error(self, error):
+        print(f"[WARNING] Result cache SQLite error: {error}")
+        with self._lock:
+            self._stats['errors'] += 1
+
+
+# Global instance shared by every classifier (the SQLite file is opened on first use, not at import)
+result_cache = LazyObject(
+    lambda: ClassificationCache(
+        db_path=AIConfig.RESULT_CACHE_DB_PATH if AIConfig.RESULT_CACHE_PERSISTENT else None
+    ),
+    'result_cache'
+)
@@ -0,0 +1,242 @@
+"""
+Provider Router
+Picks the provider for each request from rolling latency, error rate,
+remaining per-minute quota and per-call cost, and counts why each choice
+was made
+"""
+
+import os
+import sys
+import time
+import random
+import threading
+from collections import deque
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from config.ai_config import AIConfig, AIProvider
+from models.hedging import provider_latency
+from models.circuit_breaker import circuit_breakers
+
+STRATEGIES = ('static', 'weighted', 'least-latency', 'cheapest-within-slo')
+QUOTA_WINDOW_SECONDS = 60
+
+
+class ProviderRouter:
+    """
+    Ranks providers per request
+
+    Providers that are not configured, have an open circuit or have used up
+    their per-minute quota are excluded; the rest are ordered by the strategy.
+    The first is the primary, the second the fallback.
+    """
+
+    def __init__(self, latency=None, breakers=None, clock=time.time, rng=None):
+        """
+        Args:
+            latency: LatencyWindow with recent successful call latencies
+            breakers: CircuitBreakerRegistry (error rate and availability)
+            clock: Returns the current time in seconds
+            rng: random.Random used by the weighted strategy
+        """
+        self.latency = latency or provider_latency
+        self.breakers = breakers or circuit_breakers
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._calls = {provider: deque() for provider in AIProvider}
+        self._stats = {
+            'decisions': 0,
+            'by_provider': {},
+            'by_reason': {},
+            'excluded': {},
+            'calls': {provider.value: 0 for provider in AIProvider},
+            'estimated_cost': 0.0
+        }
+
+    def record_call(self, provider):
+        """Count a provider call against its quota and estimated spend"""
+        now = self._clock()
+        with self._lock:
+            calls = self._calls[provider]
+            calls.append(now)
+            self._prune(calls, now)
+            self._stats['calls'][provider.value] += 1
+            self._stats['estimated_cost'] += AIConfig.ROUTER_COST_PER_CALL.get(provider, 0.0)
+
+    @staticmethod
+    def _prune(calls, now):
+        while calls and calls[0] <= now - QUOTA_WINDOW_SECONDS:
+            calls.popleft()
+
+    def provider_inputs(self, provider):
+        """Everything the strategies look at for one provider"""
+        latency = self.latency.summary(provider)
+        known = latency['samples'] >= AIConfig.HEDGE_MIN_SAMPLES
+        quota = AIConfig.ROUTER_QUOTA_PER_MINUTE.get(provider, 0)
+        now = self._clock()
+        with self._lock:
+            calls = self._calls[provider]
+            self._prune(calls, now)
+            used = len(calls)
+        return {
+            'p50_ms': latency['p50_ms'] if known else None,
+            'p95_ms': latency['p95_ms'] if known else None,
+            'latency_samples': latency['samples'],
+            'error_rate': self.breakers.get(provider).snapshot()['error_rate'],
+            'quota_per_minute': quota or None,
+            'quota_remaining': max(quota - used, 0) if quota else None,
+            'cost_per_call': AIConfig.ROUTER_COST_PER_CALL.get(provider, 0.0),
+            'configured': AIConfig.is_provider_configured(provider),
+            'available': self.breakers.is_available(provider)
+        }
+
+    def choose(self, strategy=None, candidates=None):
+        """
+        Rank the eligible providers for one request
+
+        Args:
+            strategy: One of STRATEGIES (default ROUTER_STRATEGY)
+            candidates: Providers to consider (default ROUTER_PROVIDERS)
+
+        Returns:
+            tuple: (providers in the order to try them, decision dict with
+            strategy, provider, reason code, detail and excluded providers);
+            the list is empty when nothing is eligible
+        """
+        strategy = strategy or AIConfig.ROUTER_STRATEGY
+        candidates = candidates or AIConfig.ROUTER_PROVIDERS
+        if strategy not in STRATEGIES or strategy == 'static':
+            raise ValueError(f"Unknown ROUTER_STRATEGY for choose(): {strategy} (static uses static_decision)")
+
+        inputs = {}
+        excluded = {}
+        for provider in candidates:
+            info = self.provider_inputs(provider)
+            if not info['configured']:
+                excluded[provider.value] = 'not-configured'
+            elif not info['available']:
+                excluded[provider.value] = 'circuit-open'
+            elif info['quota_remaining'] == 0:
+                excluded[provider.value] = 'quota-exhausted'
+            else:
+                inputs[provider] = info
+
+        if not inputs:
+            order, reason, detail = [], 'no-eligible-provider', "every candidate was excluded"
+        elif strategy == 'weighted':
+            order, reason, detail = self._weighted(inputs)
+        elif strategy == 'cheapest-within-slo':
+            order, reason, detail = self._cheapest_within_slo(inputs)
+        else:
+            order, reason, detail = self._least_latency(inputs)
+
+        decision = {
+            'strategy': strategy,
+            'provider': order[0].value if order else None,
+            'reason': reason,
+            'detail': detail,
+            'order': [provider.value for provider in order],
+            'excluded': excluded
+        }
+        self._record_decision(decision)
+        return order, decision
+
+    def static_decision(self, primary, fallback):
+        """Decision for the 'static' strategy: the classifier's own provider, then FALLBACK_PROVIDER"""
+        order = [primary] + ([fallback] if fallback is not None and fallback != primary else [])
+        decision = {
+            'strategy': 'static',
+            'provider': primary.value,
+            'reason': 'configured',
+            'detail': "active provider, then the configured fallback",
+            'order': [provider.value for provider in order],
+            'excluded': {}
+        }
+        self._record_decision(decision)
+        return order, decision
+
+    @staticmethod
+    def _expected_latency(info):
+        return info['p95_ms'] if info['p95_ms'] is not None else AIConfig.ROUTER_UNKNOWN_LATENCY_MS
+
+    def _least_latency(self, inputs):
+        order = sorted(inputs, key=lambda p: (self._expected_latency(inputs[p]), inputs[p]['cost_per_call']))
+        best = inputs[order[0]]
+        if best['p95_ms'] is None:
+            return order, 'no-latency-data', f"{order[0].value} has too few samples; assumed p95 {AIConfig.ROUTER_UNKNOWN_LATENCY_MS:.0f} ms"
+        return order, 'lowest-p95', f"{order[0].value} p95 {best['p95_ms']:.0f} ms"
+
+    def _cheapest_within_slo(self, inputs):
+        within = [
+            p for p, info in inputs.items()
+            if self._expected_latency(info) <= AIConfig.ROUTER_SLO_P95_MS
+            and info['error_rate'] <= AIConfig.ROUTER_SLO_MAX_ERROR_RATE
+        ]
+        if not within:
+            order, _, detail = self._least_latency(inputs)
+            return order, 'no-provider-within-slo', f"none within p95 {AIConfig.ROUTER_SLO_P95_MS:.0f} ms; {detail}"
+
+        within.sort(key=lambda p: (inputs[p]['cost_per_call'], self._expected_latency(inputs[p])))
+        rest = sorted((p for p in inputs if p not in within), key=lambda p: self._expected_latency(inputs[p]))
+        best = inputs[within[0]]
+        return within + rest, 'cheapest-within-slo', (
+            f"{within[0].value} ${best['cost_per_call']:.4f}/call, p95 {self._expected_latency(best):.0f} ms"
+        )
+
+    def _weighted(self, inputs):
+        # Configured share, scaled down by recent errors and by how much quota is left
+        weights = {}
+        for provider, info in inputs.items():
+            weight = AIConfig.ROUTER_WEIGHTS.get(provider, 1.0) * (1.0 - info['error_rate'])
+            if info['quota_per_minute']:
+                weight *= info['quota_remaining'] / info['quota_per_minute']
+            weights[provider] = max(weight, 0.0)
+
+        total = sum(weights.values())
+        if total <= 0:
+            order, _, detail = self._least_latency(inputs)
+            return order, 'zero-weights', detail
+
+        pick = self._rng.uniform(0, total)
+        chosen = None
+        for provider, weight in weights.items():
+            pick -= weight
+            if pick <= 0 and weight > 0:
+                chosen = provider
+                break
+        chosen = chosen or max(weights, key=weights.get)
+        rest = sorted((p for p in weights if p != chosen), key=lambda p: -weights[p])
+        return [chosen] + rest, 'weighted-pick', f"{chosen.value} weight {weights[chosen]:.2f} of {total:.2f}"
+
+    def _record_decision(self, decision):
+        with self._lock:
+            stats = self._stats
+            stats['decisions'] += 1
+            provider = decision['provider'] or 'none'
+            stats['by_provider'][provider] = stats['by_provider'].get(provider, 0) + 1
+            key = f"{decision['strategy']}:{decision['reason']}"
+            stats['by_reason'][key] = stats['by_reason'].get(key, 0) + 1
+            for name, why in decision['excluded'].items():
+                excluded = stats['excluded'].setdefault(name, {})
+                excluded[why] = excluded.get(why, 0) + 1
+
+    def get_stats(self):
+        """Get decision counters and the current inputs for every provider"""
+        with self._lock:
+            stats = {
+                'decisions': self._stats['decisions'],
+                'by_provider': dict(self._stats['by_provider']),
+                'by_reason': dict(self._stats['by_reason']),
+                'excluded': {name: dict(counts) for name, counts in self._stats['excluded'].items()},
+                'calls': dict(self._stats['calls']),
+                'estimated_cost': round(self._stats['estimated_cost'], 6)
+            }
+        stats['strategy'] = AIConfig.ROUTER_STRATEGY
+        stats['inputs'] = {provider.value: self.provider_inputs(provider) for provider in AIConfig.ROUTER_PROVIDERS}
+        return stats
+
+
+# Global instance shared by every classifier
+provider_router = ProviderRouter()
@@ -0,0 +1,349 @@
+"""
+Shadow-Mode Evaluation
+A sample of live classifications is sent again, off the response path, to a
+candidate (another provider or a staged local model version). Each pair of
+answers is stored so agreement, confidence deltas and latency can be compared
+before the candidate is switched on for real traffic
+
+Candidates:
+    'gemini', 'openai', 'huggingface', 'local'  - a provider
+    'local:<version>'                            - a registry version, served
+                                                   or not (it is staged on
+                                                   first use)
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from config.ai_config import AIConfig, AIProvider
+from models.model_registry import ModelVersionError
+
+
+def parse_candidate(spec):
+    """
+    Split a candidate spec into (provider, model version or None)
+
+    Raises:
+        ValueError: Unknown provider name
+    """
+    name, _, version = (spec or '').strip().lower().partition(':')
+    return AIProvider(name), (version or None)
+
+
+class ShadowEvaluator:
+    """
+    Runs sampled requests against a candidate and records how it compares
+
+    Shadow calls run on their own small thread pool. When max_concurrent
+    calls are already in flight a sampled request is dropped rather than
+    queued, so a slow candidate never builds a backlog or holds up requests.
+    """
+
+    def __init__(self, db_path=None, candidate=None, sample_rate=None, max_concurrent=None):
+        """
+        Args:
+            db_path: SQLite file holding the comparison table
+            candidate: Candidate spec (default SHADOW_CANDIDATE)
+            sample_rate: Share of requests shadowed, 0.0 - 1.0
+            max_concurrent: Shadow calls allowed in flight at once
+        """
+        self.db_path = db_path or AIConfig.SHADOW_SQLITE_PATH
+        self.candidate = candidate if candidate is not None else AIConfig.SHADOW_CANDIDATE
+        self.sample_rate = sample_rate if sample_rate is not None else AIConfig.SHADOW_SAMPLE_RATE
+        self.max_concurrent = max_concurrent or AIConfig.SHADOW_MAX_CONCURRENT
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._executor = None
+        self._initialized = False
+        self._staging = set()
+        self._stats = {
+            'sampled': 0,
+            'submitted': 0,
+            'dropped_saturated': 0,
+            'skipped_not_ready': 0,
+            'completed': 0,
+            'failed': 0,
+            'in_flight': 0
+        }
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def init_table(self):
+        """Create the comparison table (once per instance)"""
+        with self._lock:
+            if self._initialized:
+                return
+            conn = self._connect()
+            try:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS shadow_results (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        created_at REAL NOT NULL,
+                        candidate TEXT NOT NULL,
+                        primary_provider TEXT,
+                        primary_version TEXT,
+                        primary_waste_type TEXT,
+                        primary_confidence REAL,
+                        primary_latency_ms REAL,
+                        candidate_version TEXT,
+                        candidate_waste_type TEXT,
+                        candidate_confidence REAL,
+                        candidate_latency_ms REAL,
+                        agree INTEGER,
+                        confidence_delta REAL,
+                        error TEXT
+                    )
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_shadow_results_candidate ON shadow_results (candidate, created_at)')
+            finally:
+                conn.close()
+            self._initialized = True
+
+    # ---- sampling ------------------------------------------------------
+
+    def maybe_shadow(self, classifier, image_bytes, top_k, result, latency_ms=None):
+        """
+        Send this request to the candidate in the background if it is sampled
+
+        Args:
+            classifier: UnifiedWasteClassifier that produced `result`
+            image_bytes: The request's image
+            top_k: The request's top_k
+            result: The primary result (read now; later changes are not seen)
+            latency_ms: How long the primary answer took
+
+        Returns:
+            bool: True if a shadow call was started
+        """
+        if not AIConfig.SHADOW_ENABLED or not self.candidate or random.random() >= self.sample_rate:
+            return False
+        try:
+            provider, version = parse_candidate(self.candidate)
+        except ValueError:
+            print(f"[WARNING] Unknown shadow candidate '{self.candidate}'")
+            return False
+        # Shadowing a request with the provider that answered it compares nothing
+        if version is None and result.get('provider_used') == provider.value:
+            return False
+
+        with self._lock:
+            self._stats['sampled'] += 1
+        local = None
+        if version is not None:
+            local = self._candidate_version(classifier, version)
+            if local is None:
+                with self._lock:
+                    self._stats['skipped_not_ready'] += 1
+                return False
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['dropped_saturated'] += 1
+            return False
+
+        primary = {
+            'provider': result.get('provider_used'),
+            'version': result.get('model_version'),
+            'waste_type': result.get('waste_type'),
+            'confidence': result.get('confidence'),
+            'latency_ms': latency_ms
+        }
+        with self._lock:
+            self._stats['submitted'] += 1
+            self._stats['in_flight'] += 1
+        try:
+            self._get_executor().submit(self._run, classifier, image_bytes, top_k, provider, local, primary)
+        except RuntimeError:
+            self._release()
+            return False
+        return True
+
+    def _candidate_version(self, classifier, version):
+        """The loaded registry version to shadow with, staging it once if needed"""
+        loaded = classifier.registry.loaded(version)
+        if loaded is not None:
+            self._staging.discard(version)
+        elif version not in self._staging:
+            self._staging.add(version)
+            try:
+                classifier.registry.stage(version)
+            except ModelVersionError as e:
+                print(f"[WARNING] Shadow candidate unavailable: {e}")
+        return loaded
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent,
+                                                    thread_name_prefix="shadow")
+            return self._executor
+
+    def _release(self):
+        with self._lock:
+            self._stats['in_flight'] -= 1
+        self._slots.release()
+
+    # ---- running -------------------------------------------------------
+
+    def _run(self, classifier, image_bytes, top_k, provider, local, primary):
+        """Call the candidate and store the comparison (runs on the shadow pool)"""
+        start = time.perf_counter()
+        candidate, error = None, None
+        try:
+            if local is not None:
+                candidate = classifier._classify_local(image_bytes, top_k, local=local)
+            else:
+                # Called directly so shadow traffic stays out of breaker, router and latency stats
+                candidate = classifier._classify_with_provider(image_bytes, provider, top_k)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        try:
+            self.record(self.candidate, primary, candidate, latency_ms, error)
+        except Exception as e:
+            print(f"[WARNING] Shadow result not recorded: {e}")
+        finally:
+            with self._lock:
+                self._stats['failed' if error else 'completed'] += 1
+            self._release()
+
+    def record(self, candidate_name, primary, candidate, latency_ms, error=None):
+        """Store one primary / candidate comparison"""
+        self.init_table()
+        agree = delta = None
+        candidate = candidate or {}
+        if not error:
+            agree = int(candidate.get('waste_type') == primary['waste_type'])
+            try:
+                delta = float(candidate.get('confidence')) - float(primary['confidence'])
+            except (TypeError, ValueError):
+                delta = None
+
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT INTO shadow_results (created_at, candidate, primary_provider, primary_version, '
+                'primary_waste_type, primary_confidence, primary_latency_ms, candidate_version, '
+                'candidate_waste_type, candidate_confidence, candidate_latency_ms, agree, confidence_delta, error) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (time.time(), candidate_name, primary['provider'], primary['version'],
+                 primary['waste_type'], primary['confidence'], primary['latency_ms'],
+                 candidate.get('model_version'), candidate.get('waste_type'), candidate.get('confidence'),
+                 round(latency_ms, 2), agree, delta, error)
+            )
+        finally:
+            conn.close()
+
+    def wait_idle(self, timeout=10):
+        """Block until no shadow call is in flight (used by tests and shutdown)"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._lock:
+                if self._stats['in_flight'] == 0:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    # ---- reporting -----------------------------------------------------
+
+    def summary(self, candidate=None, since_seconds=None):
+        """
+        Aggregate the stored comparisons per candidate
+
+        Args:
+            candidate: Only this candidate spec
+            since_seconds: Only comparisons from the last N seconds
+
+        Returns:
+            list: One dict per candidate with agreement rate, confidence delta,
+            latency percentiles and the most frequent disagreements
+        """
+        self.init_table()
+        where, params = [], []
+        if candidate:
+            where.append('candidate = ?')
+            params.append(candidate)
+        if since_seconds:
+            where.append('created_at >= ?')
+            params.append(time.time() - since_seconds)
+        clause = f"WHERE {' AND '.join(where)}" if where else ''
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(f'''
+                SELECT candidate, COUNT(*), COUNT(error), AVG(agree), AVG(confidence_delta),
+                       AVG(ABS(confidence_delta)), MIN(created_at), MAX(created_at)
+                FROM shadow_results {clause}
+                GROUP BY candidate ORDER BY candidate
+            ''', params).fetchall()
+            summaries = []
+            for name, total, errors, agreement, delta, abs_delta, first, last in rows:
+                scoped = clause + (' AND ' if clause else 'WHERE ') + 'candidate = ?'
+                latencies = conn.execute(
+                    f'SELECT primary_latency_ms, candidate_latency_ms FROM shadow_results {scoped} AND error IS NULL',
+                    params + [name]
+                ).fetchall()
+                disagreements = conn.execute(f'''
+                    SELECT primary_waste_type, candidate_waste_type, COUNT(*) AS n FROM shadow_results
+                    {scoped} AND agree = 0
+                    GROUP BY primary_waste_type, candidate_waste_type ORDER BY n DESC LIMIT 5
+                ''', params + [name]).fetchall()
+                summaries.append({
+                    'candidate': name,
+                    'comparisons': total,
+                    'errors': errors,
+                    'agreement_rate': round(agreement, 4) if agreement is not None else None,
+                    'mean_confidence_delta': round(delta, 4) if delta is not None else None,
+                    'mean_abs_confidence_delta': round(abs_delta, 4) if abs_delta is not None else None,
+                    'primary_latency_ms': self._percentiles([p for p, _ in latencies]),
+                    'candidate_latency_ms': self._percentiles([c for _, c in latencies]),
+                    'top_disagreements': [
+                        {'primary': p, 'candidate': c, 'count': n} for p, c, n in disagreements
+                    ],
+                    'first_at': first,
+                    'last_at': last
+                })
+        finally:
+            conn.close()
+        return summaries
+
+    @staticmethod
+    def _percentiles(values):
+        values = [v for v in values if v is not None]
+        if not values:
+            return None
+        return {
+            'p50': round(float(np.percentile(values, 50)), 2),
+            'p95': round(float(np.percentile(values, 95)), 2),
+            'mean': round(float(np.mean(values)), 2)
+        }
+
+    def get_stats(self):
+        """Get sampling counters and the current configuration"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['enabled'] = AIConfig.SHADOW_ENABLED
+        stats['candidate'] = self.candidate or None
+        stats['sample_rate'] = self.sample_rate
+        stats['max_concurrent'] = self.max_concurrent
+        return stats
+
+
+# Global instance shared by every classifier
+shadow_evaluator = ShadowEvaluator()
@@ -0,0 +1,339 @@
+"""
+Post-Response Side Effects
+Work that follows a request but does not shape its response (saving the
+classification, awarding points and badges) is written to a durable task
+table and run by background workers
+
+Guarantees:
+    per-key ordering - tasks sharing an ordering key (one user) run one at a
+                       time, oldest first; a task being retried holds back
+                       the later tasks for that key
+    at-least-once    - a task is retried with backoff until it succeeds, and
+                       a task whose worker died is picked up again once its
+                       lease runs out
+    idempotency      - a task is enqueued under a key (the classification_id)
+                       and enqueuing the same key again is a no-op; handlers
+                       must make their own writes safe to repeat
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from collections import deque
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from config.ai_config import AIConfig
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+DEAD = 'dead'
+MAX_BACKOFF_SECONDS = 300
+
+
+class SideEffectPipeline:
+    """
+    Durable, ordered task runner for post-response work
+
+    Handlers are registered per task kind and called as handler(payload).
+    A handler signals failure by raising; the task is then retried.
+    """
+
+    def __init__(self, db_path=None, workers=None, max_attempts=None):
+        """
+        Args:
+            db_path: SQLite file holding the task table
+            workers: Worker threads in this process
+            max_attempts: Tries per task before it is parked as dead
+        """
+        self.db_path = db_path or AIConfig.SIDE_EFFECTS_SQLITE_PATH
+        self.workers = workers or AIConfig.SIDE_EFFECTS_WORKERS
+        self.max_attempts = max_attempts or AIConfig.SIDE_EFFECTS_MAX_ATTEMPTS
+        self.handlers = {}
+
+        self._threads = []
+        self._stopping = threading.Event()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._last_maintenance = 0.0
+        self._delay_ms = deque(maxlen=AIConfig.LATENCY_WINDOW_SIZE)
+        self._stats = {
+            'enqueued': 0,
+            'duplicates': 0,
+            'completed': 0,
+            'retried': 0,
+            'dead': 0,
+            'recovered': 0,
+            'deleted': 0,
+            'errors': 0
+        }
+
+    def register(self, kind, handler):
+        """Set the handler for one task kind"""
+        self.handlers[kind] = handler
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def init_tasks_table(self):
+        """Create the task table (once per instance)"""
+        with self._lock:
+            if self._initialized:
+                return
+            conn = self._connect()
+            try:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS side_effect_tasks (
+                        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                        task_key TEXT UNIQUE NOT NULL,
+                        kind TEXT NOT NULL,
+                        ordering_key TEXT NOT NULL,
+                        payload TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        available_at REAL NOT NULL,
+                        lease_until REAL,
+                        created_at REAL NOT NULL,
+                        finished_at REAL,
+                        last_error TEXT
+                    )
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_side_effect_tasks_status ON side_effect_tasks (status, seq)')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_side_effect_tasks_ordering ON side_effect_tasks (ordering_key, status, seq)')
+            finally:
+                conn.close()
+            self._initialized = True
+
+    def start(self):
+        """Start the worker threads (no-op if already running); returns self"""
+        self.init_tasks_table()
+        with self._lock:
+            if self._threads:
+                return self
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"side-effects-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=5):
+        """Stop the workers after their current task"""
+        self._stopping.set()
+        self._wakeup.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def enqueue(self, kind, key, ordering_key, payload):
+        """
+        Store a task for the workers
+
+        Args:
+            kind: Registered handler name
+            key: Idempotency key; a task with the same kind and key is stored once
+            ordering_key: Tasks with the same ordering key run in enqueue order
+            payload: JSON-serializable handler argument
+
+        Returns:
+            bool: True if stored, False if the task already existed
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"No side-effect handler registered for '{kind}'")
+        self.start()
+
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO side_effect_tasks '
+                '(task_key, kind, ordering_key, payload, status, available_at, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (f"{kind}:{key}", kind, ordering_key, json.dumps(payload), QUEUED, now, now)
+            )
+            stored = cursor.rowcount == 1
+        finally:
+            conn.close()
+
+        with self._lock:
+            self._stats['enqueued' if stored else 'duplicates'] += 1
+        self._wakeup.set()
+        return stored
+
+    def _claim(self):
+        """Lease the oldest runnable task whose ordering key has nothing earlier pending"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('''
+                SELECT t.seq, t.kind, t.payload, t.attempts, t.created_at FROM side_effect_tasks t
+                WHERE t.status = 'queued' AND t.available_at <= ?
+                  AND NOT EXISTS (
+                      SELECT 1 FROM side_effect_tasks p
+                      WHERE p.ordering_key = t.ordering_key AND p.status IN ('queued', 'running') AND p.seq < t.seq
+                  )
+                ORDER BY t.seq LIMIT 1
+            ''', (now,)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            seq, kind, payload, attempts, created_at = row
+            conn.execute(
+                "UPDATE side_effect_tasks SET status = 'running', attempts = ?, lease_until = ? WHERE seq = ?",
+                (attempts + 1, now + AIConfig.SIDE_EFFECTS_LEASE_SECONDS, seq)
+            )
+            conn.execute('COMMIT')
+            return {'seq': seq, 'kind': kind, 'payload': json.loads(payload),
+                    'attempts': attempts + 1, 'created_at': created_at}
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def _finish(self, task, status, available_at=None, error=None):
+        conn = self._connect()
+        try:
+            if status == QUEUED:
+                conn.execute(
+                    "UPDATE side_effect_tasks SET status = 'queued', available_at = ?, lease_until = NULL, "
+                    "last_error = ? WHERE seq = ?",
+                    (available_at, error, task['seq'])
+                )
+            else:
+                conn.execute(
+                    'UPDATE side_effect_tasks SET status = ?, lease_until = NULL, finished_at = ?, last_error = ? '
+                    'WHERE seq = ?',
+                    (status, time.time(), error, task['seq'])
+                )
+        finally:
+            conn.close()
+        # A finished task may unblock the next one for its ordering key
+        self._wakeup.set()
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            try:
+                self._maybe_maintain()
+                task = self._claim()
+            except Exception as e:
+                print(f"[ERROR] Side-effect queue error: {e}")
+                self._stopping.wait(AIConfig.JOB_POLL_INTERVAL)
+                continue
+            if task is None:
+                # Other processes cannot wake us, so poll as well
+                self._wakeup.wait(AIConfig.JOB_POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+            try:
+                self._run(task)
+            except Exception as e:
+                # Recording the outcome failed (e.g. database is locked); the task stays
+                # 'running' and the lease sweep re-runs it, so keep this worker alive
+                print(f"[ERROR] Side effect {task['kind']} #{task['seq']} could not be recorded: {e}")
+                with self._lock:
+                    self._stats['errors'] += 1
+
+    def _run(self, task):
+        try:
+            self.handlers[task['kind']](task['payload'])
+        except Exception as e:
+            if task['attempts'] < self.max_attempts:
+                delay = min(AIConfig.SIDE_EFFECTS_RETRY_BACKOFF_SECONDS * (2 ** (task['attempts'] - 1)),
+                            MAX_BACKOFF_SECONDS)
+                print(f"[WARNING] Side effect {task['kind']} #{task['seq']} attempt {task['attempts']} failed, "
+                      f"retrying in {delay:.1f}s: {e}")
+                self._finish(task, QUEUED, available_at=time.time() + delay, error=str(e))
+                with self._lock:
+                    self._stats['retried'] += 1
+                return
+            print(f"[ERROR] Side effect {task['kind']} #{task['seq']} failed after {task['attempts']} attempts: {e}")
+            self._finish(task, DEAD, error=str(e))
+            with self._lock:
+                self._stats['dead'] += 1
+            return
+
+        self._finish(task, DONE)
+        with self._lock:
+            self._stats['completed'] += 1
+            self._delay_ms.append((time.time() - task['created_at']) * 1000)
+
+    def _maybe_maintain(self):
+        """Recover tasks with lapsed leases and drop old finished ones, every JOB_MAINTENANCE_INTERVAL seconds"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_maintenance < AIConfig.JOB_MAINTENANCE_INTERVAL:
+                return
+            self._last_maintenance = now
+        conn = self._connect()
+        try:
+            recovered = conn.execute(
+                "UPDATE side_effect_tasks SET status = 'queued', lease_until = NULL "
+                "WHERE status = 'running' AND lease_until <= ?",
+                (now,)
+            ).rowcount
+            deleted = conn.execute(
+                "DELETE FROM side_effect_tasks WHERE status = 'done' AND finished_at <= ?",
+                (now - AIConfig.SIDE_EFFECTS_DONE_TTL_SECONDS,)
+            ).rowcount
+        finally:
+            conn.close()
+        with self._lock:
+            self._stats['recovered'] += recovered
+            self._stats['deleted'] += deleted
+
+    def wait_idle(self, timeout=10):
+        """Block until no task is queued or running (for tests and shutdown); True if idle"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            depth = self.depth()
+            if depth[QUEUED] == 0 and depth[RUNNING] == 0:
+                return True
+            time.sleep(0.02)
+        return False
+
+    def depth(self):
+        """Task counts per status"""
+        self.init_tasks_table()
+        conn = self._connect()
+        try:
+            counts = dict(conn.execute('SELECT status, COUNT(*) FROM side_effect_tasks GROUP BY status').fetchall())
+        finally:
+            conn.close()
+        return {status: counts.get(status, 0) for status in (QUEUED, RUNNING, DONE, DEAD)}
+
+    def get_stats(self):
+        """Get task counts, outcome counters and enqueue-to-done delay percentiles"""
+        with self._lock:
+            stats = dict(self._stats)
+            delays = list(self._delay_ms)
+            workers = len(self._threads)
+        try:
+            stats['depth'] = self.depth()
+        except Exception as e:
+            stats['depth'] = {'error': str(e)}
+        stats['workers'] = workers
+        stats['delay'] = {
+            'samples': len(delays),
+            'p50_ms': round(float(np.percentile(delays, 50)), 2) if delays else None,
+            'p95_ms': round(float(np.percentile(delays, 95)), 2) if delays else None
+        }
+        return stats
+
+
+# Global instance shared by every request
+side_effects = SideEffectPipeline()
@@ -0,0 +1,133 @@
+"""
+Single-Flight Request Coalescing
+Concurrent classifications of the same image bytes on the same provider share
+one provider call: the first request (the leader) makes it and the others wait
+for its result
+"""
+
+import os
+import sys
+import copy
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from config.ai_config import AIConfig
+
+
+class _Flight:
+    def __init__(self):
+        self.future = Future()
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key onto one execution
+
+    A failed leader never hands its exception to the waiters: they start a new
+    flight instead (one of them becomes the leader), so one bad call cannot
+    fail every request that happened to arrive with it. A waiter that has seen
+    max_waits flights fail, or waited wait_timeout seconds, runs the call itself.
+    """
+
+    def __init__(self, wait_timeout=None, max_waits=None):
+        """
+        Args:
+            wait_timeout: Seconds a waiter waits for the leader
+            max_waits: Failed flights a waiter sits through before calling on its own
+        """
+        self.wait_timeout = wait_timeout if wait_timeout is not None else AIConfig.SINGLE_FLIGHT_WAIT_TIMEOUT
+        self.max_waits = max_waits if max_waits is not None else AIConfig.SINGLE_FLIGHT_MAX_WAITS
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._stats = {
+            'leaders': 0,
+            'coalesced': 0,
+            'leader_failures': 0,
+            'waiter_retries': 0,
+            'waiter_timeouts': 0,
+            'uncoalesced_calls': 0,
+            'max_waiters': 0
+        }
+
+    def do(self, key, fn):
+        """
+        Run fn() once for all concurrent callers with the same key
+
+        Args:
+            key: Identity of the call (e.g. content hash + provider)
+            fn: Zero-argument callable
+
+        Returns:
+            tuple: (result, shared) - shared is True when the result came from
+            another caller's call; waiters get a deep copy so they can mutate it
+        """
+        waits = 0
+        while waits < self.max_waits:
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = _Flight()
+                    self._flights[key] = flight
+                    self._stats['leaders'] += 1
+                else:
+                    flight.waiters += 1
+                    self._stats['max_waiters'] = max(self._stats['max_waiters'], flight.waiters)
+
+            if leader:
+                return self._lead(key, flight, fn), False
+
+            try:
+                result = flight.future.result(timeout=self.wait_timeout)
+            except FutureTimeoutError:
+                with self._lock:
+                    self._stats['waiter_timeouts'] += 1
+                break
+            except Exception:
+                # The leader failed: retry under a new flight rather than share its error
+                waits += 1
+                with self._lock:
+                    self._stats['waiter_retries'] += 1
+                continue
+
+            with self._lock:
+                self._stats['coalesced'] += 1
+            return copy.deepcopy(result), True
+
+        with self._lock:
+            self._stats['uncoalesced_calls'] += 1
+        return fn(), False
+
+    def _lead(self, key, flight, fn):
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                self._stats['leader_failures'] += 1
+                self._flights.pop(key, None)
+            flight.future.set_exception(e)
+            raise
+
+        # Hand waiters a snapshot taken before the leader's caller mutates its copy
+        with self._lock:
+            self._flights.pop(key, None)
+        flight.future.set_result(copy.deepcopy(result))
+        return result
+
+    def get_stats(self):
+        """Get coalescing counters and the number of calls in flight"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._flights)
+        total = stats['leaders'] + stats['coalesced']
+        stats['coalesced_rate'] = round(stats['coalesced'] / total, 4) if total else 0.0
+        stats['enabled'] = AIConfig.SINGLE_FLIGHT_ENABLED
+        return stats
+
+
+# Global instance shared by every classifier
+single_flight = SingleFlight()
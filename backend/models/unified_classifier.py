@@ -6,18 +6,63 @@ Easy switching between providers via configuration
 
 import os
 import sys
+import math
 import base64
-import requests
 import numpy as np
-from PIL import Image
-import io
 import json
 import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from config.ai_config import AIConfig, AIProvider
+from models.model_registry import model_registry
+from models.result_cache import ClassificationCache, result_cache
+from models.phash_index import phash_index, dhash
+from utils.http_client import get_http_client
+from models.hedging import hedging, provider_latency
+from models.circuit_breaker import circuit_breakers, CircuitOpenError
+from models.cascade import cascade_stats, escalation_reason
+from models.payload_policy import RequestImage, provider_payload
+from models.single_flight import single_flight
+from models.router import provider_router
+from models.shadow import shadow_evaluator
+from models.multi_image import (build_prompt, gemini_response_schema, openai_response_format,
+                                parse_response, multi_image_stats)
+
+
+def parse_confidence(value, default=0.7):
+    """
+    Confidence named by an LLM as a float in [0, 1]
+
+    Accepts numbers, numeric strings and percentages ("85%" or 85); anything
+    else (missing, "high", NaN) becomes `default`.
+    """
+    try:
+        if isinstance(value, str):
+            text = value.strip()
+            number = float(text.rstrip('%'))
+            if text.endswith('%'):
+                number /= 100
+        else:
+            number = float(value)
+    except (TypeError, ValueError):
+        return default
+    if not math.isfinite(number) or number < 0:
+        return default
+    if 1 < number <= 100:
+        number /= 100
+    return min(number, 1.0)
+
+
+def is_valid_confidence(value):
+    """Whether a result's confidence is a real number in [0, 1]"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, np.floating)):
+        return False
+    return 0.0 <= float(value) <= 1.0
 
 
 class UnifiedWasteClassifier:
@@ -37,83 +82,627 @@ class UnifiedWasteClassifier:
         self.provider = provider or self.config.ACTIVE_PROVIDER
 
         # Initialize provider-specific components
-        self.local_model = None
-        self.cv2 = None
+        self.registry = model_registry
+        self._batch_executor = None
+        self._batch_lock = threading.Lock()
         if self.provider == AIProvider.LOCAL:
-            self._load_local_model()
+            # Loads (and warms) the served model version on first use
+            self.registry.active()
+
+        # Gemini model handle, resolved once and reused across requests
+        self._gemini_model = None
+        self._gemini_model_name = None
+        self._gemini_lock = threading.Lock()
+        self._gemini_resolve_lock = threading.Lock()
+        self._gemini_unavailable = set()
+        self._gemini_stats = {'resolutions': 0, 'reused': 0, 'last_resolve_ms': None}
+        if self.provider == AIProvider.GEMINI and self.config.GEMINI_API_KEY:
+            try:
+                self._resolve_gemini_model()
+            except Exception as e:
+                print(f"[WARNING] Gemini model not resolved at startup: {e}")
 
-    def _load_local_model(self):
-        """Load local TensorFlow/Keras model when available."""
-        try:
-            from tensorflow.keras.models import load_model
-            import cv2
-
-            model_path = self.config.LOCAL_MODEL_PATH
-            if os.path.exists(model_path):
-                self.local_model = load_model(model_path)
-                self.cv2 = cv2
-                print(f"[INFO] Local model loaded from {model_path}")
-            else:
-                print(f"[WARNING] Local model not found at {model_path}")
-        except Exception as e:
-            print(f"[WARNING] Local model unavailable: {e}")
-            self.local_model = None
-            self.cv2 = None
+    def close(self):
+        """Release background resources held by this classifier"""
+        # Model versions (and their batchers) belong to the registry
+        if self._batch_executor is not None:
+            self._batch_executor.shutdown(wait=False, cancel_futures=True)
 
-    def classify(self, image_path, top_k=None):
+    def get_stats(self):
+        """Get runtime metrics for this classifier instance"""
+        local = self.registry.active() if self.provider == AIProvider.LOCAL else None
+        return {
+            'provider': self.provider.value,
+            'local_model_loaded': local is not None,
+            'local_model_backend': local.backend if local else None,
+            'local_model_version': local.version if local else None,
+            'batching': local.batcher.get_stats() if local and local.batcher else None,
+            'gemini': self.get_gemini_stats()
+        }
+
+    def get_gemini_stats(self):
+        """Get Gemini model resolution counters and the latency they saved"""
+        with self._gemini_lock:
+            stats = dict(self._gemini_stats)
+        stats['model'] = self._gemini_model_name
+        # Every reuse skips the configure + list_models + construct round trip
+        stats['estimated_saved_ms'] = round((stats['last_resolve_ms'] or 0) * stats['reused'], 2)
+        return stats
+
+    def classify(self, image, top_k=None):
         """
         Classify waste image using configured AI provider
 
         Args:
-            image_path: Path to image file
+            image: Raw image bytes, a binary file-like object (e.g. an upload
+                stream) or a path to an image file
             top_k: Number of top predictions (default from config)
 
         Returns:
             dict: Classification results with waste_type, confidence, etc.
         """
         top_k = top_k or self.config.TOP_K_PREDICTIONS
+        image_bytes = self._read_image_bytes(image)
+
+        reused, cache_key, image_hash = self._lookup_reusable(image_bytes, top_k)
+        if reused is not None:
+            return reused
+
+        start = time.perf_counter()
+        if not self.config.SINGLE_FLIGHT_ENABLED:
+            result = self._classify_fresh(image_bytes, top_k, image_hash, cache_key)
+            self._shadow(image_bytes, top_k, result, start)
+            return result
+
+        # Identical uploads arriving together wait for one provider call
+        flight_key = cache_key or self._flight_key(image_bytes, top_k)
+        result, shared = single_flight.do(
+            flight_key,
+            lambda: self._classify_fresh(image_bytes, top_k, image_hash, cache_key)
+        )
+        if shared:
+            result.pop('payload', None)  # This request uploaded nothing
+            result.pop('usage', None)
+        else:
+            self._shadow(image_bytes, top_k, result, start)
+        result['coalesced'] = shared
+        return result
 
+    def _shadow(self, image_bytes, top_k, result, start):
+        """Hand a fresh result to shadow evaluation; never fails the request"""
         try:
-            # Try primary provider
-            result = self._classify_with_provider(image_path, self.provider, top_k)
-            if result:
-                result['provider_used'] = self.provider.value
-                return result
-
+            shadow_evaluator.maybe_shadow(self, image_bytes, top_k, result,
+                                          latency_ms=round((time.perf_counter() - start) * 1000, 2))
         except Exception as e:
-            print(f"[WARNING] Primary provider ({self.provider.value}) failed: {e}")
+            print(f"[WARNING] Shadow evaluation skipped: {e}")
+
+    def _route(self):
+        """
+        Pick this request's primary and fallback provider
+
+        Returns:
+            tuple: (primary, fallback or None, routing decision dict)
+        """
+        if self.config.ROUTER_STRATEGY == 'static':
+            order, decision = provider_router.static_decision(self.provider, self.config.FALLBACK_PROVIDER)
+        else:
+            order, decision = provider_router.choose()
+            if not order:
+                # Nothing eligible: keep the configured pair so the usual errors surface
+                return self.provider, self.config.FALLBACK_PROVIDER, decision
+        return order[0], (order[1] if len(order) > 1 else None), decision
+
+    def _flight_key(self, image_bytes, top_k):
+        """Content hash + provider key used when the result cache is off"""
+        return self._cache_key(image_bytes, top_k)
+
+    def _cache_key(self, image_bytes, top_k):
+        """Result cache key for an upload under this classifier's provider and model"""
+        # A cascade result is decided by the local model, whichever tier answers
+        cascade = self.config.CASCADE_ENABLED
+        provider = AIProvider.LOCAL if cascade else self.provider
+        key = ClassificationCache.make_key(image_bytes, provider, top_k, self._model_version(provider))
+        return key + ':cascade' if cascade else key
+
+    def _model_version(self, provider):
+        """Model actually serving a provider (the resolved Gemini model, not the configured one)"""
+        if provider == AIProvider.GEMINI and self.config.is_provider_configured(provider):
+            if self._gemini_model_name is None:
+                try:
+                    self._get_gemini_model()
+                except Exception as e:
+                    print(f"[WARNING] Could not resolve Gemini model for the cache key: {e}")
+            if self._gemini_model_name:
+                return self._gemini_model_name
+        return self.config.get_model_version(provider)
+
+    def _classify_fresh(self, image_bytes, top_k, image_hash, cache_key):
+        """Classify with the cascade or the primary / fallback providers (no reuse)"""
+        if self.config.CASCADE_ENABLED:
+            return self._classify_cascade(image_bytes, top_k, image_hash, cache_key)
+
+        primary, fallback, routing = self._route()
+        can_fall_back = (fallback is not None and fallback != primary
+                         and self.config.is_provider_configured(fallback))
+
+        # Skip providers whose circuit is open instead of paying for a failed call
+        primary_up = circuit_breakers.is_available(primary)
+        fallback_up = can_fall_back and circuit_breakers.is_available(fallback)
+
+        # Hedged mode: race the fallback against a primary that is running slow
+        if self.config.HEDGING_ENABLED and primary_up and fallback_up:
+            result, provider, hedged = hedging.run(
+                primary,
+                fallback,
+                lambda p: self._timed_classify(image_bytes, p, top_k),
+                self._is_acceptable
+            )
+            result['hedged'] = hedged
+            return self._finish_result(result, provider, image_hash, cache_key, routing)
+
+        if primary_up:
+            try:
+                # Try primary provider
+                result = self._timed_classify(image_bytes, primary, top_k)
+                if result:
+                    return self._finish_result(result, primary, image_hash, cache_key, routing)
+
+            except CircuitOpenError:
+                pass
+            except Exception as e:
+                print(f"[WARNING] Primary provider ({primary.value}) failed: {e}")
 
         # Try fallback provider
         try:
-            fallback = self.config.FALLBACK_PROVIDER
-            if fallback != self.provider and self.config.is_provider_configured(fallback):
-                print(f"[INFO] Trying fallback provider: {fallback.value}")
-                result = self._classify_with_provider(image_path, fallback, top_k)
+            if fallback_up:
+                if primary_up:
+                    print(f"[INFO] Trying fallback provider: {fallback.value}")
+                result = self._timed_classify(image_bytes, fallback, top_k)
                 if result:
-                    result['provider_used'] = fallback.value
-                    result['fallback'] = True
-                    return result
+                    return self._finish_result(result, fallback, image_hash, cache_key, routing)
         except Exception as e:
             print(f"[ERROR] Fallback provider also failed: {e}")
 
+        if not primary_up and not fallback_up:
+            raise RuntimeError("All AI providers are unavailable (circuit open). Please retry shortly.")
+        raise RuntimeError("All AI providers failed. Please check configuration.")
+
+    def classify_batch(self, images, top_k=None):
+        """
+        Classify many images in one call
+
+        Args:
+            images: List of raw image bytes, streams or paths
+            top_k: Number of top predictions per image
+
+        Returns:
+            list: One {'success': True, 'result': ...} or
+            {'success': False, 'error': ...} per image, in input order
+        """
+        results = [None] * len(images)
+        for index, item in self.iter_classify_batch(images, top_k):
+            results[index] = item
+        return results
+
+    def iter_classify_batch(self, images, top_k=None):
+        """
+        Classify many images, yielding (index, item) as each one finishes
+
+        The local model scores every uncached image in a single predict call;
+        Gemini and OpenAI get several images per call; other cloud providers
+        run per image on a bounded worker pool.
+        """
+        top_k = top_k or self.config.TOP_K_PREDICTIONS
+
+        if (self.config.MULTI_IMAGE_ENABLED and self.config.MULTI_IMAGE_PER_CALL > 1
+                and self.provider in self.config.MULTI_IMAGE_PROVIDERS
+                and not self.config.CASCADE_ENABLED
+                and circuit_breakers.is_available(self.provider)):
+            yield from self._iter_classify_multi_image(images, top_k)
+            return
+
+        # One model version for the whole batch, even if a switch happens meanwhile
+        local = self.registry.active() if self.provider == AIProvider.LOCAL else None
+        vectorized = local is not None and not self.config.CASCADE_ENABLED
+        if not vectorized:
+            yield from self._iter_classify_concurrently(images, top_k)
+            return
+
+        # Images decode straight into their row of one preallocated batch
+        width, height = local.input_size
+        batch = np.empty((len(images), height, width, 3), dtype=np.float32)
+        pending = []  # (index, cache_key, image_hash) per filled row
+        for index, image in enumerate(images):
+            try:
+                image_bytes = self._read_image_bytes(image)
+                reused, cache_key, image_hash = self._lookup_reusable(image_bytes, top_k)
+                if reused is not None:
+                    yield index, {'success': True, 'result': reused}
+                    continue
+                self._preprocess_local(image_bytes, out=batch[len(pending)], input_size=local.input_size)
+                pending.append((index, cache_key, image_hash))
+            except Exception as e:
+                yield index, {'success': False, 'error': str(e)}
+
+        if not pending:
+            return
+
+        try:
+            predictions = local.model.predict(batch[:len(pending)], verbose=0)
+        except Exception as e:
+            for index, _, _ in pending:
+                yield index, {'success': False, 'error': f"Batch prediction failed: {e}"}
+            return
+
+        for (index, cache_key, image_hash), scores in zip(pending, predictions):
+            result = self._local_result(scores, top_k, local)
+            yield index, {
+                'success': True,
+                'result': self._finish_result(result, AIProvider.LOCAL, image_hash, cache_key)
+            }
+
+    def _get_batch_executor(self):
+        """This provider's bounded pool for batch work"""
+        with self._batch_lock:
+            if self._batch_executor is None:
+                self._batch_executor = ThreadPoolExecutor(
+                    max_workers=self.config.BATCH_MAX_CONCURRENCY,
+                    thread_name_prefix=f"batch-{self.provider.value}"
+                )
+            return self._batch_executor
+
+    def _iter_classify_concurrently(self, images, top_k):
+        """Run classify() per image on this provider's bounded batch pool"""
+        executor = self._get_batch_executor()
+        futures = {executor.submit(self.classify, image, top_k): index for index, image in enumerate(images)}
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], {'success': True, 'result': future.result()}
+                except Exception as e:
+                    yield futures[future], {'success': False, 'error': str(e)}
+        finally:
+            # Client went away mid-stream: drop the images not started yet
+            for future in futures:
+                future.cancel()
+
+    def _iter_classify_multi_image(self, images, top_k):
+        """Send uncached images MULTI_IMAGE_PER_CALL at a time, calls running on the batch pool"""
+        pending = []  # (index, image_bytes, cache_key, image_hash)
+        for index, image in enumerate(images):
+            try:
+                image_bytes = self._read_image_bytes(image)
+                reused, cache_key, image_hash = self._lookup_reusable(image_bytes, top_k)
+                if reused is not None:
+                    yield index, {'success': True, 'result': reused}
+                    continue
+                pending.append((index, image_bytes, cache_key, image_hash))
+            except Exception as e:
+                yield index, {'success': False, 'error': str(e)}
+
+        size = self.config.MULTI_IMAGE_PER_CALL
+        executor = self._get_batch_executor()
+        futures = [executor.submit(self._classify_chunk, pending[i:i + size], top_k)
+                   for i in range(0, len(pending), size)]
+        try:
+            for future in as_completed(futures):
+                for index, item in future.result():
+                    yield index, item
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _classify_chunk(self, chunk, top_k):
+        """
+        Classify a chunk with one multi-image call
+
+        Images the answer leaves out or garbles are asked about again, in a
+        call carrying only those images; whatever still has no answer (or a
+        failed call) goes through classify() with its fallback provider.
+
+        Returns:
+            list: (index, item) per image in the chunk
+        """
+        results = []
+        remaining = list(chunk)
+        for attempt in range(1 + self.config.MULTI_IMAGE_MAX_RETRIES):
+            if len(remaining) < 2:
+                break  # One image: the single-image call is just as cheap
+            try:
+                parsed, failed, usage = self._timed_multi_image_call(
+                    [entry[1] for entry in remaining], retry=attempt > 0
+                )
+            except Exception as e:
+                print(f"[WARNING] Multi-image call to {self.provider.value} failed: {e}")
+                break
+
+            for label, item in parsed.items():
+                index, image_bytes, cache_key, image_hash = remaining[label - 1]
+                result = self._llm_result(item['waste_type'], item['confidence'], item['reasoning'])
+                result['multi_image'] = {'images_in_call': len(remaining), 'attempt': attempt + 1}
+                # Each image carries an equal share of the call's tokens
+                result['usage'] = {name: count / len(remaining) for name, count in usage.items()}
+                payload = image_bytes.payload_info(self.provider) if isinstance(image_bytes, RequestImage) else None
+                if payload is not None:
+                    result['payload'] = payload
+                results.append((index, {
+                    'success': True,
+                    'result': self._finish_result(result, self.provider, image_hash, cache_key)
+                }))
+            remaining = [remaining[label - 1] for label in failed]
+
+        for index, image_bytes, _, _ in remaining:
+            try:
+                results.append((index, {'success': True, 'result': self.classify(image_bytes, top_k)}))
+            except Exception as e:
+                results.append((index, {'success': False, 'error': str(e)}))
+        return results
+
+    def _timed_multi_image_call(self, images, retry=False):
+        """
+        One multi-image call through the provider's circuit breaker
+
+        Returns:
+            tuple: ({label: item}, [labels without a usable answer], token usage)
+        """
+        provider = self.provider
+        breaker = circuit_breakers.get(provider) if self.config.BREAKER_ENABLED else None
+        if breaker is not None and not breaker.allow_request():
+            raise CircuitOpenError(f"{provider.value} circuit is open")
+        provider_router.record_call(provider)
+
+        start = time.perf_counter()
+        try:
+            if provider == AIProvider.GEMINI:
+                text, usage = self._gemini_multi_image(images)
+            else:
+                text, usage = self._openai_multi_image(images)
+        except Exception as e:
+            call_ms = (time.perf_counter() - start) * 1000
+            if breaker is not None:
+                breaker.record_failure(call_ms / len(images), e)
+            multi_image_stats.record(provider, len(images), call_ms, 0, retry=retry, error=True)
+            raise
+
+        call_ms = (time.perf_counter() - start) * 1000
+        parsed, failed = parse_response(text, len(images))
+        if breaker is not None:
+            # Judge the call by its per-image cost, as the slow-call threshold is set for one image
+            breaker.record_success(call_ms / len(images))
+        multi_image_stats.record(provider, len(images), call_ms, len(failed), retry=retry, usage=usage)
+        return parsed, failed, usage
+
+    def _lookup_reusable(self, image_bytes, top_k):
+        """
+        Look for a stored result for this image
+
+        Returns:
+            tuple: (result or None, cache key, perceptual hash); the key and
+            hash are reused when storing a fresh result
+        """
+        cascade = self.config.CASCADE_ENABLED
+
+        # Serve identical uploads from the result cache
+        cache_key = None
+        if self.config.RESULT_CACHE_ENABLED:
+            cache_key = self._cache_key(image_bytes, top_k)
+            cached, tier = result_cache.get(cache_key)
+            if cached is not None:
+                cached['cached'] = True
+                cached['cache_tier'] = tier
+                cached.pop('payload', None)  # Nothing was uploaded for this request
+                cached.pop('routing', None)
+                cached.pop('usage', None)
+                cached.pop('multi_image', None)
+                return cached, cache_key, None
+
+        # Reuse the stored result of a near-duplicate image
+        image_hash = self._perceptual_hash(image_bytes)
+        if image_hash is not None:
+            try:
+                reused = phash_index.lookup(image_hash)
+            except Exception as e:
+                # The index is an optimisation; classify the image fresh instead
+                print(f"[WARNING] Near-duplicate lookup failed: {e}")
+                reused = None
+            if reused is not None:
+                reused['provider_used'] = 'near-duplicate'
+                reused['phash'] = image_hash
+                reused['cached'] = True
+                reused['cache_tier'] = 'near-duplicate'
+                reused.pop('payload', None)
+                reused.pop('routing', None)
+                reused.pop('usage', None)
+                reused.pop('multi_image', None)
+                return reused, cache_key, image_hash
+
+        return None, cache_key, image_hash
+
+    def _classify_cascade(self, image_bytes, top_k, image_hash, cache_key):
+        """Run the local model first; escalate to a cloud provider only when it is unsure"""
+        start = time.perf_counter()
+        local_result = None
+        try:
+            local_result = self._timed_classify(image_bytes, AIProvider.LOCAL, top_k)
+        except Exception as e:
+            print(f"[WARNING] Cascade local tier failed: {e}")
+        local_ms = (time.perf_counter() - start) * 1000
+
+        reason = escalation_reason(local_result)
+        if reason is None:
+            cascade_stats.record(local_ms, local_ms)
+            return self._finish_cascade(local_result, AIProvider.LOCAL, None, image_hash, cache_key)
+
+        escalate_to = self._escalation_provider()
+        cloud_result = None
+        escalation_ms = None
+        if escalate_to is not None:
+            cloud_start = time.perf_counter()
+            try:
+                cloud_result = self._timed_classify(image_bytes, escalate_to, top_k)
+            except Exception as e:
+                print(f"[WARNING] Cascade escalation to {escalate_to.value} failed: {e}")
+            escalation_ms = (time.perf_counter() - cloud_start) * 1000
+
+        local_usable = reason != 'local-unavailable'
+        agreed = None
+        if cloud_result and local_usable:
+            agreed = cloud_result.get('waste_type') == local_result.get('waste_type')
+
+        cascade_stats.record(
+            local_ms,
+            (time.perf_counter() - start) * 1000,
+            reason=reason,
+            escalated_to=escalate_to.value if escalate_to else None,
+            escalation_ms=escalation_ms,
+            agreed=agreed,
+            failed=escalate_to is not None and not cloud_result
+        )
+
+        if cloud_result:
+            return self._finish_cascade(cloud_result, escalate_to, reason, image_hash, cache_key)
+        if local_usable:
+            # Unsure, but better than failing; not cached so the cloud tier is retried
+            return self._finish_cascade(local_result, AIProvider.LOCAL, reason, image_hash, None)
         raise RuntimeError("All AI providers failed. Please check configuration.")
 
-    def _classify_with_provider(self, image_path, provider, top_k):
+    def _escalation_provider(self):
+        """First configured cloud provider whose circuit is not open"""
+        for provider in self.config.CASCADE_ESCALATION_PROVIDERS:
+            if self.config.is_provider_configured(provider) and circuit_breakers.is_available(provider):
+                return provider
+        return None
+
+    def _finish_cascade(self, result, provider, reason, image_hash, cache_key):
+        """Tag a cascade result with the tier that answered and cache it"""
+        result['provider_used'] = provider.value
+        result['phash'] = image_hash
+        result['cascade'] = {
+            'tier': provider.value,
+            'escalated': reason is not None,
+            'reason': reason
+        }
+        if cache_key:
+            result_cache.put(cache_key, result)
+        result['cached'] = False
+        return result
+
+    def _finish_result(self, result, provider, image_hash, cache_key, routing=None):
+        """Tag a fresh provider result and cache it if it came from the primary"""
+        primary = AIProvider(routing['provider']) if routing and routing['provider'] else self.provider
+        result['provider_used'] = provider.value
+        result['phash'] = image_hash
+        if routing is not None:
+            result['routing'] = routing
+        if provider != primary:
+            result['fallback'] = True
+        elif (provider == self.provider and cache_key and result.get('raw_category') != 'fallback-local'
+              and self._matches_cache_key(result, cache_key)):
+            # The cache key names this classifier's provider and model; routed answers
+            # from others, or answers from a model re-resolved since the key was built, are not stored
+            result_cache.put(cache_key, result)
+        result['cached'] = False
+        return result
+
+    @staticmethod
+    def _matches_cache_key(result, cache_key):
+        """Whether the model that produced a result is the one named in the cache key"""
+        model = result.get('model')
+        return not model or f":{model}:" in cache_key
+
+    def _is_acceptable(self, result):
+        """Whether a result is confident enough to return without waiting for others"""
+        if result.get('raw_category') == 'fallback-local':
+            return False
+        try:
+            return float(result.get('confidence') or 0) >= self.config.CONFIDENCE_THRESHOLD
+        except (TypeError, ValueError):
+            return False
+
+    def _timed_classify(self, image_bytes, provider, top_k):
+        """Call a provider through its circuit breaker and record its latency"""
+        breaker = circuit_breakers.get(provider) if self.config.BREAKER_ENABLED else None
+        if breaker is not None and not breaker.allow_request():
+            raise CircuitOpenError(f"{provider.value} circuit is open")
+        provider_router.record_call(provider)
+
+        start = time.perf_counter()
+        try:
+            result = self._classify_with_provider(image_bytes, provider, top_k)
+        except Exception as e:
+            if breaker is not None:
+                breaker.record_failure((time.perf_counter() - start) * 1000, e)
+            raise
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        if breaker is not None:
+            breaker.record_success(latency_ms)
+        if result and result.get('raw_category') != 'fallback-local':
+            provider_latency.record(provider, latency_ms)
+        if result and isinstance(image_bytes, RequestImage):
+            payload = image_bytes.payload_info(provider)
+            if payload is not None:
+                result['payload'] = payload
+        return result
+
+    def _delegate_for(self, provider):
+        """Classifier that owns the provider's resources (warm model, handles)"""
+        if provider == self.provider:
+            return self
+        # Imported here: the pool module imports this one
+        from models.classifier_pool import classifier_pool
+        return classifier_pool.get(provider)
+
+    @staticmethod
+    def _read_image_bytes(image):
+        """
+        Get the encoded image as bytes, reading from disk only for paths
+
+        Returns a RequestImage so the payload prepared for each cloud provider
+        is built once per request, however many times that provider is called.
+        """
+        if isinstance(image, RequestImage):
+            return image
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return RequestImage(image)
+        if hasattr(image, 'read'):
+            if hasattr(image, 'seek'):
+                image.seek(0)
+            return RequestImage(image.read())
+        with open(image, "rb") as f:
+            return RequestImage(f.read())
+
+    def _perceptual_hash(self, image_bytes):
+        """dHash of the upload, or None when disabled or undecodable"""
+        if not self.config.PHASH_INDEX_ENABLED or not image_bytes:
+            return None
+        try:
+            return dhash(image_bytes)
+        except Exception as e:
+            print(f"[WARNING] Could not hash image: {e}")
+            return None
+
+    def _classify_with_provider(self, image_bytes, provider, top_k):
         """Route to appropriate classification method based on provider"""
+        if provider != self.provider:
+            # e.g. a fallback to LOCAL should use the pooled, loaded model
+            return self._delegate_for(provider)._classify_with_provider(image_bytes, provider, top_k)
+
         if provider == AIProvider.LOCAL:
-            return self._classify_local(image_path, top_k)
+            return self._classify_local(image_bytes, top_k)
         elif provider == AIProvider.HUGGINGFACE:
-            return self._classify_huggingface(image_path, top_k)
+            return self._classify_huggingface(image_bytes, top_k)
         elif provider == AIProvider.GEMINI:
-            return self._classify_gemini(image_path, top_k)
+            return self._classify_gemini(image_bytes, top_k)
         elif provider == AIProvider.OPENAI:
-            return self._classify_openai(image_path, top_k)
+            return self._classify_openai(image_bytes, top_k)
         else:
             raise ValueError(f"Unknown provider: {provider}")
 
-    def _classify_local(self, image_path, top_k):
-        """Classify using local TensorFlow model"""
-        if not self.local_model or self.cv2 is None:
+    def _classify_local(self, image_bytes, top_k, local=None):
+        """Classify using the served local model version (or the given one)"""
+        local = local or self.registry.active()
+        if local is None:
             return {
                 'waste_type': 'general',
                 'raw_category': 'fallback-local',
@@ -125,23 +714,29 @@ class UnifiedWasteClassifier:
                 ]
             }
 
-        # Preprocess image
-        img = self.cv2.imread(image_path)
-        if img is None:
-            raise ValueError(f"Could not load image from {image_path}")
+        img = self._preprocess_local(image_bytes, input_size=local.input_size)
 
-        img = self.cv2.cvtColor(img, self.cv2.COLOR_BGR2RGB)
-        img = self.cv2.resize(img, self.config.LOCAL_MODEL_INPUT_SIZE)
-        img = img.astype(np.float32) / 255.0
-        img = np.expand_dims(img, axis=0)
+        # Predict (batched with concurrent requests when enabled)
+        if local.batcher is not None:
+            predictions = local.batcher.submit(img, timeout=self.config.LOCAL_BATCH_TIMEOUT_SECONDS)
+        else:
+            predictions = local.model.predict(np.expand_dims(img, axis=0), verbose=0)[0]
 
-        # Predict
-        predictions = self.local_model.predict(img, verbose=0)[0]
+        return self._local_result(predictions, top_k, local)
 
+    def _preprocess_local(self, image_bytes, out=None, input_size=None):
+        """Decode image bytes into a normalized model input tensor (optionally into `out`)"""
+        # Imported here so cv2 stays unloaded until the local model is used
+        from utils.image_processing import load_model_input
+        return load_model_input(image_bytes, input_size or self.config.LOCAL_MODEL_INPUT_SIZE, out=out)
+
+    def _local_result(self, predictions, top_k, local=None):
+        """Build a classification dict from one row of model scores"""
         # Get top predictions
         top_indices = np.argsort(predictions)[-top_k:][::-1]
 
-        waste_categories = self.config.WASTE_CATEGORIES
+        # Class order comes from the served version's class_indices.json
+        waste_categories = local.class_names if local is not None else self.config.WASTE_CATEGORIES
         top_class = waste_categories[top_indices[0]]
         top_confidence = float(predictions[top_indices[0]])
 
@@ -149,6 +744,7 @@ class UnifiedWasteClassifier:
             'waste_type': self.config.CATEGORY_MAPPING.get(top_class, top_class),
             'raw_category': top_class,
             'confidence': top_confidence,
+            'model_version': local.version if local is not None else None,
             'all_predictions': [
                 {
                     'class': waste_categories[idx],
@@ -159,24 +755,21 @@ class UnifiedWasteClassifier:
             ]
         }
 
-    def _classify_huggingface(self, image_path, top_k):
+    def _classify_huggingface(self, image_bytes, top_k):
         """Classify using Hugging Face Inference API"""
         api_key = self.config.HUGGINGFACE_API_KEY
         if not api_key:
             raise ValueError("HUGGINGFACE_API_KEY not configured")
 
-        # Read and encode image
-        with open(image_path, "rb") as f:
-            image_bytes = f.read()
-
-        headers = {"Authorization": f"Bearer {api_key}"}
+        # Downscaled / re-encoded per the provider payload policy
+        payload = provider_payload(image_bytes, AIProvider.HUGGINGFACE)
+        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": payload.mime_type}
 
-        # Try image classification endpoint
-        response = requests.post(
+        # Try image classification endpoint (pooled keep-alive connection)
+        response = get_http_client('huggingface').post(
             self.config.HUGGINGFACE_API_URL,
             headers=headers,
-            data=image_bytes,
-            timeout=30
+            data=payload.data
         )
 
         if response.status_code == 403:
@@ -192,8 +785,14 @@ class UnifiedWasteClassifier:
 
         return best_match
 
-    def _classify_gemini(self, image_path, top_k):
-        """Classify using Google Gemini Vision API"""
+    def _resolve_gemini_model(self):
+        """
+        Configure the Gemini SDK and pick a working model once
+
+        Lists the account's models a single time and keeps the first
+        preferred model that supports generateContent. The handle is reused
+        by every request until a model-not-found error forces re-resolution.
+        """
         api_key = self.config.GEMINI_API_KEY
         if not api_key:
             raise ValueError("GEMINI_API_KEY not configured")
@@ -203,77 +802,90 @@ class UnifiedWasteClassifier:
         except ImportError:
             raise ImportError("Install google-generativeai: pip install google-generativeai")
 
+        start = time.perf_counter()
+        genai.configure(api_key=api_key)
+
+        generation_config = {
+            "temperature": 0.4,
+            "top_p": 1,
+            "top_k": 32,
+            "max_output_tokens": 512,
+        }
+
+        # Preferred Gemini models (in order of preference)
+        candidates = [
+            "gemini-2.0-flash-lite",
+            "gemini-2.0-flash-lite-001",
+            "gemini-flash-lite-latest",
+        ]
+        if self.config.GEMINI_MODEL:
+            config_model = self.config.GEMINI_MODEL.replace('models/', '')
+            if config_model not in candidates:
+                candidates.insert(0, config_model)
+        candidates = [name for name in candidates if name not in self._gemini_unavailable]
+        if not candidates:
+            raise RuntimeError("Every configured Gemini model has been reported unavailable")
+
+        # One listing call tells us which candidates this key can actually use
+        available = None
         try:
-            # Configure API
-            genai.configure(api_key=api_key)
-            
-            # List available models for debugging
-            try:
-                print("[INFO] Listing available Gemini models...")
-                available_model_list = genai.list_models()
-                vision_models = [m.name for m in available_model_list if 'generateContent' in m.supported_generation_methods]
-                print(f"[INFO] Available vision models: {vision_models}")
-            except Exception as e:
-                print(f"[WARNING] Could not list models: {e}")
-            
-            # Initialize model with proper configuration
-            generation_config = {
-                "temperature": 0.4,
-                "top_p": 1,
-                "top_k": 32,
-                "max_output_tokens": 512,
+            available = {
+                m.name.replace('models/', '')
+                for m in genai.list_models()
+                if 'generateContent' in m.supported_generation_methods
             }
-            
-            # List of available Gemini models to try (in order of preference)
-            # Note: Don't include 'models/' prefix - SDK adds it automatically
-            available_models = [
-            "models/gemini-2.0-flash-lite",
-            "models/gemini-2.0-flash-lite-001",
-            "models/gemini-flash-lite-latest",
-            ]
+        except Exception as e:
+            print(f"[WARNING] Could not list Gemini models, using first candidate: {e}")
 
-            
-            # Add config model if it exists and is different
-            if hasattr(self.config, 'GEMINI_MODEL') and self.config.GEMINI_MODEL:
-                config_model = self.config.GEMINI_MODEL.replace('models/', '')  # Remove prefix if present
-                if config_model not in available_models:
-                    available_models.insert(0, config_model)
-            
-            model = None
-            last_error = None
-            
-            for model_name in available_models:
-                try:
-                    # Try both with and without 'models/' prefix
-                    for name_variant in [model_name, f"models/{model_name}"]:
-                        try:
-                            model = genai.GenerativeModel(
-                                model_name=name_variant,
-                                generation_config=generation_config
-                            )
-                            print(f"[INFO] Successfully loaded Gemini model: {name_variant}")
-                            break
-                        except Exception as e:
-                            last_error = e
-                            continue
-                    
-                    if model is not None:
-                        break
-                        
-                except Exception as e:
-                    last_error = e
-                    print(f"[WARNING] Failed to load {model_name}: {e}")
-                    continue
-            
-            if model is None:
-                raise RuntimeError(f"Could not initialize any Gemini model. Last error: {last_error}")
+        if available:
+            usable = [name for name in candidates if name in available]
+            if not usable:
+                raise RuntimeError(f"None of the Gemini models {candidates} are available for this API key")
+            model_name = usable[0]
+        else:
+            model_name = candidates[0]
+
+        model = genai.GenerativeModel(
+            model_name=f"models/{model_name}",
+            generation_config=generation_config
+        )
+
+        resolve_ms = (time.perf_counter() - start) * 1000
+        with self._gemini_lock:
+            self._gemini_model = model
+            self._gemini_model_name = model_name
+            self._gemini_stats['resolutions'] += 1
+            self._gemini_stats['last_resolve_ms'] = round(resolve_ms, 2)
+        print(f"[INFO] Gemini model resolved: {model_name} ({resolve_ms:.0f} ms)")
+        return model
+
+    def _get_gemini_model(self):
+        """Get the cached Gemini model handle, resolving it on first use"""
+        model = self._gemini_model
+        if model is not None:
+            with self._gemini_lock:
+                self._gemini_stats['reused'] += 1
+            return model
+
+        # Concurrent first requests wait here instead of all listing models
+        with self._gemini_resolve_lock:
+            if self._gemini_model is not None:
+                return self._gemini_model
+            return self._resolve_gemini_model()
+
+    @staticmethod
+    def _is_model_not_found(error):
+        message = str(error).lower()
+        return '404' in message or 'not found' in message or 'is not supported' in message
+
+    def _classify_gemini(self, image_bytes, top_k):
+        """Classify using Google Gemini Vision API"""
+        try:
+            model = self._get_gemini_model()
 
-            # Load and prepare image
-            img = Image.open(image_path)
-            
-            # Convert to RGB if necessary
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
+            # Send the policy-sized encoded image as-is (the SDK would re-encode a PIL image)
+            payload = provider_payload(image_bytes, AIProvider.GEMINI)
+            img = {'mime_type': payload.mime_type, 'data': payload.data}
 
             # Create prompt for waste classification
             prompt = f"""Analyze this image and classify the waste type.
@@ -287,7 +899,19 @@ The waste_type must be one of the available categories listed above."""
 
             # Generate content with error handling
             try:
-                response = model.generate_content([prompt, img])
+                try:
+                    response = model.generate_content([prompt, img])
+                except Exception as e:
+                    if not self._is_model_not_found(e):
+                        raise
+                    # Model was retired or renamed: re-resolve once and retry
+                    print(f"[WARNING] Gemini model {self._gemini_model_name} unavailable, re-resolving: {e}")
+                    with self._gemini_resolve_lock:
+                        if self._gemini_model is model:
+                            self._gemini_unavailable.add(self._gemini_model_name)
+                            self._gemini_model = None
+                    model = self._get_gemini_model()
+                    response = model.generate_content([prompt, img])
                 
                 # Check if response was blocked
                 if not response.text:
@@ -296,6 +920,7 @@ The waste_type must be one of the available categories listed above."""
                     raise RuntimeError("Gemini returned empty response")
                 
                 text = response.text.strip()
+                usage = self._gemini_usage(response)
                 
             except Exception as e:
                 raise RuntimeError(f"Gemini API call failed: {str(e)}")
@@ -318,32 +943,12 @@ The waste_type must be one of the available categories listed above."""
                     result = json.loads(text)
                 
                 waste_type = result.get('waste_type', 'general')
-                confidence = float(result.get('confidence', 0.7))
+                confidence = parse_confidence(result.get('confidence'))
                 
-                # Validate waste_type is in available categories
-                if waste_type not in self.config.WASTE_CATEGORIES:
-                    # Try to find closest match
-                    waste_type_lower = waste_type.lower()
-                    for category in self.config.WASTE_CATEGORIES:
-                        if category.lower() in waste_type_lower or waste_type_lower in category.lower():
-                            waste_type = category
-                            break
-                    else:
-                        waste_type = 'general'
-
-                return {
-                    'waste_type': self.config.CATEGORY_MAPPING.get(waste_type, waste_type),
-                    'raw_category': waste_type,
-                    'confidence': confidence,
-                    'reasoning': result.get('reasoning', ''),
-                    'all_predictions': [
-                        {
-                            'class': waste_type,
-                            'mapped_type': self.config.CATEGORY_MAPPING.get(waste_type, waste_type),
-                            'confidence': confidence
-                        }
-                    ]
-                }
+                classification = self._llm_result(waste_type, confidence, result.get('reasoning', ''))
+                classification['usage'] = usage
+                classification['model'] = self._gemini_model_name
+                return classification
                 
             except json.JSONDecodeError as e:
                 print(f"[ERROR] Failed to parse Gemini JSON response: {text}")
@@ -371,7 +976,9 @@ The waste_type must be one of the available categories listed above."""
                             'mapped_type': self.config.CATEGORY_MAPPING.get(waste_type, waste_type),
                             'confidence': confidence
                         }
-                    ]
+                    ],
+                    'usage': usage,
+                    'model': self._gemini_model_name
                 }
                 
         except ImportError as e:
@@ -380,25 +987,16 @@ The waste_type must be one of the available categories listed above."""
             print(f"[ERROR] Gemini classification failed: {str(e)}")
             raise RuntimeError(f"Gemini classification error: {str(e)}")
 
-    def _classify_openai(self, image_path, top_k):
+    def _classify_openai(self, image_bytes, top_k):
         """Classify using OpenAI GPT-4 Vision API"""
         api_key = self.config.OPENAI_API_KEY
         if not api_key:
             raise ValueError("OPENAI_API_KEY not configured")
 
-        # Encode image to base64
-        with open(image_path, "rb") as f:
-            image_data = base64.b64encode(f.read()).decode('utf-8')
-
-        # Determine image type
-        ext = os.path.splitext(image_path)[1].lower()
-        mime_type = {
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.webp': 'image/webp'
-        }.get(ext, 'image/jpeg')
+        # Encode the policy-sized image to base64
+        payload = provider_payload(image_bytes, AIProvider.OPENAI)
+        image_data = base64.b64encode(payload.data).decode('utf-8')
+        mime_type = payload.mime_type
 
         headers = {
             "Content-Type": "application/json",
@@ -436,11 +1034,10 @@ Respond in this EXACT JSON format:
             "max_tokens": 300
         }
 
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
+        response = get_http_client('openai').post(
+            self.config.OPENAI_API_URL,
             headers=headers,
-            json=payload,
-            timeout=30
+            json=payload
         )
 
         if response.status_code != 200:
@@ -454,7 +1051,7 @@ Respond in this EXACT JSON format:
         if json_match:
             parsed = json.loads(json_match.group())
             waste_type = parsed.get('waste_type', 'general')
-            confidence = parsed.get('confidence', 0.7)
+            confidence = parse_confidence(parsed.get('confidence'))
 
             return {
                 'waste_type': self.config.CATEGORY_MAPPING.get(waste_type, waste_type),
@@ -467,11 +1064,101 @@ Respond in this EXACT JSON format:
                         'mapped_type': self.config.CATEGORY_MAPPING.get(waste_type, waste_type),
                         'confidence': confidence
                     }
-                ]
+                ],
+                'usage': self._openai_usage(result)
             }
 
         raise ValueError("Could not parse OpenAI response")
 
+    def _gemini_multi_image(self, images):
+        """Several images in one generate_content call; returns (text, token usage)"""
+        model = self._get_gemini_model()
+        parts = [build_prompt(len(images))]
+        for label, image_bytes in enumerate(images, 1):
+            payload = provider_payload(image_bytes, AIProvider.GEMINI)
+            parts += [f"Image {label}:", {'mime_type': payload.mime_type, 'data': payload.data}]
+
+        response = model.generate_content(parts, generation_config={
+            'response_mime_type': 'application/json',
+            'response_schema': gemini_response_schema()
+        })
+        return response.text, self._gemini_usage(response)
+
+    def _openai_multi_image(self, images):
+        """Several images in one chat completion; returns (text, token usage)"""
+        api_key = self.config.OPENAI_API_KEY
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY not configured")
+
+        content = [{"type": "text", "text": build_prompt(len(images))}]
+        for label, image_bytes in enumerate(images, 1):
+            payload = provider_payload(image_bytes, AIProvider.OPENAI)
+            image_data = base64.b64encode(payload.data).decode('utf-8')
+            content += [
+                {"type": "text", "text": f"Image {label}:"},
+                {"type": "image_url", "image_url": {"url": f"data:{payload.mime_type};base64,{image_data}"}}
+            ]
+
+        response = get_http_client('openai').post(
+            self.config.OPENAI_API_URL,
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"},
+            json={
+                "model": self.config.OPENAI_MODEL,
+                "messages": [{"role": "user", "content": content}],
+                "response_format": openai_response_format(),
+                "max_tokens": 100 + 80 * len(images)
+            }
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"OpenAI API error: {response.text}")
+
+        body = response.json()
+        return body['choices'][0]['message']['content'], self._openai_usage(body)
+
+    @staticmethod
+    def _gemini_usage(response):
+        """Token counts reported with a Gemini response"""
+        usage = getattr(response, 'usage_metadata', None)
+        return {
+            'input_tokens': getattr(usage, 'prompt_token_count', 0) or 0,
+            'output_tokens': getattr(usage, 'candidates_token_count', 0) or 0
+        }
+
+    @staticmethod
+    def _openai_usage(body):
+        """Token counts reported with a chat completion"""
+        usage = body.get('usage') or {}
+        return {
+            'input_tokens': usage.get('prompt_tokens', 0),
+            'output_tokens': usage.get('completion_tokens', 0)
+        }
+
+    def _llm_result(self, waste_type, confidence, reasoning):
+        """Result dict for a category named by an LLM, snapped to the known categories"""
+        if waste_type not in self.config.WASTE_CATEGORIES:
+            # Try to find closest match
+            waste_type_lower = waste_type.lower()
+            for category in self.config.WASTE_CATEGORIES:
+                if category.lower() in waste_type_lower or waste_type_lower in category.lower():
+                    waste_type = category
+                    break
+            else:
+                waste_type = 'general'
+
+        return {
+            'waste_type': self.config.CATEGORY_MAPPING.get(waste_type, waste_type),
+            'raw_category': waste_type,
+            'confidence': confidence,
+            'reasoning': reasoning,
+            'all_predictions': [
+                {
+                    'class': waste_type,
+                    'mapped_type': self.config.CATEGORY_MAPPING.get(waste_type, waste_type),
+                    'confidence': confidence
+                }
+            ]
+        }
+
     def _match_to_waste_categories(self, hf_results):
         """Match Hugging Face generic labels to waste categories"""
         # This is a simple keyword matching - can be enhanced
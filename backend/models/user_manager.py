@@ -5,114 +5,24 @@ import json
 from datetime import datetime, timedelta
 from typing import Optional, Dict, List
 
+from utils.db_pool import get_db_pool
+from models.migrations import run_migrations
+
 class UserManager:
+    # Database files migrated by this process
+    _initialized = set()
+
     def __init__(self, db_path='wastewise.db'):
         self.db_path = db_path
-        self.init_user_tables()
+        self.pool = get_db_pool(db_path)
+        if self.pool.db_path not in UserManager._initialized:
+            self.init_user_tables()
 
     def init_user_tables(self):
-        """Initialize user-related database tables"""
+        """Bring the user tables up to date (tables and indexes live in models/migrations.py)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # Create users table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id TEXT PRIMARY KEY,
-                    email TEXT UNIQUE NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    full_name TEXT NOT NULL,
-                    phone TEXT,
-                    role TEXT DEFAULT 'user',
-                    is_verified BOOLEAN DEFAULT FALSE,
-                    is_active BOOLEAN DEFAULT TRUE,
-                    avatar_url TEXT,
-                    address TEXT,
-                    city TEXT,
-                    state TEXT,
-                    pincode TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_login TIMESTAMP,
-                    login_attempts INTEGER DEFAULT 0,
-                    locked_until TIMESTAMP
-                )
-            ''')
-
-            # Create user_profiles table for additional information
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS user_profiles (
-                    user_id TEXT PRIMARY KEY,
-                    bio TEXT,
-                    preferences TEXT,
-                    notification_settings TEXT,
-                    language TEXT DEFAULT 'en',
-                    timezone TEXT DEFAULT 'Asia/Kolkata',
-                    FOREIGN KEY (user_id) REFERENCES users (id)
-                )
-            ''')
-
-            # Create password_reset_tokens table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS password_reset_tokens (
-                    id TEXT PRIMARY KEY,
-                    user_id TEXT NOT NULL,
-                    token TEXT UNIQUE NOT NULL,
-                    expires_at TIMESTAMP NOT NULL,
-                    used_at TIMESTAMP,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (id)
-                )
-            ''')
-
-            # Create email_verification_tokens table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS email_verification_tokens (
-                    id TEXT PRIMARY KEY,
-                    user_id TEXT NOT NULL,
-                    token TEXT UNIQUE NOT NULL,
-                    expires_at TIMESTAMP NOT NULL,
-                    verified_at TIMESTAMP,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (id)
-                )
-            ''')
-
-            # Create revoked_tokens table for JWT blacklisting
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS revoked_tokens (
-                    id TEXT PRIMARY KEY,
-                    jti TEXT UNIQUE NOT NULL,
-                    user_id TEXT,
-                    revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    expires_at TIMESTAMP NOT NULL
-                )
-            ''')
-
-            # Create user_activity_logs table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS user_activity_logs (
-                    id TEXT PRIMARY KEY,
-                    user_id TEXT,
-                    action TEXT NOT NULL,
-                    details TEXT,
-                    ip_address TEXT,
-                    user_agent TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (id)
-                )
-            ''')
-
-            # Create indexes for better performance
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_email ON users (email)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_phone ON users (phone)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_role ON users (role)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_revoked_tokens_jti ON revoked_tokens (jti)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_activity_logs_user_id ON user_activity_logs (user_id)')
-
-            conn.commit()
-            conn.close()
+            run_migrations(self.pool.db_path)
+            UserManager._initialized.add(self.pool.db_path)
             print("User tables initialized successfully")
 
         except Exception as e:
@@ -129,44 +39,42 @@ class UserManager:
     def create_user(self, user_data: Dict) -> Optional[str]:
         """Create a new user"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
             user_id = str(uuid.uuid4())
+            # Hashed before taking a connection: bcrypt is deliberately slow
             password_hash = self.hash_password(user_data['password'])
 
-            cursor.execute('''
-                INSERT INTO users (id, email, password_hash, full_name, phone, role, address, city, state, pincode)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                user_id,
-                user_data['email'],
-                password_hash,
-                user_data['full_name'],
-                user_data.get('phone'),
-                user_data.get('role', 'user'),
-                user_data.get('address'),
-                user_data.get('city'),
-                user_data.get('state'),
-                user_data.get('pincode')
-            ))
-
-            # Create user profile
-            cursor.execute('''
-                INSERT INTO user_profiles (user_id, preferences, notification_settings)
-                VALUES (?, ?, ?)
-            ''', (
-                user_id,
-                json.dumps({}),
-                json.dumps({
-                    'email_notifications': True,
-                    'sms_notifications': True,
-                    'push_notifications': True
-                })
-            ))
-
-            conn.commit()
-            conn.close()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('''
+                    INSERT INTO users (id, email, password_hash, full_name, phone, role, address, city, state, pincode)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    user_id,
+                    user_data['email'],
+                    password_hash,
+                    user_data['full_name'],
+                    user_data.get('phone'),
+                    user_data.get('role', 'user'),
+                    user_data.get('address'),
+                    user_data.get('city'),
+                    user_data.get('state'),
+                    user_data.get('pincode')
+                ))
+
+                # Create user profile
+                cursor.execute('''
+                    INSERT INTO user_profiles (user_id, preferences, notification_settings)
+                    VALUES (?, ?, ?)
+                ''', (
+                    user_id,
+                    json.dumps({}),
+                    json.dumps({
+                        'email_notifications': True,
+                        'sms_notifications': True,
+                        'push_notifications': True
+                    })
+                ))
 
             self.log_user_activity(user_id, 'user_registered', {'email': user_data['email']})
             return user_id
@@ -184,16 +92,16 @@ class UserManager:
     def authenticate_user(self, email: str, password: str, ip_address: str = None) -> Optional[Dict]:
         """Authenticate user with email and password"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
 
-            # Check if account is locked
-            cursor.execute('''
-                SELECT id, password_hash, full_name, role, is_active, login_attempts, locked_until
-                FROM users WHERE email = ?
-            ''', (email,))
+                # Check if account is locked
+                cursor.execute('''
+                    SELECT id, password_hash, full_name, role, is_active, login_attempts, locked_until
+                    FROM users WHERE email = ?
+                ''', (email,))
 
-            user = cursor.fetchone()
+                user = cursor.fetchone()
             if not user:
                 return None
 
@@ -206,7 +114,7 @@ class UserManager:
             if not is_active:
                 raise Exception("Account is deactivated")
 
-            # Verify password
+            # Verify password (no connection held: bcrypt is deliberately slow)
             if not self.verify_password(password, password_hash):
                 # Increment login attempts
                 new_attempts = login_attempts + 1
@@ -215,24 +123,21 @@ class UserManager:
                 if new_attempts >= 5:  # Lock account after 5 failed attempts
                     locked_until_time = datetime.now() + timedelta(minutes=30)
 
-                cursor.execute('''
-                    UPDATE users SET login_attempts = ?, locked_until = ?
-                    WHERE id = ?
-                ''', (new_attempts, locked_until_time, user_id))
-                conn.commit()
-                conn.close()
+                with self.pool.connection() as conn:
+                    conn.execute('''
+                        UPDATE users SET login_attempts = ?, locked_until = ?
+                        WHERE id = ?
+                    ''', (new_attempts, locked_until_time, user_id))
 
                 self.log_user_activity(user_id, 'login_failed', {'ip_address': ip_address})
                 return None
 
             # Reset login attempts on successful login
-            cursor.execute('''
-                UPDATE users SET login_attempts = 0, locked_until = NULL, last_login = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (user_id,))
-
-            conn.commit()
-            conn.close()
+            with self.pool.connection() as conn:
+                conn.execute('''
+                    UPDATE users SET login_attempts = 0, locked_until = NULL, last_login = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (user_id,))
 
             self.log_user_activity(user_id, 'login_success', {'ip_address': ip_address})
 
@@ -249,20 +154,19 @@ class UserManager:
     def get_user_by_id(self, user_id: str) -> Optional[Dict]:
         """Get user by ID"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute('''
-                SELECT u.id, u.email, u.full_name, u.phone, u.role, u.is_verified,
-                       u.avatar_url, u.address, u.city, u.state, u.pincode, u.created_at,
-                       p.bio, p.preferences, p.notification_settings, p.language, p.timezone
-                FROM users u
-                LEFT JOIN user_profiles p ON u.id = p.user_id
-                WHERE u.id = ? AND u.is_active = TRUE
-            ''', (user_id,))
+                cursor.execute('''
+                    SELECT u.id, u.email, u.full_name, u.phone, u.role, u.is_verified,
+                           u.avatar_url, u.address, u.city, u.state, u.pincode, u.created_at,
+                           p.bio, p.preferences, p.notification_settings, p.language, p.timezone
+                    FROM users u
+                    LEFT JOIN user_profiles p ON u.id = p.user_id
+                    WHERE u.id = ? AND u.is_active = TRUE
+                ''', (user_id,))
 
-            row = cursor.fetchone()
-            conn.close()
+                row = cursor.fetchone()
 
             if not row:
                 return None
@@ -294,54 +198,51 @@ class UserManager:
     def update_user_profile(self, user_id: str, update_data: Dict) -> bool:
         """Update user profile"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # Prepare user table updates
-            user_fields = ['full_name', 'phone', 'avatar_url', 'address', 'city', 'state', 'pincode']
-            user_updates = []
-            user_values = []
-
-            for field in user_fields:
-                if field in update_data:
-                    user_updates.append(f"{field} = ?")
-                    user_values.append(update_data[field])
-
-            if user_updates:
-                user_values.append(user_id)
-                cursor.execute(f'''
-                    UPDATE users SET {', '.join(user_updates)}, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', user_values)
-
-            # Prepare profile table updates
-            profile_fields = ['bio', 'language', 'timezone']
-            profile_updates = []
-            profile_values = []
-
-            for field in profile_fields:
-                if field in update_data:
-                    profile_updates.append(f"{field} = ?")
-                    profile_values.append(update_data[field])
-
-            # Handle preferences and notification_settings
-            if 'preferences' in update_data:
-                profile_updates.append("preferences = ?")
-                profile_values.append(json.dumps(update_data['preferences']))
-
-            if 'notification_settings' in update_data:
-                profile_updates.append("notification_settings = ?")
-                profile_values.append(json.dumps(update_data['notification_settings']))
-
-            if profile_updates:
-                profile_values.append(user_id)
-                cursor.execute(f'''
-                    UPDATE user_profiles SET {', '.join(profile_updates)}
-                    WHERE user_id = ?
-                ''', profile_values)
-
-            conn.commit()
-            conn.close()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+
+                # Prepare user table updates
+                user_fields = ['full_name', 'phone', 'avatar_url', 'address', 'city', 'state', 'pincode']
+                user_updates = []
+                user_values = []
+
+                for field in user_fields:
+                    if field in update_data:
+                        user_updates.append(f"{field} = ?")
+                        user_values.append(update_data[field])
+
+                if user_updates:
+                    user_values.append(user_id)
+                    cursor.execute(f'''
+                        UPDATE users SET {', '.join(user_updates)}, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    ''', user_values)
+
+                # Prepare profile table updates
+                profile_fields = ['bio', 'language', 'timezone']
+                profile_updates = []
+                profile_values = []
+
+                for field in profile_fields:
+                    if field in update_data:
+                        profile_updates.append(f"{field} = ?")
+                        profile_values.append(update_data[field])
+
+                # Handle preferences and notification_settings
+                if 'preferences' in update_data:
+                    profile_updates.append("preferences = ?")
+                    profile_values.append(json.dumps(update_data['preferences']))
+
+                if 'notification_settings' in update_data:
+                    profile_updates.append("notification_settings = ?")
+                    profile_values.append(json.dumps(update_data['notification_settings']))
+
+                if profile_updates:
+                    profile_values.append(user_id)
+                    cursor.execute(f'''
+                        UPDATE user_profiles SET {', '.join(profile_updates)}
+                        WHERE user_id = ?
+                    ''', profile_values)
 
             self.log_user_activity(user_id, 'profile_updated', update_data)
             return True
@@ -353,25 +254,22 @@ class UserManager:
     def change_password(self, user_id: str, current_password: str, new_password: str) -> bool:
         """Change user password"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # Verify current password
-            cursor.execute('SELECT password_hash FROM users WHERE id = ?', (user_id,))
-            row = cursor.fetchone()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT password_hash FROM users WHERE id = ?', (user_id,))
+                row = cursor.fetchone()
 
+            # Verify current password (no connection held: bcrypt is deliberately slow)
             if not row or not self.verify_password(current_password, row[0]):
                 return False
 
             # Update password
             new_password_hash = self.hash_password(new_password)
-            cursor.execute('''
-                UPDATE users SET password_hash = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (new_password_hash, user_id))
-
-            conn.commit()
-            conn.close()
+            with self.pool.connection() as conn:
+                conn.execute('''
+                    UPDATE users SET password_hash = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (new_password_hash, user_id))
 
             self.log_user_activity(user_id, 'password_changed')
             return True
@@ -383,16 +281,11 @@ class UserManager:
     def revoke_token(self, jti: str, user_id: str = None, expires_at: datetime = None):
         """Add token to blacklist"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                INSERT INTO revoked_tokens (id, jti, user_id, expires_at)
-                VALUES (?, ?, ?, ?)
-            ''', (str(uuid.uuid4()), jti, user_id, expires_at))
-
-            conn.commit()
-            conn.close()
+            with self.pool.connection() as conn:
+                conn.execute('''
+                    INSERT INTO revoked_tokens (id, jti, user_id, expires_at)
+                    VALUES (?, ?, ?, ?)
+                ''', (str(uuid.uuid4()), jti, user_id, expires_at))
 
         except Exception as e:
             print(f"Error revoking token: {str(e)}")
@@ -400,12 +293,10 @@ class UserManager:
     def is_token_revoked(self, jti: str) -> bool:
         """Check if token is revoked"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('SELECT id FROM revoked_tokens WHERE jti = ?', (jti,))
-            result = cursor.fetchone()
-            conn.close()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT id FROM revoked_tokens WHERE jti = ?', (jti,))
+                result = cursor.fetchone()
 
             return result is not None
 
@@ -416,23 +307,18 @@ class UserManager:
     def log_user_activity(self, user_id: str, action: str, details: Dict = None, ip_address: str = None, user_agent: str = None):
         """Log user activity"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                INSERT INTO user_activity_logs (id, user_id, action, details, ip_address, user_agent)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                str(uuid.uuid4()),
-                user_id,
-                action,
-                json.dumps(details) if details else None,
-                ip_address,
-                user_agent
-            ))
-
-            conn.commit()
-            conn.close()
+            with self.pool.connection() as conn:
+                conn.execute('''
+                    INSERT INTO user_activity_logs (id, user_id, action, details, ip_address, user_agent)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (
+                    str(uuid.uuid4()),
+                    user_id,
+                    action,
+                    json.dumps(details) if details else None,
+                    ip_address,
+                    user_agent
+                ))
 
         except Exception as e:
             print(f"Error logging user activity: {str(e)}")
@@ -440,25 +326,23 @@ class UserManager:
     def get_user_stats(self, user_id: str) -> Dict:
         """Get user statistics"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # Get classification count
-            cursor.execute('''
-                SELECT COUNT(*) FROM classifications
-                WHERE filename LIKE ?
-            ''', (f"%{user_id}%",))
-            classifications_count = cursor.fetchone()[0]
-
-            # Get recent activity
-            cursor.execute('''
-                SELECT action, created_at FROM user_activity_logs
-                WHERE user_id = ?
-                ORDER BY created_at DESC LIMIT 10
-            ''', (user_id,))
-            recent_activities = cursor.fetchall()
-
-            conn.close()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+
+                # Get classification count
+                cursor.execute('''
+                    SELECT COUNT(*) FROM classifications
+                    WHERE user_id = ?
+                ''', (user_id,))
+                classifications_count = cursor.fetchone()[0]
+
+                # Get recent activity
+                cursor.execute('''
+                    SELECT action, created_at FROM user_activity_logs
+                    WHERE user_id = ?
+                    ORDER BY created_at DESC LIMIT 10
+                ''', (user_id,))
+                recent_activities = cursor.fetchall()
 
             return {
                 'classifications_count': classifications_count,
@@ -470,4 +354,4 @@ class UserManager:
 
         except Exception as e:
             print(f"Error getting user stats: {str(e)}")
-            return {'classifications_count': 0, 'recent_activities': []}
\ No newline at end of file
+            return {'classifications_count': 0, 'recent_activities': []}
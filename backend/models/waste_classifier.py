@@ -1,9 +1,10 @@
 import os
 import numpy as np
-import cv2
 import json
 from tensorflow.keras.models import load_model
 
+from utils.image_processing import load_model_input
+
 class WasteClassifier:
     def __init__(self, model_path=None):
         """
@@ -146,34 +147,29 @@ class WasteClassifier:
             print(f"[ERROR] Failed to load model: {e}")
             return None
 
-    def preprocess_image(self, image_path):
+    def preprocess_image(self, image_path, out=None):
         """
         Preprocess image for model prediction.
 
+        Large JPEGs are decoded at reduced resolution, EXIF orientation is
+        applied and the image is area-resized straight into a float32 buffer.
+
         Args:
             image_path: Path to the image file
+            out: Optional preallocated float32 array of shape (128, 128, 3);
+                when given it is filled in place and returned without a batch
+                dimension
 
         Returns:
             Preprocessed image array ready for prediction
         """
         try:
-            # Read image
-            img = cv2.imread(image_path)
-            if img is None:
-                raise ValueError(f"Could not load image from {image_path}")
-
-            # Convert BGR to RGB
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-
-            # Resize to model input size
-            img = cv2.resize(img, self.img_size)
-
-            # Normalize to [0, 1]
-            img = img.astype(np.float32) / 255.0
+            if out is not None:
+                return load_model_input(image_path, self.img_size, out=out)
 
             # Add batch dimension
-            img = np.expand_dims(img, axis=0)
-
+            img = np.empty((1, self.img_size[1], self.img_size[0], 3), dtype=np.float32)
+            load_model_input(image_path, self.img_size, out=img[0])
             return img
         except Exception as e:
             raise ValueError(f"Error preprocessing image: {str(e)}")
@@ -199,39 +195,43 @@ class WasteClassifier:
             # Make prediction
             predictions = self.model.predict(processed_img, verbose=0)[0]
 
-            # Get top k predictions
-            top_indices = np.argsort(predictions)[-top_k:][::-1]
-
-            # Get the top prediction details
-            top_class = self.waste_categories[top_indices[0]]
-            top_confidence = float(predictions[top_indices[0]])
-
-            # Prepare results in the format expected by app.py
-            results = {
-                'waste_type': top_class,
-                'confidence': top_confidence,
-                'recommendations': self.recommendations.get(
-                    top_class,
-                    ['Dispose properly']
-                ),
-                'environmental_impact': self.environmental_impact.get(
-                    top_class,
-                    'Proper disposal helps protect the environment'
-                ),
-                'all_predictions': [
-                    {
-                        'class': self.waste_categories[idx],
-                        'confidence': float(predictions[idx])
-                    }
-                    for idx in top_indices
-                ]
-            }
-
-            return results
+            return self._build_result(predictions, top_k)
 
         except Exception as e:
             raise RuntimeError(f"Classification failed: {str(e)}")
 
+    def _build_result(self, predictions, top_k):
+        """Turn one row of model scores into a result dictionary."""
+        # Get top k predictions
+        top_indices = np.argsort(predictions)[-top_k:][::-1]
+
+        # Get the top prediction details
+        top_class = self.waste_categories[top_indices[0]]
+        top_confidence = float(predictions[top_indices[0]])
+
+        # Prepare results in the format expected by app.py
+        results = {
+            'waste_type': top_class,
+            'confidence': top_confidence,
+            'recommendations': self.recommendations.get(
+                top_class,
+                ['Dispose properly']
+            ),
+            'environmental_impact': self.environmental_impact.get(
+                top_class,
+                'Proper disposal helps protect the environment'
+            ),
+            'all_predictions': [
+                {
+                    'class': self.waste_categories[idx],
+                    'confidence': float(predictions[idx])
+                }
+                for idx in top_indices
+            ]
+        }
+
+        return results
+
     def batch_classify(self, image_paths, top_k=3):
         """
         Classify multiple images at once.
@@ -243,17 +243,40 @@ class WasteClassifier:
         Returns:
             List of classification results
         """
-        results = []
-        for img_path in image_paths:
+        results = [None] * len(image_paths)
+
+        # Preprocess everything into one buffer so the model runs once for the whole batch
+        batch = np.empty((len(image_paths), self.img_size[1], self.img_size[0], 3), dtype=np.float32)
+        positions = []
+        for i, img_path in enumerate(image_paths):
             try:
-                result = self.classify(img_path, top_k=top_k)
-                results.append({'success': True, 'result': result})
+                self.preprocess_image(img_path, out=batch[len(positions)])
+                positions.append(i)
             except Exception as e:
-                results.append({
+                results[i] = {
                     'success': False,
                     'error': str(e),
                     'image_path': img_path
-                })
+                }
+
+        if positions:
+            try:
+                if self.model is None:
+                    raise RuntimeError("Model not loaded. Cannot perform classification.")
+                batch_predictions = self.model.predict(batch[:len(positions)], verbose=0)
+            except Exception as e:
+                batch_predictions = None
+                for i in positions:
+                    results[i] = {
+                        'success': False,
+                        'error': str(e),
+                        'image_path': image_paths[i]
+                    }
+
+            if batch_predictions is not None:
+                for i, predictions in zip(positions, batch_predictions):
+                    results[i] = {'success': True, 'result': self._build_result(predictions, top_k)}
+
         return results
 
     def get_category_info(self, category_name):
@@ -6,12 +6,13 @@ import uuid
 from middleware.auth import AuthMiddleware
 from models.demo_data import demo_data
 from models.user_manager import UserManager
+from utils.lazy import LazyObject
 
 # Create blueprint
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
 # Initialize user manager
-user_manager = UserManager()
+user_manager = LazyObject(UserManager, 'admin.user_manager')
 
 @admin_bp.route('/dashboard', methods=['GET'])
 @AuthMiddleware.admin_required
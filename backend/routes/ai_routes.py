@@ -1,18 +1,64 @@
-from flask import Blueprint, request, jsonify
-import os
-import uuid
+from flask import Blueprint, request, jsonify, Response, stream_with_context, url_for
 from datetime import datetime
+from urllib.parse import urlparse
+import json
 
-# Import unified classifier
-from models.unified_classifier import UnifiedWasteClassifier
+# Import shared classifier pool
+from models.classifier_pool import classifier_pool
+from models.result_cache import result_cache
+from models.phash_index import phash_index
+from utils.http_client import get_http_stats
+from models.hedging import hedging
+from models.cascade import cascade_stats
+from models.payload_policy import payload_stats
+from models.job_queue import JobQueue, QueueFullError
+from models.single_flight import single_flight
+from models.router import provider_router
+from models.multi_image import multi_image_stats
+from models.side_effects import side_effects
+from models.model_registry import model_registry, ModelVersionError
+from models.shadow import shadow_evaluator
+from middleware.auth import AuthMiddleware
 from config.ai_config import AIConfig, AIProvider
+from utils.lazy import LazyObject
 
 ai_bp = Blueprint("ai_bp", __name__, url_prefix='/api/ai')
 
-# Initialize classifier (recreate each request to pick up config changes)
 def get_classifier():
-    """Get a fresh classifier instance"""
-    return UnifiedWasteClassifier()
+    """Get the warm classifier for the active provider from the shared pool"""
+    return classifier_pool.get()
+
+def format_classification(classifier, result):
+    """Shape a classifier result the way the frontend expects"""
+    # Get recommendations
+    recommendations = classifier.get_recommendations(result['waste_type'])
+
+    # Convert all_predictions array to object format
+    all_predictions_obj = {}
+    all_predictions_list = result.get('all_predictions', [])
+    if isinstance(all_predictions_list, list):
+        for pred in all_predictions_list:
+            if isinstance(pred, dict) and 'class' in pred and 'confidence' in pred:
+                all_predictions_obj[pred['class']] = pred['confidence']
+            elif isinstance(pred, dict) and 'mapped_type' in pred and 'confidence' in pred:
+                all_predictions_obj[pred['mapped_type']] = pred['confidence']
+
+    return {
+        'waste_type': result['waste_type'],
+        'raw_category': result.get('raw_category'),
+        'confidence': result['confidence'],
+        'provider_used': result.get('provider_used', 'unknown'),
+        'fallback_used': result.get('fallback', False),
+        'cached': result.get('cached', False),
+        'coalesced': result.get('coalesced', False),
+        'hedged': result.get('hedged', False),
+        'cascade': result.get('cascade'),
+        'payload': result.get('payload'),
+        'routing': result.get('routing'),
+        'recommendations': recommendations,
+        'environmental_impact': f"Proper disposal of {result['waste_type']} helps protect the environment",
+        'all_predictions': all_predictions_obj
+    }
 
 @ai_bp.route("/predict", methods=["POST"])
 def predict():
@@ -22,62 +68,15 @@ def predict():
 
     image = request.files["image"]
 
-    # Generate unique filename
-    temp_filename = f"temp_{uuid.uuid4().hex}.jpg"
-    temp_path = os.path.join("uploads", temp_filename)
-
-    # Create uploads directory if it doesn't exist
-    os.makedirs("uploads", exist_ok=True)
-
     try:
-        # Save uploaded image
-        image.save(temp_path)
-        print(f"[AI-ROUTES] Image saved to: {temp_path}")
-
-        # Classify using unified classifier (create fresh instance)
+        # Classify straight from the upload stream (nothing touches disk)
         classifier = get_classifier()
-        print(f"[AI-ROUTES] Classifier initialized with provider: {classifier.provider.value}")
+        print(f"[AI-ROUTES] Classifier ready with provider: {classifier.provider.value}")
 
-        result = classifier.classify(temp_path)
+        result = classifier.classify(image.read())
         print(f"[AI-ROUTES] Classification successful: {result.get('waste_type')} ({result.get('confidence'):.2%})")
 
-        # Get recommendations
-        recommendations = classifier.get_recommendations(result['waste_type'])
-
-        # Clean up temp file (with retry for Windows file locking)
-        if os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-            except PermissionError:
-                # Windows file locking issue - file will be cleaned up later
-                import time
-                time.sleep(0.1)
-                try:
-                    os.remove(temp_path)
-                except:
-                    pass  # File will be cleaned up on next run
-
-        # Format response to match frontend expectations
-        # Convert all_predictions array to object format
-        all_predictions_obj = {}
-        all_predictions_list = result.get('all_predictions', [])
-        if isinstance(all_predictions_list, list):
-            for pred in all_predictions_list:
-                if isinstance(pred, dict) and 'class' in pred and 'confidence' in pred:
-                    all_predictions_obj[pred['class']] = pred['confidence']
-                elif isinstance(pred, dict) and 'mapped_type' in pred and 'confidence' in pred:
-                    all_predictions_obj[pred['mapped_type']] = pred['confidence']
-
-        classification = {
-            'waste_type': result['waste_type'],
-            'raw_category': result.get('raw_category'),
-            'confidence': result['confidence'],
-            'provider_used': result.get('provider_used', 'unknown'),
-            'fallback_used': result.get('fallback', False),
-            'recommendations': recommendations,
-            'environmental_impact': f"Proper disposal of {result['waste_type']} helps protect the environment",
-            'all_predictions': all_predictions_obj
-        }
+        classification = format_classification(classifier, result)
 
         return jsonify({
             "success": True,
@@ -86,13 +85,6 @@ def predict():
         })
 
     except Exception as e:
-        # Clean up temp file on error (with retry for Windows file locking)
-        if os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-            except:
-                pass
-
         fallback_result = {
             "success": True,
             "classification": {
@@ -117,6 +109,205 @@ def predict():
 
         return jsonify(fallback_result)
 
+@ai_bp.route("/predict-batch", methods=["POST"])
+def predict_batch():
+    """
+    Classify many images from one multipart request (field "images", repeated)
+    Add ?stream=true to receive NDJSON lines as items finish
+    """
+    files = request.files.getlist("images") or request.files.getlist("image")
+    if not files:
+        return jsonify({"error": "No image files provided"}), 400
+    if len(files) > AIConfig.BATCH_MAX_IMAGES:
+        return jsonify({
+            "error": f"Too many images ({len(files)}). Maximum per request: {AIConfig.BATCH_MAX_IMAGES}"
+        }), 400
+
+    filenames = [f.filename for f in files]
+    images = [f.read() for f in files]
+    classifier = get_classifier()
+
+    def build_item(index, item):
+        entry = {"index": index, "filename": filenames[index], "success": item['success']}
+        if item['success']:
+            try:
+                entry["classification"] = format_classification(classifier, item['result'])
+            except Exception as e:
+                entry.update(success=False, error=str(e))
+        else:
+            entry["error"] = item['error']
+        return entry
+
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        def generate():
+            for index, item in classifier.iter_classify_batch(images):
+                yield json.dumps(build_item(index, item)) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    results = [build_item(index, item) for index, item in enumerate(classifier.classify_batch(images))]
+    return jsonify({
+        "success": True,
+        "count": len(results),
+        "failed": sum(1 for entry in results if not entry['success']),
+        "provider": classifier.provider.value,
+        "results": results,
+        "timestamp": datetime.now().isoformat()
+    })
+
+def run_classification_job(image_bytes, job):
+    """Job handler: classify with the job's provider (or the active one), shaped like /predict"""
+    provider = AIProvider(job['provider']) if job.get('provider') else None
+    classifier = classifier_pool.get(provider)
+    result = classifier.classify(image_bytes, top_k=job.get('top_k'))
+    return format_classification(classifier, result)
+
+# Global job queue (workers start with the first job, or at startup for durable backends)
+job_queue = LazyObject(lambda: JobQueue(run_classification_job), 'job_queue')
+
+def validate_callback_url(url):
+    """Return an error message if the callback URL is not allowed, else None"""
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        return "callback_url must be an absolute http(s) URL"
+    allowed = AIConfig.JOB_CALLBACK_ALLOWED_HOSTS
+    if not allowed:
+        # The endpoint is unauthenticated; an open callback would let anyone make
+        # this server POST to internal addresses
+        return "callback_url is disabled on this server (no JOB_CALLBACK_ALLOWED_HOSTS configured)"
+    if parsed.hostname not in allowed:
+        return f"callback_url host '{parsed.hostname}' is not allowed"
+    return None
+
+def validate_job_provider(provider):
+    """Return (error, status) if the caller may not pick this provider, else None"""
+    if provider not in [p.value for p in AIProvider]:
+        return f"Invalid provider. Choose from: {[p.value for p in AIProvider]}", 400
+    provider = AIProvider(provider)
+    if not AIConfig.is_provider_configured(provider):
+        return f"Provider '{provider.value}' is not configured on this server", 400
+    # /predict only ever uses the active provider; picking another metered
+    # (API-billed) provider is reserved for signed-in users
+    metered = provider not in (AIProvider.LOCAL, AIConfig.ACTIVE_PROVIDER)
+    if metered and AuthMiddleware.get_current_user_id() is None:
+        return f"Sign in to choose the '{provider.value}' provider", 401
+    return None
+
+@ai_bp.route("/jobs", methods=["POST"])
+@AuthMiddleware.optional_jwt
+def submit_job():
+    """
+    Queue an image for classification and return immediately (202)
+    Poll GET /api/ai/jobs/<job_id>, or pass callback_url to have the finished job POSTed to it
+    """
+    if "image" not in request.files:
+        return jsonify({"error": "No image file provided"}), 400
+
+    provider = request.form.get('provider', '').lower() or None
+    if provider:
+        rejected = validate_job_provider(provider)
+        if rejected:
+            error, status = rejected
+            return jsonify({"error": error}), status
+
+    try:
+        top_k = int(request.form['top_k']) if request.form.get('top_k') else None
+    except ValueError:
+        return jsonify({"error": "top_k must be an integer"}), 400
+    max_top_k = len(AIConfig.WASTE_CATEGORIES)
+    if top_k is not None and not 1 <= top_k <= max_top_k:
+        return jsonify({"error": f"top_k must be between 1 and {max_top_k}"}), 400
+
+    callback_url = request.form.get('callback_url') or None
+    if callback_url:
+        error = validate_callback_url(callback_url)
+        if error:
+            return jsonify({"error": error}), 400
+
+    try:
+        job = job_queue.submit(request.files["image"].read(), provider=provider,
+                               top_k=top_k, callback_url=callback_url)
+    except QueueFullError as e:
+        return jsonify({"success": False, "error": str(e)}), 503
+
+    return jsonify({
+        "success": True,
+        "job": job,
+        "status_url": url_for('ai_bp.get_job', job_id=job['job_id'])
+    }), 202
+
+@ai_bp.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Get the status (and, once finished, the result) of a classification job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found or expired"}), 404
+    return jsonify({"success": True, "job": job})
+
+@ai_bp.route("/models", methods=["GET"])
+@AuthMiddleware.admin_required
+def get_models():
+    """List local model versions, which one is serving and the rollback target"""
+    return jsonify({"success": True, "models": model_registry.get_stats()})
+
+@ai_bp.route("/models/<version>/load", methods=["POST"])
+@AuthMiddleware.admin_required
+def load_model_version(version):
+    """
+    Load and warm a model version in the background (202)
+    Pass {"activate": true} to switch traffic to it once it is warm
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        status = model_registry.stage(version, activate=bool(data.get('activate')))
+    except ModelVersionError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    return jsonify({
+        "success": True,
+        "model": status,
+        "status_url": url_for('ai_bp.get_models')
+    }), 202
+
+@ai_bp.route("/models/<version>/activate", methods=["POST"])
+@AuthMiddleware.admin_required
+def activate_model_version(version):
+    """Switch traffic to a loaded, warm model version"""
+    try:
+        models = model_registry.activate(version)
+    except ModelVersionError as e:
+        return jsonify({"success": False, "error": str(e)}), 409
+    return jsonify({"success": True, "models": models})
+
+@ai_bp.route("/models/rollback", methods=["POST"])
+@AuthMiddleware.admin_required
+def rollback_model_version():
+    """Switch traffic back to the previously served model version"""
+    try:
+        models = model_registry.rollback()
+    except ModelVersionError as e:
+        return jsonify({"success": False, "error": str(e)}), 409
+    return jsonify({"success": True, "models": models})
+
+@ai_bp.route("/shadow", methods=["GET"])
+@AuthMiddleware.admin_required
+def get_shadow_summary():
+    """
+    Compare shadowed candidates with the answers users were given
+    Query: ?candidate=<spec> to pick one, ?hours=<n> for a recent window
+    """
+    try:
+        hours = float(request.args['hours']) if request.args.get('hours') else None
+    except ValueError:
+        return jsonify({"success": False, "error": "hours must be a number"}), 400
+    return jsonify({
+        "success": True,
+        "shadow": shadow_evaluator.get_stats(),
+        "candidates": shadow_evaluator.summary(
+            candidate=request.args.get('candidate'),
+            since_seconds=hours * 3600 if hours else None
+        )
+    })
+
 @ai_bp.route("/providers", methods=["GET"])
 def get_providers():
     """Get information about available AI providers"""
@@ -156,10 +347,12 @@ def switch_provider():
             }), 400
 
         # Switch provider
+        previous_provider = AIConfig.ACTIVE_PROVIDER
         AIConfig.switch_provider(provider)
 
-        # Provider switched successfully
-        # Next request will use the new provider via get_classifier()
+        # Rebuild only the newly active provider; other pooled instances stay warm
+        if provider != previous_provider:
+            classifier_pool.rebuild(provider)
 
         return jsonify({
             "success": True,
@@ -173,6 +366,31 @@ def switch_provider():
             "error": str(e)
         }), 500
 
+@ai_bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Get performance counters for the AI classification pipeline"""
+    local_classifier = classifier_pool.peek(AIProvider.LOCAL)
+    gemini_classifier = classifier_pool.peek(AIProvider.GEMINI)
+    return jsonify({
+        "success": True,
+        "classifier_pool": classifier_pool.get_stats(),
+        "result_cache": result_cache.get_stats(),
+        "near_duplicate_index": phash_index.get_stats(),
+        "local_batching": local_classifier.get_stats()['batching'] if local_classifier else None,
+        "local_model": model_registry.get_stats(),
+        "gemini_model": gemini_classifier.get_gemini_stats() if gemini_classifier else None,
+        "http_clients": get_http_stats(),
+        "hedging": hedging.get_stats(),
+        "cascade": cascade_stats.get_stats(),
+        "payload": payload_stats.get_stats(),
+        "single_flight": single_flight.get_stats(),
+        "router": provider_router.get_stats(),
+        "multi_image": multi_image_stats.get_stats(),
+        "jobs": job_queue.get_stats(),
+        "side_effects": side_effects.get_stats(),
+        "shadow": shadow_evaluator.get_stats()
+    })
+
 @ai_bp.route("/test", methods=["GET"])
 def test_endpoint():
     """Test endpoint to check if AI service is working"""
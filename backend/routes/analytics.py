@@ -7,6 +7,7 @@ import json
 from middleware.auth import AuthMiddleware
 from models.demo_data import demo_data
 from models.database import DatabaseManager
+from utils.lazy import LazyObject
 
 # Create blueprint
 analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
@@ -88,7 +89,7 @@ class AnalyticsManager:
 
         return breakdown
 
-analytics_manager = AnalyticsManager()
+analytics_manager = LazyObject(AnalyticsManager, 'analytics_manager')
 
 @analytics_bp.route('/dashboard', methods=['GET'])
 @AuthMiddleware.jwt_required
@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 import uuid
 
 from models.user_manager import UserManager
+from utils.lazy import LazyObject
 from utils.validators import (
     UserRegistrationSchema, UserLoginSchema, UserProfileUpdateSchema,
     PasswordChangeSchema, validate_json_request
@@ -15,7 +16,7 @@ from middleware.auth import AuthMiddleware
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
 # Initialize user manager
-user_manager = UserManager()
+user_manager = LazyObject(UserManager, 'auth.user_manager')
 
 @auth_bp.route('/register', methods=['POST'])
 @validate_json_request(UserRegistrationSchema)
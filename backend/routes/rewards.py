@@ -6,6 +6,7 @@ import uuid
 from middleware.auth import AuthMiddleware
 from models.demo_data import demo_data
 from models.database import DatabaseManager
+from utils.lazy import LazyObject
 
 # Create blueprint
 rewards_bp = Blueprint('rewards', __name__, url_prefix='/api/rewards')
@@ -132,10 +133,10 @@ class RewardsManager:
         points_data = db.get_user_points(user_id)
         return points_data['total_points']
 
-    def add_points(self, user_id, points, reason, reference_id=None):
-        """Add points to user account"""
+    def add_points(self, user_id, points, reason, reference_id=None, idempotency_key=None):
+        """Add points to user account (at most once per idempotency_key)"""
         db = DatabaseManager()
-        new_total = db.add_points(user_id, points, 'earned', reason, reference_id)
+        new_total = db.add_points(user_id, points, 'earned', reason, reference_id, idempotency_key)
 
         # Check for badge achievements
         self.check_badge_achievements(user_id)
@@ -154,37 +155,59 @@ class RewardsManager:
         return db.get_user_badges(user_id)
 
     def award_badge(self, user_id, badge_id):
-        """Award a badge to user"""
+        """
+        Award a badge to user together with its bonus points
+
+        The badge row and its points are written in one transaction. For a
+        badge the user already holds, the bonus is paid again under its
+        idempotency key, which does nothing once it has been paid.
+
+        Returns:
+            dict: The new badge, or None if unknown or already held
+
+        Raises:
+            RuntimeError: The badge or its points could not be stored, so the
+                caller (e.g. a side-effect task) fails and is retried
+        """
+        badge_info = self.badges.get(badge_id)
+        if not badge_info:
+            return None
+
         db = DatabaseManager()
+        reason = f'Badge earned: {badge_info["name"]}'
+        points_key = f'badge:{user_id}:{badge_id}'
 
         user_badges = self.get_user_badges(user_id)
-        if badge_id not in [b['badge_id'] for b in user_badges]:
-            badge_info = self.badges.get(badge_id)
-            if badge_info:
-                # Add badge to database
-                badge_record_id = db.add_user_badge(
-                    user_id,
-                    badge_id,
-                    badge_info['name'],
-                    badge_info['description'],
-                    badge_info['icon'],
-                    badge_info['points']
-                )
-
-                if badge_record_id:
-                    # Award points for the badge
-                    self.add_points(user_id, badge_info['points'], f'Badge earned: {badge_info["name"]}')
-
-                    return {
-                        'id': badge_record_id,
-                        'badge_id': badge_id,
-                        'name': badge_info['name'],
-                        'description': badge_info['description'],
-                        'icon': badge_info['icon'],
-                        'points_awarded': badge_info['points'],
-                        'earned_at': datetime.now().isoformat()
-                    }
-        return None
+        if badge_id in [b['badge_id'] for b in user_badges]:
+            # Goes straight to the database: self.add_points would re-check badges
+            if db.add_points(user_id, badge_info['points'], 'earned', reason, idempotency_key=points_key) is None:
+                raise RuntimeError(f"Bonus points for badge {badge_id} could not be awarded")
+            return None
+
+        with db.pool.connection(immediate=True):
+            badge_record_id = db.add_user_badge(
+                user_id,
+                badge_id,
+                badge_info['name'],
+                badge_info['description'],
+                badge_info['icon'],
+                badge_info['points']
+            )
+            if badge_record_id is None:
+                raise RuntimeError(f"Badge {badge_id} could not be stored")
+            if db.add_points(user_id, badge_info['points'], 'earned', reason, idempotency_key=points_key) is None:
+                # Rolls the badge back too, so a retry awards both
+                raise RuntimeError(f"Bonus points for badge {badge_id} could not be awarded")
+
+        return {
+            'id': badge_record_id,
+            'badge_id': badge_id,
+            'name': badge_info['name'],
+            'description': badge_info['description'],
+            'icon': badge_info['icon'],
+            'points_awarded': badge_info['points'],
+            'earned_at': datetime.now().isoformat()
+        }
 
     def check_badge_achievements(self, user_id):
         """Check and award badges based on user activity"""
@@ -222,7 +245,7 @@ class RewardsManager:
 
         return new_badges
 
-rewards_manager = RewardsManager()
+rewards_manager = LazyObject(RewardsManager, 'rewards_manager')
 
 @rewards_bp.route('/points', methods=['GET'])
 @AuthMiddleware.jwt_required
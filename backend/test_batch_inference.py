@@ -0,0 +1,144 @@
+"""
+Test script for the micro-batcher that groups concurrent local predictions
+"""
+import sys
+import os
+import time
+import threading
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+
+from models.batch_inference import MicroBatcher
+
+
+class RecordingPredict:
+    """Stand-in vectorized model: row i is the input's sum, batch sizes are recorded"""
+
+    def __init__(self, delay=0.0):
+        self.batch_sizes = []
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def __call__(self, inputs):
+        with self.lock:
+            self.batch_sizes.append(len(inputs))
+        time.sleep(self.delay)
+        return inputs.reshape(len(inputs), -1).sum(axis=1, keepdims=True)
+
+
+def submit_concurrently(batcher, count, timeout=2):
+    results, errors = [None] * count, [None] * count
+    start = threading.Barrier(count)
+
+    def call(i):
+        start.wait()
+        try:
+            results[i] = batcher.submit(np.full((2, 2), i, dtype=np.float32), timeout=timeout)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_calls_share_one_predict():
+    print("=" * 60)
+    print("MICRO-BATCHER TEST")
+    print("=" * 60)
+
+    predict = RecordingPredict()
+    batcher = MicroBatcher(predict, max_batch_size=16, max_wait_ms=200)
+    results, errors = submit_concurrently(batcher, 8)
+    batcher.close()
+
+    print(f"\n[1] Batch sizes for 8 concurrent calls: {predict.batch_sizes}")
+    assert errors == [None] * 8
+    # Each caller gets its own row back
+    assert [float(row[0]) for row in results] == [4.0 * i for i in range(8)]
+    assert predict.batch_sizes == [8]
+    assert batcher.get_stats()['deadline_flushes'] == 1
+
+
+def test_full_batch_flushes_without_waiting():
+    predict = RecordingPredict()
+    batcher = MicroBatcher(predict, max_batch_size=4, max_wait_ms=5000)
+    start = time.perf_counter()
+    results, errors = submit_concurrently(batcher, 8)
+    elapsed = time.perf_counter() - start
+    batcher.close()
+
+    stats = batcher.get_stats()
+    print(f"\n[2] Batch sizes with max 4: {predict.batch_sizes} in {elapsed * 1000:.0f} ms")
+    assert errors == [None] * 8
+    assert max(predict.batch_sizes) <= 4 and sum(predict.batch_sizes) == 8
+    assert stats['size_flushes'] == 2
+    # Never waited for the 5 s deadline
+    assert elapsed < 2
+
+
+def test_predict_error_reaches_every_caller():
+    def broken(inputs):
+        raise RuntimeError("model exploded")
+
+    batcher = MicroBatcher(broken, max_batch_size=16, max_wait_ms=100)
+    results, errors = submit_concurrently(batcher, 5)
+    batcher.close()
+
+    print(f"\n[3] Errors: {[str(e) for e in errors]}")
+    assert all(isinstance(e, RuntimeError) and 'exploded' in str(e) for e in errors)
+    assert batcher.get_stats()['errors'] >= 1
+
+
+def test_short_predict_output_fails_instead_of_hanging():
+    # Drops the last row of every batch
+    batcher = MicroBatcher(lambda inputs: RecordingPredict()(inputs)[:-1], max_batch_size=16, max_wait_ms=100)
+    start = time.perf_counter()
+    results, errors = submit_concurrently(batcher, 4, timeout=5)
+    elapsed = time.perf_counter() - start
+    batcher.close()
+
+    print(f"\n[4] Short output: {[type(e).__name__ for e in errors]} after {elapsed * 1000:.0f} ms")
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert elapsed < 2
+
+
+def test_close_flushes_queue_and_falls_back_to_direct_calls():
+    predict = RecordingPredict(delay=0.1)
+    batcher = MicroBatcher(predict, max_batch_size=2, max_wait_ms=1000)
+
+    # One batch running, one more item queued behind it when close() is called
+    results, errors = [], []
+    threads = [threading.Thread(target=lambda i=i: results.append(
+        batcher.submit(np.full((2, 2), i, dtype=np.float32), timeout=2))) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    batcher.close()
+    for thread in threads:
+        thread.join()
+    batcher._worker.join(timeout=2)
+
+    # After close: predicted directly, one at a time
+    late = batcher.submit(np.ones((2, 2), dtype=np.float32), timeout=1)
+
+    print(f"\n[5] Batches {predict.batch_sizes}, worker alive: {batcher._worker.is_alive()}")
+    assert sorted(float(row[0]) for row in results) == [0.0, 4.0, 8.0]
+    assert float(late[0]) == 4.0
+    assert not batcher._worker.is_alive()
+    assert predict.batch_sizes[-1] == 1 and sum(predict.batch_sizes) == 4
+
+
+if __name__ == "__main__":
+    test_concurrent_calls_share_one_predict()
+    test_full_batch_flushes_without_waiting()
+    test_predict_error_reaches_every_caller()
+    test_short_predict_output_fails_instead_of_hanging()
+    test_close_flushes_queue_and_falls_back_to_direct_calls()
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
@@ -0,0 +1,52 @@
+"""
+Test script for the confidence-gated cascade escalation rules and counters
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from models.cascade import CascadeStats, escalation_reason
+
+
+def make_result(*confidences):
+    return {
+        'raw_category': 'plastic',
+        'confidence': confidences[0],
+        'all_predictions': [{'class': f'c{i}', 'confidence': c} for i, c in enumerate(confidences)]
+    }
+
+
+def test_escalation_reasons():
+    print("=" * 60)
+    print("CASCADE TEST")
+    print("=" * 60)
+
+    assert escalation_reason(make_result(0.9, 0.05), threshold=0.5, margin=0.2) is None
+    assert escalation_reason(make_result(0.4, 0.1), threshold=0.5, margin=0.2) == 'low-confidence'
+    assert escalation_reason(make_result(0.55, 0.45), threshold=0.5, margin=0.2) == 'small-margin'
+    assert escalation_reason({'raw_category': 'fallback-local', 'confidence': 0.4}) == 'local-unavailable'
+    assert escalation_reason(None) == 'local-unavailable'
+
+
+def test_stats_track_rate_latency_and_agreement():
+    stats = CascadeStats(window_size=10)
+    stats.record(5, 5)
+    stats.record(6, 6)
+    stats.record(5, 900, reason='low-confidence', escalated_to='gemini', escalation_ms=895, agreed=True)
+    stats.record(4, 800, reason='small-margin', escalated_to='gemini', escalation_ms=796, agreed=False)
+
+    result = stats.get_stats()
+    print(f"\n[2] Stats: {result}")
+    assert result['escalation_rate'] == 0.5
+    assert result['agreement_rate'] == 0.5
+    assert result['reasons'] == {'low-confidence': 1, 'small-margin': 1}
+    assert result['latency']['escalation']['samples'] == 2
+    assert result['latency']['local']['samples'] == 4
+
+
+if __name__ == "__main__":
+    test_escalation_reasons()
+    test_stats_track_rate_latency_and_agreement()
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
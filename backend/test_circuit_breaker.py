@@ -0,0 +1,91 @@
+"""
+Test script for provider circuit breaker state transitions
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from models.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock):
+    return CircuitBreaker('stub', window_seconds=60, min_calls=4, error_rate=0.5,
+                          slow_call_ms=1000, slow_call_rate=0.8, open_seconds=30,
+                          half_open_probes=1, close_after=2, clock=clock)
+
+
+def test_opens_on_error_rate():
+    print("=" * 60)
+    print("CIRCUIT BREAKER TEST")
+    print("=" * 60)
+
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    breaker.record_success(50)
+    breaker.record_success(50)
+    breaker.record_failure(50)
+    assert breaker.state == CLOSED  # below min_calls
+
+    breaker.record_failure(50)
+    print(f"\n[1] Snapshot: {breaker.snapshot()}")
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.snapshot()['rejected'] == 1
+
+
+def test_opens_on_slow_calls():
+    breaker = make_breaker(FakeClock())
+    for _ in range(4):
+        breaker.record_success(5000)
+    assert breaker.state == OPEN
+
+
+def test_half_open_probe_closes_or_reopens():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        breaker.record_failure(10)
+    assert breaker.state == OPEN
+
+    clock.now += 31
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # only one probe at a time
+    breaker.record_failure(10)
+    assert breaker.state == OPEN
+
+    clock.now += 31
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record_success(10)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()['times_opened'] == 2
+
+
+def test_old_failures_leave_the_window():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(3):
+        breaker.record_failure(10)
+    clock.now += 61
+    breaker.record_failure(10)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()['window_calls'] == 1
+
+
+if __name__ == "__main__":
+    test_opens_on_error_rate()
+    test_opens_on_slow_calls()
+    test_half_open_probe_closes_or_reopens()
+    test_old_failures_leave_the_window()
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
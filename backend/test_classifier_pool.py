@@ -0,0 +1,121 @@
+"""
+Test script to verify the shared classifier pool reuses warm instances
+"""
+import sys
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.dirname(__file__))
+
+from config.ai_config import AIProvider
+from models.classifier_pool import ClassifierPool
+
+
+class CountingFactory:
+    """Stand-in classifier factory that counts constructions"""
+
+    def __init__(self):
+        self.built = []
+
+    def __call__(self, provider):
+        self.built.append(provider)
+        return object()
+
+
+def test_pool_reuses_instances():
+    print("=" * 60)
+    print("CLASSIFIER POOL TEST")
+    print("=" * 60)
+
+    factory = CountingFactory()
+    pool = ClassifierPool(factory=factory)
+
+    first = pool.get(AIProvider.GEMINI)
+    second = pool.get(AIProvider.GEMINI)
+    assert first is second
+    assert factory.built == [AIProvider.GEMINI]
+
+    stats = pool.get_stats()['gemini']
+    print(f"\n[1] Gemini stats: {stats}")
+    assert stats['cold_hits'] == 1
+    assert stats['warm_hits'] == 1
+    assert stats['load_time_ms'] is not None
+
+
+def test_pool_builds_once_under_concurrency():
+    factory = CountingFactory()
+    pool = ClassifierPool(factory=factory)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(pool.get(AIProvider.LOCAL)))
+        for _ in range(16)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(f"\n[2] Concurrent gets built {len(factory.built)} instance(s)")
+    assert len(factory.built) == 1
+    assert all(r is results[0] for r in results)
+
+
+def test_rebuild_only_affects_one_provider():
+    factory = CountingFactory()
+    pool = ClassifierPool(factory=factory)
+
+    local = pool.get(AIProvider.LOCAL)
+    gemini = pool.get(AIProvider.GEMINI)
+    rebuilt = pool.rebuild(AIProvider.GEMINI)
+
+    print(f"\n[3] Loads after rebuild: {pool.get_stats()['gemini']['loads']}")
+    assert rebuilt is not gemini
+    assert pool.get(AIProvider.GEMINI) is rebuilt
+    assert pool.get(AIProvider.LOCAL) is local
+
+
+class SlowClassifier:
+    """Stand-in classifier whose close() cancels queued work like the real one"""
+
+    def __init__(self, provider):
+        self.release = threading.Event()
+        self.closed = False
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def classify(self, image_bytes):
+        return self._executor.submit(lambda: self.release.wait(5) and 'plastic')
+
+    def close(self):
+        self.closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def test_rebuild_lets_in_flight_calls_finish():
+    pool = ClassifierPool(factory=SlowClassifier, retire_grace_seconds=0.3)
+
+    old = pool.get(AIProvider.GEMINI)
+    running = old.classify(b'a')
+    queued = old.classify(b'b')
+    new = pool.rebuild(AIProvider.GEMINI)
+    assert pool.get(AIProvider.GEMINI) is new and not old.closed
+
+    # Work already handed to the old instance completes after the swap
+    old.release.set()
+    results = [running.result(timeout=2), queued.result(timeout=2)]
+    time.sleep(0.6)
+
+    print(f"\n[4] Old instance results after rebuild: {results}, closed after grace: {old.closed}")
+    assert results == ['plastic', 'plastic']
+    assert old.closed and not new.closed
+
+
+if __name__ == "__main__":
+    test_pool_reuses_instances()
+    test_pool_builds_once_under_concurrency()
+    test_rebuild_only_affects_one_provider()
+    test_rebuild_lets_in_flight_calls_finish()
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
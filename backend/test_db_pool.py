@@ -0,0 +1,169 @@
+"""
+Test script for the pooled SQLite connections used by DatabaseManager,
+UserManager and the marketplace routes
+"""
+import sys
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+sys.path.insert(0, os.path.dirname(__file__))
+
+from utils.db_pool import SQLitePool, PoolTimeoutError
+from models.database import DatabaseManager
+from models.user_manager import UserManager
+
+
+def test_concurrent_writers_share_a_few_connections():
+    print("=" * 60)
+    print("SQLITE POOL TEST")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'wastewise.db')
+        db = DatabaseManager(db_path)
+        errors = []
+
+        def writer(n):
+            for i in range(50):
+                if db.add_points('user-1', 1, 'earned', 'test', idempotency_key=f"{n}:{i}") is None:
+                    errors.append((n, i))
+                db.get_user_points('user-1')
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        stats = db.pool.get_stats()
+        print(f"\n[1] 800 calls from 8 threads in {elapsed_ms:.0f} ms: created {stats['created']}, "
+              f"reused {stats['reused']}, write-lock wait {stats['write_lock_wait_ms']}")
+        assert errors == [] and stats['lock_errors'] == 0
+        assert db.get_user_points('user-1')['total_points'] == 400
+        assert stats['created'] <= 8 and stats['reused'] >= 800 - 8
+        assert stats['write_lock_wait_ms']['max'] is not None
+        assert stats['in_use'] == 0
+
+        with db.pool.connection() as conn:
+            assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+            assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == db.pool.pragmas['busy_timeout']
+            assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+        db.pool.close_all()
+
+
+def test_pooled_reads_skip_connection_setup():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'wastewise.db')
+        db = DatabaseManager(db_path)
+        db.save_classification('a.jpg', 'a.jpg', 'plastic', 0.9)
+
+        def fresh_connection_read():
+            conn = sqlite3.connect(db_path)
+            conn.execute('SELECT waste_type, COUNT(*) FROM classifications GROUP BY waste_type').fetchall()
+            conn.close()
+
+        def timed(fn, n=300):
+            start = time.perf_counter()
+            for _ in range(n):
+                fn()
+            return (time.perf_counter() - start) * 1000 / n
+
+        pooled_ms = timed(db.get_statistics)
+        fresh_ms = timed(fresh_connection_read)
+        print(f"\n[2] get_statistics {pooled_ms:.3f} ms pooled vs {fresh_ms:.3f} ms for connect + one query")
+        assert db.get_statistics()['total_classifications'] == 1
+        db.pool.close_all()
+
+
+def test_nested_blocks_and_rollback():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = SQLitePool(os.path.join(tmp, 'nested.db'))
+        with pool.connection() as conn:
+            conn.execute('CREATE TABLE t (v INTEGER)')
+
+        with pool.connection() as conn:
+            conn.execute('INSERT INTO t VALUES (1)')
+            try:
+                # Same thread: shares the connection, undone on its own
+                with pool.connection() as inner:
+                    assert inner is conn
+                    inner.execute('INSERT INTO t VALUES (2)')
+                    raise ValueError("inner failure")
+            except ValueError:
+                pass
+            with pool.connection(row_factory=sqlite3.Row) as inner:
+                inner.execute('INSERT INTO t VALUES (3)')
+            assert conn.row_factory is None
+
+        try:
+            with pool.connection() as conn:
+                conn.execute('INSERT INTO t VALUES (4)')
+                raise RuntimeError("outer failure")
+        except RuntimeError:
+            pass
+
+        with pool.connection(row_factory=sqlite3.Row) as conn:
+            values = [row['v'] for row in conn.execute('SELECT v FROM t ORDER BY v')]
+        stats = pool.get_stats()
+        print(f"\n[3] Kept {values}, stats: commits {stats['commits']}, rollbacks {stats['rollbacks']}, nested {stats['nested']}")
+        assert values == [1, 3]
+        assert stats['rollbacks'] == 1 and stats['nested'] == 2 and stats['created'] == 1
+        pool.close_all()
+
+
+def test_exhausted_pool_times_out():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = SQLitePool(os.path.join(tmp, 'small.db'), max_connections=1, timeout=0.1)
+        held, release = threading.Event(), threading.Event()
+
+        def holder():
+            with pool.connection():
+                held.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=holder)
+        thread.start()
+        held.wait(5)
+        try:
+            with pool.connection():
+                raise AssertionError("checked out a second connection from a pool of one")
+        except PoolTimeoutError:
+            pass
+        release.set()
+        thread.join()
+
+        # Freed: the next checkout reuses the same connection
+        with pool.connection():
+            pass
+        stats = pool.get_stats()
+        print(f"\n[4] {stats['checkout_timeouts']} timeout, {stats['checkout_waits']} waits, wait ms {stats['checkout_wait_ms']}")
+        assert stats['checkout_timeouts'] == 1 and stats['created'] == 1
+        pool.close_all()
+
+
+def test_user_manager_uses_the_pool():
+    with tempfile.TemporaryDirectory() as tmp:
+        users = UserManager(os.path.join(tmp, 'wastewise.db'))
+        user_id = users.create_user({'email': 'a@example.com', 'password': 'secret-pass', 'full_name': 'A'})
+        assert users.authenticate_user('a@example.com', 'wrong') is None
+        assert users.authenticate_user('a@example.com', 'secret-pass')['id'] == user_id
+        assert users.get_user_stats(user_id)['recent_activities'][0]['action'] in ('login_success', 'login_failed')
+        stats = users.pool.get_stats()
+        print(f"\n[5] UserManager: {stats['checkouts']} checkouts on {stats['created']} connection(s)")
+        assert stats['created'] == 1
+        users.pool.close_all()
+
+
+if __name__ == "__main__":
+    test_concurrent_writers_share_a_few_connections()
+    test_pooled_reads_skip_connection_setup()
+    test_nested_blocks_and_rollback()
+    test_exhausted_pool_times_out()
+    test_user_manager_uses_the_pool()
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
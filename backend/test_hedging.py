@@ -0,0 +1,133 @@
+"""
+Test script for hedged provider calls with fake, timed providers
+"""
+import sys
+import os
+import time
+sys.path.insert(0, os.path.dirname(__file__))
+
+from config.ai_config import AIProvider
+from models.hedging import HedgingCoordinator, LatencyWindow
+
+
+def fake_call(delays, failures=()):
+    def call(provider):
+        time.sleep(delays[provider])
+        if provider in failures:
+            raise RuntimeError(f"{provider.value} down")
+        return {'category': provider.value, 'confidence': 0.9}
+    return call
+
+
+def accept(result):
+    return result['confidence'] >= 0.6
+
+
+def warm_window(ms):
+    window = LatencyWindow(size=50)
+    for _ in range(30):
+        window.record(AIProvider.GEMINI, ms)
+    return window
+
+
+def test_fast_primary_is_not_hedged():
+    print("=" * 60)
+    print("HEDGED REQUEST TEST")
+    print("=" * 60)
+
+    coordinator = HedgingCoordinator(warm_window(100))
+    call = fake_call({AIProvider.GEMINI: 0.01, AIProvider.LOCAL: 0.01})
+    _, provider, hedged = coordinator.run(AIProvider.GEMINI, AIProvider.LOCAL, call, accept)
+
+    assert provider == AIProvider.GEMINI
+    assert not hedged
+    assert coordinator.get_stats()['hedge_rate'] == 0.0
+
+
+def test_slow_primary_loses_to_fallback():
+    coordinator = HedgingCoordinator(warm_window(100))
+    call = fake_call({AIProvider.GEMINI: 1.0, AIProvider.LOCAL: 0.01})
+
+    start = time.perf_counter()
+    _, provider, hedged = coordinator.run(AIProvider.GEMINI, AIProvider.LOCAL, call, accept)
+    elapsed = time.perf_counter() - start
+
+    stats = coordinator.get_stats()
+    print(f"\n[2] Elapsed {elapsed:.3f}s, stats: {stats}")
+    assert provider == AIProvider.LOCAL
+    assert hedged
+    assert elapsed < 0.5
+    assert stats['hedge_wins'] == 1
+    assert stats['wins']['local'] == 1
+
+
+def test_failed_primary_falls_back_immediately():
+    coordinator = HedgingCoordinator(warm_window(1000))
+    call = fake_call({AIProvider.GEMINI: 0.01, AIProvider.LOCAL: 0.01}, failures={AIProvider.GEMINI})
+
+    start = time.perf_counter()
+    _, provider, hedged = coordinator.run(AIProvider.GEMINI, AIProvider.LOCAL, call, accept)
+
+    assert provider == AIProvider.LOCAL
+    assert hedged
+    assert time.perf_counter() - start < 0.5
+
+
+def test_all_failed_raises():
+    coordinator = HedgingCoordinator(warm_window(100))
+    call = fake_call({AIProvider.GEMINI: 0.0, AIProvider.LOCAL: 0.0},
+                     failures={AIProvider.GEMINI, AIProvider.LOCAL})
+    try:
+        coordinator.run(AIProvider.GEMINI, AIProvider.LOCAL, call, accept)
+        assert False, "expected RuntimeError"
+    except RuntimeError:
+        pass
+    stats = coordinator.get_stats()
+    assert stats['all_failed'] == 1
+    # The fallback was launched, so it counts as hedged even though nothing won
+    assert stats['hedged'] == 1 and stats['in_flight'] == 0
+
+
+def occupy_workers(coordinator, count, seconds):
+    return [coordinator._submit(lambda provider: time.sleep(seconds), AIProvider.LOCAL) for _ in range(count)]
+
+
+def test_hedge_delay_starts_when_primary_runs():
+    coordinator = HedgingCoordinator(warm_window(150), max_workers=2)
+    blockers = occupy_workers(coordinator, 2, 0.3)
+    call = fake_call({AIProvider.GEMINI: 0.05, AIProvider.LOCAL: 0.01})
+
+    # Queued for 0.3 s behind the blockers, then finishes well inside its delay
+    _, provider, hedged = coordinator.run(AIProvider.GEMINI, AIProvider.LOCAL, call, accept)
+    for blocker in blockers:
+        blocker.result()
+
+    print(f"\n[5] Queued primary: provider {provider.value}, hedged {hedged}")
+    assert provider == AIProvider.GEMINI and not hedged
+    assert coordinator.get_stats()['hedged'] == 0
+
+
+def test_saturated_pool_skips_hedge():
+    coordinator = HedgingCoordinator(warm_window(100), max_workers=2)
+    blockers = occupy_workers(coordinator, 1, 0.6)
+    call = fake_call({AIProvider.GEMINI: 0.3, AIProvider.LOCAL: 0.01})
+
+    _, provider, hedged = coordinator.run(AIProvider.GEMINI, AIProvider.LOCAL, call, accept)
+    blockers[0].result()
+
+    stats = coordinator.get_stats()
+    print(f"\n[6] Saturated pool: skipped {stats['skipped_saturated']}, hedged {stats['hedged']}")
+    assert provider == AIProvider.GEMINI and not hedged
+    assert stats['skipped_saturated'] == 1 and stats['hedged'] == 0
+
+
+if __name__ == "__main__":
+    test_fast_primary_is_not_hedged()
+    test_slow_primary_loses_to_fallback()
+    test_failed_primary_falls_back_immediately()
+    test_all_failed_raises()
+    test_hedge_delay_starts_when_primary_runs()
+    test_saturated_pool_skips_hedge()
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
@@ -0,0 +1,108 @@
+"""
+Test script for the pooled provider HTTP client against a local stub server
+"""
+import sys
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.insert(0, os.path.dirname(__file__))
+
+from utils.http_client import ProviderHTTPClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers 503 for the first `fail_first` POSTs, then 200"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+    fail_first = 0
+    calls = 0
+    connections = set()
+
+    def do_POST(self):
+        cls = type(self)
+        cls.calls += 1
+        cls.connections.add(self.client_address)
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        status = 503 if cls.calls <= cls.fail_first else 200
+        body = json.dumps({'ok': status == 200}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(fail_first=0):
+    handler = type('Handler', (StubHandler,), {'fail_first': fail_first, 'calls': 0, 'connections': set()})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, handler, f"http://127.0.0.1:{server.server_address[1]}/classify"
+
+
+def test_keep_alive_reuses_connection():
+    print("=" * 60)
+    print("PROVIDER HTTP CLIENT TEST")
+    print("=" * 60)
+
+    server, handler, url = start_stub()
+    client = ProviderHTTPClient('stub', max_retries=0)
+    try:
+        for _ in range(5):
+            response = client.post(url, data=b'image-bytes')
+            assert response.status_code == 200
+            assert 'ttfb_ms' in response.timing
+    finally:
+        client.close()
+        server.shutdown()
+
+    stats = client.get_stats()
+    print(f"\n[1] Stats: {stats}")
+    assert len(handler.connections) == 1
+    assert stats['new_connections'] == 1
+    assert stats['reused_connections'] == 4
+
+
+def test_retries_on_5xx_with_backoff():
+    server, handler, url = start_stub(fail_first=2)
+    client = ProviderHTTPClient('stub', max_retries=3, backoff_base=0.01, backoff_max=0.02)
+    try:
+        response = client.post(url, json={'x': 1})
+    finally:
+        client.close()
+        server.shutdown()
+
+    stats = client.get_stats()
+    print(f"\n[2] Stats: {stats}")
+    assert response.status_code == 200
+    assert handler.calls == 3
+    assert stats['retries'] == 2
+    assert stats['failures'] == 0
+
+
+def test_gives_up_after_max_retries():
+    server, handler, url = start_stub(fail_first=10)
+    client = ProviderHTTPClient('stub', max_retries=1, backoff_base=0.01, backoff_max=0.02)
+    try:
+        response = client.post(url, data=b'')
+    finally:
+        client.close()
+        server.shutdown()
+
+    assert response.status_code == 503
+    assert handler.calls == 2
+    assert client.get_stats()['failures'] == 1
+
+
+if __name__ == "__main__":
+    test_keep_alive_reuses_connection()
+    test_retries_on_5xx_with_backoff()
+    test_gives_up_after_max_retries()
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
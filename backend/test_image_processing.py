@@ -0,0 +1,100 @@
+"""
+Test script for load_model_input: EXIF orientation, PNG / RGBA / grayscale
+input, upscaling small images, and agreement with the full-decode pipeline
+"""
+import sys
+import os
+import io
+import tempfile
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from PIL import Image
+
+from utils.image_processing import load_model_input
+from benchmark_preprocessing import make_synthetic_jpeg, decode_full
+
+RED, BLUE = (255, 0, 0), (0, 0, 255)
+
+
+def encode(img, fmt='JPEG', **kwargs):
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt, **kwargs)
+    return buffer.getvalue()
+
+
+def red_left_blue_right(size=(400, 200)):
+    img = Image.new('RGB', size, color=BLUE)
+    img.paste(RED, (0, 0, size[0] // 2, size[1]))
+    return img
+
+
+def test_exif_orientation_is_applied():
+    print("=" * 60)
+    print("MODEL INPUT DECODE TEST")
+    print("=" * 60)
+
+    # Orientation 6: stored sideways, displayed rotated 90 degrees clockwise,
+    # so the stored left (red) half ends up on top
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    image_bytes = encode(red_left_blue_right(), quality=95, exif=exif.tobytes())
+
+    out = np.empty((64, 64, 3), dtype=np.float32)
+    result = load_model_input(image_bytes, (64, 64), out=out)
+    top, bottom = result[8, 32], result[56, 32]
+    print(f"\n[1] EXIF 6: top {np.round(top, 2)}, bottom {np.round(bottom, 2)}")
+    assert result is out
+    assert top[0] > 0.8 and top[2] < 0.2
+    assert bottom[2] > 0.8 and bottom[0] < 0.2
+
+
+def test_png_rgba_and_grayscale_inputs():
+    rgba = red_left_blue_right().convert('RGBA')
+    rgba.putalpha(128)
+    gray = Image.linear_gradient('L').resize((300, 300))
+
+    rgba_tensor = load_model_input(encode(rgba, 'PNG'), (32, 32))
+    gray_tensor = load_model_input(encode(gray, 'PNG'), (32, 32))
+
+    print(f"\n[2] RGBA {rgba_tensor.shape} {rgba_tensor.dtype}, grayscale {gray_tensor.shape}")
+    for tensor in (rgba_tensor, gray_tensor):
+        assert tensor.shape == (32, 32, 3) and tensor.dtype == np.float32
+        assert 0.0 <= tensor.min() and tensor.max() <= 1.0
+    assert rgba_tensor[16, 4, 0] > 0.9 and rgba_tensor[16, 28, 2] > 0.9
+    # Gray becomes three equal channels, still dark at the top and light at the bottom
+    assert np.allclose(gray_tensor[..., 0], gray_tensor[..., 2])
+    assert gray_tensor[2].mean() < 0.2 and gray_tensor[-3].mean() > 0.8
+
+
+def test_image_smaller_than_target_is_upscaled():
+    tensor = load_model_input(encode(red_left_blue_right((20, 10)), 'PNG'), (128, 128))
+    print(f"\n[3] 20x10 -> {tensor.shape}")
+    assert tensor.shape == (128, 128, 3)
+    assert tensor[64, 10, 0] > 0.9 and tensor[64, 118, 2] > 0.9
+
+
+def test_matches_full_decode_pipeline():
+    path = os.path.join(tempfile.mkdtemp(), 'photo.jpg')
+    make_synthetic_jpeg(path, size=(1600, 1200))
+    with open(path, 'rb') as f:
+        image_bytes = f.read()
+
+    reduced = load_model_input(image_bytes, (128, 128))
+    full = decode_full(image_bytes, np.empty((128, 128, 3), dtype=np.float32))
+    difference = np.abs(reduced - full)
+    print(f"\n[4] vs full decode: mean abs diff {difference.mean():.4f}, "
+          f"99th percentile {np.percentile(difference, 99):.4f}")
+    # Area-averaged reduced decode vs point-sampled full decode: same picture, less noise
+    assert difference.mean() < 0.03
+    assert np.percentile(difference, 99) < 0.15
+
+
+if __name__ == "__main__":
+    test_exif_orientation_is_applied()
+    test_png_rgba_and_grayscale_inputs()
+    test_image_smaller_than_target_is_upscaled()
+    test_matches_full_decode_pipeline()
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
@@ -0,0 +1,230 @@
+"""
+Test script for the asynchronous classification job queue and /api/ai/jobs
+"""
+import sys
+import os
+import io
+import time
+import tempfile
+from pathlib import Path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+
+from config.ai_config import AIConfig
+from models.job_queue import JobQueue, MemoryJobBackend, SQLiteJobBackend
+
+
+def wait_for(queue, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] not in ('queued', 'running'):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish: {queue.get(job_id)}")
+
+
+def test_memory_queue_retries_then_succeeds():
+    print("=" * 60)
+    print("JOB QUEUE TEST")
+    print("=" * 60)
+
+    AIConfig.JOB_RETRY_BACKOFF_SECONDS = 0.05
+    calls = []
+
+    def flaky(image_bytes, job):
+        calls.append(job['attempts'])
+        if job['attempts'] == 1:
+            raise RuntimeError("provider timed out")
+        return {'waste_type': 'plastic', 'size': len(image_bytes)}
+
+    queue = JobQueue(flaky, backend=MemoryJobBackend(), workers=2, max_attempts=3)
+    job = queue.submit(b'image-bytes')
+    assert job['status'] == 'queued'
+
+    done = wait_for(queue, job['job_id'])
+    print(f"\n[1] Finished job: {done}")
+    assert done['status'] == 'succeeded'
+    assert done['attempts'] == 2
+    assert done['result'] == {'waste_type': 'plastic', 'size': 11}
+    assert calls == [1, 2]
+
+    stats = queue.get_stats()
+    assert stats['retried'] == 1 and stats['succeeded'] == 1
+    assert stats['depth'] == {'queued': 0, 'running': 0, 'delayed': 0}
+    queue.stop()
+
+
+def test_sqlite_queue_fails_after_max_attempts_and_expires():
+    AIConfig.JOB_RETRY_BACKOFF_SECONDS = 0.01
+    with tempfile.TemporaryDirectory() as temp_dir:
+        backend = SQLiteJobBackend(os.path.join(temp_dir, 'jobs.db'))
+
+        def broken(image_bytes, job):
+            raise RuntimeError("all providers failed")
+
+        queue = JobQueue(broken, backend=backend, workers=1, max_attempts=2)
+        failed = wait_for(queue, queue.submit(b'x')['job_id'])
+        assert failed['status'] == 'failed'
+        assert failed['attempts'] == 2
+        assert failed['error'] == 'all providers failed'
+        queue.stop()
+
+        # A job nobody picked up before its TTL expires instead of running late
+        queue.start = lambda: None  # keep the workers stopped
+        job = queue.submit(b'y')
+        expired_at = time.time() + AIConfig.JOB_TTL_SECONDS + 1
+        assert backend.depth()['queued'] == 1
+        assert backend.purge(expired_at) == (1, 0)
+        assert queue.get(job['job_id'])['status'] == 'expired'
+        print(f"\n[2] Stats: {queue.get_stats()}")
+
+
+class FlakySaveBackend(MemoryJobBackend):
+    """Memory backend whose first save() raises, like a locked database"""
+
+    def __init__(self):
+        super().__init__()
+        self.save_failures = 1
+
+    def save(self, job):
+        if self.save_failures:
+            self.save_failures -= 1
+            raise RuntimeError("database is locked")
+        super().save(job)
+
+
+def test_backend_error_does_not_kill_the_worker(monkeypatch):
+    monkeypatch.setattr(AIConfig, 'JOB_RETRY_BACKOFF_SECONDS', 0.01)
+    queue = JobQueue(lambda image_bytes, job: {'waste_type': 'glass'}, backend=FlakySaveBackend(),
+                     workers=1, max_attempts=3)
+    first = queue.submit(b'first')
+    second = queue.submit(b'second')
+
+    # One worker: the second job only finishes if it survived the failed save
+    done = [wait_for(queue, job['job_id']) for job in (first, second)]
+    stats = queue.get_stats()
+    print(f"\n[3] After a failed save: {[(job['status'], job['attempts']) for job in done]}, workers alive "
+          f"{sum(thread.is_alive() for thread in queue._threads)}")
+    assert [job['status'] for job in done] == ['succeeded', 'succeeded']
+    assert done[0]['attempts'] == 2 and stats['retried'] == 1
+    assert all(thread.is_alive() for thread in queue._threads)
+    queue.stop()
+
+
+def make_client(monkeypatch, tmp_path):
+    """Lazy-start app run from tmp_path with an in-memory job queue"""
+    import app as app_module
+    from config.settings import config
+    from routes import ai_routes
+
+    # The database managers default to ./wastewise.db
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config['testing'], 'STARTUP_MODE', 'lazy', raising=False)
+    queue = JobQueue(lambda image_bytes, job: {'waste_type': 'paper'}, backend=MemoryJobBackend(), workers=1)
+    monkeypatch.setattr(ai_routes, 'job_queue', queue)
+    return app_module.create_app('testing').test_client(), queue
+
+
+def test_jobs_endpoints(monkeypatch, tmp_path):
+    client, queue = make_client(monkeypatch, tmp_path)
+    try:
+        response = client.post('/api/ai/jobs', data={
+            'image': (io.BytesIO(b'fake-image'), 'photo.jpg'),
+            'callback_url': 'ftp://example.com/hook'
+        }, content_type='multipart/form-data')
+        assert response.status_code == 400
+
+        response = client.post('/api/ai/jobs', data={'image': (io.BytesIO(b'fake-image'), 'photo.jpg')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 202
+        status_url = response.get_json()['status_url']
+
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            body = client.get(status_url).get_json()
+            if body['job']['status'] == 'succeeded':
+                break
+            time.sleep(0.02)
+        print(f"\n[4] Polled job: {body['job']}")
+        assert body['job']['result'] == {'waste_type': 'paper'}
+        assert client.get('/api/ai/jobs/unknown').status_code == 404
+    finally:
+        queue.stop()
+
+
+def test_callbacks_need_an_allowlisted_host(monkeypatch, tmp_path):
+    from routes.ai_routes import validate_callback_url
+
+    client, queue = make_client(monkeypatch, tmp_path)
+    try:
+        def submit(callback_url):
+            return client.post('/api/ai/jobs', data={
+                'image': (io.BytesIO(b'fake-image'), 'photo.jpg'),
+                'callback_url': callback_url
+            }, content_type='multipart/form-data')
+
+        # No allowlist: every callback is refused, including cloud metadata and loopback
+        monkeypatch.setattr(AIConfig, 'JOB_CALLBACK_ALLOWED_HOSTS', [])
+        for url in ('http://169.254.169.254/latest/meta-data/', 'http://127.0.0.1:5000/admin',
+                    'https://hooks.example.com/done'):
+            response = submit(url)
+            assert response.status_code == 400, url
+        print(f"\n[5] Without an allowlist: {response.get_json()['error']}")
+
+        monkeypatch.setattr(AIConfig, 'JOB_CALLBACK_ALLOWED_HOSTS', ['hooks.example.com'])
+        assert submit('http://localhost/internal').status_code == 400
+        assert validate_callback_url('https://hooks.example.com/done') is None
+        assert queue.get_stats()['submitted'] == 0
+    finally:
+        queue.stop()
+
+
+def test_job_options_are_bounded(monkeypatch, tmp_path):
+    from config.ai_config import AIProvider
+    from flask_jwt_extended import create_access_token
+
+    client, queue = make_client(monkeypatch, tmp_path)
+    try:
+        def submit(headers=None, **form):
+            form['image'] = (io.BytesIO(b'fake-image'), 'photo.jpg')
+            return client.post('/api/ai/jobs', data=form, headers=headers or {},
+                               content_type='multipart/form-data')
+
+        max_top_k = len(AIConfig.WASTE_CATEGORIES)
+        for top_k in ('0', '-1', str(max_top_k + 1), '1000000'):
+            assert submit(top_k=top_k).status_code == 400, top_k
+
+        # A configured metered provider other than the active one needs a signed-in user
+        monkeypatch.setattr(AIConfig, 'ACTIVE_PROVIDER', AIProvider.LOCAL)
+        monkeypatch.setattr(AIConfig, 'is_provider_configured',
+                            classmethod(lambda cls, provider: provider != AIProvider.GEMINI))
+        anonymous = submit(provider='openai')
+        assert submit(provider='gemini').status_code == 400
+        print(f"\n[6] Anonymous openai job: {anonymous.status_code} {anonymous.get_json()['error']}")
+        assert anonymous.status_code == 401
+        assert queue.get_stats()['submitted'] == 0
+
+        with client.application.app_context():
+            token = create_access_token(identity='user-1')
+        headers = {'Authorization': f'Bearer {token}'}
+        assert submit(headers, provider='openai', top_k=str(max_top_k)).status_code == 202
+        assert submit(provider='local', top_k='1').status_code == 202
+        assert queue.get_stats()['submitted'] == 2
+    finally:
+        queue.stop()
+
+
+if __name__ == "__main__":
+    test_memory_queue_retries_then_succeeds()
+    test_sqlite_queue_fails_after_max_attempts_and_expires()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_backend_error_does_not_kill_the_worker(monkeypatch)
+    for test in (test_jobs_endpoints, test_callbacks_need_an_allowlisted_host,
+                 test_job_options_are_bounded):
+        with pytest.MonkeyPatch.context() as monkeypatch, tempfile.TemporaryDirectory() as tmp:
+            test(monkeypatch, Path(tmp))
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
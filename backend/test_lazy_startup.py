@@ -0,0 +1,84 @@
+"""
+Test script for lazily built singletons and the readiness endpoint
+"""
+import sys
+import os
+import tempfile
+from pathlib import Path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+
+from utils.lazy import LazyObject, startup_state
+
+
+class Counter:
+    built = 0
+
+    def __init__(self):
+        Counter.built += 1
+        self.items = []
+
+
+def test_lazy_object_builds_on_first_use():
+    print("=" * 60)
+    print("LAZY STARTUP TEST")
+    print("=" * 60)
+
+    lazy = LazyObject(Counter, 'test.counter')
+    assert Counter.built == 0
+    assert startup_state.snapshot()['subsystems']['test.counter']['warm'] is False
+
+    lazy.items.append(1)
+    lazy.extra = 'set through the proxy'
+    assert Counter.built == 1
+    assert lazy.items == [1]
+    assert lazy.extra == 'set through the proxy'
+    assert not hasattr(lazy, 'missing')
+    assert startup_state.snapshot()['subsystems']['test.counter']['warm'] is True
+
+
+def test_container_protocol_is_forwarded():
+    lazy = LazyObject(lambda: {'plastic': 3, 'paper': 1}, 'test.container')
+    assert len(lazy) == 2
+    assert 'plastic' in lazy and 'glass' not in lazy
+    assert sorted(lazy) == ['paper', 'plastic']
+    assert lazy['plastic'] == 3
+    assert bool(LazyObject(list, 'test.empty')) is False
+
+    # Not forwarded: operators and isinstance() see the proxy
+    assert not isinstance(lazy, dict)
+    try:
+        lazy | {}
+        assert False, "expected TypeError"
+    except TypeError:
+        pass
+    print("\n[2] len / in / iter / [] / bool forwarded; operators and isinstance are not")
+
+
+def test_ready_endpoint_in_lazy_mode(monkeypatch, tmp_path):
+    import app as app_module
+    from config.settings import config
+
+    # The database managers default to ./wastewise.db
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config['testing'], 'STARTUP_MODE', 'lazy', raising=False)
+    client = app_module.create_app('testing').test_client()
+    response = client.get('/api/ready')
+    body = response.get_json()
+
+    print(f"\n[3] Readiness: {body['subsystems']}")
+    assert response.status_code == 200
+    assert body['startup_mode'] == 'lazy'
+    assert body['subsystems']['database']['warm'] is False
+    assert body['heavy_modules_loaded']['tensorflow'] is False
+
+
+if __name__ == "__main__":
+    test_lazy_object_builds_on_first_use()
+    test_container_protocol_is_forwarded()
+    with pytest.MonkeyPatch.context() as monkeypatch, tempfile.TemporaryDirectory() as tmp:
+        test_ready_endpoint_in_lazy_mode(monkeypatch, Path(tmp))
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
@@ -0,0 +1,274 @@
+"""
+Test script for the schema migrations and the query plans of the hot queries
+A hot query that stops using its index (a dropped index, a rewritten WHERE)
+fails here instead of turning into a full table scan in production
+"""
+import sys
+import os
+import re
+import sqlite3
+import tempfile
+sys.path.insert(0, os.path.dirname(__file__))
+
+from utils.db_pool import get_db_pool
+from models.migrations import MIGRATIONS, run_migrations, get_schema_version
+from models.database import DatabaseManager
+
+# Tables read or written by the routes and managers
+ROUTE_TABLES = {
+    'classifications', 'processed_events', 'waste_categories', 'user_sessions',
+    'users', 'user_profiles', 'password_reset_tokens', 'email_verification_tokens',
+    'revoked_tokens', 'user_activity_logs',
+    'user_points', 'point_transactions', 'user_badges', 'reward_redemptions',
+    'marketplace_listings', 'marketplace_bookings', 'marketplace_transactions', 'marketplace_reviews'
+}
+
+# (name, sql, params, index the plan must use, whether ORDER BY must come from the index)
+HOT_QUERIES = [
+    ('recent classifications',
+     'SELECT filename, waste_type, confidence, created_at FROM classifications ORDER BY created_at DESC LIMIT ?',
+     (10,), 'idx_classifications_created_at', True),
+    ('waste breakdown',
+     'SELECT waste_type, COUNT(*) as count FROM classifications GROUP BY waste_type',
+     (), 'idx_classifications_waste_type', False),
+    ('classification cleanup',
+     "DELETE FROM classifications WHERE created_at < datetime('now', '-30 days')",
+     (), 'idx_classifications_created_at', False),
+    ('saved classification by uid',
+     'SELECT id FROM classifications WHERE classification_uid = ?',
+     ('uid',), 'idx_classifications_uid', False),
+    ('user classification stats',
+     'SELECT waste_type, COUNT(*) as count FROM classifications WHERE user_id = ? GROUP BY waste_type',
+     ('u',), 'COVERING INDEX idx_classifications_user_type_created', False),
+    ('user classification stats since',
+     '''SELECT waste_type, COUNT(*) as count FROM classifications
+        WHERE user_id = ? AND created_at >= ? GROUP BY waste_type''',
+     ('u', '2026-01-01'), 'COVERING INDEX idx_classifications_user_type_created', False),
+    ('user classification count',
+     'SELECT COUNT(*) FROM classifications WHERE user_id = ?',
+     ('u',), 'COVERING INDEX idx_classifications_user_type_created', False),
+    ('session lookup',
+     'SELECT id FROM user_sessions WHERE session_id = ?',
+     ('s',), 'sqlite_autoindex_user_sessions_1', False),
+    ('login',
+     'SELECT id, password_hash, full_name, role, is_active, login_attempts, locked_until FROM users WHERE email = ?',
+     ('a@example.com',), 'sqlite_autoindex_users_2', False),
+    ('revoked token check',
+     'SELECT id FROM revoked_tokens WHERE jti = ?',
+     ('jti',), 'sqlite_autoindex_revoked_tokens_2', False),
+    ('recent activity',
+     'SELECT action, created_at FROM user_activity_logs WHERE user_id = ? ORDER BY created_at DESC LIMIT 10',
+     ('u',), 'idx_user_activity_logs_user_created', True),
+    ('points balance',
+     'SELECT total_points, points_earned, points_spent FROM user_points WHERE user_id = ?',
+     ('u',), 'sqlite_autoindex_user_points_1', False),
+    ('points history',
+     '''SELECT id, points, transaction_type, reason, reference_id, balance_after, created_at
+        FROM point_transactions WHERE user_id = ? ORDER BY created_at DESC LIMIT ?''',
+     ('u', 10), 'idx_point_transactions_user_created', True),
+    ('badges',
+     '''SELECT id, badge_id, badge_name, badge_description, icon, points_awarded, earned_at
+        FROM user_badges WHERE user_id = ? ORDER BY earned_at DESC''',
+     ('u',), 'idx_user_badges_user_earned', True),
+    ('redemptions',
+     '''SELECT id, reward_id, reward_name, quantity, points_spent, status, redeemed_at
+        FROM reward_redemptions WHERE user_id = ? ORDER BY redeemed_at DESC''',
+     ('u',), 'idx_reward_redemptions_user_redeemed', True),
+    ('leaderboard',
+     'SELECT user_id, total_points FROM user_points ORDER BY total_points DESC LIMIT ?',
+     (50,), 'idx_user_points_total', True),
+    ('listing search',
+     '''SELECT l.*, u.full_name as seller_name, u.phone as seller_phone
+        FROM marketplace_listings l JOIN users u ON l.user_id = u.id
+        WHERE l.status = 'active' ORDER BY l.created_at DESC LIMIT ? OFFSET ?''',
+     (20, 0), 'idx_listings_status_created', True),
+    ('listing search by type',
+     '''SELECT l.*, u.full_name as seller_name, u.phone as seller_phone
+        FROM marketplace_listings l JOIN users u ON l.user_id = u.id
+        WHERE l.status = 'active' AND l.waste_type = ? ORDER BY l.created_at DESC LIMIT ? OFFSET ?''',
+     ('plastic', 20, 0), 'idx_listings_status_type_created', True),
+    ('listing search count',
+     "SELECT COUNT(*) as total FROM marketplace_listings l WHERE l.status = 'active' AND l.waste_type = ?",
+     ('plastic',), 'idx_listings_status_type_created', False),
+    ('my listings',
+     '''SELECT l.*, COUNT(DISTINCT b.id) as booking_count
+        FROM marketplace_listings l LEFT JOIN marketplace_bookings b ON l.id = b.listing_id
+        WHERE l.user_id = ? AND l.status = ?
+        GROUP BY l.id ORDER BY l.created_at DESC LIMIT ? OFFSET ?''',
+     ('u', 'active', 20, 0), 'idx_listings_user_status_created', False),
+    ('seller stats',
+     '''SELECT COUNT(*) as total_listings, AVG(r.rating) as average_rating, COUNT(DISTINCT r.id) as total_reviews
+        FROM marketplace_listings l
+        LEFT JOIN marketplace_bookings b ON l.id = b.listing_id
+        LEFT JOIN marketplace_reviews r ON b.id = r.booking_id AND r.reviewed_user_id = l.user_id
+        WHERE l.user_id = ?''',
+     ('u',), 'idx_reviews_booking_reviewed', False),
+    ('my bookings',
+     '''SELECT b.*, l.title as listing_title, u.full_name as seller_name
+        FROM marketplace_bookings b
+        JOIN marketplace_listings l ON b.listing_id = l.id
+        JOIN users u ON b.seller_id = u.id
+        WHERE b.buyer_id = ? ORDER BY b.created_at DESC LIMIT ? OFFSET ?''',
+     ('u', 20, 0), 'idx_bookings_buyer_created', True),
+    ('active bookings for listing',
+     "SELECT COUNT(*) as count FROM marketplace_bookings WHERE listing_id = ? AND status IN ('pending', 'confirmed')",
+     ('l',), 'idx_bookings_listing_status', False),
+    ('my transactions',
+     '''SELECT t.*, b.listing_id, l.title as listing_title
+        FROM marketplace_transactions t
+        JOIN marketplace_bookings b ON t.booking_id = b.id
+        JOIN marketplace_listings l ON b.listing_id = l.id
+        WHERE (t.buyer_id = ? OR t.seller_id = ?) ORDER BY t.created_at DESC LIMIT ? OFFSET ?''',
+     ('u', 'u', 20, 0), 'idx_transactions_seller_created', False)
+]
+
+# "SCAN t" / "SCAN TABLE t AS x" with no index: every row is read
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\S+( AS \S+)?$')
+
+
+def query_plan(conn, sql, params):
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()]
+
+
+def test_migrations_create_route_tables_once():
+    print("=" * 60)
+    print("SCHEMA MIGRATION TEST")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'wastewise.db')
+        applied = run_migrations(db_path)
+        assert applied == [version for version, _, _ in MIGRATIONS]
+        assert run_migrations(db_path) == []
+        assert get_schema_version(db_path) == MIGRATIONS[-1][0]
+
+        with get_db_pool(db_path).connection() as conn:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            categories = conn.execute('SELECT COUNT(*) FROM waste_categories').fetchone()[0]
+        print(f"\n[1] Applied {applied}, {len(tables & ROUTE_TABLES)} route tables")
+        assert ROUTE_TABLES <= tables
+        assert categories == 5
+        get_db_pool(db_path).close_all()
+
+
+def test_pre_migration_database_is_upgraded():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'wastewise.db')
+        # A file written by the old ad hoc init: no phash column, a duplicate email index, a row to keep
+        conn = sqlite3.connect(db_path)
+        conn.executescript('''
+            CREATE TABLE classifications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, filename TEXT NOT NULL, original_filename TEXT,
+                waste_type TEXT NOT NULL, confidence REAL NOT NULL, all_predictions TEXT, image_path TEXT,
+                recommendations TEXT, environmental_impact TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            INSERT INTO classifications (filename, waste_type, confidence) VALUES ('old.jpg', 'paper', 0.8);
+            CREATE TABLE users (id TEXT PRIMARY KEY, email TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL,
+                                full_name TEXT NOT NULL, phone TEXT, role TEXT DEFAULT 'user');
+            CREATE INDEX idx_users_email ON users (email);
+        ''')
+        conn.close()
+
+        db = DatabaseManager(db_path)
+        assert db.save_classification('new.jpg', 'new.jpg', 'plastic', 0.9, phash=1, classification_uid='u1')
+        assert db.get_statistics()['total_classifications'] == 2
+        with db.pool.connection() as conn:
+            indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        print(f"\n[2] Upgraded an old file to version {get_schema_version(db_path)}")
+        assert 'idx_users_email' not in indexes and 'idx_classifications_created_at' in indexes
+        db.pool.close_all()
+
+
+def test_failed_migration_leaves_nothing_behind():
+    def broken(cursor):
+        cursor.execute('CREATE TABLE half_done (id INTEGER)')
+        raise sqlite3.OperationalError("migration bug")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'wastewise.db')
+        run_migrations(db_path)
+        try:
+            run_migrations(db_path, MIGRATIONS + [(99, 'broken', broken)])
+            raise AssertionError("broken migration did not raise")
+        except sqlite3.OperationalError:
+            pass
+        with get_db_pool(db_path).connection() as conn:
+            assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+        assert get_schema_version(db_path) == MIGRATIONS[-1][0]
+        print("\n[3] Failed migration rolled back, version unchanged")
+        get_db_pool(db_path).close_all()
+
+
+def test_classifications_are_attributed_to_users():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'wastewise.db')
+        # Rows saved before the owner columns existed; only the points ledger knows who made them
+        run_migrations(db_path, [m for m in MIGRATIONS if m[0] < 5])
+        with get_db_pool(db_path).connection() as conn:
+            conn.executemany('''
+                INSERT INTO classifications (filename, waste_type, confidence, classification_uid)
+                VALUES (?, ?, 0.9, ?)
+            ''', [('1f0c_a.jpg', 'plastic', 'c1'), ('9e2d_b.jpg', 'glass', 'c2'),
+                  ('anon_c.jpg', 'paper', 'c3'), ('user-1_d.jpg', 'metal', None),
+                  ('legacy_e.jpg', 'cardboard', None)])
+            legacy_id = conn.execute("SELECT id FROM classifications WHERE filename = 'legacy_e.jpg'").fetchone()[0]
+            conn.executemany('''
+                INSERT INTO point_transactions (id, user_id, points, transaction_type, reason, reference_id)
+                VALUES (?, ?, 10, 'earned', ?, ?)
+            ''', [('t1', 'user-1', 'Waste classification', 'c1'), ('t2', 'user-1', 'Waste classification', 'c2'),
+                  ('t3', 'user-2', 'Badge earned', 'c3'),
+                  # Older ledger rows referenced the integer row id
+                  ('t4', 'user-2', 'Waste classification', str(legacy_id))])
+
+        assert run_migrations(db_path) == [5]
+        db = DatabaseManager(db_path)
+        db.save_classification('f.jpg', 'f.jpg', 'organic', 0.8, classification_uid='c4',
+                               user_id='user-1', session_id='s1')
+        stats = db.get_user_classification_stats('user-1')
+        with db.pool.connection() as conn:
+            owners = dict(conn.execute('SELECT filename, user_id FROM classifications').fetchall())
+            session = conn.execute("SELECT session_id FROM classifications WHERE classification_uid = 'c4'").fetchone()[0]
+
+        print(f"\n[4] Owners after backfill: {owners}, user-1 stats: {stats}")
+        assert owners == {'1f0c_a.jpg': 'user-1', '9e2d_b.jpg': 'user-1', 'anon_c.jpg': None,
+                          'user-1_d.jpg': None, 'legacy_e.jpg': 'user-2', 'f.jpg': 'user-1'}
+        assert session == 's1'
+        # A filename that merely contains the id no longer counts
+        assert stats == {'total_classifications': 3, 'waste_breakdown': {'plastic': 1, 'glass': 1, 'organic': 1}}
+        assert db.get_user_classification_stats('user-1', start_date='2999-01-01')['total_classifications'] == 0
+        assert db.get_user_classification_stats('user-2')['waste_breakdown'] == {'cardboard': 1}
+        db.pool.close_all()
+
+
+def test_hot_queries_use_their_indexes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'wastewise.db')
+        run_migrations(db_path)
+        failures = []
+        with get_db_pool(db_path).connection() as conn:
+            for name, sql, params, index, ordered in HOT_QUERIES:
+                plan = query_plan(conn, sql, params)
+                problems = [step for step in plan if FULL_SCAN.match(step)]
+                if not any(index in step for step in plan):
+                    problems.append(f"{index} not used")
+                if ordered and any('TEMP B-TREE FOR ORDER BY' in step for step in plan):
+                    problems.append('sorts instead of reading the index in order')
+                if problems:
+                    failures.append((name, problems, plan))
+        get_db_pool(db_path).close_all()
+
+        print(f"\n[5] {len(HOT_QUERIES) - len(failures)}/{len(HOT_QUERIES)} hot queries on their indexes")
+        for name, problems, plan in failures:
+            print(f"    {name}: {problems}\n      plan: {plan}")
+        assert failures == []
+
+
+if __name__ == "__main__":
+    test_migrations_create_route_tables_once()
+    test_pre_migration_database_is_upgraded()
+    test_failed_migration_leaves_nothing_behind()
+    test_classifications_are_attributed_to_users()
+    test_hot_queries_use_their_indexes()
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
@@ -0,0 +1,238 @@
+"""
+Test script for the versioned local model registry (load, warm, switch, roll back)
+"""
+import sys
+import os
+import io
+import json
+import time
+import tempfile
+import threading
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from config.ai_config import AIConfig, AIProvider
+from models.model_registry import ModelRegistry, ModelVersionError
+
+
+class FakeModel:
+    """Always predicts `target`; the first call is slow, like graph tracing"""
+
+    def __init__(self, classes, target, outputs=None):
+        self.index = classes.index(target)
+        self.outputs = outputs or len(classes)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def predict(self, batch, verbose=0):
+        with self._lock:
+            first = not self.calls
+            self.calls.append(len(batch))
+        if first:
+            time.sleep(0.2)
+        scores = np.full((len(batch), self.outputs), 0.01, dtype=np.float32)
+        scores[:, self.index] = 0.9
+        return scores
+
+
+def add_version(root, version, classes, target, outputs=None):
+    directory = os.path.join(root, version)
+    os.makedirs(directory)
+    with open(os.path.join(directory, 'class_indices.json'), 'w') as f:
+        json.dump({name: i for i, name in enumerate(classes)}, f)
+    with open(os.path.join(directory, 'model.onnx'), 'w') as f:
+        json.dump({'classes': classes, 'target': target, 'outputs': outputs}, f)
+
+
+def fake_loader(models):
+    def load(backend, path):
+        with open(path) as f:
+            spec = json.load(f)
+        model = FakeModel(spec['classes'], spec['target'], spec['outputs'])
+        models[os.path.basename(os.path.dirname(path))] = model
+        return model
+    return load
+
+
+def make_registry(root, models):
+    add_version(root, 'v1', AIConfig.WASTE_CATEGORIES, 'plastic')
+    add_version(root, 'v2', ['paper', 'glass', 'metal'], 'glass')
+    with open(os.path.join(root, 'ACTIVE'), 'w') as f:
+        f.write('v1')
+    return ModelRegistry(root=root, loader=fake_loader(models))
+
+
+def wait_for_state(registry, version, states, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        state = registry.get_stats()['states'].get(version, {}).get('state')
+        if state in states:
+            return state
+        time.sleep(0.01)
+    raise AssertionError(f"{version} never reached {states}")
+
+
+def make_jpeg():
+    buffer = io.BytesIO()
+    Image.new('RGB', (160, 120), color='green').save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def with_config(test):
+    def wrapper():
+        saved = AIConfig.RESULT_CACHE_ENABLED, AIConfig.PHASH_INDEX_ENABLED, AIConfig.LOCAL_MODEL_VERSION
+        AIConfig.RESULT_CACHE_ENABLED = AIConfig.PHASH_INDEX_ENABLED = False
+        try:
+            test()
+        finally:
+            AIConfig.RESULT_CACHE_ENABLED, AIConfig.PHASH_INDEX_ENABLED, AIConfig.LOCAL_MODEL_VERSION = saved
+    wrapper.__name__ = test.__name__
+    return wrapper
+
+
+@with_config
+def test_switch_under_load_and_instant_rollback():
+    print("=" * 60)
+    print("MODEL REGISTRY TEST")
+    print("=" * 60)
+
+    from models.unified_classifier import UnifiedWasteClassifier
+
+    with tempfile.TemporaryDirectory() as root:
+        models = {}
+        registry = make_registry(root, models)
+        assert registry.active().version == 'v1'
+
+        classifier = UnifiedWasteClassifier(provider=AIProvider.OPENAI)
+        classifier.registry = registry
+        image = make_jpeg()
+        results, errors, slow = [], [], []
+        stop = threading.Event()
+
+        def client():
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    result = classifier._classify_local(image, 3)
+                    results.append(result['model_version'])
+                    if result['model_version'] == 'v2':
+                        slow.append((time.perf_counter() - start) * 1000)
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=client) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        status = registry.stage('v2', activate=True)
+        assert status['state'] == 'loading'
+        while registry.active().version != 'v2':
+            time.sleep(0.01)
+        time.sleep(0.05)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        stats = registry.get_stats()
+        print(f"\n[1] Served: v1={results.count('v1')} v2={results.count('v2')}, "
+              f"slowest v2 request {max(slow):.1f} ms, warm-up {stats['active']['warmup']}")
+        assert errors == []
+        # Every request saw one version; after the switch only v2 answers
+        assert results.index('v2') > 0 and 'v1' not in results[results.index('v2') + 4:]
+        # The slow first call happened during warm-up, not on a request
+        assert stats['active']['warmup']['batch_sizes'] == [1, 2, 4, 8, 16]
+        assert models['v2'].calls[:2] == [1, 1]
+        assert max(slow) < 150
+        # v2's own class_indices.json maps its outputs
+        assert classifier._classify_local(image, 3)['raw_category'] == 'glass'
+
+        loads = stats['loads']
+        start = time.perf_counter()
+        registry.rollback()
+        rollback_ms = (time.perf_counter() - start) * 1000
+        print(f"[1] Rollback took {rollback_ms:.2f} ms")
+        assert registry.active().version == 'v1' and registry.get_stats()['loads'] == loads
+        assert classifier._classify_local(image, 3)['raw_category'] == 'plastic'
+        with open(os.path.join(root, 'ACTIVE')) as f:
+            assert f.read() == 'v1'
+        assert AIConfig.get_model_version(AIProvider.LOCAL) == 'onnx-v1'
+        classifier.close()
+
+
+@with_config
+def test_broken_version_never_serves():
+    with tempfile.TemporaryDirectory() as root:
+        registry = make_registry(root, {})
+        assert registry.active().version == 'v1'
+        # class_indices.json lists 3 classes but the model outputs 12 scores
+        add_version(root, 'v3', ['paper', 'glass', 'metal'], 'glass', outputs=12)
+
+        registry.stage('v3')
+        assert wait_for_state(registry, 'v3', ('failed', 'ready')) == 'failed'
+        print(f"\n[2] {registry.get_stats()['states']['v3']}")
+        try:
+            registry.activate('v3')
+            raise AssertionError("activated a version that failed warm-up")
+        except ModelVersionError:
+            pass
+        try:
+            registry.stage('missing')
+            raise AssertionError("staged a version that does not exist")
+        except ModelVersionError:
+            pass
+        assert registry.active().version == 'v1'
+
+
+@with_config
+def test_model_endpoints_require_admin():
+    import app as app_module
+    from config.settings import config
+    from routes import ai_routes
+    from flask_jwt_extended import create_access_token
+
+    original = ai_routes.model_registry
+    with tempfile.TemporaryDirectory() as root:
+        ai_routes.model_registry = make_registry(root, {})
+        # Lazy start from the temp dir: nothing is warmed and ./wastewise.db lands there
+        monkeypatch = pytest.MonkeyPatch()
+        monkeypatch.chdir(root)
+        monkeypatch.setattr(config['testing'], 'STARTUP_MODE', 'lazy', raising=False)
+        try:
+            app = app_module.create_app('testing')
+            client = app.test_client()
+            with app.app_context():
+                admin = create_access_token(identity='admin-1', additional_claims={'is_admin': True})
+                user = create_access_token(identity='user-1')
+
+            assert client.post('/api/ai/models/v2/load').status_code == 401
+            assert client.post('/api/ai/models/v2/load',
+                               headers={'Authorization': f'Bearer {user}'}).status_code == 403
+
+            headers = {'Authorization': f'Bearer {admin}'}
+            response = client.post('/api/ai/models/v2/load', json={'activate': False}, headers=headers)
+            assert response.status_code == 202
+            wait_for_state(ai_routes.model_registry, 'v2', ('ready',))
+
+            response = client.post('/api/ai/models/v2/activate', headers=headers)
+            assert response.status_code == 200
+            assert response.get_json()['models']['active']['version'] == 'v2'
+
+            response = client.post('/api/ai/models/rollback', headers=headers)
+            print(f"\n[3] After rollback: {response.get_json()['models']['active']['version']}")
+            assert response.get_json()['models']['active']['version'] == 'v1'
+            assert client.post('/api/ai/models/nope/load', headers=headers).status_code == 404
+        finally:
+            monkeypatch.undo()
+            ai_routes.model_registry = original
+
+
+if __name__ == "__main__":
+    test_switch_under_load_and_instant_rollback()
+    test_broken_version_never_serves()
+    test_model_endpoints_require_admin()
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
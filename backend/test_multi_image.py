@@ -0,0 +1,114 @@
+"""
+Test script for classifying several images in one Gemini/OpenAI call
+"""
+import sys
+import os
+import json
+sys.path.insert(0, os.path.dirname(__file__))
+
+from config.ai_config import AIConfig, AIProvider
+from models.multi_image import parse_response
+
+
+def answer(labels, waste_type='plastic'):
+    return [{'index': label, 'waste_type': waste_type, 'confidence': 0.9, 'reasoning': 'test'} for label in labels]
+
+
+def test_parse_response_maps_items_to_labels():
+    print("=" * 60)
+    print("MULTI-IMAGE PROMPT TEST")
+    print("=" * 60)
+
+    parsed, failed = parse_response(json.dumps(answer([2, 1, 3])), 3)
+    print(f"\n[1] Array: {sorted(parsed)} failed={failed}")
+    assert sorted(parsed) == [1, 2, 3] and failed == []
+
+    # OpenAI strict mode wraps the array; markdown fences are stripped
+    parsed, failed = parse_response("```json\n" + json.dumps({'items': answer([1, 3])}) + "\n```", 3)
+    assert sorted(parsed) == [1, 3] and failed == [2]
+
+    # Broken JSON: the objects that still parse are kept, bad or out-of-range ones are not
+    text = json.dumps(answer([1]))[:-1] + ', {"index": 2, "waste_type": "glass", "confidence": 7}, ' \
+        '{"index": 9, "waste_type": "glass", "confidence": 0.5}, {"index": 3, "waste_ty'
+    parsed, failed = parse_response(text, 3)
+    print(f"[1] Broken: {sorted(parsed)} failed={failed}")
+    assert sorted(parsed) == [1] and failed == [2, 3]
+
+
+def make_classifier(replies):
+    """OpenAI classifier whose multi-image calls return the queued replies"""
+    from models.unified_classifier import UnifiedWasteClassifier
+    classifier = UnifiedWasteClassifier(provider=AIProvider.OPENAI)
+    calls, singles = [], []
+
+    def fake_multi(images):
+        calls.append(len(images))
+        return json.dumps(replies.pop(0)), {'input_tokens': 100 * len(images), 'output_tokens': 40 * len(images)}
+
+    def fake_classify(image_bytes, top_k=None):
+        singles.append(bytes(image_bytes))
+        return {'waste_type': 'metal', 'confidence': 0.8, 'provider': 'openai'}
+
+    classifier._openai_multi_image = fake_multi
+    classifier.classify = fake_classify
+    return classifier, calls, singles
+
+
+def with_config(test):
+    def wrapper():
+        saved = (AIConfig.OPENAI_API_KEY, AIConfig.RESULT_CACHE_ENABLED, AIConfig.PHASH_INDEX_ENABLED,
+                 AIConfig.MULTI_IMAGE_ENABLED, AIConfig.MULTI_IMAGE_PER_CALL, AIConfig.MULTI_IMAGE_MAX_RETRIES)
+        AIConfig.OPENAI_API_KEY = 'test-key'
+        AIConfig.RESULT_CACHE_ENABLED = AIConfig.PHASH_INDEX_ENABLED = False
+        AIConfig.MULTI_IMAGE_ENABLED = True
+        AIConfig.MULTI_IMAGE_PER_CALL = 4
+        AIConfig.MULTI_IMAGE_MAX_RETRIES = 1
+        try:
+            test()
+        finally:
+            (AIConfig.OPENAI_API_KEY, AIConfig.RESULT_CACHE_ENABLED, AIConfig.PHASH_INDEX_ENABLED,
+             AIConfig.MULTI_IMAGE_ENABLED, AIConfig.MULTI_IMAGE_PER_CALL, AIConfig.MULTI_IMAGE_MAX_RETRIES) = saved
+    wrapper.__name__ = test.__name__
+    return wrapper
+
+
+@with_config
+def test_batch_is_packed_per_call_limit():
+    classifier, calls, singles = make_classifier([answer([1, 2, 3, 4]), answer([1, 2])])
+    images = [b'image-%d' % i for i in range(6)]
+
+    items = classifier.classify_batch(images)
+    print(f"\n[2] Calls: {calls}")
+    assert sorted(calls) == [2, 4] and singles == []
+    assert all(item['success'] and item['result']['waste_type'] == 'plastic' for item in items)
+    assert {item['result']['multi_image']['images_in_call'] for item in items} == {2, 4}
+    # Tokens are shared out per image
+    assert items[0]['result']['usage']['input_tokens'] == 100
+    classifier.close()
+
+
+@with_config
+def test_only_failed_items_are_retried():
+    # Image 2 and 3 are missing from the first answer; the retry call carries
+    # only those two, and answers just one (its label 2 = original image 3)
+    classifier, calls, singles = make_classifier([answer([1, 4]), answer([2], 'glass')])
+    images = [b'image-%d' % i for i in range(4)]
+
+    items = classifier.classify_batch(images)
+    print(f"\n[3] Calls: {calls}, single-image fallbacks: {singles}")
+    assert calls == [4, 2]
+    assert items[2]['result']['waste_type'] == 'glass'
+    assert items[2]['result']['multi_image'] == {'images_in_call': 2, 'attempt': 2}
+    # Still unanswered after the retry: classified on its own
+    assert singles == [b'image-1'] and items[1]['result']['waste_type'] == 'metal'
+    assert items[0]['result']['multi_image']['attempt'] == 1
+    classifier.close()
+
+
+if __name__ == "__main__":
+    test_parse_response_maps_items_to_labels()
+    test_batch_is_packed_per_call_limit()
+    test_only_failed_items_are_retried()
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
@@ -0,0 +1,83 @@
+"""
+Test script for the per-provider payload policy (downscale + re-encode before upload)
+"""
+import sys
+import os
+import io
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from PIL import Image
+
+from config.ai_config import AIProvider
+from models.payload_policy import PayloadStats, RequestImage, prepare_payload, provider_payload, payload_stats
+
+POLICY = {'max_dimension': 1024, 'format': 'jpeg', 'quality': 85, 'min_quality': 50, 'max_bytes': 200 * 1024}
+
+
+def make_jpeg(size, orientation=None, noise=20):
+    rng = np.random.default_rng(0)
+    pixels = np.clip(rng.normal(128, noise, (size[1], size[0], 3)), 0, 255).astype(np.uint8)
+    img = Image.fromarray(pixels)
+    buffer = io.BytesIO()
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        img.save(buffer, format='JPEG', quality=95, exif=exif)
+    else:
+        img.save(buffer, format='JPEG', quality=95)
+    return buffer.getvalue()
+
+
+def test_large_upload_is_downscaled_within_budget():
+    print("=" * 60)
+    print("PAYLOAD POLICY TEST")
+    print("=" * 60)
+
+    original = make_jpeg((4000, 3000))
+    payload = prepare_payload(original, POLICY)
+    print(f"\n[1] {payload.info}")
+
+    assert payload.info['reencoded'] is True
+    assert payload.info['bytes_sent'] <= POLICY['max_bytes'] < len(original)
+    assert max(payload.info['sent_size']) <= POLICY['max_dimension']
+    assert payload.mime_type == 'image/jpeg'
+    assert Image.open(io.BytesIO(payload.data)).size == tuple(payload.info['sent_size'])
+
+
+def test_exif_rotation_and_passthrough():
+    rotated = prepare_payload(make_jpeg((800, 600), orientation=6), POLICY)
+    assert rotated.info['sent_size'] == [600, 800]
+
+    small = make_jpeg((640, 480), noise=5)
+    payload = prepare_payload(small, POLICY)
+    assert payload.info['reencoded'] is False
+    assert payload.data is small
+    assert payload.info['estimated_time_saved_ms'] <= 0
+
+
+def test_request_image_prepares_once_per_provider():
+    stats = payload_stats.get_stats()['providers'].get('openai', {}).get('payloads', 0)
+    image = RequestImage(make_jpeg((3000, 2000)))
+
+    first = provider_payload(image, AIProvider.OPENAI)
+    second = provider_payload(image, AIProvider.OPENAI)
+    assert first is second
+    assert image.payload_info(AIProvider.OPENAI)['bytes_sent'] == len(first.data)
+    assert image.payload_info(AIProvider.GEMINI) is None
+    assert payload_stats.get_stats()['providers']['openai']['payloads'] == stats + 1
+
+    local = PayloadStats()
+    local.record(AIProvider.GEMINI, first.info)
+    summary = local.get_stats()['providers']['gemini']
+    print(f"\n[3] Stats: {summary}")
+    assert 0 < summary['bytes_saved_ratio'] < 1
+
+
+if __name__ == "__main__":
+    test_large_upload_is_downscaled_within_budget()
+    test_exif_rotation_and_passthrough()
+    test_request_image_prepares_once_per_provider()
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
@@ -0,0 +1,111 @@
+"""
+Test script to verify near-duplicate lookup in the perceptual hash index
+"""
+import sys
+import os
+import io
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from config.ai_config import AIConfig, AIProvider
+from models.phash_index import PerceptualHashIndex, dhash, _popcount
+
+
+def make_image_bytes(size, quality):
+    img = Image.new('RGB', (800, 600), color='white')
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((100, 100, 500, 400), fill=(200, 50, 50))
+    draw.rectangle((550, 50, 750, 550), fill=(20, 200, 90))
+    buffer = io.BytesIO()
+    img.resize(size).save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def test_reencoded_image_hashes_close():
+    print("=" * 60)
+    print("NEAR-DUPLICATE INDEX TEST")
+    print("=" * 60)
+
+    original = dhash(make_image_bytes((800, 600), 95))
+    reencoded = dhash(make_image_bytes((400, 300), 40))
+    distance = bin(original ^ reencoded).count('1')
+    print(f"\n[1] Re-encode hamming distance: {distance}")
+    assert distance <= 6
+
+
+def test_index_matches_brute_force():
+    rng = np.random.default_rng(42)
+    hashes = rng.integers(0, 2 ** 63, size=20000, dtype=np.int64).view(np.uint64)
+    ids = np.arange(1, len(hashes) + 1, dtype=np.int64)
+
+    index = PerceptualHashIndex(db_path=':memory:', max_entries=100000, max_distance=6)
+    index._merge(hashes, ids)
+
+    for i in range(50):
+        # Flip up to 6 random bits of a stored hash, or use a random query
+        if i % 2 == 0:
+            query = int(hashes[i])
+            for bit in rng.choice(64, size=rng.integers(0, 7), replace=False):
+                query ^= 1 << int(bit)
+        else:
+            query = int(rng.integers(0, 2 ** 63))
+
+        _, distance = index.find(query)
+        brute = min(bin(int(h) ^ query).count('1') for h in hashes)
+        expected = brute if brute <= 6 else None
+        assert distance == expected, (query, distance, brute)
+
+    print(f"\n[2] Stats: {index.get_stats()}")
+
+
+def test_memory_bound_keeps_newest():
+    index = PerceptualHashIndex(db_path=':memory:', max_entries=100, max_distance=0)
+    index._merge(np.arange(1000, dtype=np.uint64), np.arange(1, 1001, dtype=np.int64))
+
+    assert index.get_stats()['entries'] == 100
+    assert index.find(999) == (1000, 0)
+    assert index.find(5) == (None, None)
+
+
+def test_popcount_matches_python():
+    values = np.array([0, 1, 0xFF, 2 ** 63, 2 ** 64 - 1, 0x0F0F0F0F0F0F0F0F], dtype=np.uint64)
+    expected = [bin(int(v)).count('1') for v in values]
+    print(f"\n[3] Popcounts: {_popcount(values).tolist()}")
+    assert _popcount(values).tolist() == expected
+    assert _popcount(values.reshape(2, 3)).shape == (2, 3)
+
+
+def test_failed_lookup_falls_through_to_fresh_classification():
+    import models.unified_classifier as unified
+    from models.unified_classifier import UnifiedWasteClassifier
+
+    class BrokenIndex:
+        def lookup(self, image_hash):
+            raise RuntimeError("index unavailable")
+
+    saved = AIConfig.RESULT_CACHE_ENABLED, AIConfig.PHASH_INDEX_ENABLED, unified.phash_index
+    AIConfig.RESULT_CACHE_ENABLED = False
+    AIConfig.PHASH_INDEX_ENABLED = True
+    unified.phash_index = BrokenIndex()
+    try:
+        classifier = UnifiedWasteClassifier(provider=AIProvider.OPENAI)
+        classifier._classify_with_provider = lambda image_bytes, provider, top_k: {
+            'waste_type': 'paper', 'raw_category': 'paper', 'confidence': 0.9, 'all_predictions': []}
+        result = classifier.classify(make_image_bytes((200, 150), 80))
+        print(f"\n[4] Result with a broken index: {result['waste_type']} from {result['provider_used']}")
+        assert result['provider_used'] == 'openai' and result['cached'] is False
+    finally:
+        AIConfig.RESULT_CACHE_ENABLED, AIConfig.PHASH_INDEX_ENABLED, unified.phash_index = saved
+
+
+if __name__ == "__main__":
+    test_reencoded_image_hashes_close()
+    test_index_matches_brute_force()
+    test_memory_bound_keeps_newest()
+    test_popcount_matches_python()
+    test_failed_lookup_falls_through_to_fresh_classification()
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
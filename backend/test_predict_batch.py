@@ -0,0 +1,109 @@
+"""
+Test script for /api/ai/predict-batch with a stand-in local model
+"""
+import sys
+import os
+import io
+import json
+import tempfile
+from pathlib import Path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from config.ai_config import AIConfig, AIProvider
+from models.classifier_pool import ClassifierPool
+from models.model_registry import ModelRegistry, ModelVersion
+
+
+class FakeModel:
+    """Scores every image as cardboard and records batch shapes"""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, batch, verbose=0):
+        self.calls.append(batch.shape)
+        scores = np.zeros((len(batch), len(AIConfig.WASTE_CATEGORIES)), dtype=np.float32)
+        scores[:, AIConfig.WASTE_CATEGORIES.index('cardboard')] = 0.9
+        scores[:, AIConfig.WASTE_CATEGORIES.index('paper')] = 0.1
+        return scores
+
+
+def make_jpeg():
+    buffer = io.BytesIO()
+    Image.new('RGB', (300, 200), color='brown').save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def make_client(monkeypatch, tmp_path):
+    """Lazy-start app whose databases live in tmp_path; every setting is restored afterwards"""
+    import app as app_module
+    from config.settings import config
+    from models.side_effects import side_effects
+    from routes import ai_routes, marketplace
+
+    # DatabaseManager / UserManager default to ./wastewise.db
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config['testing'], 'STARTUP_MODE', 'lazy', raising=False)
+    monkeypatch.setattr(AIConfig, 'SIDE_EFFECTS_SQLITE_PATH', str(tmp_path / 'side_effects.db'))
+    monkeypatch.setattr(AIConfig, 'RESULT_CACHE_DB_PATH', str(tmp_path / 'classification_cache.db'))
+    monkeypatch.setattr(side_effects, 'db_path', str(tmp_path / 'side_effects.db'))
+    monkeypatch.setattr(marketplace, 'DB_PATH', str(tmp_path / 'wastewise.db'))
+    monkeypatch.setattr(AIConfig, 'RESULT_CACHE_ENABLED', False)
+    monkeypatch.setattr(AIConfig, 'PHASH_INDEX_ENABLED', False)
+    monkeypatch.setattr(AIConfig, 'ACTIVE_PROVIDER', AIProvider.LOCAL)
+
+    model = FakeModel()
+    registry = ModelRegistry(root=str(tmp_path / 'no-registry'))
+    registry.serve(ModelVersion('test', model, AIConfig.WASTE_CATEGORIES, batching=False))
+
+    pool = ClassifierPool()
+    classifier = pool.get(AIProvider.LOCAL)
+    classifier.registry = registry
+    monkeypatch.setattr(ai_routes, 'classifier_pool', pool)
+    return app_module.create_app('testing').test_client(), model
+
+
+def test_batch_is_one_predict_call_in_order(monkeypatch, tmp_path):
+    print("=" * 60)
+    print("PREDICT BATCH TEST")
+    print("=" * 60)
+
+    client, model = make_client(monkeypatch, tmp_path)
+    files = [(io.BytesIO(make_jpeg()), f'{i}.jpg') for i in range(5)]
+    files.insert(2, (io.BytesIO(b'not an image'), 'bad.jpg'))
+    response = client.post('/api/ai/predict-batch', data={'images': files},
+                           content_type='multipart/form-data')
+
+    body = response.get_json()
+    print(f"\n[1] Model calls: {model.calls}, failed: {body['failed']}")
+    assert response.status_code == 200
+    assert [entry['index'] for entry in body['results']] == list(range(6))
+    assert [entry['success'] for entry in body['results']] == [True, True, False, True, True, True]
+    assert body['results'][2]['filename'] == 'bad.jpg'
+    assert body['results'][0]['classification']['waste_type'] == 'paper'
+    assert model.calls == [(5, 128, 128, 3)]
+
+
+def test_stream_returns_ndjson(monkeypatch, tmp_path):
+    client, _ = make_client(monkeypatch, tmp_path)
+    files = [(io.BytesIO(make_jpeg()), f'{i}.jpg') for i in range(3)]
+    response = client.post('/api/ai/predict-batch?stream=true', data={'images': files},
+                           content_type='multipart/form-data')
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert response.mimetype == 'application/x-ndjson'
+    assert sorted(entry['index'] for entry in lines) == [0, 1, 2]
+    assert all(entry['success'] for entry in lines)
+
+
+if __name__ == "__main__":
+    for test in (test_batch_is_one_predict_call_in_order, test_stream_returns_ndjson):
+        with pytest.MonkeyPatch.context() as monkeypatch, tempfile.TemporaryDirectory() as tmp:
+            test(monkeypatch, Path(tmp))
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
@@ -0,0 +1,121 @@
+"""
+Test script to verify the two-tier classification result cache
+"""
+import sys
+import os
+import time
+import tempfile
+import subprocess
+sys.path.insert(0, os.path.dirname(__file__))
+
+from config.ai_config import AIConfig, AIProvider
+from models.result_cache import ClassificationCache
+from utils.db_pool import get_db_pool
+
+
+def make_cache(**kwargs):
+    db_path = os.path.join(tempfile.mkdtemp(), 'cache_test.db')
+    return ClassificationCache(db_path=db_path, **kwargs)
+
+
+def test_memory_and_sqlite_tiers():
+    print("=" * 60)
+    print("RESULT CACHE TEST")
+    print("=" * 60)
+
+    cache = make_cache(memory_size=1, ttl_seconds=60, max_rows=100)
+    key_a = cache.make_key(b'image-a', AIProvider.GEMINI, 3)
+    key_b = cache.make_key(b'image-b', AIProvider.GEMINI, 3)
+
+    assert cache.get(key_a) == (None, None)
+
+    cache.put(key_a, {'waste_type': 'plastic', 'confidence': 0.9})
+    result, tier = cache.get(key_a)
+    assert tier == 'memory' and result['waste_type'] == 'plastic'
+
+    # key_b pushes key_a out of the one-slot memory tier; SQLite still has it
+    cache.put(key_b, {'waste_type': 'paper', 'confidence': 0.8})
+    result, tier = cache.get(key_a)
+    assert tier == 'sqlite' and result['waste_type'] == 'plastic'
+
+    stats = cache.get_stats()
+    print(f"\n[1] Stats: {stats}")
+    assert stats['memory_hits'] == 1
+    assert stats['sqlite_hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['memory_evictions'] >= 1
+
+
+def test_key_depends_on_provider():
+    key_gemini = ClassificationCache.make_key(b'same', AIProvider.GEMINI, 3)
+    key_openai = ClassificationCache.make_key(b'same', AIProvider.OPENAI, 3)
+    assert key_gemini != key_openai
+
+
+def test_ttl_and_size_eviction():
+    cache = make_cache(memory_size=10, ttl_seconds=0.05, max_rows=2)
+    key = cache.make_key(b'short-lived', AIProvider.LOCAL, 3)
+    cache.put(key, {'waste_type': 'metal'})
+    time.sleep(0.1)
+    assert cache.get(key) == (None, None)
+
+    cache.ttl_seconds = 60
+    for i in range(5):
+        cache.put(cache.make_key(bytes([i]), AIProvider.LOCAL, 3), {'i': i})
+    cache._trim_sqlite()
+
+    print(f"\n[2] Stats after trim: {cache.get_stats()}")
+    assert cache.get_stats()['sqlite_evictions'] >= 3
+
+
+def test_global_cache_is_lazy_and_pooled():
+    # Importing the module must not create or trim the cache database. Check in a
+    # fresh interpreter: other tests in this process may already have resolved it
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    probe = (f"import sys; sys.path.insert(0, {backend_dir!r}); "
+             "from models.result_cache import result_cache; "
+             "print(object.__getattribute__(result_cache, '_lazy_instance'))")
+    with tempfile.TemporaryDirectory() as tmp:
+        output = subprocess.run([sys.executable, '-c', probe], cwd=tmp,
+                                capture_output=True, text=True, check=True).stdout
+        assert output.strip() == 'None' and not os.listdir(tmp)
+
+    cache = make_cache(memory_size=1, ttl_seconds=60, max_rows=100)
+    for i in range(10):
+        cache.put(cache.make_key(bytes([i]), AIProvider.LOCAL, 3), {'i': i})
+        cache.get(cache.make_key(bytes([i]), AIProvider.LOCAL, 3))
+    pool_stats = get_db_pool(cache.db_path).get_stats()
+    print(f"\n[3] Pool after 10 puts and 10 gets: created {pool_stats['created']}, checkouts {pool_stats['checkouts']}")
+    assert pool_stats['created'] == 1 and pool_stats['checkouts'] >= 10
+
+
+def test_key_uses_resolved_gemini_model():
+    from models.unified_classifier import UnifiedWasteClassifier
+
+    saved = AIConfig.GEMINI_API_KEY, AIConfig.CASCADE_ENABLED
+    AIConfig.GEMINI_API_KEY = 'test-key'
+    AIConfig.CASCADE_ENABLED = False
+    try:
+        classifier = UnifiedWasteClassifier(provider=AIProvider.GEMINI)
+        classifier._gemini_model_name = 'resolved-flash'
+        key = classifier._cache_key(b'image', 3)
+        print(f"\n[4] Key with resolved model: {key}")
+        assert ':resolved-flash:' in key
+        assert key != ClassificationCache.make_key(b'image', AIProvider.GEMINI, 3)
+
+        # A result from a model re-resolved after the key was built is not stored under it
+        assert classifier._matches_cache_key({'model': 'resolved-flash'}, key)
+        assert not classifier._matches_cache_key({'model': 'other-pro'}, key)
+    finally:
+        AIConfig.GEMINI_API_KEY, AIConfig.CASCADE_ENABLED = saved
+
+
+if __name__ == "__main__":
+    test_memory_and_sqlite_tiers()
+    test_key_depends_on_provider()
+    test_ttl_and_size_eviction()
+    test_global_cache_is_lazy_and_pooled()
+    test_key_uses_resolved_gemini_model()
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
@@ -0,0 +1,108 @@
+"""
+Test script for the latency- and quota-aware provider router
+"""
+import sys
+import os
+import random
+sys.path.insert(0, os.path.dirname(__file__))
+
+from config.ai_config import AIConfig, AIProvider
+from models.hedging import LatencyWindow
+from models.circuit_breaker import CircuitBreakerRegistry
+from models.router import ProviderRouter
+
+CLOUD = [AIProvider.HUGGINGFACE, AIProvider.GEMINI, AIProvider.OPENAI]
+
+
+class Clock:
+    now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_router(latencies):
+    window = LatencyWindow(size=50)
+    for provider, ms in latencies.items():
+        for _ in range(AIConfig.HEDGE_MIN_SAMPLES):
+            window.record(provider, ms)
+    clock = Clock()
+    return ProviderRouter(window, CircuitBreakerRegistry(), clock, random.Random(7)), clock
+
+
+def with_keys(test):
+    def wrapper():
+        saved = AIConfig.HUGGINGFACE_API_KEY, AIConfig.GEMINI_API_KEY, AIConfig.OPENAI_API_KEY
+        AIConfig.HUGGINGFACE_API_KEY = AIConfig.GEMINI_API_KEY = AIConfig.OPENAI_API_KEY = 'test-key'
+        try:
+            test()
+        finally:
+            AIConfig.HUGGINGFACE_API_KEY, AIConfig.GEMINI_API_KEY, AIConfig.OPENAI_API_KEY = saved
+    wrapper.__name__ = test.__name__
+    return wrapper
+
+
+@with_keys
+def test_least_latency_and_cheapest_within_slo():
+    print("=" * 60)
+    print("PROVIDER ROUTER TEST")
+    print("=" * 60)
+
+    router, _ = make_router({AIProvider.HUGGINGFACE: 4000, AIProvider.GEMINI: 900, AIProvider.OPENAI: 700})
+
+    order, decision = router.choose('least-latency', CLOUD)
+    print(f"\n[1] {decision}")
+    assert order == [AIProvider.OPENAI, AIProvider.GEMINI, AIProvider.HUGGINGFACE]
+    assert decision['reason'] == 'lowest-p95'
+
+    # Hugging Face is free but outside the 3 s SLO; Gemini is the cheapest inside it
+    order, decision = router.choose('cheapest-within-slo', CLOUD)
+    print(f"[1] {decision}")
+    assert order[0] == AIProvider.GEMINI
+    assert decision['reason'] == 'cheapest-within-slo'
+
+
+@with_keys
+def test_quota_and_circuit_exclusions():
+    router, clock = make_router({AIProvider.GEMINI: 900, AIProvider.OPENAI: 700})
+    for _ in range(AIConfig.ROUTER_QUOTA_PER_MINUTE[AIProvider.GEMINI]):
+        router.record_call(AIProvider.GEMINI)
+    for _ in range(AIConfig.BREAKER_MIN_CALLS):
+        router.breakers.get(AIProvider.OPENAI).record_failure(100, RuntimeError("boom"))
+
+    order, decision = router.choose('cheapest-within-slo', [AIProvider.GEMINI, AIProvider.OPENAI, AIProvider.LOCAL])
+    print(f"\n[2] {decision}")
+    assert order == []
+    assert decision['excluded']['gemini'] == 'quota-exhausted'
+    assert decision['excluded']['openai'] == 'circuit-open'
+
+    # Quota frees up once the minute has passed
+    clock.now += 61
+    order, _ = router.choose('least-latency', [AIProvider.GEMINI])
+    assert order == [AIProvider.GEMINI]
+
+    stats = router.get_stats()
+    assert stats['by_reason']['cheapest-within-slo:no-eligible-provider'] == 1
+    assert stats['calls']['gemini'] == AIConfig.ROUTER_QUOTA_PER_MINUTE[AIProvider.GEMINI]
+
+
+@with_keys
+def test_weighted_follows_weights():
+    router, _ = make_router({})
+    picks = {}
+    for _ in range(400):
+        order, decision = router.choose('weighted', [AIProvider.GEMINI, AIProvider.OPENAI])
+        picks[order[0]] = picks.get(order[0], 0) + 1
+        assert decision['reason'] == 'weighted-pick'
+    print(f"\n[3] Picks: {picks}")
+    # Default weights are 3:1
+    assert 2.0 < picks[AIProvider.GEMINI] / picks[AIProvider.OPENAI] < 4.5
+
+
+if __name__ == "__main__":
+    test_least_latency_and_cheapest_within_slo()
+    test_quota_and_circuit_exclusions()
+    test_weighted_follows_weights()
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
@@ -0,0 +1,180 @@
+"""
+Test script for shadow-mode evaluation of a candidate provider or model version
+"""
+import sys
+import os
+import io
+import time
+import tempfile
+import threading
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+from PIL import Image
+
+from config.ai_config import AIConfig, AIProvider
+from models.shadow import ShadowEvaluator
+from models import unified_classifier
+from test_model_registry import make_registry, wait_for_state
+
+
+def make_jpeg(shade):
+    buffer = io.BytesIO()
+    Image.new('RGB', (96, 96), color=(shade, 120, 40)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def with_shadow(test):
+    def wrapper():
+        saved = (AIConfig.RESULT_CACHE_ENABLED, AIConfig.PHASH_INDEX_ENABLED, AIConfig.SHADOW_ENABLED,
+                 AIConfig.LOCAL_MODEL_VERSION, unified_classifier.shadow_evaluator)
+        AIConfig.RESULT_CACHE_ENABLED = AIConfig.PHASH_INDEX_ENABLED = False
+        AIConfig.SHADOW_ENABLED = True
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                test(tmp)
+        finally:
+            (AIConfig.RESULT_CACHE_ENABLED, AIConfig.PHASH_INDEX_ENABLED, AIConfig.SHADOW_ENABLED,
+             AIConfig.LOCAL_MODEL_VERSION, unified_classifier.shadow_evaluator) = saved
+    wrapper.__name__ = test.__name__
+    return wrapper
+
+
+@with_shadow
+def test_candidate_provider_is_off_the_response_path(tmp):
+    print("=" * 60)
+    print("SHADOW EVALUATION TEST")
+    print("=" * 60)
+
+    evaluator = ShadowEvaluator(db_path=os.path.join(tmp, 'shadow.db'), candidate='gemini',
+                                sample_rate=1.0, max_concurrent=2)
+    unified_classifier.shadow_evaluator = evaluator
+    classifier = unified_classifier.UnifiedWasteClassifier(provider=AIProvider.OPENAI)
+    calls = {'gemini': 0}
+    lock = threading.Lock()
+
+    def fake_provider(image_bytes, provider, top_k):
+        if provider == AIProvider.OPENAI:
+            time.sleep(0.01)
+            return {'waste_type': 'plastic', 'raw_category': 'plastic', 'confidence': 0.9}
+        with lock:
+            calls['gemini'] += 1
+            n = calls['gemini']
+        time.sleep(0.2)  # A slow candidate must not slow the answer down
+        if n == 3:
+            raise RuntimeError("candidate timed out")
+        return {'waste_type': 'plastic' if n % 2 else 'glass', 'raw_category': 'x', 'confidence': 0.7}
+
+    classifier._classify_with_provider = fake_provider
+    latencies, errors = [], []
+
+    def client(shade):
+        start = time.perf_counter()
+        try:
+            result = classifier.classify(make_jpeg(shade))
+            assert result['provider_used'] == 'openai'
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=client, args=(i * 10,)) for i in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert evaluator.wait_idle()
+
+    stats = evaluator.get_stats()
+    summary = evaluator.summary()[0]
+    print(f"\n[1] Slowest request {max(latencies):.1f} ms, stats {stats}")
+    print(f"[1] Summary: {summary}")
+    assert errors == []
+    assert max(latencies) < 150
+    # Only max_concurrent shadow calls ran at once; the rest were dropped, not queued
+    assert stats['sampled'] == 12 and stats['submitted'] == calls['gemini']
+    assert stats['dropped_saturated'] == 12 - stats['submitted'] and stats['dropped_saturated'] > 0
+    assert stats['in_flight'] == 0
+    assert summary['candidate'] == 'gemini' and summary['comparisons'] == stats['submitted']
+    assert summary['errors'] == (1 if calls['gemini'] >= 3 else 0)
+    assert 0 < summary['agreement_rate'] < 1
+    assert summary['mean_confidence_delta'] < 0
+    assert summary['candidate_latency_ms']['p50'] >= 200 > summary['primary_latency_ms']['p50']
+    assert (summary['top_disagreements'][0]['primary'], summary['top_disagreements'][0]['candidate']) == ('plastic', 'glass')
+    classifier.close()
+
+
+@with_shadow
+def test_candidate_model_version_is_staged_then_compared(tmp):
+    evaluator = ShadowEvaluator(db_path=os.path.join(tmp, 'shadow.db'), candidate='local:v2',
+                                sample_rate=1.0, max_concurrent=1)
+    unified_classifier.shadow_evaluator = evaluator
+    os.makedirs(os.path.join(tmp, 'registry'))
+    registry = make_registry(os.path.join(tmp, 'registry'), {})
+    classifier = unified_classifier.UnifiedWasteClassifier(provider=AIProvider.OPENAI)
+    classifier.registry = registry
+    classifier.provider = AIProvider.LOCAL
+
+    first = classifier.classify(make_jpeg(10))
+    assert first['model_version'] == 'v1'
+    # Not loaded yet: staged in the background, this request is not shadowed
+    assert evaluator.get_stats()['skipped_not_ready'] == 1
+    wait_for_state(registry, 'v2', ('ready',))
+
+    classifier.classify(make_jpeg(20))
+    assert evaluator.wait_idle()
+    summary = evaluator.summary(candidate='local:v2')[0]
+    print(f"\n[2] Summary: {summary}")
+    # v2 is staged next to v1, never served
+    assert registry.active().version == 'v1'
+    assert summary['comparisons'] == 1 and summary['agreement_rate'] == 0
+    assert summary['top_disagreements'][0]['candidate'] == 'glass'
+    classifier.close()
+
+
+@with_shadow
+def test_shadow_summary_requires_admin(tmp):
+    import app as app_module
+    from config.settings import config
+    from routes import ai_routes
+    from flask_jwt_extended import create_access_token
+
+    original = ai_routes.shadow_evaluator
+    evaluator = ShadowEvaluator(db_path=os.path.join(tmp, 'shadow.db'), candidate='gemini', sample_rate=1.0)
+    primary = {'provider': 'openai', 'version': None, 'waste_type': 'plastic', 'confidence': 0.9, 'latency_ms': 800}
+    evaluator.record('gemini', primary, {'waste_type': 'plastic', 'confidence': 0.8}, 400)
+    evaluator.record('gemini', primary, {'waste_type': 'metal', 'confidence': 0.6}, 500)
+    ai_routes.shadow_evaluator = evaluator
+    # Lazy start from the temp dir: nothing is warmed and ./wastewise.db lands there
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.chdir(tmp)
+    monkeypatch.setattr(config['testing'], 'STARTUP_MODE', 'lazy', raising=False)
+    try:
+        app = app_module.create_app('testing')
+        client = app.test_client()
+        with app.app_context():
+            admin = create_access_token(identity='admin-1', additional_claims={'is_admin': True})
+            user = create_access_token(identity='user-1')
+
+        assert client.get('/api/ai/shadow').status_code == 401
+        assert client.get('/api/ai/shadow', headers={'Authorization': f'Bearer {user}'}).status_code == 403
+
+        headers = {'Authorization': f'Bearer {admin}'}
+        response = client.get('/api/ai/shadow?hours=1', headers=headers)
+        candidates = response.get_json()['candidates']
+        print(f"\n[3] {candidates}")
+        assert response.status_code == 200
+        assert candidates[0]['comparisons'] == 2 and candidates[0]['agreement_rate'] == 0.5
+        assert client.get('/api/ai/shadow?candidate=openai', headers=headers).get_json()['candidates'] == []
+        assert client.get('/api/ai/shadow?hours=x', headers=headers).status_code == 400
+    finally:
+        monkeypatch.undo()
+        ai_routes.shadow_evaluator = original
+
+
+if __name__ == "__main__":
+    test_candidate_provider_is_off_the_response_path()
+    test_candidate_model_version_is_staged_then_compared()
+    test_shadow_summary_requires_admin()
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
@@ -0,0 +1,309 @@
+"""
+Test script for the post-response side-effect pipeline
+"""
+import sys
+import os
+import time
+import io
+import json
+import tempfile
+import threading
+from pathlib import Path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+from PIL import Image
+
+from config.ai_config import AIConfig, AIProvider
+from models.side_effects import SideEffectPipeline
+from models.database import DatabaseManager
+
+
+def make_pipeline(tmp, handler, workers=3):
+    pipeline = SideEffectPipeline(db_path=os.path.join(tmp, 'side_effects.db'), workers=workers, max_attempts=3)
+    pipeline.register('test', handler)
+    return pipeline
+
+
+def test_per_user_order_and_idempotent_enqueue():
+    print("=" * 60)
+    print("SIDE-EFFECT PIPELINE TEST")
+    print("=" * 60)
+
+    seen = []
+    lock = threading.Lock()
+
+    def handler(payload):
+        time.sleep(0.01 if payload['n'] % 2 else 0.03)
+        with lock:
+            seen.append((payload['user'], payload['n']))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pipeline = make_pipeline(tmp, handler)
+        for n in range(6):
+            for user in ('a', 'b', 'c'):
+                assert pipeline.enqueue('test', f"{user}-{n}", f"user:{user}", {'user': user, 'n': n})
+        # Same classification_id again: stored once
+        assert not pipeline.enqueue('test', 'a-0', 'user:a', {'user': 'a', 'n': 0})
+
+        assert pipeline.wait_idle()
+        pipeline.stop()
+        stats = pipeline.get_stats()
+
+    print(f"\n[1] Stats: {stats}")
+    for user in ('a', 'b', 'c'):
+        assert [n for u, n in seen if u == user] == list(range(6))
+    assert stats['completed'] == 18 and stats['duplicates'] == 1
+
+
+def test_failed_task_is_retried_before_later_tasks():
+    saved = AIConfig.SIDE_EFFECTS_RETRY_BACKOFF_SECONDS, AIConfig.JOB_POLL_INTERVAL
+    AIConfig.SIDE_EFFECTS_RETRY_BACKOFF_SECONDS, AIConfig.JOB_POLL_INTERVAL = 0.05, 0.02
+    seen, attempts = [], {}
+
+    def handler(payload):
+        attempts[payload['n']] = attempts.get(payload['n'], 0) + 1
+        if payload['n'] == 0 and attempts[0] < 3:
+            raise RuntimeError("database is locked")
+        seen.append(payload['n'])
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            pipeline = make_pipeline(tmp, handler)
+            for n in range(3):
+                pipeline.enqueue('test', n, 'user:a', {'n': n})
+            assert pipeline.wait_idle()
+            pipeline.stop()
+            stats = pipeline.get_stats()
+    finally:
+        AIConfig.SIDE_EFFECTS_RETRY_BACKOFF_SECONDS, AIConfig.JOB_POLL_INTERVAL = saved
+
+    print(f"\n[2] Order: {seen}, attempts: {attempts}")
+    assert seen == [0, 1, 2]
+    assert attempts[0] == 3 and stats['retried'] == 2 and stats['depth']['dead'] == 0
+
+
+def test_lost_worker_task_is_recovered():
+    saved = AIConfig.SIDE_EFFECTS_LEASE_SECONDS
+    AIConfig.SIDE_EFFECTS_LEASE_SECONDS = 0
+    seen = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            crashed = make_pipeline(tmp, lambda payload: seen.append(payload['n']), workers=1)
+            crashed.init_tasks_table()
+            crashed.start = lambda: crashed  # no workers: claim by hand below
+            crashed.enqueue('test', 1, 'user:a', {'n': 1})
+            # A worker claims the task and dies without finishing it
+            assert crashed._claim()['payload'] == {'n': 1}
+
+            restarted = make_pipeline(tmp, lambda payload: seen.append(payload['n']), workers=1).start()
+            assert restarted.wait_idle()
+            restarted.stop()
+            stats = restarted.get_stats()
+    finally:
+        AIConfig.SIDE_EFFECTS_LEASE_SECONDS = saved
+
+    print(f"\n[3] Recovered: {stats['recovered']}, ran: {seen}")
+    assert seen == [1] and stats['recovered'] == 1
+
+
+def test_failed_bookkeeping_does_not_kill_the_worker(monkeypatch):
+    monkeypatch.setattr(AIConfig, 'SIDE_EFFECTS_LEASE_SECONDS', 0.05)
+    monkeypatch.setattr(AIConfig, 'JOB_MAINTENANCE_INTERVAL', 0.05)
+    monkeypatch.setattr(AIConfig, 'JOB_POLL_INTERVAL', 0.02)
+    seen = []
+    with tempfile.TemporaryDirectory() as tmp:
+        pipeline = make_pipeline(tmp, lambda payload: seen.append(payload['n']), workers=1)
+        finish, failures = pipeline._finish, [RuntimeError("database is locked")]
+
+        def flaky_finish(*args, **kwargs):
+            if failures:
+                raise failures.pop()
+            return finish(*args, **kwargs)
+
+        monkeypatch.setattr(pipeline, '_finish', flaky_finish)
+        for n in (1, 2):
+            pipeline.enqueue('test', n, 'user:a', {'n': n})
+        assert pipeline.wait_idle()
+        alive = [thread.is_alive() for thread in pipeline._threads]
+        pipeline.stop()
+        stats = pipeline.get_stats()
+
+    print(f"\n[4] Ran {seen}, errors {stats['errors']}, recovered {stats['recovered']}, workers alive {alive}")
+    # Task 1 is re-run after its lease lapses (at-least-once), then task 2 still runs
+    assert seen == [1, 1, 2]
+    assert stats['errors'] == 1 and stats['recovered'] == 1 and alive == [True]
+
+
+def test_repeated_save_keeps_one_row():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'wastewise.db'))
+        first = db.save_classification('a.jpg', 'a.jpg', 'plastic', 0.9, classification_uid='uid-1')
+        again = db.save_classification('a.jpg', 'a.jpg', 'plastic', 0.9, classification_uid='uid-1')
+        other = db.save_classification('b.jpg', 'b.jpg', 'glass', 0.8, classification_uid='uid-2')
+        total = db.get_statistics()['total_classifications']
+
+    print(f"\n[5] Ids: {first}, {again}, {other}")
+    assert first == again and other != first
+    assert total == 2
+
+
+def test_badge_and_bonus_points_are_stored_together(monkeypatch, tmp_path):
+    from routes.rewards import RewardsManager
+
+    # RewardsManager opens ./wastewise.db
+    monkeypatch.chdir(tmp_path)
+    rewards = RewardsManager()
+    db = DatabaseManager()
+    add_points, failures = DatabaseManager.add_points, [None]
+
+    def flaky_add_points(self, *args, **kwargs):
+        if failures and str(kwargs.get('idempotency_key', '')).startswith('badge:'):
+            return failures.pop()
+        return add_points(self, *args, **kwargs)
+
+    monkeypatch.setattr(DatabaseManager, 'add_points', flaky_add_points)
+    try:
+        rewards.award_badge('user-1', 'green_warrior')
+        assert False, "expected RuntimeError"
+    except RuntimeError:
+        pass
+    # The badge was rolled back with its points, so the retry awards both
+    assert rewards.get_user_badges('user-1') == []
+    assert rewards.award_badge('user-1', 'green_warrior')['badge_id'] == 'green_warrior'
+    assert rewards.award_badge('user-1', 'green_warrior') is None
+    bonus = rewards.badges['green_warrior']['points']
+    assert db.get_user_points('user-1')['total_points'] == bonus
+
+    # A badge stored earlier without its points gets them once
+    db.add_user_badge('user-2', 'review_master', 'Review Master', '', '', rewards.badges['review_master']['points'])
+    for _ in range(2):
+        assert rewards.award_badge('user-2', 'review_master') is None
+    total = db.get_user_points('user-2')['total_points']
+    print(f"\n[6] Badge bonus after a failed write: {bonus}; held badge paid once: {total}")
+    assert total == rewards.badges['review_master']['points']
+    db.pool.close_all()
+
+
+def test_openai_confidence_is_normalised(monkeypatch):
+    import models.unified_classifier as unified
+    from models.unified_classifier import UnifiedWasteClassifier, parse_confidence
+
+    assert parse_confidence('0.8') == 0.8 and parse_confidence('85%') == 0.85
+    assert parse_confidence(90) == 0.9 and parse_confidence(None) == 0.7
+    assert parse_confidence('high') == 0.7 and parse_confidence(float('nan')) == 0.7
+
+    class FakeResponse:
+        status_code = 200
+        text = ''
+
+        def json(self):
+            content = json.dumps({'waste_type': 'plastic', 'confidence': 'very high', 'reasoning': 'bottle'})
+            return {'choices': [{'message': {'content': content}}], 'usage': {}}
+
+    class FakeClient:
+        def post(self, *args, **kwargs):
+            return FakeResponse()
+
+    monkeypatch.setattr(AIConfig, 'OPENAI_API_KEY', 'test-key')
+    monkeypatch.setattr(unified, 'get_http_client', lambda name: FakeClient())
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), color='white').save(buffer, format='JPEG')
+
+    result = UnifiedWasteClassifier(provider=AIProvider.OPENAI)._classify_openai(buffer.getvalue(), 3)
+    print(f"\n[7] 'very high' from OpenAI became {result['confidence']!r}")
+    assert result['confidence'] == 0.7
+    assert result['all_predictions'][0]['confidence'] == 0.7
+
+
+class FixedClassifier:
+    """Pooled-classifier stand-in returning one canned result"""
+
+    def __init__(self, confidence):
+        self.confidence = confidence
+
+    def classify(self, image_bytes):
+        return {'waste_type': 'plastic', 'raw_category': 'plastic', 'confidence': self.confidence,
+                'all_predictions': [], 'provider_used': 'custom'}
+
+    def get_recommendations(self, waste_type):
+        return []
+
+
+class RecordingPipeline:
+    """Side-effect pipeline stand-in; enqueue raises `error` if set"""
+
+    def __init__(self, error=None):
+        self.enqueued = []
+        self.error = error
+
+    def register(self, kind, handler):
+        pass
+
+    def enqueue(self, kind, task_id, ordering_key=None, payload=None):
+        if self.error:
+            raise self.error
+        self.enqueued.append(payload)
+
+
+def classify_upload(monkeypatch, tmp_path, classifier, pipeline):
+    """POST one upload to /api/classify on a lazy-start app run from tmp_path"""
+    import app as app_module
+    from config.settings import config
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config['testing'], 'STARTUP_MODE', 'lazy', raising=False)
+    monkeypatch.setattr(config['testing'], 'PERSIST_UPLOADS', False, raising=False)
+    monkeypatch.setattr(app_module, 'side_effects', pipeline)
+    monkeypatch.setattr(app_module.classifier_pool, 'get', lambda provider=None: classifier)
+
+    client = app_module.create_app('testing').test_client()
+    response = client.post('/api/classify', data={'image': (io.BytesIO(b'fake-image'), 'photo.jpg')},
+                           content_type='multipart/form-data')
+    return response, response.get_json()
+
+
+def test_invalid_confidence_is_never_queued(monkeypatch, tmp_path):
+    pipeline = RecordingPipeline()
+    response, body = classify_upload(monkeypatch, tmp_path, FixedClassifier('high'), pipeline)
+
+    print(f"\n[8] Invalid confidence: {response.status_code}, answered by {body['classification']['provider_used']}")
+    assert response.status_code == 200
+    assert body['classification']['provider_used'] == 'fallback'
+    assert all(isinstance(task['confidence'], float) for task in pipeline.enqueued)
+
+
+def test_failed_enqueue_saves_inline_or_withholds_the_id(monkeypatch, tmp_path):
+    pipeline = RecordingPipeline(error=RuntimeError("database is locked"))
+    response, body = classify_upload(monkeypatch, tmp_path, FixedClassifier(0.9), pipeline)
+    db = DatabaseManager(str(tmp_path / 'wastewise.db'))
+    with db.pool.connection() as conn:
+        saved = conn.execute('SELECT classification_uid FROM classifications').fetchall()
+    assert response.status_code == 200
+    assert saved == [(body['classification_id'],)]
+
+    # Neither queued nor saved: no id for a row that will never exist
+    monkeypatch.setattr(DatabaseManager, 'save_classification', lambda self, **kwargs: None)
+    response, body = classify_upload(monkeypatch, tmp_path, FixedClassifier(0.9), pipeline)
+    print(f"\n[9] Saved inline: {saved[0][0] is not None}; unsaved id: {body['classification_id']}")
+    assert response.status_code == 200 and body['classification_id'] is None
+    db.pool.close_all()
+
+if __name__ == "__main__":
+    test_per_user_order_and_idempotent_enqueue()
+    test_failed_task_is_retried_before_later_tasks()
+    test_lost_worker_task_is_recovered()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_failed_bookkeeping_does_not_kill_the_worker(monkeypatch)
+    test_repeated_save_keeps_one_row()
+    with pytest.MonkeyPatch.context() as monkeypatch, tempfile.TemporaryDirectory() as tmp:
+        test_badge_and_bonus_points_are_stored_together(monkeypatch, Path(tmp))
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_openai_confidence_is_normalised(monkeypatch)
+    with pytest.MonkeyPatch.context() as monkeypatch, tempfile.TemporaryDirectory() as tmp:
+        test_invalid_confidence_is_never_queued(monkeypatch, Path(tmp))
+    with pytest.MonkeyPatch.context() as monkeypatch, tempfile.TemporaryDirectory() as tmp:
+        test_failed_enqueue_saves_inline_or_withholds_the_id(monkeypatch, Path(tmp))
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
@@ -0,0 +1,107 @@
+"""
+Test script for single-flight coalescing of identical concurrent classifications
+"""
+import sys
+import os
+import time
+import threading
+sys.path.insert(0, os.path.dirname(__file__))
+
+from config.ai_config import AIConfig, AIProvider
+from models.single_flight import SingleFlight
+
+
+def run_concurrently(count, target):
+    results, errors = [None] * count, [None] * count
+    start = threading.Barrier(count)
+
+    def worker(i):
+        start.wait()
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    print("=" * 60)
+    print("SINGLE-FLIGHT TEST")
+    print("=" * 60)
+
+    flight = SingleFlight(wait_timeout=5, max_waits=2)
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'waste_type': 'plastic'}
+
+    results, errors = run_concurrently(8, lambda: flight.do('img:gemini', slow))
+    stats = flight.get_stats()
+    print(f"\n[1] Stats: {stats}")
+    assert errors == [None] * 8
+    assert len(calls) == 1
+    assert sum(shared for _, shared in results) == 7
+    assert stats['coalesced'] == 7 and stats['in_flight'] == 0
+
+    # Waiters get their own copy
+    results[0][0]['waste_type'] = 'changed'
+    assert all(r[0]['waste_type'] == 'plastic' for r in results[1:])
+
+
+def test_failed_leader_does_not_poison_waiters():
+    flight = SingleFlight(wait_timeout=5, max_waits=2)
+    calls = []
+
+    def fails_once():
+        calls.append(1)
+        time.sleep(0.1)
+        if len(calls) == 1:
+            raise RuntimeError("provider timed out")
+        return {'waste_type': 'metal'}
+
+    results, errors = run_concurrently(5, lambda: flight.do('img:openai', fails_once))
+    print(f"\n[2] Calls: {len(calls)}, stats: {flight.get_stats()}")
+    assert sum(e is not None for e in errors) == 1  # Only the leader sees its own failure
+    assert len(calls) == 2
+    assert all(r[0] == {'waste_type': 'metal'} for r in results if r is not None)
+
+
+def test_classifier_coalesces_identical_uploads():
+    from models.unified_classifier import UnifiedWasteClassifier
+
+    saved = AIConfig.RESULT_CACHE_ENABLED, AIConfig.PHASH_INDEX_ENABLED
+    AIConfig.RESULT_CACHE_ENABLED = False
+    AIConfig.PHASH_INDEX_ENABLED = False
+    try:
+        classifier = UnifiedWasteClassifier(provider=AIProvider.OPENAI)
+        calls = []
+
+        def fake_provider(image_bytes, provider, top_k):
+            calls.append(provider)
+            time.sleep(0.2)
+            return {'waste_type': 'paper', 'raw_category': 'paper', 'confidence': 0.9, 'all_predictions': []}
+
+        classifier._classify_with_provider = fake_provider
+        results, errors = run_concurrently(6, lambda: classifier.classify(b'same-bytes'))
+        assert errors == [None] * 6
+        assert len(calls) == 1
+        assert sum(r['coalesced'] for r in results) == 5
+    finally:
+        AIConfig.RESULT_CACHE_ENABLED, AIConfig.PHASH_INDEX_ENABLED = saved
+
+
+if __name__ == "__main__":
+    test_concurrent_calls_share_one_execution()
+    test_failed_leader_does_not_poison_waiters()
+    test_classifier_coalesces_identical_uploads()
+    print("\n" + "=" * 60)
+    print("TEST COMPLETED")
+    print("=" * 60)
@@ -306,6 +306,17 @@ with open(class_indices_path, 'w') as f:
     json.dump(train_generator.class_indices, f, indent=2)
 print(f"[OK] Saved class indices to: {class_indices_path}")
 
+# Optional: export CPU inference variants (TFLite / ONNX) and benchmark them
+# e.g. EXPORT_FORMATS=tflite,onnx EXPORT_QUANTIZATION=dynamic,int8 python train_model.py
+EXPORT_FORMATS = os.environ.get('EXPORT_FORMATS', '')
+if EXPORT_FORMATS:
+    print("\n[EXPORT] Exporting trained model for CPU inference...")
+    from export_model import main as export_main
+    export_main([
+        '--formats', EXPORT_FORMATS,
+        '--quantization', os.environ.get('EXPORT_QUANTIZATION', 'float32,dynamic,int8')
+    ])
+
 print("\n" + "=" * 80)
 print("TRAINING COMPLETE!")
 print("=" * 80)
@@ -0,0 +1,295 @@
+"""
+SQLite Connection Pool
+Connections to each database file are opened once, tuned (WAL journal,
+synchronous level, page cache, mmap, busy timeout, prepared statement cache)
+and reused. A thread checks a connection out for a `with` block; nested
+blocks on the same thread share it, each running as a savepoint.
+
+Usage:
+    with get_db_pool(db_path).connection() as conn:
+        conn.execute(...)          # committed when the block exits
+
+    with pool.connection(immediate=True) as conn:
+        ...                        # read-then-write under the write lock
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from config.settings import Config
+
+WAIT_WINDOW_SIZE = 500  # Recent waits kept for percentiles
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """No connection became free within DB_POOL_TIMEOUT seconds"""
+
+
+class SQLitePool:
+    """
+    Bounded pool of tuned connections to one SQLite file
+
+    Connections are created on demand up to max_connections and kept open.
+    Each `with pool.connection()` block holds one for its duration: the
+    outermost block commits on a normal exit and rolls back on an exception.
+    """
+
+    def __init__(self, db_path, max_connections=None, timeout=None):
+        """
+        Args:
+            db_path: SQLite database file
+            max_connections: Open connections allowed at once
+            timeout: Seconds to wait for a free connection before PoolTimeoutError
+        """
+        self.db_path = db_path
+        self.max_connections = max_connections or Config.DB_POOL_MAX_CONNECTIONS
+        self.timeout = timeout if timeout is not None else Config.DB_POOL_TIMEOUT
+        self.pragmas = {
+            'journal_mode': 'WAL',
+            'synchronous': Config.DB_SYNCHRONOUS,
+            'cache_size': -Config.DB_CACHE_SIZE_KB,  # negative = KiB rather than pages
+            'mmap_size': Config.DB_MMAP_SIZE,
+            'busy_timeout': Config.DB_BUSY_TIMEOUT_MS
+        }
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._open = 0
+        self._local = threading.local()
+        self._checkout_wait_ms = deque(maxlen=WAIT_WINDOW_SIZE)
+        self._write_lock_wait_ms = deque(maxlen=WAIT_WINDOW_SIZE)
+        self._stats = {
+            'created': 0,
+            'checkouts': 0,
+            'reused': 0,
+            'nested': 0,
+            'checkout_waits': 0,
+            'checkout_timeouts': 0,
+            'commits': 0,
+            'rollbacks': 0,
+            'lock_errors': 0
+        }
+
+    # ---- checkout ------------------------------------------------------
+
+    @contextmanager
+    def connection(self, immediate=False, row_factory=None):
+        """
+        Hold this thread's connection for one unit of work
+
+        Args:
+            immediate: Take the write lock up front (BEGIN IMMEDIATE) so a
+                read-then-write block cannot fail on a lock upgrade halfway
+            row_factory: Row factory for this block, e.g. sqlite3.Row (default tuples)
+
+        Yields:
+            sqlite3.Connection
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            with self._nested(conn, immediate, row_factory):
+                yield conn
+            return
+
+        conn = self._checkout()
+        self._local.conn = conn
+        conn.row_factory = row_factory
+        try:
+            if immediate:
+                self._begin_immediate(conn)
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+                self._count('commits')
+        except BaseException as e:
+            self._rollback(conn, e)
+            raise
+        finally:
+            self._local.conn = None
+            conn.row_factory = None
+            self._checkin(conn)
+
+    @contextmanager
+    def _nested(self, conn, immediate, row_factory):
+        """A block inside another on the same thread: a savepoint on the shared connection"""
+        depth = getattr(self._local, 'depth', 0) + 1
+        self._local.depth = depth
+        saved_factory = conn.row_factory
+        if row_factory is not None:
+            conn.row_factory = row_factory
+        self._count('nested')
+        savepoint = f"pool_sp_{depth}"
+        try:
+            if immediate and not conn.in_transaction:
+                self._begin_immediate(conn)
+            conn.execute(f'SAVEPOINT {savepoint}')
+            try:
+                yield
+            except BaseException as e:
+                conn.execute(f'ROLLBACK TO {savepoint}')
+                conn.execute(f'RELEASE {savepoint}')
+                self._note_lock_error(e)
+                raise
+            conn.execute(f'RELEASE {savepoint}')
+        finally:
+            conn.row_factory = saved_factory
+            self._local.depth = depth - 1
+
+    def _checkout(self):
+        start = time.perf_counter()
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    self._stats['checkouts'] += 1
+                    self._stats['reused'] += 1
+                    conn = self._idle.pop()
+                    break
+                if self._open < self.max_connections:
+                    self._open += 1
+                    self._stats['checkouts'] += 1
+                    conn = None
+                    break
+                if not waited:
+                    waited = True
+                    self._stats['checkout_waits'] += 1
+                remaining = self.timeout - (time.perf_counter() - start)
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and self._open >= self.max_connections:
+                        self._stats['checkout_timeouts'] += 1
+                        raise PoolTimeoutError(
+                            f"No database connection free after {self.timeout}s "
+                            f"({self.max_connections} in use)"
+                        )
+            if waited:
+                self._checkout_wait_ms.append((time.perf_counter() - start) * 1000)
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+        return conn
+
+    def _checkin(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=Config.DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,  # handed between threads, never shared at once
+            cached_statements=Config.DB_STATEMENT_CACHE_SIZE
+        )
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name}={value}')
+        self._count('created')
+        return conn
+
+    # ---- transactions --------------------------------------------------
+
+    def _begin_immediate(self, conn):
+        """Start a write transaction, recording how long the write lock took"""
+        start = time.perf_counter()
+        conn.execute('BEGIN IMMEDIATE')
+        with self._cond:
+            self._write_lock_wait_ms.append((time.perf_counter() - start) * 1000)
+
+    def _rollback(self, conn, error):
+        try:
+            conn.rollback()
+        except sqlite3.Error:
+            pass
+        self._count('rollbacks')
+        self._note_lock_error(error)
+
+    def _note_lock_error(self, error):
+        if isinstance(error, sqlite3.OperationalError) and not isinstance(error, PoolTimeoutError) \
+                and ('locked' in str(error) or 'busy' in str(error)):
+            self._count('lock_errors')
+
+    def _count(self, name):
+        with self._cond:
+            self._stats[name] += 1
+
+    # ---- lifecycle and reporting ---------------------------------------
+
+    def close_all(self):
+        """Close the idle connections (e.g. before the database file is replaced)"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    @staticmethod
+    def _percentiles(values):
+        if not values:
+            return None
+        return {
+            'p50': round(float(np.percentile(values, 50)), 3),
+            'p95': round(float(np.percentile(values, 95)), 3),
+            'max': round(float(max(values)), 3)
+        }
+
+    def get_stats(self):
+        """Get pool occupancy, reuse counters and lock-wait percentiles"""
+        with self._cond:
+            stats = dict(self._stats)
+            idle, open_ = len(self._idle), self._open
+            checkout_waits = list(self._checkout_wait_ms)
+            lock_waits = list(self._write_lock_wait_ms)
+        stats.update({
+            'db_path': self.db_path,
+            'max_connections': self.max_connections,
+            'open': open_,
+            'idle': idle,
+            'in_use': open_ - idle,
+            'checkout_wait_ms': self._percentiles(checkout_waits),
+            'write_lock_wait_ms': self._percentiles(lock_waits),
+            'write_lock_waits_over_1ms': sum(1 for ms in lock_waits if ms > 1),
+            'pragmas': dict(self.pragmas),
+            'statement_cache_size': Config.DB_STATEMENT_CACHE_SIZE
+        })
+        return stats
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_db_pool(db_path):
+    """Get the shared pool for a database file, creating it on first use"""
+    key = os.path.abspath(db_path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = SQLitePool(key)
+                _pools[key] = pool
+    return pool
+
+
+def get_db_pool_stats():
+    """Get stats for every database pool created so far"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {path: pool.get_stats() for path, pool in pools.items()}
@@ -0,0 +1,272 @@
+"""
+Provider HTTP Client
+Pooled keep-alive sessions for the cloud AI backends, with jittered retries
+and a per-call latency breakdown (connect, TLS, time to first byte, total)
+"""
+
+import os
+import sys
+import time
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from config.ai_config import AIConfig
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Connection setup timings for the request currently running on this thread
+_timings = threading.local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    """Records how long the TCP connect took"""
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        _timings.new_connection = True
+        sock = super()._new_conn()
+        _timings.connect_ms = (time.perf_counter() - start) * 1000
+        return sock
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    """Records TCP connect and TLS handshake time separately"""
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        _timings.new_connection = True
+        sock = super()._new_conn()
+        _timings.connect_ms = (time.perf_counter() - start) * 1000
+        return sock
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        total_ms = (time.perf_counter() - start) * 1000
+        _timings.tls_ms = max(total_ms - getattr(_timings, 'connect_ms', 0.0), 0.0)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools use the timing connection classes"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool
+        }
+
+
+class ProviderHTTPClient:
+    """
+    Keep-alive HTTP client for one AI provider
+    Retries 429/5xx and connection failures with full-jitter exponential backoff
+    """
+
+    def __init__(self, name, pool_size=None, connect_timeout=None, read_timeout=None,
+                 max_retries=None, backoff_base=None, backoff_max=None, keep_alive=None):
+        """
+        Args:
+            name: Provider label used in stats
+            pool_size: Max pooled connections per host
+            connect_timeout: Seconds allowed for TCP + TLS setup
+            read_timeout: Seconds allowed between bytes of the response
+            max_retries: Extra attempts after the first on 429/5xx/connection errors
+            backoff_base: First backoff ceiling in seconds (doubles per attempt)
+            backoff_max: Upper bound on a single backoff sleep
+            keep_alive: Reuse connections between calls
+        """
+        self.name = name
+        self.pool_size = pool_size or AIConfig.HTTP_POOL_SIZE
+        self.connect_timeout = connect_timeout or AIConfig.HTTP_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout or AIConfig.HTTP_READ_TIMEOUT
+        self.max_retries = AIConfig.HTTP_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = AIConfig.HTTP_BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = AIConfig.HTTP_BACKOFF_MAX if backoff_max is None else backoff_max
+        self.keep_alive = AIConfig.HTTP_KEEP_ALIVE if keep_alive is None else keep_alive
+
+        self.session = requests.Session()
+        adapter = _TimedAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if not self.keep_alive:
+            self.session.headers['Connection'] = 'close'
+
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'attempts': 0,
+            'retries': 0,
+            'failures': 0,
+            'new_connections': 0,
+            'reused_connections': 0,
+            'total_connect_ms': 0.0,
+            'total_tls_ms': 0.0,
+            'total_ttfb_ms': 0.0,
+            'total_ms': 0.0
+        }
+        self.last_timing = None
+
+    def post(self, url, **kwargs):
+        """POST with retries; see request()"""
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request through the pooled session
+
+        Returns:
+            requests.Response: The last response (may still be 429/5xx once
+            retries are exhausted). The latency breakdown of the final
+            attempt is attached as response.timing.
+        """
+        kwargs.setdefault('timeout', (self.connect_timeout, self.read_timeout))
+        attempt = 0
+
+        while True:
+            attempt += 1
+            _timings.connect_ms = 0.0
+            _timings.tls_ms = 0.0
+            _timings.new_connection = False
+            start = time.perf_counter()
+
+            try:
+                response = self.session.request(method, url, **kwargs)
+                error = None
+            except requests.ConnectionError as e:
+                # Includes connect timeouts; read timeouts are not retried
+                # because the provider may still be doing (billed) work
+                response = None
+                error = e
+            except requests.Timeout:
+                with self._lock:
+                    self._stats['requests'] += attempt == 1
+                    self._stats['attempts'] += 1
+                    self._stats['failures'] += 1
+                raise
+
+            total_ms = (time.perf_counter() - start) * 1000
+            timing = {
+                'attempt': attempt,
+                'connect_ms': round(_timings.connect_ms, 3),
+                'tls_ms': round(_timings.tls_ms, 3),
+                # requests measures send -> response headers parsed
+                'ttfb_ms': round(response.elapsed.total_seconds() * 1000, 3) if response is not None else None,
+                'total_ms': round(total_ms, 3),
+                'reused_connection': not _timings.new_connection
+            }
+            self._record(timing, first_attempt=(attempt == 1))
+
+            retryable = error is not None or response.status_code in RETRY_STATUS_CODES
+            if not retryable or attempt > self.max_retries:
+                if error is not None:
+                    with self._lock:
+                        self._stats['failures'] += 1
+                    raise error
+                if response.status_code >= 400:
+                    with self._lock:
+                        self._stats['failures'] += 1
+                response.timing = timing
+                self.last_timing = timing
+                return response
+
+            delay = self._backoff_delay(attempt, response)
+            print(f"[WARNING] {self.name} HTTP attempt {attempt} failed "
+                  f"({error or response.status_code}); retrying in {delay:.2f}s")
+            if response is not None:
+                response.close()
+            with self._lock:
+                self._stats['retries'] += 1
+            time.sleep(delay)
+
+    def get_stats(self):
+        """Get request counters and average latency breakdown"""
+        with self._lock:
+            stats = dict(self._stats)
+
+        attempts = stats['attempts'] or 1
+        new_connections = stats['new_connections'] or 1
+        return {
+            'requests': stats['requests'],
+            'attempts': stats['attempts'],
+            'retries': stats['retries'],
+            'failures': stats['failures'],
+            'new_connections': stats['new_connections'],
+            'reused_connections': stats['reused_connections'],
+            'avg_connect_ms': round(stats['total_connect_ms'] / new_connections, 3),
+            'avg_tls_ms': round(stats['total_tls_ms'] / new_connections, 3),
+            'avg_ttfb_ms': round(stats['total_ttfb_ms'] / attempts, 3),
+            'avg_total_ms': round(stats['total_ms'] / attempts, 3),
+            'pool_size': self.pool_size,
+            'keep_alive': self.keep_alive,
+            'last_timing': self.last_timing
+        }
+
+    def close(self):
+        self.session.close()
+
+    def _backoff_delay(self, attempt, response):
+        """Full-jitter exponential backoff, honouring Retry-After when sent"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    pass
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+    def _record(self, timing, first_attempt):
+        with self._lock:
+            stats = self._stats
+            if first_attempt:
+                stats['requests'] += 1
+            stats['attempts'] += 1
+            if timing['reused_connection']:
+                stats['reused_connections'] += 1
+            else:
+                stats['new_connections'] += 1
+                stats['total_connect_ms'] += timing['connect_ms']
+                stats['total_tls_ms'] += timing['tls_ms']
+            stats['total_ttfb_ms'] += timing['ttfb_ms'] or 0.0
+            stats['total_ms'] += timing['total_ms']
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_http_client(name):
+    """Get the shared client for a provider, creating it on first use"""
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = ProviderHTTPClient(name)
+                _clients[name] = client
+    return client
+
+
+def get_http_stats():
+    """Get stats for every provider client created so far"""
+    with _clients_lock:
+        clients = dict(_clients)
+    return {name: client.get_stats() for name, client in clients.items()}
@@ -1,8 +1,57 @@
 import cv2
+import io
 import numpy as np
-from PIL import Image
+from PIL import Image, ImageOps, UnidentifiedImageError
 import os
 
+# EXIF orientations that swap width and height
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+_EXIF_ORIENTATION_TAG = 0x0112
+
+
+def load_model_input(image, target_size, out=None):
+    """
+    Decode an image straight into a normalized float32 model tensor
+
+    JPEGs are decoded at the smallest DCT scale (1/2, 1/4 or 1/8) that still
+    covers target_size, so a 12 MP photo never materializes at full size.
+    EXIF orientation is applied, then the image is resized with area
+    interpolation and scaled to [0, 1] directly into `out`.
+
+    Args:
+        image: Raw image bytes or a path to an image file
+        target_size: (width, height) the model expects
+        out: Optional preallocated float32 array of shape (height, width, 3)
+
+    Returns:
+        np.ndarray: `out` (or a new array) holding RGB values in [0, 1]
+    """
+    width, height = target_size
+    if out is None:
+        out = np.empty((height, width, 3), dtype=np.float32)
+
+    try:
+        source = io.BytesIO(image) if isinstance(image, (bytes, bytearray, memoryview)) else image
+        with Image.open(source) as img:
+            orientation = img.getexif().get(_EXIF_ORIENTATION_TAG, 1)
+            # draft() works in stored (pre-rotation) coordinates
+            if orientation in _TRANSPOSED_ORIENTATIONS:
+                img.draft('RGB', (height, width))
+            else:
+                img.draft('RGB', (width, height))
+            img = ImageOps.exif_transpose(img)
+            pixels = np.asarray(img.convert('RGB'))
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        raise ValueError(f"Could not decode image: {e}")
+
+    if pixels.shape[1] != width or pixels.shape[0] != height:
+        interpolation = cv2.INTER_AREA if pixels.shape[1] >= width else cv2.INTER_LINEAR
+        pixels = cv2.resize(pixels, (width, height), interpolation=interpolation)
+
+    np.multiply(pixels, np.float32(1.0 / 255.0), out=out)
+    return out
+
+
 def validate_image(file_path):
     """
     Validate if the file is a valid image
@@ -0,0 +1,158 @@
+"""
+Lazy Initialization
+Module-level singletons that are built on first use, plus a registry of which
+subsystems are warm so the app can report readiness
+"""
+
+import sys
+import time
+import threading
+
+# Third-party modules that dominate cold start; reported by the readiness endpoint
+HEAVY_MODULES = ('tensorflow', 'cv2', 'google.generativeai', 'razorpay')
+
+
+class StartupState:
+    """Tracks startup mode, per-subsystem warm state and overall readiness"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subsystems = {}
+        self._objects = {}  # name -> LazyObject
+        self._started_at = time.perf_counter()
+        self._ready_at = None
+        self.mode = 'eager'
+
+    def begin(self, mode):
+        with self._lock:
+            self.mode = mode
+            self._started_at = time.perf_counter()
+            self._ready_at = None
+
+    def mark_ready(self):
+        with self._lock:
+            if self._ready_at is None:
+                self._ready_at = time.perf_counter()
+
+    @property
+    def ready(self):
+        with self._lock:
+            return self._ready_at is not None
+
+    def register(self, name, obj=None):
+        with self._lock:
+            if obj is not None or name not in self._subsystems:
+                # A new object under an existing name (e.g. create_app called again) starts cold
+                self._subsystems[name] = {'warm': False, 'init_ms': None, 'error': None}
+            if obj is not None:
+                self._objects[name] = obj
+
+    def registered_objects(self):
+        with self._lock:
+            return list(self._objects.values())
+
+    def mark_warm(self, name, init_ms):
+        with self._lock:
+            self._subsystems[name] = {'warm': True, 'init_ms': round(init_ms, 2), 'error': None}
+
+    def mark_failed(self, name, error):
+        with self._lock:
+            entry = self._subsystems.setdefault(name, {'warm': False, 'init_ms': None, 'error': None})
+            entry['error'] = str(error)
+
+    def snapshot(self):
+        """Get readiness, subsystem states and which heavy modules are imported"""
+        with self._lock:
+            subsystems = {name: dict(entry) for name, entry in self._subsystems.items()}
+            ready_ms = None
+            if self._ready_at is not None:
+                ready_ms = round((self._ready_at - self._started_at) * 1000, 2)
+            return {
+                'ready': self._ready_at is not None,
+                'startup_mode': self.mode,
+                'time_to_ready_ms': ready_ms,
+                'subsystems': subsystems,
+                'heavy_modules_loaded': {name: name in sys.modules for name in HEAVY_MODULES}
+            }
+
+
+class LazyObject:
+    """
+    Stand-in for a module-level instance; the real object is constructed on
+    first attribute access and every access after that is forwarded to it
+
+    Python looks special methods up on the type, not through __getattr__, so
+    only the container protocol (len, iteration, `in`, indexing) and truth
+    testing are forwarded explicitly. Operators, context managers and
+    isinstance() see the proxy, not the real instance.
+    """
+
+    def __init__(self, factory, name):
+        object.__setattr__(self, '_lazy_factory', factory)
+        object.__setattr__(self, '_lazy_name', name)
+        object.__setattr__(self, '_lazy_instance', None)
+        object.__setattr__(self, '_lazy_lock', threading.Lock())
+        startup_state.register(name, self)
+
+    def _lazy_resolve(self):
+        instance = object.__getattribute__(self, '_lazy_instance')
+        if instance is not None:
+            return instance
+
+        with object.__getattribute__(self, '_lazy_lock'):
+            instance = object.__getattribute__(self, '_lazy_instance')
+            if instance is None:
+                name = object.__getattribute__(self, '_lazy_name')
+                start = time.perf_counter()
+                try:
+                    instance = object.__getattribute__(self, '_lazy_factory')()
+                except Exception as e:
+                    startup_state.mark_failed(name, e)
+                    raise
+                object.__setattr__(self, '_lazy_instance', instance)
+                startup_state.mark_warm(name, (time.perf_counter() - start) * 1000)
+        return instance
+
+    def __getattr__(self, item):
+        return getattr(self._lazy_resolve(), item)
+
+    def __setattr__(self, key, value):
+        setattr(self._lazy_resolve(), key, value)
+
+    def __len__(self):
+        return len(self._lazy_resolve())
+
+    def __iter__(self):
+        return iter(self._lazy_resolve())
+
+    def __contains__(self, item):
+        return item in self._lazy_resolve()
+
+    def __getitem__(self, key):
+        return self._lazy_resolve()[key]
+
+    def __bool__(self):
+        return bool(self._lazy_resolve())
+
+    def __repr__(self):
+        instance = object.__getattribute__(self, '_lazy_instance')
+        if instance is None:
+            return f"<LazyObject {object.__getattribute__(self, '_lazy_name')} (cold)>"
+        return repr(instance)
+
+
+def warm(obj):
+    """Build a LazyObject now (no-op for anything else)"""
+    if isinstance(obj, LazyObject):
+        obj._lazy_resolve()
+    return obj
+
+
+def warm_all():
+    """Build every registered LazyObject that is still cold"""
+    for obj in startup_state.registered_objects():
+        obj._lazy_resolve()
+
+
+# Global instance shared by the app factory and the blueprints
+startup_state = StartupState()
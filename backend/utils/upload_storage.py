@@ -0,0 +1,65 @@
+"""
+Upload Storage
+Persists original uploads in the background so classification never waits on disk
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class UploadStorage:
+    """Background writer for uploaded image bytes"""
+
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload-writer")
+        self._lock = threading.Lock()
+        self._stats = {'pending': 0, 'saved': 0, 'failed': 0, 'bytes_written': 0}
+
+    def save_async(self, image_bytes, path):
+        """
+        Queue an upload to be written to disk
+
+        Args:
+            image_bytes: Raw uploaded bytes
+            path: Destination file path
+
+        Returns:
+            concurrent.futures.Future: Resolves to True once written
+        """
+        with self._lock:
+            self._stats['pending'] += 1
+        return self._executor.submit(self._write, image_bytes, path)
+
+    def get_stats(self):
+        """Get background write counters"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _write(self, image_bytes, path):
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            # Write then rename so readers never see a partial file
+            temp_path = f"{path}.part"
+            with open(temp_path, 'wb') as f:
+                f.write(image_bytes)
+            os.replace(temp_path, path)
+
+            with self._lock:
+                self._stats['saved'] += 1
+                self._stats['bytes_written'] += len(image_bytes)
+            return True
+
+        except Exception as e:
+            print(f"[WARNING] Could not persist upload to {path}: {e}")
+            with self._lock:
+                self._stats['failed'] += 1
+            return False
+
+        finally:
+            with self._lock:
+                self._stats['pending'] -= 1
+
+
+# Global instance shared by upload endpoints
+upload_storage = UploadStorage()